@@ -36,18 +36,54 @@ bl_info = {
     "category": "Import-Export"
 }
 
-import bpy
-
-from mathutils import Matrix
-from bpy.props import (BoolProperty,
-                       StringProperty,
-                       EnumProperty)
-from bpy_extras.io_utils import (ImportHelper,
-                                 ExportHelper,
-                                 axis_conversion)
-
-
-class ImportBlenderXModel(bpy.types.Operator, ImportHelper):
+try:
+    import bpy
+
+    from mathutils import Matrix
+    from bpy.types import Operator
+    from bpy.props import (BoolProperty,
+                           IntProperty,
+                           FloatProperty,
+                           StringProperty,
+                           EnumProperty)
+    from bpy_extras.io_utils import (ImportHelper,
+                                     ExportHelper,
+                                     axis_conversion)
+except ImportError:
+    # imported outside of blender, such as by a worker process or a tool,
+    # the operators are defined on these stand-ins but never registered,
+    # only the modules which don't depend on bpy are available
+    bpy = None
+    Matrix = None
+    axis_conversion = None
+    BoolProperty = IntProperty = FloatProperty = StringProperty = EnumProperty = dict
+
+    class Operator:
+        pass
+
+    class ImportHelper:
+        pass
+
+    class ExportHelper:
+        pass
+
+
+# properties of the export operator which aren't passed to the exporter as they are
+_CONVERTED_PROPERTIES = ("filepath",
+                         "filter_glob",
+                         "check_existing",
+                         "axis_forward",
+                         "axis_up",
+                         "flip_x",
+                         "flip_y",
+                         "flip_z",
+                         "mesh_cache_directory",
+                         "mesh_cache_size",
+                         "compress_sections",
+                         "compress_level")
+
+
+class ImportBlenderXModel(Operator, ImportHelper):
     bl_idname = "import.xm_data"
     bl_label = "Import xModel Data"
 
@@ -113,7 +149,7 @@ class ImportBlenderXModel(bpy.types.Operator, ImportHelper):
         return importer.decode()
 
 
-class ExportBlenderXModel(bpy.types.Operator, ExportHelper):
+class ExportBlenderXModel(Operator, ExportHelper):
     bl_idname = "export.xm_data"
     bl_label = "Export xModel Data"
 
@@ -175,6 +211,199 @@ class ExportBlenderXModel(bpy.types.Operator, ExportHelper):
         name="Export Actions",
         default=True)
 
+    compact_mesh = BoolProperty(
+        name="Compact Mesh Data",
+        default=False)
+
+    num_workers = IntProperty(
+        name="Mesh Worker Processes",
+        description="Number of processes converting the meshes in parallel, 0 is serial",
+        default=0,
+        min=0,
+        max=64)
+
+    use_mesh_cache = BoolProperty(
+        name="Use Mesh Cache",
+        description="Reuse the converted data of the unchanged meshes",
+        default=False)
+
+    mesh_cache_directory = StringProperty(
+        name="Mesh Cache Directory",
+        description="Directory of the mesh cache, empty is the cache directory of the user",
+        default="",
+        subtype='DIR_PATH')
+
+    mesh_cache_size = IntProperty(
+        name="Mesh Cache Size (MB)",
+        default=256,
+        min=1)
+
+    stream_encode = BoolProperty(
+        name="Stream Encoding",
+        description="Write each mesh as soon as it's converted for reducing the peak memory",
+        default=False)
+
+    compress_sections = BoolProperty(
+        name="Compress Sections",
+        description="Compress the big blocks of the binary data, it needs the newer decoder",
+        default=False)
+
+    compress_level = IntProperty(
+        name="Compression Level",
+        default=6,
+        min=0,
+        max=9)
+
+    position_encoding = EnumProperty(
+        name="Positions",
+        items=(('FLOAT32', "32bits Float", ""),
+               ('INT16', "16bits Integer", "Quantize in the bounding box of mesh")),
+        default='FLOAT32')
+
+    normal_encoding = EnumProperty(
+        name="Normals",
+        items=(('FLOAT32', "32bits Float", ""),
+               ('OCTAHEDRAL16', "Octahedral 2x16bits", ""),
+               ('OCTAHEDRAL8', "Octahedral 2x8bits", "")),
+        default='FLOAT32')
+
+    color_encoding = EnumProperty(
+        name="Colors",
+        items=(('FLOAT32', "32bits Float", ""),
+               ('FLOAT16', "16bits Float", ""),
+               ('UNORM8', "8bits Normalized", "")),
+        default='FLOAT32')
+
+    tex_coord_encoding = EnumProperty(
+        name="Texture Coordinates",
+        items=(('FLOAT32', "32bits Float", ""),
+               ('FLOAT16', "16bits Float", "")),
+        default='FLOAT32')
+
+    indexed_layout = BoolProperty(
+        name="Indexed Layout",
+        description="Write the index of the structures for loading them partially, "
+                    "it needs the newer decoder",
+        default=False)
+
+    embed_textures = BoolProperty(
+        name="Embed Textures",
+        description="Embed the images of the textures, the same images are embedded once",
+        default=False)
+
+    texture_max_size = IntProperty(
+        name="Max Texture Size",
+        description="Downscale the embedded images to fit in this size, 0 keeps the size, "
+                    "it needs Pillow",
+        default=0,
+        min=0)
+
+    texture_format = EnumProperty(
+        name="Texture Format",
+        description="Convert the embedded images to this format, it needs Pillow",
+        items=(('ORIGINAL', "Original", ""),
+               ('PNG', "PNG", ""),
+               ('JPEG', "JPEG", "")),
+        default='ORIGINAL')
+
+    optimize_vertex_cache = BoolProperty(
+        name="Optimize Vertex Cache",
+        description="Triangulate the faces and reorder them for the vertex cache and overdraw, "
+                    "and reorder the vertices in order of the use",
+        default=False)
+
+    triangulate_faces = BoolProperty(
+        name="Triangulate Faces",
+        description="Write the triangulated faces for the index buffers of the runtime, "
+                    "it needs the newer decoder",
+        default=False)
+
+    interleave_vertices = EnumProperty(
+        name="Interleave Vertices",
+        description="Write the interleaved vertices for the vertex buffers of the runtime, "
+                    "it needs the newer decoder",
+        items=(('NONE', "None", "Don't interleave the vertices"),
+               ('STATIC', "Static", "Interleave the vertices of the meshes without skin"),
+               ('ALL', "All", "Interleave the vertices of all meshes")),
+        default='NONE')
+
+    skin_palette_size = IntProperty(
+        name="Skin Palette Size",
+        description="Split the skinned meshes into the submeshes whose bones fit in the matrix palette "
+                    "of this size, 0 doesn't split them",
+        default=0,
+        min=0,
+        max=256)
+
+    skin_max_influences = IntProperty(
+        name="Max Bone Influences",
+        description="Maximum number of the bones weighting a vertex of the split meshes",
+        default=4,
+        min=1,
+        max=8)
+
+    skin_weight_threshold = FloatProperty(
+        name="Bone Weight Threshold",
+        description="Prune the bone weights below this threshold of the split meshes "
+                    "and renormalize the remaining ones",
+        default=0.0,
+        min=0.0,
+        max=1.0)
+
+    bake_pose = BoolProperty(
+        name="Bake Poses",
+        description="Write the poses evaluated with the constraints and the inverse kinematics "
+                    "at each frame of the actions, and drop the inverse kinematics",
+        default=False)
+
+    group_channels = BoolProperty(
+        name="Group Animation Channels",
+        description="Write the components of the locations, rotations and scales of the actions "
+                    "as an animation of vectors, it needs the newer runtime",
+        default=False)
+
+    sample_frames = EnumProperty(
+        name="Sample Frames",
+        description="Write the actions as the values sampled at each frame instead of the keys, "
+                    "it needs the newer decoder",
+        items=(('NONE', "None", "Write the keys"),
+               ('FLOAT32', "Float32", "32bits float numbers"),
+               ('FLOAT16', "Float16", "16bits float numbers"),
+               ('INT16', "Int16", "16bits integers in the range of each component")),
+        default='NONE')
+
+    reduce_keyframes = BoolProperty(
+        name="Reduce Keyframes",
+        description="Remove the keys of the actions which are interpolated within the tolerances",
+        default=False)
+
+    fit_bezier = BoolProperty(
+        name="Fit Bezier Curves",
+        description="Fit the bezier curves to the reduced keys if they are smaller, "
+                    "it needs the newer decoder",
+        default=False)
+
+    translate_tolerance = FloatProperty(
+        name="Translate Tolerance",
+        description="Maximum error of the reduced keys of the locations",
+        default=0.001,
+        min=0.0,
+        precision=4)
+
+    rotate_tolerance = FloatProperty(
+        name="Rotate Tolerance",
+        description="Maximum error of the reduced keys of the rotations",
+        default=0.0005,
+        min=0.0,
+        precision=4)
+
+    scale_tolerance = FloatProperty(
+        name="Scale Tolerance",
+        description="Maximum error of the reduced keys of the scales",
+        default=0.001,
+        min=0.0,
+        precision=4)
+
     def execute(self, context):
         from . import export_xm
 
@@ -195,9 +424,19 @@ class ExportBlenderXModel(bpy.types.Operator, ExportHelper):
                                   global_matrix
         config["export_bones"] = self.export_bones
         config["export_actions"] = self.export_actions
+        # the other options of the exporter are same as the properties
+        config.update(self.as_keywords(ignore=_CONVERTED_PROPERTIES))
+        if self.mesh_cache_directory:
+            config["mesh_cache_directory"] = bpy.path.abspath(self.mesh_cache_directory)
+        config["mesh_cache_size"] = self.mesh_cache_size * 1024 * 1024
+        if self.compress_sections:
+            config["compress_level"] = self.compress_level
 
         exporter = export_xm.XModelExporter(context, **config)
-        return exporter.encode()
+        result = exporter.encode()
+        for level, message in exporter.reports():
+            self.report({level}, message)
+        return result
 
 
 def import_test(filepath=".\\test.xm",
@@ -237,7 +476,10 @@ def export_test(filepath=".\\test.xm",
                 axis_forward="Z",
                 axis_up="Y",
                 export_bones=True,
-                export_actions=True):
+                export_actions=True,
+                mesh_cache_directory=None,
+                mesh_cache_size=256,
+                **options):
     from . import export_xm
     import imp
     imp.reload(export_xm)
@@ -258,9 +500,17 @@ def export_test(filepath=".\\test.xm",
                               global_matrix
     config["export_bones"] = export_bones
     config["export_actions"] = export_actions
+    if mesh_cache_directory:
+        config["mesh_cache_directory"] = mesh_cache_directory
+    config["mesh_cache_size"] = mesh_cache_size * 1024 * 1024
+    # the other options are passed to the exporter as they are
+    config.update(options)
 
     exporter = export_xm.XModelExporter(bpy.context, **config)
-    return exporter.encode()
+    result = exporter.encode()
+    for level, message in exporter.reports():
+        print("%s: %s" % (level, message))
+    return result
 
 
 def menu_func_import(self, context):
@@ -283,5 +533,5 @@ def unregister():
     bpy.types.INFO_MT_file_import.remove(menu_func_import)
 
 
-if __name__ == "__main__":
+if __name__ == "__main__" and bpy is not None:
     register()
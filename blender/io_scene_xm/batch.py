@@ -0,0 +1,429 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# Batch exporting of the blend files to xModel format on the command line.
+# This module doesn't depend on bpy, each file is exported by the blender process
+# which is launched in background mode.
+#
+# usage: python3 -m io_scene_xm.batch [options] <blend files, globs or @manifest>
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+# directory which contains this add-on package
+_PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# python expression which is run in the blender process
+_EXPORT_EXPRESSION = ("import sys\n"
+                      "sys.path.insert(0, %r)\n"
+                      "import io_scene_xm\n"
+                      "io_scene_xm.export_test(**%r)\n")
+
+# names of the axes
+_AXES = ("X", "Y", "Z", "-X", "-Y", "-Z")
+
+
+# result of exporting a blend file
+class XModelBatchResult:
+    # attributes of instance
+    __slots__ = ("source",
+                 "destination",
+                 "succeeded",
+                 "elapsed",
+                 "size",
+                 "message")
+
+    # initialize
+    def __init__(self, source, destination):
+        # string : path of the blend file
+        self.source = source
+        # string : path of the exported xModel file
+        self.destination = destination
+        # bool : true if the file is exported
+        self.succeeded = False
+        # float : elapsed seconds
+        self.elapsed = 0.0
+        # int : size of the exported file in bytes
+        self.size = 0
+        # string : error message if it's failed
+        self.message = None
+
+    # convert to dictionary for reporting
+    def toDict(self):
+        return {"source": self.source,
+                "destination": self.destination,
+                "succeeded": self.succeeded,
+                "elapsed": self.elapsed,
+                "size": self.size,
+                "message": self.message}
+
+
+# runner that launches the blender process,
+# it can be replaced by the object which has the same run method for testing
+class XModelBlenderRunner:
+    # initialize
+    def __init__(self, executable="blender"):
+        self.executable = executable
+
+    # run the python expression on the blend file in background,
+    # returns the return code and the output of the process
+    def run(self, source, expression, timeout=None):
+        command = [self.executable,
+                   "--background",
+                   "--factory-startup",
+                   source,
+                   "--python-exit-code", "1",
+                   "--python-expr", expression]
+        try:
+            process = subprocess.run(command,
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT,
+                                     timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return -1, "timed out after %s seconds" % timeout
+        return process.returncode, process.stdout.decode("utf-8", "replace")
+
+
+# batch exporter that exports the blend files in parallel
+class XModelBatchExporter:
+    # initialize
+    def __init__(self,
+                 runner,
+                 num_workers=1,
+                 output_directory=None,
+                 timeout=None,
+                 mesh_workers=0,
+                 **options):
+        self.runner = runner
+        self.num_workers = max(1, num_workers)
+        self.output_directory = output_directory
+        self.timeout = timeout
+        # options for export_test of the add-on,
+        # the number of the processes converting the meshes in each blender process is num_workers of it
+        self.options = options
+        self.options["num_workers"] = mesh_workers
+
+    # get the path of the exported file of the blend file
+    def destinationOf(self, source):
+        name = os.path.splitext(os.path.basename(source))[0] + ".xm"
+        if self.output_directory is not None:
+            return os.path.join(self.output_directory, name)
+        return os.path.join(os.path.dirname(source), name)
+
+    # export the blend files, the results are returned in order of the sources
+    def export(self, sources, callback=None):
+        # the files with the same name overwrite each other in the output directory
+        destinations = {}
+        for source in sources:
+            destination = os.path.normcase(os.path.abspath(self.destinationOf(source)))
+            if destination in destinations:
+                raise ValueError("%s and %s are exported to the same file" %
+                                 (destinations[destination], source))
+            destinations[destination] = source
+
+        if self.output_directory is not None:
+            os.makedirs(self.output_directory, exist_ok=True)
+
+        # each job waits for the blender process, so the threads are enough for the pool
+        results = [None] * len(sources)
+        with concurrent.futures.ThreadPoolExecutor(self.num_workers) as executor:
+            futures = {}
+            for index, source in enumerate(sources):
+                futures[executor.submit(self.exportFile, source)] = index
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                if callback is not None:
+                    callback(result)
+        return results
+
+    # export a blend file
+    def exportFile(self, source):
+        result = XModelBatchResult(source, self.destinationOf(source))
+
+        options = dict(self.options)
+        options["filepath"] = os.path.abspath(result.destination)
+        expression = _EXPORT_EXPRESSION % (_PACKAGE_PARENT, options)
+
+        # remove the old file for detecting the failure
+        try:
+            os.remove(result.destination)
+        except OSError:
+            pass
+
+        start = time.perf_counter()
+        try:
+            code, output = self.runner.run(os.path.abspath(source), expression, self.timeout)
+        except OSError as error:
+            code, output = -1, str(error)
+        result.elapsed = time.perf_counter() - start
+
+        if code != 0:
+            result.message = "exit code %d: %s" % (code, _lastLines(output))
+        elif not os.path.isfile(result.destination):
+            result.message = "no output file: %s" % _lastLines(output)
+        else:
+            result.succeeded = True
+            result.size = os.path.getsize(result.destination)
+        return result
+
+
+# get the last lines of the output for the error message
+def _lastLines(output, num_lines=5):
+    lines = [line for line in output.splitlines() if line.strip()]
+    return " | ".join(lines[-num_lines:])
+
+
+# collect the blend files from the paths, globs and manifests,
+# a manifest is given as @path and lists a path or a glob in each line
+def collect_sources(patterns):
+    sources = []
+    for pattern in patterns:
+        if pattern.startswith("@"):
+            with open(pattern[1:], "r", encoding="utf-8") as file:
+                base = os.path.dirname(pattern[1:])
+                lines = [line.strip() for line in file]
+            sources.extend(collect_sources([os.path.join(base, line)
+                                            for line in lines
+                                            if line and not line.startswith("#")]))
+        elif glob.has_magic(pattern):
+            sources.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            sources.append(pattern)
+
+    # remove the duplicated files keeping the order
+    unique_sources = []
+    found = set()
+    for source in sources:
+        key = os.path.normcase(os.path.abspath(source))
+        if key not in found:
+            found.add(key)
+            unique_sources.append(source)
+    return unique_sources
+
+
+# add the pair of --name and --no-name options, the defaults are same as the operator
+def _add_switch(parser, name, default, help):
+    dest = name.replace("-", "_")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--" + name, dest=dest, action="store_true",
+                       help=help + (" (default)" if default else ""))
+    group.add_argument("--no-" + name, dest=dest, action="store_false",
+                       help="don't " + help + ("" if default else " (default)"))
+    parser.set_defaults(**{dest: default})
+
+
+# create the parser of command line arguments
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        prog="python3 -m io_scene_xm.batch",
+        description="Export the blend files to xModel format with the blender processes.")
+    parser.add_argument("sources", nargs="+",
+                        help="blend files, globs or @manifest files")
+    parser.add_argument("-o", "--output-directory", default=None,
+                        help="directory of the exported files, default is beside each blend file")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of the blender processes")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"),
+                        help="path of the blender executable")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="timeout of each file in seconds")
+    parser.add_argument("--report", default=None,
+                        help="path of the JSON report")
+    parser.add_argument("--axis-forward", choices=_AXES, default="Z")
+    parser.add_argument("--axis-up", choices=_AXES, default="Y")
+    _add_switch(parser, "use-mesh-modifiers", False, "apply the modifiers")
+    _add_switch(parser, "invert-face", True, "invert the faces")
+    _add_switch(parser, "flip-x", True, "flip the x-axis")
+    _add_switch(parser, "flip-y", False, "flip the y-axis")
+    _add_switch(parser, "flip-z", False, "flip the z-axis")
+    _add_switch(parser, "export-bones", True, "export the bones")
+    _add_switch(parser, "export-actions", True, "export the actions")
+    _add_switch(parser, "compact-mesh", False, "use the compact mesh data")
+    parser.add_argument("--mesh-workers", type=int, default=0,
+                        help="number of the processes converting the meshes in parallel in each blender process, "
+                             "0 is serial")
+    _add_switch(parser, "mesh-cache", False, "reuse the converted data of the unchanged meshes")
+    parser.add_argument("--mesh-cache-directory", default=None,
+                        help="directory of the mesh cache, default is the cache directory of the user")
+    parser.add_argument("--mesh-cache-size", type=int, default=256,
+                        help="limit of the total size of the mesh cache in MB")
+    _add_switch(parser, "stream-encode", False, "write each mesh as soon as it's converted")
+    parser.add_argument("--compress-level", type=int, choices=range(10), default=None, metavar="0-9",
+                        help="compress the sections in the level, it needs the newer decoder")
+    parser.add_argument("--position-encoding", choices=("FLOAT32", "INT16"), default="FLOAT32")
+    parser.add_argument("--normal-encoding", choices=("FLOAT32", "OCTAHEDRAL16", "OCTAHEDRAL8"),
+                        default="FLOAT32")
+    parser.add_argument("--color-encoding", choices=("FLOAT32", "FLOAT16", "UNORM8"), default="FLOAT32")
+    parser.add_argument("--tex-coord-encoding", choices=("FLOAT32", "FLOAT16"), default="FLOAT32")
+    _add_switch(parser, "indexed-layout", False,
+                "write the index of the structures for loading them partially")
+    _add_switch(parser, "embed-textures", False, "embed the images of the textures")
+    parser.add_argument("--texture-max-size", type=int, default=0,
+                        help="downscale the embedded images to fit in the size, it needs Pillow")
+    parser.add_argument("--texture-format", choices=("ORIGINAL", "PNG", "JPEG"), default="ORIGINAL",
+                        help="convert the embedded images to the format, it needs Pillow")
+    _add_switch(parser, "optimize-vertex-cache", False,
+                "reorder the triangles and vertices for the vertex cache and overdraw")
+    _add_switch(parser, "triangulate-faces", False,
+                "write the triangulated faces for the index buffers of the runtime")
+    parser.add_argument("--interleave-vertices", choices=("NONE", "STATIC", "ALL"), default="NONE",
+                        help="write the interleaved vertices of the selected meshs for the vertex buffers "
+                             "of the runtime")
+    parser.add_argument("--skin-palette-size", type=int, default=0,
+                        help="split the skinned meshs into the submeshs whose bones fit in the matrix palette "
+                             "of the size, 0 doesn't split them")
+    parser.add_argument("--skin-max-influences", type=int, default=4,
+                        help="maximum number of the bones weighting a vertex of the split meshs")
+    parser.add_argument("--skin-weight-threshold", type=float, default=0.0,
+                        help="prune the bone weights below the threshold of the split meshs "
+                             "and renormalize the remaining ones")
+    _add_switch(parser, "bake-pose", False,
+                "write the poses evaluated with the constraints and the inverse kinematics at each frame "
+                "of the actions, and drop the inverse kinematics")
+    _add_switch(parser, "group-channels", False,
+                "write the components of the transforms of the actions as an animation of vectors")
+    parser.add_argument("--sample-frames", choices=("NONE", "FLOAT32", "FLOAT16", "INT16"), default="NONE",
+                        help="write the actions as the values sampled at each frame in the encoding "
+                             "instead of the keys")
+    _add_switch(parser, "reduce-keyframes", False,
+                "remove the keys of the actions which are interpolated within the tolerances")
+    _add_switch(parser, "fit-bezier", False,
+                "fit the bezier curves to the reduced keys if they are smaller")
+    parser.add_argument("--translate-tolerance", type=float, default=0.001,
+                        help="maximum error of the reduced keys of the locations")
+    parser.add_argument("--rotate-tolerance", type=float, default=0.0005,
+                        help="maximum error of the reduced keys of the rotations")
+    parser.add_argument("--scale-tolerance", type=float, default=0.001,
+                        help="maximum error of the reduced keys of the scales")
+    return parser
+
+
+# entry point of command line, returns the exit status
+def main(args=None, runner=None):
+    args = create_argument_parser().parse_args(args)
+
+    sources = collect_sources(args.sources)
+    if len(sources) == 0:
+        print("No blend files are found.", file=sys.stderr)
+        return 2
+
+    if runner is None:
+        runner = XModelBlenderRunner(args.blender)
+    mesh_cache_directory = None
+    if args.mesh_cache_directory is not None:
+        mesh_cache_directory = os.path.abspath(args.mesh_cache_directory)
+    exporter = XModelBatchExporter(runner,
+                                   num_workers=args.jobs,
+                                   output_directory=args.output_directory,
+                                   timeout=args.timeout,
+                                   use_mesh_modifiers=args.use_mesh_modifiers,
+                                   invert_face=args.invert_face,
+                                   flip_x=args.flip_x,
+                                   flip_y=args.flip_y,
+                                   flip_z=args.flip_z,
+                                   axis_forward=args.axis_forward,
+                                   axis_up=args.axis_up,
+                                   export_bones=args.export_bones,
+                                   export_actions=args.export_actions,
+                                   compact_mesh=args.compact_mesh,
+                                   mesh_workers=args.mesh_workers,
+                                   use_mesh_cache=args.mesh_cache,
+                                   mesh_cache_directory=mesh_cache_directory,
+                                   mesh_cache_size=args.mesh_cache_size,
+                                   stream_encode=args.stream_encode,
+                                   compress_level=args.compress_level,
+                                   position_encoding=args.position_encoding,
+                                   normal_encoding=args.normal_encoding,
+                                   color_encoding=args.color_encoding,
+                                   tex_coord_encoding=args.tex_coord_encoding,
+                                   indexed_layout=args.indexed_layout,
+                                   embed_textures=args.embed_textures,
+                                   texture_max_size=args.texture_max_size,
+                                   texture_format=args.texture_format,
+                                   optimize_vertex_cache=args.optimize_vertex_cache,
+                                   triangulate_faces=args.triangulate_faces,
+                                   interleave_vertices=args.interleave_vertices,
+                                   skin_palette_size=args.skin_palette_size,
+                                   skin_max_influences=args.skin_max_influences,
+                                   skin_weight_threshold=args.skin_weight_threshold,
+                                   bake_pose=args.bake_pose,
+                                   group_channels=args.group_channels,
+                                   sample_frames=args.sample_frames,
+                                   reduce_keyframes=args.reduce_keyframes,
+                                   fit_bezier=args.fit_bezier,
+                                   translate_tolerance=args.translate_tolerance,
+                                   rotate_tolerance=args.rotate_tolerance,
+                                   scale_tolerance=args.scale_tolerance)
+
+    # report each file when it's finished
+    def report(result):
+        if result.succeeded:
+            print("OK   %8.2fs %12d  %s" % (result.elapsed, result.size, result.source))
+        else:
+            print("FAIL %8.2fs %12s  %s: %s" % (result.elapsed, "-", result.source, result.message))
+        sys.stdout.flush()
+
+    start = time.perf_counter()
+    try:
+        results = exporter.export(sources, report)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - start
+
+    num_failures = sum(1 for result in results if not result.succeeded)
+    print("%d files, %d failed, %d bytes, %.2fs (%d jobs)" %
+          (len(results),
+           num_failures,
+           sum(result.size for result in results),
+           elapsed,
+           exporter.num_workers))
+
+    if args.report is not None:
+        with open(args.report, "w", encoding="utf-8") as file:
+            json.dump({"elapsed": elapsed,
+                       "num_files": len(results),
+                       "num_failures": num_failures,
+                       "results": [result.toDict() for result in results]},
+                      file,
+                      indent=2)
+
+    return 1 if 0 < num_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1103 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# Micro-benchmark of the encoder for each structure type and the bulk packing of the arrays,
+# benchmark of the memory of the meshes in the lists and in the compact arrays,
+# benchmark of the peak memory of encoding the meshes in streaming,
+# benchmark of the conversion of the meshes by the process pool of the workers,
+# benchmark of the compressed sections and the random access for the existing file,
+# benchmark of the hashing of vertices and elements for deduplication,
+# benchmark of the sampled frames of animations against the keys,
+# and benchmark of the batched evaluation of the poses and the skinning of the vertices.
+# This module doesn't depend on bpy.
+#
+# usage: python3 -m io_scene_xm.benchmark [--count N] [--repeat N] [--arrays N] [--memory N]
+#                                         [--stream N] [--mesh-workers N] [--compress FILE]
+#                                         [--random-access FILE]
+#                                         [--hash N] [--tracks N] [--pose N] [--skin N]
+
+import argparse
+import array
+import gc
+import hashlib
+import io
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from io_scene_xm.types import (XModelStructure,
+                               XModelAxisRotate,
+                               XModelQuaternion,
+                               XModelScale,
+                               XModelTranslate,
+                               XModelMatrix,
+                               XModelContainer,
+                               XModelTexture,
+                               XModelMaterial,
+                               XModelMesh,
+                               XModelSkin,
+                               XModelVertex,
+                               XModelVertexTable,
+                               XModelElement,
+                               XModelNode,
+                               XModelKinematic,
+                               XModelAnimation,
+                               XModelAnimationKey,
+                               XModelAnimationSet)
+from io_scene_xm.code import (XModelBinaryEncoder,
+                              XModelBinaryDecoder,
+                              container_array_types)
+from io_scene_xm.optimize import (optimize_mesh_vertices,
+                                  optimize_mesh_elements)
+from io_scene_xm.quantize import ENCODINGS
+from io_scene_xm.keyframe import sample_animation_frames
+
+try:
+    import numpy
+    from io_scene_xm.mesh import (XModelMeshSnapshot,
+                                  build_mesh_data,
+                                  merge_mesh_data,
+                                  create_mesh_pool)
+    from io_scene_xm.pose import XModelPoseEvaluator
+    from io_scene_xm.skin import (XModelSkinDeformer,
+                                  DEFAULT_CHUNK_BYTES)
+except ImportError:
+    # numpy isn't available, the meshes can't be built from the snapshots,
+    # the poses can't be evaluated and the vertices can't be skinned
+    numpy = None
+    XModelMeshSnapshot = None
+    build_mesh_data = None
+    merge_mesh_data = None
+    create_mesh_pool = None
+    XModelPoseEvaluator = None
+    XModelSkinDeformer = None
+    DEFAULT_CHUNK_BYTES = None
+
+# maximum number of the structures in an array, it's limited by 16bits length
+_MAX_ARRAY_LENGTH = 0x7fff
+
+
+# split the structures into the arrays that fit in the limit of length
+def _split(structures):
+    return [structures[i:i + _MAX_ARRAY_LENGTH]
+            for i in range(0, len(structures), _MAX_ARRAY_LENGTH)]
+
+
+# create the node which has the transforms of the type
+def _create_node(index, transform_type=None):
+    node = XModelNode()
+    node.name = "node%d" % index
+    if transform_type is None:
+        node.transforms = [XModelMatrix(), XModelTranslate(), XModelScale(), XModelQuaternion()]
+    else:
+        node.transforms = [transform_type() for i in range(XModelNode.NUM_TRANSFORMS)]
+    return node
+
+
+# create the container which has the nodes as the root
+def _create_container_with_nodes(nodes):
+    container = XModelContainer()
+    container.num_nodes = len(nodes)
+    container.nodes = nodes
+    return container
+
+
+# create the container which has the animations in the animation sets
+def _create_container_with_animations(animations):
+    container = XModelContainer()
+    container.animation_sets = []
+    for animations in _split(animations):
+        animation_set = XModelAnimationSet()
+        animation_set.num_animations = len(animations)
+        animation_set.animations = animations
+        container.animation_sets.append(animation_set)
+    container.num_animation_sets = len(container.animation_sets)
+    return container
+
+
+# container of textures
+def _benchmark_texture(count):
+    container = XModelContainer()
+    container.textures = []
+    for i in range(count):
+        texture = XModelTexture()
+        texture.name = "texture%d" % i
+        texture.ref = "texture%d.png" % i
+        container.textures.append(texture)
+    container.num_textures = count
+    return container
+
+
+# container of materials
+def _benchmark_material(count):
+    container = XModelContainer()
+    container.materials = [XModelMaterial() for i in range(count)]
+    container.num_materials = count
+    return container
+
+
+# container of the meshes of cube
+def _benchmark_mesh(count):
+    container = XModelContainer()
+    container.meshs = []
+    for i in range(count):
+        mesh = XModelMesh()
+        mesh.num_positions = 8
+        mesh.position_size = 3
+        mesh.positions = [float(j & 1) for j in range(3 * 8)]
+        mesh.num_vertices = 8
+        mesh.vertices = []
+        for j in range(8):
+            vertex = XModelVertex()
+            vertex.position = j
+            mesh.vertices.append(vertex)
+        mesh.num_elements = 6
+        mesh.elements = []
+        for j in range(6):
+            element = XModelElement()
+            element.material = 0
+            element.num_vertices = 4
+            element.vertices = [j, (j + 1) % 8, (j + 2) % 8, (j + 3) % 8]
+            mesh.elements.append(element)
+        container.meshs.append(mesh)
+    container.num_meshs = count
+    return container
+
+
+# container of nodes, each node has 4 transforms
+def _benchmark_node(count):
+    return _create_container_with_nodes([_create_node(i) for i in range(count)])
+
+
+# node which has the transforms of the type
+def _benchmark_transform(transform_type):
+    def create(count):
+        return _create_container_with_nodes([_create_node(i, transform_type)
+                                             for i in range(max(1, count // XModelNode.NUM_TRANSFORMS))])
+    return create
+
+
+# node which has the kinematics
+def _benchmark_kinematic(count):
+    nodes = []
+    for kinematics in _split([XModelKinematic() for i in range(count)]):
+        node = _create_node(len(nodes))
+        node.num_inverse_kinematics = len(kinematics)
+        node.inverse_kinematics = kinematics
+        nodes.append(node)
+    return _create_container_with_nodes(nodes)
+
+
+# animations without keys
+def _benchmark_animation(count):
+    animations = []
+    for i in range(count):
+        animation = XModelAnimation()
+        animation.name = "animation%d" % i
+        animations.append(animation)
+    return _create_container_with_animations(animations)
+
+
+# animations which have the keys of quaternion
+def _benchmark_animation_key(count):
+    keys = []
+    for i in range(count):
+        key = XModelAnimationKey()
+        key.interpolate = XModelAnimationKey.INTERPOLATE_LINER
+        key.time = i / 30.0
+        key.value_size = 4
+        key.value = [1.0, 0.0, 0.0, 0.0]
+        keys.append(key)
+    animations = []
+    for keys in _split(keys):
+        animation = XModelAnimation()
+        animation.num_keys = len(keys)
+        animation.keys = keys
+        animations.append(animation)
+    return _create_container_with_animations(animations)
+
+
+# container of animation sets
+def _benchmark_animation_set(count):
+    container = XModelContainer()
+    container.animation_sets = [XModelAnimationSet() for i in range(count)]
+    container.num_animation_sets = count
+    return container
+
+
+# benchmarks, name and function to create the container which has the structures
+BENCHMARKS = (("axis rotate", _benchmark_transform(XModelAxisRotate)),
+              ("quaternion", _benchmark_transform(XModelQuaternion)),
+              ("scale", _benchmark_transform(XModelScale)),
+              ("translate", _benchmark_transform(XModelTranslate)),
+              ("matrix", _benchmark_transform(XModelMatrix)),
+              ("texture", _benchmark_texture),
+              ("material", _benchmark_material),
+              ("mesh (cube)", _benchmark_mesh),
+              ("node (4 transforms)", _benchmark_node),
+              ("kinematic", _benchmark_kinematic),
+              ("animation", _benchmark_animation),
+              ("animation key", _benchmark_animation_key),
+              ("animation set", _benchmark_animation_set))
+
+
+# run the benchmarks, returns the tuples of name, count, best seconds and encoded size
+def run_benchmarks(count=20000, repeat=5, encoder_class=XModelBinaryEncoder):
+    results = []
+    for name, create in BENCHMARKS:
+        container = create(count)
+        best = None
+        size = 0
+        for i in range(repeat):
+            writer = io.BytesIO()
+            start = time.perf_counter()
+            encoder_class().encode(container, writer)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+            size = len(writer.getvalue())
+        results.append((name, count, best, size))
+    return results
+
+
+# vertex which has the instance dictionary for comparison, it's the vertex before the slots
+class _DictVertex(XModelVertex):
+    pass
+
+
+# create the skinned mesh of the grid of quads like the converted one from blender,
+# the number arrays are the lists and the vertices are the structures of the class
+def _create_memory_mesh(count, vertex_class=XModelVertex, seed=1):
+    rnd = random.Random(seed)
+    mesh = XModelMesh()
+    mesh.num_positions = count
+    mesh.position_size = 3
+    mesh.positions = [rnd.uniform(-1.0, 1.0) for i in range(3 * count)]
+    mesh.num_normals = count
+    mesh.normal_size = 3
+    mesh.normals = [rnd.uniform(-1.0, 1.0) for i in range(3 * count)]
+    mesh.num_tex_coords = count
+    mesh.tex_coord_size = 2
+    mesh.tex_coords = [rnd.random() for i in range(2 * count)]
+    skin = XModelSkin()
+    skin.num_weighted_indices = count
+    skin.weighted_index_stride = 4
+    skin.weighted_index_sizes = [4] * count
+    skin.indices = [rnd.randrange(80) for i in range(4 * count)]
+    skin.weights = [rnd.random() for i in range(4 * count)]
+    skin.num_nodes = 0
+    mesh.skin = skin
+    mesh.vertices = []
+    for i in range(count):
+        vertex = vertex_class()
+        vertex.position = i
+        vertex.normal = i
+        vertex.tex_coord = i
+        vertex.skin_weight = i
+        mesh.vertices.append(vertex)
+    mesh.num_vertices = count
+    mesh.elements = []
+    for i in range(0, count - 3, 4):
+        element = XModelElement()
+        element.material = 0
+        element.num_vertices = 4
+        element.vertices = [i, i + 1, i + 2, i + 3]
+        mesh.elements.append(element)
+    mesh.num_elements = len(mesh.elements)
+    return mesh
+
+
+# create the mesh and convert it to the compact representations
+def _create_compact_mesh(count):
+    mesh = _create_memory_mesh(count)
+    mesh.compact()
+    return mesh
+
+
+# measure the memory allocated by calling the function with tracemalloc,
+# returns the tuple of the bytes still allocated after the call, the peak bytes during the call and result
+def _trace_memory(function, *args):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        result = function(*args)
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current - base, peak - base, result
+
+
+# encode the mesh in the container
+def _encode_mesh(mesh):
+    container = XModelContainer()
+    container.num_meshs = 1
+    container.meshs = [mesh]
+    writer = io.BytesIO()
+    XModelBinaryEncoder().encode(container, writer)
+    return writer.getvalue()
+
+
+# run the benchmark of the memory of the mesh, the number arrays are the lists and
+# the vertices are the structures with the dictionary, with the slots,
+# or the mesh is converted by compact to array.array and XModelVertexTable,
+# returns the tuples of name, number of the vertices, bytes still allocated after building the mesh,
+# peak bytes while building it and whether it's encoded to the same bytes as the lists
+def run_memory_benchmark(count=200000):
+    results = []
+    data = None
+    for name, create, args in (("list (dict)", _create_memory_mesh, (count, _DictVertex)),
+                               ("list (slots)", _create_memory_mesh, (count, XModelVertex)),
+                               ("compact", _create_compact_mesh, (count,))):
+        size, peak, mesh = _trace_memory(create, *args)
+        mesh_data = _encode_mesh(mesh)
+        if data is None:
+            data = mesh_data
+        results.append((name, count, size, peak, mesh_data == data))
+        del mesh
+    return results
+
+
+# create the mesh of the scene for the benchmark of the streaming
+def _create_scene_mesh(index, count):
+    mesh = _create_memory_mesh(count, seed=index + 1)
+    mesh.name = "mesh%d" % index
+    return mesh
+
+
+# create all of the meshes of the scene in the container and encode it,
+# the meshes are given as the pairs of the index and the number of the vertices
+def _encode_scene(meshs, writer):
+    container = XModelContainer()
+    container.meshs = [_create_scene_mesh(index, count) for index, count in meshs]
+    container.num_meshs = len(container.meshs)
+    XModelBinaryEncoder().encode(container, writer)
+
+
+# encode the container in streaming, each mesh is created just before writing and released after it
+def _encode_scene_in_stream(meshs, writer):
+    encoder = XModelBinaryEncoder()
+    encoder.beginContainer(writer)
+    for structure_type in container_array_types(encoder._getVersion()):
+        if structure_type == XModelStructure.TYPE_ANIMATION_SET:
+            encoder.putTimeRate(1.0)
+        if structure_type == XModelStructure.TYPE_MESH:
+            encoder.beginStructureArray(len(meshs))
+            for index, count in meshs:
+                encoder.putStructure(_create_scene_mesh(index, count), True)
+        else:
+            encoder.beginStructureArray(0)
+        encoder.endStructureArray()
+    encoder.endContainer()
+
+
+# encode the scene to the temporary file, returns the hash of the encoded bytes,
+# the written bytes are on the disk and read by the small blocks,
+# so they aren't counted in the memory of the process
+def _encode_scene_to_file(function, meshs):
+    digest = hashlib.sha256()
+    with tempfile.TemporaryFile() as file:
+        function(meshs, file)
+        file.seek(0)
+        for block in iter(lambda: file.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# run the benchmark of the peak memory of encoding the scene of the meshes in streaming
+# against encoding the whole container, the sizes of the meshes are 50% to 100% of the vertices,
+# the last row encodes only the largest mesh of them as the lower bound of the peak memory,
+# returns the tuples of name, number of the meshes, peak bytes and whether the encoded bytes
+# are identical to the whole container, it's None for the largest mesh
+def run_stream_benchmark(num_meshs=200, num_vertices=2000, seed=1):
+    rnd = random.Random(seed)
+    meshs = [(index, rnd.randrange(num_vertices // 2, num_vertices + 1)) for index in range(num_meshs)]
+
+    whole_peak, whole_digest = _trace_memory(_encode_scene_to_file, _encode_scene, meshs)[1:]
+    stream_peak, stream_digest = _trace_memory(_encode_scene_to_file, _encode_scene_in_stream, meshs)[1:]
+    largest_peak = _trace_memory(_encode_scene_to_file, _encode_scene,
+                                 [max(meshs, key=lambda mesh: mesh[1])])[1]
+    return [("whole", num_meshs, whole_peak, True),
+            ("stream", num_meshs, stream_peak, stream_digest == whole_digest),
+            ("largest mesh", 1, largest_peak, None)]
+
+
+# encoder which writes the elements of the arrays one by one for comparison,
+# it's the encoder before the bulk packing
+class _ElementEncoder(XModelBinaryEncoder):
+
+    def _putInt8Array(self, array, offset, length):
+        for i in range(offset, offset + length):
+            self._putInt8(array[i])
+
+    def _putInt16Array(self, array, offset, length):
+        for i in range(offset, offset + length):
+            self._putInt16(array[i])
+
+    def _putInt32Array(self, array, offset, length):
+        for i in range(offset, offset + length):
+            self._putInt32(array[i])
+
+    def _putFloat32Array(self, array, offset, length):
+        for i in range(offset, offset + length):
+            self._putFloat32(array[i])
+
+    def _putFloat64Arrat(self, array, offset, length):
+        for i in range(offset, offset + length):
+            self._putFloat64(array[i])
+
+
+# write the array by the write procedure of the encoder, returns the written bytes
+def _put_array(encoder_class, procedure_name, values):
+    writer = io.BytesIO()
+    encoder = encoder_class()
+    encoder.beginContainer(writer)
+    start = writer.tell()
+    getattr(encoder, procedure_name)(values, 0, len(values))
+    return writer.getvalue()[start:]
+
+
+# run the benchmark of the bulk packing of the arrays against the packing of each element,
+# the arrays are given as the lists and the typed arrays, the unsigned 16bits values
+# aren't in the signed range so they go through the masked format,
+# returns the tuples of name, count, best seconds of each element, best seconds of bulk
+# and whether the written bytes are identical
+def run_array_benchmark(count=1500000, repeat=5, seed=1):
+    rnd = random.Random(seed)
+    floats = [rnd.uniform(-1.0, 1.0) for i in range(count)]
+    ints = [rnd.randrange(-0x80000000, 0x80000000) for i in range(count)]
+    shorts = [rnd.randrange(0x10000) for i in range(count)]
+    arrays = (("float32 list", "_putFloat32Array", floats),
+              ("float32 array", "_putFloat32Array", array.array("f", floats)),
+              ("float64 list", "_putFloat64Arrat", floats),
+              ("int32 list", "_putInt32Array", ints),
+              ("int32 array", "_putInt32Array", array.array("i", ints)),
+              ("uint16 list", "_putInt16Array", shorts))
+    results = []
+    for name, procedure_name, values in arrays:
+        element_time, element_data = _measure(repeat, _put_array, _ElementEncoder, procedure_name, values)
+        bulk_time, bulk_data = _measure(repeat, _put_array, XModelBinaryEncoder, procedure_name, values)
+        results.append((name, count, element_time, bulk_time, element_data == bulk_data))
+    return results
+
+
+# measure the best time to call the function, returns the tuple of best seconds and result
+def _measure(repeat, function, *args):
+    best = None
+    result = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+# encode the container in the compression level
+def _encode(container, compress_level):
+    writer = io.BytesIO()
+    XModelBinaryEncoder(compress_level).encode(container, writer)
+    return writer.getvalue()
+
+
+# run the benchmark of the compressed sections for the file,
+# returns the tuples of compression level, encoded size, best seconds of encoding and decoding
+def run_compression_benchmark(filepath, levels=(None, 1, 6, 9), repeat=5, num_workers=0):
+    with open(filepath, "rb") as file:
+        container = XModelBinaryDecoder().decode(file)
+    if container is None:
+        raise ValueError("%s isn't a xModel file" % filepath)
+
+    results = []
+    for level in levels:
+        encode_time, data = _measure(repeat, _encode, container, level)
+        decode_time, decoded = _measure(repeat, XModelBinaryDecoder(num_workers=num_workers).decode, data)
+        results.append((level, len(data), encode_time, decode_time))
+    return results
+
+
+# decode the entry of the binary opened for random access
+def _decodeEntry(data, entry, num_workers):
+    decoder = XModelBinaryDecoder(num_workers=num_workers)
+    decoder.open(data)
+    try:
+        return decoder.decodeEntry(entry.structure_type, entry.index)
+    finally:
+        decoder.close()
+
+
+# run the benchmark of the random access for the file, it's encoded with the index,
+# returns the best seconds of the whole decoding and
+# the tuples of index entry, class name and best seconds of opening and decoding the entry
+def run_random_access_benchmark(filepath, repeat=5, num_workers=0):
+    with open(filepath, "rb") as file:
+        container = XModelBinaryDecoder().decode(file)
+    if container is None:
+        raise ValueError("%s isn't a xModel file" % filepath)
+
+    writer = io.BytesIO()
+    XModelBinaryEncoder(indexed=True).encode(container, writer)
+    data = writer.getvalue()
+
+    decode_time, decoded = _measure(repeat, XModelBinaryDecoder(num_workers=num_workers).decode, data)
+    decoder = XModelBinaryDecoder()
+    index = decoder.open(data)
+    decoder.close()
+    results = []
+    for entry in index.entries:
+        entry_time, value = _measure(repeat, _decodeEntry, data, entry, num_workers)
+        results.append((entry, type(value).__name__, entry_time))
+    return decode_time, results
+
+
+# vertex of the exclusive or hash of the indices for comparison, it's the hash before the fix
+class _XorVertex(XModelVertex):
+    # attributes of instance
+    __slots__ = ()
+
+    def __hash__(self):
+        return (self.position ^
+                self.normal ^
+                self.color ^
+                self.tex_coord ^
+                self.skin_weight)
+
+
+# create the mesh like the converted one from blender, it's the grid of quads
+# and the half of them are flat shaded, so the vertices are more than the positions,
+# the loops of the smooth shaded quads share the vertices to be merged,
+# and a few quads are doubled as the duplicated faces
+def _create_hash_mesh(count, vertex_class, seed=1):
+    rnd = random.Random(seed)
+    width = max(1, int((count // 4) ** 0.5))
+    num_positions = (width + 1) * (width + 1)
+    vertices = []
+    elements = []
+    for y in range(width):
+        for x in range(width):
+            flat = rnd.random() < 0.5
+            face = y * width + x
+            element = XModelElement()
+            element.material = 0
+            element.num_vertices = 4
+            element.vertices = []
+            for dx, dy in ((0, 0), (1, 0), (1, 1), (0, 1)):
+                position = (y + dy) * (width + 1) + (x + dx)
+                vertex = vertex_class()
+                vertex.position = position
+                vertex.normal = num_positions + face if flat else position
+                vertex.tex_coord = position
+                vertex.skin_weight = (y + dy) // 8
+                element.vertices.append(len(vertices))
+                vertices.append(vertex)
+            elements.append(element)
+            if rnd.random() < 0.01:
+                duplicate = XModelElement()
+                duplicate.material = element.material
+                duplicate.num_vertices = element.num_vertices
+                duplicate.vertices = list(element.vertices)
+                elements.append(duplicate)
+
+    mesh = XModelMesh()
+    mesh.num_vertices = len(vertices)
+    mesh.vertices = vertices
+    mesh.num_elements = len(elements)
+    mesh.elements = elements
+    return mesh
+
+
+# get the collision rates of the hash values and the buckets of the table of the keys,
+# the table has the power of 2 buckets for 1.5 times of the keys as same as dict
+def _collision_rates(keys):
+    keys = set(keys)
+    hashes = [hash(key) for key in keys]
+    mask = 1
+    while mask < len(keys) * 3 // 2:
+        mask <<= 1
+    mask -= 1
+    return (1.0 - len(set(hashes)) / len(keys),
+            1.0 - len(set(value & mask for value in hashes)) / len(keys))
+
+
+# deduplicate the vertices by the dictionary keyed on the vertex structures,
+# returns the number of the removed vertices
+def _dedup_vertices_by_structure(mesh):
+    unique = {}
+    for vertex in mesh.vertices:
+        unique.setdefault(vertex, len(unique))
+    return mesh.num_vertices - len(unique)
+
+
+# copy the mesh for deduplicating the vertices, the vertices are copied to the table if compact
+def _copy_mesh(mesh, compact):
+    dest_mesh = XModelMesh()
+    dest_mesh.num_vertices = mesh.num_vertices
+    if compact:
+        dest_mesh.vertices = XModelVertexTable.fromVertices(mesh.vertices)
+    else:
+        dest_mesh.vertices = list(mesh.vertices)
+    dest_mesh.num_elements = mesh.num_elements
+    dest_mesh.elements = [_copy_element(element) for element in mesh.elements]
+    return dest_mesh
+
+
+# copy the element
+def _copy_element(element):
+    dest_element = XModelElement()
+    dest_element.material = element.material
+    dest_element.num_vertices = element.num_vertices
+    dest_element.vertices = element.vertices
+    return dest_element
+
+
+# deduplicate the elements of the copy of the mesh, returns the number of the removed elements
+def _dedup_elements(mesh):
+    dest_mesh = XModelMesh()
+    dest_mesh.num_elements = mesh.num_elements
+    dest_mesh.elements = list(mesh.elements)
+    return optimize_mesh_elements(dest_mesh)
+
+
+# run the benchmark of the hashing for deduplication,
+# the vertex structures are keyed by the exclusive or of the indices before the fix
+# and by the tuple of the indices after the fix, the xor and tuple rows only count the vertices,
+# the remap rows run the whole optimize functions on the copies of the mesh made before the timing,
+# so they include building the vertices and renumbering the elements,
+# the table row is the path of the exporter, the elements couldn't be hashed before the fix,
+# returns the tuples of name, hash collision rate, bucket collision rate,
+# best seconds of deduplication and the number of the removed structures
+def run_hash_benchmark(count=1000000, repeat=3):
+    results = []
+    for name, vertex_class in (("xor", _XorVertex), ("tuple", XModelVertex)):
+        mesh = _create_hash_mesh(count, vertex_class)
+        elapsed, removed = _measure(repeat, _dedup_vertices_by_structure, mesh)
+        results.append(("vertex (%s)" % name,) + _collision_rates(mesh.vertices) + (elapsed, removed))
+
+    keys = [vertex.key() for vertex in mesh.vertices]
+    for name, compact in (("remap", False), ("table", True)):
+        copies = iter([_copy_mesh(mesh, compact) for i in range(repeat)])
+        elapsed, removed = _measure(repeat, lambda: optimize_mesh_vertices(next(copies)))
+        results.append(("vertex (%s)" % name,) + _collision_rates(keys) + (elapsed, removed))
+
+    elapsed, removed = _measure(repeat, _dedup_elements, mesh)
+    results.append(("element (remap)",) + _collision_rates(mesh.elements) + (elapsed, removed))
+    return results
+
+
+# create the snapshot of the grid of quads like the one taken from blender,
+# the smooth and flat normals, the texture coordinates and the skin weights are shared partially
+def _create_mesh_snapshot(width, seed=1):
+    rnd = numpy.random.RandomState(seed)
+    num_positions = (width + 1) * (width + 1)
+    snapshot = XModelMeshSnapshot()
+    grid = numpy.arange(width + 1, dtype=numpy.float32) / width
+    snapshot.positions = numpy.column_stack((numpy.tile(grid, width + 1),
+                                             numpy.repeat(grid, width + 1),
+                                             rnd.choice([0.0, 0.25, 0.5], num_positions))).astype(numpy.float32)
+    snapshot.normals = numpy.eye(3, dtype=numpy.float32)[rnd.choice(3, num_positions)]
+    snapshot.skin_weights = [((i % 8, 0.5), ((i + 1) % 8, 0.5)) if i % 3 else ((i % 8, 1.0),)
+                             for i in range(num_positions)]
+
+    corners = numpy.arange(width * (width + 1)).reshape(width, width + 1)[:, 0:width].reshape(-1)
+    quads = numpy.column_stack((corners, corners + 1, corners + width + 2, corners + width + 1))
+    snapshot.loop_starts = numpy.arange(0, 4 * len(quads), 4, dtype=numpy.int32)
+    snapshot.loop_totals = numpy.full(len(quads), 4, dtype=numpy.int32)
+    snapshot.material_indices = rnd.randint(0, 3, len(quads)).astype(numpy.int32)
+    snapshot.loop_vertices = quads.reshape(-1).astype(numpy.int32)
+    snapshot.tex_coords = snapshot.positions[snapshot.loop_vertices, 0:2] * numpy.float32(0.5)
+    return snapshot
+
+
+# build the meshes from the snapshots serially or by the process pool of the workers,
+# and encode them in the container, returns the encoded bytes
+def _build_and_encode_meshs(snapshots, num_workers):
+    matrix = numpy.eye(4, dtype=numpy.float32)
+    meshs = []
+    if 0 < num_workers:
+        pool = create_mesh_pool(num_workers)
+        try:
+            futures = [pool.submit(build_mesh_data, snapshot, matrix, True, True) for snapshot in snapshots]
+            for future in futures:
+                meshs.append(merge_mesh_data(future.result(), XModelMesh()))
+        finally:
+            pool.shutdown()
+    else:
+        for snapshot in snapshots:
+            meshs.append(merge_mesh_data(build_mesh_data(snapshot, matrix, True, True), XModelMesh()))
+
+    container = XModelContainer()
+    for i, mesh in enumerate(meshs):
+        mesh.name = "mesh%d" % i
+    container.num_meshs = len(meshs)
+    container.meshs = meshs
+    writer = io.BytesIO()
+    XModelBinaryEncoder().encode(container, writer)
+    return writer.getvalue()
+
+
+# run the benchmark of the conversion of the meshes by the process pool of 1 to max_workers workers
+# against the serial conversion, the time includes spawning the workers,
+# returns the tuples of number of the workers, 0 is serial, best seconds
+# and whether the encoded bytes are identical to the serial one
+def run_worker_benchmark(max_workers=4, num_meshs=8, width=100, repeat=3):
+    snapshots = [_create_mesh_snapshot(width, seed=i + 1) for i in range(num_meshs)]
+    results = []
+    data = None
+    for num_workers in range(max_workers + 1):
+        elapsed, workers_data = _measure(repeat, _build_and_encode_meshs, snapshots, num_workers)
+        if data is None:
+            data = workers_data
+        results.append((num_workers, elapsed, workers_data == data))
+    return results
+
+
+# create the animations of the bones like the baked action, each bone has the animations of
+# the quaternion and the translate and they have a key at every frame,
+# the nodes of the bones are appended to nodes if it's given
+def _create_track_animations(num_frames, num_bones, seed=1, nodes=None):
+    rnd = random.Random(seed)
+    animations = []
+    for i in range(num_bones):
+        node = _create_node(i)
+        if nodes is not None:
+            nodes.append(node)
+        phases = [rnd.uniform(0.0, 2.0 * math.pi) for j in range(4)]
+        for target, size in ((node.transforms[XModelNode.TRANSFORM_ROTATE], 4),
+                             (node.transforms[XModelNode.TRANSFORM_TRANSLATE], 3)):
+            keys = []
+            for frame in range(num_frames):
+                key = XModelAnimationKey()
+                key.interpolate = XModelAnimationKey.INTERPOLATE_LINER
+                key.time = float(frame)
+                key.value_size = size
+                angle = 0.5 * math.sin(frame / 20.0 + phases[0])
+                axis = (math.cos(frame / 50.0 + phases[1]), math.sin(frame / 50.0 + phases[1]), 0.5)
+                norm = math.sqrt(sum(value * value for value in axis))
+                if size == 4:
+                    key.value = [math.cos(0.5 * angle)] + [value / norm * math.sin(0.5 * angle)
+                                                           for value in axis]
+                else:
+                    key.value = [0.1 * math.sin(frame / (10.0 + j) + phases[j]) for j in range(3)]
+                keys.append(key)
+            animation = XModelAnimation()
+            animation.target = target
+            animation.num_keys = len(keys)
+            animation.keys = keys
+            animations.append(animation)
+    return animations
+
+
+# run the benchmark of the sampled frames of animations against the keys,
+# returns the tuples of name, encoded size, best seconds of encoding and decoding, and maximum error
+def run_track_benchmark(num_frames=2000, num_bones=80, repeat=3):
+    results = []
+    for name in ("KEYS", "FLOAT32", "FLOAT16", "INT16"):
+        animations = _create_track_animations(num_frames, num_bones)
+        sources = [[value for key in animation.keys for value in key.value] for animation in animations]
+        encoding = None
+        if name != "KEYS":
+            encoding = ENCODINGS[name]
+            for animation in animations:
+                sample_animation_frames(animation)
+        container = _create_container_with_animations(animations)
+
+        def encode():
+            writer = io.BytesIO()
+            XModelBinaryEncoder(sample_encoding=encoding).encode(container, writer)
+            return writer.getvalue()
+
+        encode_time, data = _measure(repeat, encode)
+        decode_time, decoded = _measure(repeat, XModelBinaryDecoder().decode, data)
+        error = 0.0
+        decoded_animations = [animation
+                              for animation_set in decoded.animation_sets
+                              for animation in animation_set.animations]
+        for source, animation in zip(sources, decoded_animations):
+            if 0 < animation.num_frames:
+                values = animation.frames
+            else:
+                values = [value for key in animation.keys for value in key.value]
+            error = max(error, max(abs(a - b) for a, b in zip(source, values)))
+        results.append((name, len(data), encode_time, decode_time, error))
+    return results
+
+
+# create the bones which have the track animations, they are linked into a tree
+# that each bone has three children, returns the nodes of the bones and the animation set
+def _create_track_bones(num_frames, num_bones, sample_frames=False):
+    nodes = []
+    animations = _create_track_animations(num_frames, num_bones, nodes=nodes)
+    for node in nodes:
+        node.transforms[XModelNode.TRANSFORM_MATRIX].values[0:16:5] = [1.0] * 4
+        node.transforms[XModelNode.TRANSFORM_SCALE].values[0:3] = [1.0] * 3
+        node.transforms[XModelNode.TRANSFORM_ROTATE].values[0] = 1.0
+    for i in range(1, num_bones):
+        parent = nodes[(i - 1) // 3]
+        parent.children = (parent.children or []) + [nodes[i]]
+        parent.num_children = len(parent.children)
+    if sample_frames:
+        for animation in animations:
+            sample_animation_frames(animation)
+    return nodes, _create_container_with_animations(animations).animation_sets[0]
+
+
+# run the benchmark of the batched evaluation of the poses of the bones against the evaluation
+# for each frame, the first call prepares the tracks of the animation set and evaluates the batch,
+# the difference is the maximum of the world matrices of the evaluation for each frame from the batch,
+# returns the tuples of name, number of the frames, best seconds and maximum difference
+def run_pose_benchmark(num_frames=1000, num_bones=80, repeat=3):
+    results = []
+    for name in ("KEYS", "FRAMES"):
+        nodes, animation_set = _create_track_bones(num_frames, num_bones, name == "FRAMES")
+        times = [0.5 * i for i in range(num_frames)]
+
+        evaluator = XModelPoseEvaluator(nodes[0:1])
+        prepare_time, pose = _measure(1, evaluator.evaluate, animation_set, times)
+        batch_time, pose = _measure(repeat, evaluator.evaluate, animation_set, times)
+        frame_time, frame_poses = _measure(1, lambda: [evaluator.evaluate(animation_set, [time]) for time in times])
+        difference = max(float(abs(frame_pose.world_matrices[0] - pose.world_matrices[i]).max())
+                         for i, frame_pose in enumerate(frame_poses))
+        results.append((name.lower() + " first call", num_frames, prepare_time, 0.0))
+        results.append((name.lower() + " batch", num_frames, batch_time, 0.0))
+        results.append((name.lower() + " per frame", num_frames, frame_time, difference))
+    return results
+
+
+# create the mesh which is skinned by the bones, each vertex has four weighted indices
+def _create_skinned_mesh(num_vertices, nodes, seed=1):
+    rnd = random.Random(seed)
+    mesh = XModelMesh()
+    mesh.num_positions = num_vertices
+    mesh.position_size = 3
+    mesh.positions = [rnd.uniform(-1.0, 1.0) for i in range(3 * num_vertices)]
+    mesh.num_normals = num_vertices
+    mesh.normal_size = 3
+    mesh.normals = [rnd.uniform(-1.0, 1.0) for i in range(3 * num_vertices)]
+    skin = XModelSkin()
+    skin.num_weighted_indices = num_vertices
+    skin.weighted_index_stride = 4
+    skin.weighted_index_sizes = [4] * num_vertices
+    skin.indices = [rnd.randrange(len(nodes)) for i in range(4 * num_vertices)]
+    skin.weights = [rnd.random() for i in range(4 * num_vertices)]
+    skin.num_nodes = len(nodes)
+    skin.nodes = nodes
+    skin.offset_matrices = [1.0, 0.0, 0.0, 0.0,
+                            0.0, 1.0, 0.0, 0.0,
+                            0.0, 0.0, 1.0, 0.0,
+                            0.0, 0.0, 0.0, 1.0] * len(nodes)
+    mesh.skin = skin
+    mesh.num_vertices = num_vertices
+    mesh.vertices = XModelVertexTable(num_vertices)
+    mesh.vertices.position = array.array("i", range(num_vertices))
+    mesh.vertices.normal = array.array("i", range(num_vertices))
+    mesh.vertices.skin_weight = array.array("i", range(num_vertices))
+    return mesh
+
+
+# skin the vertices by gathering the matrices of the palettes for each weighted index of each vertex
+# and blending them, it's the kernel before the product of the blend weights and the palettes
+def _gather_skin(deformer, world_matrices):
+    palettes = deformer.paletteMatrices(world_matrices)
+    matrices = numpy.einsum("fvwij,vw->fvij", palettes[:, deformer.indices], deformer.weights)
+    positions = numpy.einsum("fvij,vj->fvi", matrices, deformer.positions)
+    normals = numpy.einsum("fvij,vj->fvi", matrices[..., 0:3], deformer.normals)
+    return positions, normals
+
+
+# run the benchmark of the skinning of the vertices for the batch of the poses,
+# the frames are skinned by gathering the matrices, and by blending them in the chunks of the default size
+# and the chunks of a frame, the differences are the maximum of the positions and the normals from the gathering,
+# returns the tuples of name, number of the frames, number of the vertices, best seconds and maximum difference
+def run_skin_benchmark(num_vertices=10000, num_frames=100, num_bones=80, repeat=3):
+    nodes, animation_set = _create_track_bones(num_frames, num_bones)
+    evaluator = XModelPoseEvaluator(nodes[0:1])
+    pose_time, pose = _measure(repeat, evaluator.evaluate, animation_set, [float(i) for i in range(num_frames)])
+    deformer = XModelSkinDeformer(_create_skinned_mesh(num_vertices, nodes), evaluator.nodes)
+    gather_time, (positions, normals) = _measure(repeat, _gather_skin, deformer, pose.world_matrices)
+    results = [("pose", num_frames, len(nodes), pose_time, 0.0),
+               ("skin gather", num_frames, num_vertices, gather_time, 0.0)]
+    for name, chunk_bytes in (("skin", DEFAULT_CHUNK_BYTES), ("skin per frame", 0)):
+        elapsed, (chunk_positions, chunk_normals) = _measure(repeat, deformer.deform, pose.world_matrices, chunk_bytes)
+        difference = max(float(abs(chunk_positions - positions).max()), float(abs(chunk_normals - normals).max()))
+        results.append((name, num_frames, num_vertices, elapsed, difference))
+    return results
+
+
+# entry point of command line
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m io_scene_xm.benchmark",
+        description="Measure the encoding time of each structure type.")
+    parser.add_argument("--count", type=int, default=20000,
+                        help="number of the structures of each type")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of the repetitions, the best time is reported")
+    parser.add_argument("--arrays", metavar="N", type=int, default=None,
+                        help="measure the bulk packing of the arrays of N elements against each element")
+    parser.add_argument("--memory", metavar="N", type=int, default=None,
+                        help="measure the memory of the skinned mesh of N vertices in the lists and compacted")
+    parser.add_argument("--stream", metavar="N", type=int, default=None,
+                        help="measure the peak memory of encoding N meshes in streaming against the whole container")
+    parser.add_argument("--compress", metavar="FILE", default=None,
+                        help="measure the compression ratio and throughput of the sections for the file")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of the worker threads to inflate the sections")
+    parser.add_argument("--mesh-workers", metavar="N", type=int, default=None,
+                        help="measure the conversion of 8 meshes by the process pool of 1 to N workers")
+    parser.add_argument("--random-access", metavar="FILE", default=None,
+                        help="measure the decoding time of each structure of the container for the file")
+    parser.add_argument("--hash", metavar="N", type=int, default=None,
+                        help="measure the collisions and deduplication of the hashes of N vertices")
+    parser.add_argument("--tracks", metavar="N", type=int, default=None,
+                        help="measure the sampled frames of animations of N frames and 80 bones against the keys")
+    parser.add_argument("--pose", metavar="N", type=int, default=None,
+                        help="measure the batched evaluation of the poses of N frames and 80 bones")
+    parser.add_argument("--skin", metavar="N", type=int, default=None,
+                        help="measure the skinning of N vertices by 80 bones for 100 frames")
+    args = parser.parse_args(args)
+
+    if args.mesh_workers is not None:
+        if create_mesh_pool is None:
+            parser.error("--mesh-workers requires numpy")
+        results = run_worker_benchmark(args.mesh_workers, repeat=args.repeat)
+        serial_time = results[0][1]
+        print("cpus %s" % os.cpu_count())
+        print("%-10s %12s %8s %10s" % ("workers", "total ms", "speedup", "identical"))
+        for num_workers, elapsed, identical in results:
+            print("%-10s %12.2f %8.2f %10s" %
+                  (num_workers if 0 < num_workers else "serial", elapsed * 1000.0, serial_time / elapsed, identical))
+        return
+
+    if args.stream is not None:
+        results = run_stream_benchmark(args.stream)
+        largest_peak = results[-1][2]
+        print("%-20s %10s %12s %10s %10s" % ("encoding", "meshes", "peak MB", "/ largest", "identical"))
+        for name, num_meshs, peak, identical in results:
+            print("%-20s %10d %12.2f %10.2f %10s" %
+                  (name, num_meshs, peak / 1000000.0, peak / largest_peak, "-" if identical is None else identical))
+        return
+
+    if args.memory is not None:
+        results = run_memory_benchmark(args.memory)
+        list_size = results[0][2]
+        print("%-20s %10s %12s %12s %12s %8s %10s" %
+              ("mesh", "vertices", "MB", "peak MB", "bytes/vert", "ratio", "identical"))
+        for name, count, size, peak, identical in results:
+            print("%-20s %10d %12.2f %12.2f %12.1f %8.2f %10s" %
+                  (name, count, size / 1000000.0, peak / 1000000.0, size / count, list_size / size, identical))
+        return
+
+    if args.arrays is not None:
+        print("%-20s %10s %12s %12s %8s %10s" % ("array", "count", "element ms", "bulk ms", "speedup", "identical"))
+        for name, count, element_time, bulk_time, identical in run_array_benchmark(args.arrays, args.repeat):
+            print("%-20s %10d %12.2f %12.2f %8.1f %10s" %
+                  (name, count, element_time * 1000.0, bulk_time * 1000.0, element_time / bulk_time, identical))
+        return
+
+    if args.skin is not None:
+        if XModelSkinDeformer is None:
+            parser.error("--skin requires numpy")
+        print("%-20s %10s %10s %12s %16s %12s" % ("step", "frames", "elements", "total ms", "M elem*frame/s",
+                                                "max diff"))
+        for name, num_frames, count, elapsed, difference in run_skin_benchmark(args.skin, repeat=args.repeat):
+            print("%-20s %10d %10d %12.2f %16.2f %12.3g" %
+                  (name, num_frames, count, elapsed * 1000.0, count * num_frames / elapsed / 1000000.0, difference))
+        return
+
+    if args.pose is not None:
+        if XModelPoseEvaluator is None:
+            parser.error("--pose requires numpy")
+        print("%-20s %10s %12s %12s %12s" % ("evaluation", "frames", "total ms", "us/frame", "diff batch"))
+        for name, num_frames, elapsed, difference in run_pose_benchmark(args.pose, repeat=args.repeat):
+            print("%-20s %10d %12.2f %12.3f %12.3g" %
+                  (name, num_frames, elapsed * 1000.0, elapsed * 1000000.0 / num_frames, difference))
+        return
+
+    if args.tracks is not None:
+        results = run_track_benchmark(args.tracks, repeat=args.repeat)
+        key_size = results[0][1]
+        print("%-10s %12s %8s %12s %12s %12s" % ("form", "bytes", "ratio", "encode ms", "decode ms", "max error"))
+        for name, size, encode_time, decode_time, error in results:
+            print("%-10s %12d %8.2f %12.2f %12.2f %12.3g" %
+                  (name.lower(), size, key_size / size, encode_time * 1000.0, decode_time * 1000.0, error))
+        return
+
+    if args.hash is not None:
+        print("%-20s %12s %12s %12s %12s" % ("key", "hash coll.", "bucket coll.", "dedup ms", "removed"))
+        for name, hash_rate, bucket_rate, elapsed, removed in run_hash_benchmark(args.hash, args.repeat):
+            print("%-20s %11.4f%% %11.4f%% %12.2f %12d" %
+                  (name, hash_rate * 100.0, bucket_rate * 100.0, elapsed * 1000.0, removed))
+        return
+
+    if args.random_access is not None:
+        decode_time, results = run_random_access_benchmark(args.random_access,
+                                                           repeat=args.repeat,
+                                                           num_workers=args.workers)
+        print("whole container %.2f ms" % (decode_time * 1000.0))
+        print("%-20s %6s %12s %10s %12s %8s" % ("structure", "index", "bytes", "instances", "decode ms", "ratio"))
+        for entry, name, entry_time in results:
+            print("%-20s %6d %12d %10d %12.3f %8.4f" %
+                  (name,
+                   entry.index,
+                   entry.size,
+                   entry.num_insts,
+                   entry_time * 1000.0,
+                   entry_time / decode_time))
+        return
+
+    if args.compress is not None:
+        results = run_compression_benchmark(args.compress, repeat=args.repeat, num_workers=args.workers)
+        raw_size = results[0][1]
+        print("%-10s %12s %8s %12s %12s %12s %12s" %
+              ("level", "bytes", "ratio", "encode ms", "encode MB/s", "decode ms", "decode MB/s"))
+        for level, size, encode_time, decode_time in results:
+            print("%-10s %12d %8.3f %12.2f %12.1f %12.2f %12.1f" %
+                  ("none" if level is None else level,
+                   size,
+                   raw_size / size,
+                   encode_time * 1000.0,
+                   raw_size / encode_time / 1000000.0,
+                   decode_time * 1000.0,
+                   raw_size / decode_time / 1000000.0))
+        return
+
+    print("%-20s %10s %12s %12s %10s" % ("structure", "count", "total ms", "us/struct", "MB/s"))
+    for name, count, elapsed, size in run_benchmarks(args.count, args.repeat):
+        print("%-20s %10d %12.2f %12.3f %10.1f" %
+              (name, count, elapsed * 1000.0, elapsed * 1000000.0 / count, size / elapsed / 1000000.0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# Content addressed cache of the converted mesh data on the disk.
+# The entries are keyed on the hash of the raw mesh arrays and the export options,
+# so an unchanged mesh can be reused without converting it again.
+# The cache is in the directory of the user, and an entry is the raw arrays of the packed mesh data
+# with the small JSON header, so nothing in the entry is executed when it's read.
+
+import array
+import hashlib
+import json
+import os
+import stat
+import struct
+import sys
+import tempfile
+
+from io_scene_xm.types import XModelSkin
+from io_scene_xm.mesh import (pack_mesh_data,
+                              unpack_mesh_data)
+
+# version of the cache entries, change this when the converted mesh data is changed
+CACHE_VERSION = 2
+
+
+# get the cache directory of the user for the platform
+def _user_cache_directory():
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    elif sys.platform == "darwin":
+        base = os.path.join(os.path.expanduser("~"), "Library", "Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "io_scene_xm", "meshs")
+
+
+# default directory of the cache
+DEFAULT_CACHE_DIRECTORY = _user_cache_directory()
+
+# default limit of the total size of the cache entries in bytes
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+# file extension of the cache entry
+_ENTRY_EXTENSION = ".xmc"
+
+# magic number, version and size of the JSON header of the cache entry
+_ENTRY_HEADER = struct.Struct("<4sII")
+
+# magic number of the cache entry
+_ENTRY_MAGIC = b"XMC\0"
+
+# names of the integer values of the packed mesh data
+_ENTRY_VALUES = ("num_positions", "position_size",
+                 "num_normals", "normal_size",
+                 "num_colors", "color_size",
+                 "num_tex_coords", "tex_coord_size",
+                 "num_vertices", "num_elements")
+
+# names of the integer values and the arrays of the skin of the packed mesh data
+_ENTRY_SKIN_VALUES = ("num_weighted_indices", "weighted_index_stride")
+_ENTRY_SKIN_ARRAYS = ("weighted_index_sizes", "indices", "weights")
+
+# names of the number arrays and the groups of the arrays of the packed mesh data
+_ENTRY_ARRAYS = ("positions", "normals", "colors", "tex_coords")
+_ENTRY_ARRAY_GROUPS = (("vertices", 5), ("elements", 3))
+
+# type codes of the arrays in the cache entry
+_ENTRY_TYPE_CODES = ("B", "h", "i", "f")
+
+
+# write the packed mesh data to bytes of the cache entry
+def _dump_entry(packed):
+    arrays = []
+    for name in _ENTRY_ARRAYS:
+        if packed[name] is not None:
+            arrays.append((name, packed[name]))
+    for name, size in _ENTRY_ARRAY_GROUPS:
+        if packed[name] is not None:
+            arrays.extend(("%s.%d" % (name, i), values) for i, values in enumerate(packed[name]))
+    skin = packed["skin"]
+    if skin is not None:
+        arrays.extend(("skin." + name, getattr(skin, name)) for name in _ENTRY_SKIN_ARRAYS)
+
+    header = json.dumps({
+        "values": dict((name, int(packed[name])) for name in _ENTRY_VALUES),
+        "skin": None if skin is None else dict((name, int(getattr(skin, name))) for name in _ENTRY_SKIN_VALUES),
+        "arrays": [(name, values.typecode, len(values)) for name, values in arrays]
+    }).encode("utf-8")
+
+    chunks = [_ENTRY_HEADER.pack(_ENTRY_MAGIC, CACHE_VERSION, len(header)), header]
+    for name, values in arrays:
+        if sys.byteorder != "little":
+            values = array.array(values.typecode, values)
+            values.byteswap()
+        chunks.append(values.tobytes())
+    return b"".join(chunks)
+
+
+# read the packed mesh data from bytes of the cache entry, raises ValueError if it's broken
+def _load_entry(data):
+    if len(data) < _ENTRY_HEADER.size:
+        raise ValueError("The cache entry is too short")
+    magic, version, header_size = _ENTRY_HEADER.unpack_from(data, 0)
+    if magic != _ENTRY_MAGIC or version != CACHE_VERSION:
+        raise ValueError("The cache entry is in the other format")
+    offset = _ENTRY_HEADER.size + header_size
+    header = json.loads(data[_ENTRY_HEADER.size:offset].decode("utf-8"))
+
+    # number arrays
+    arrays = {}
+    for name, type_code, length in header["arrays"]:
+        if type_code not in _ENTRY_TYPE_CODES or not isinstance(length, int) or length < 0:
+            raise ValueError("The cache entry has the invalid array %r" % name)
+        values = array.array(type_code)
+        end = offset + values.itemsize * length
+        if len(data) < end:
+            raise ValueError("The cache entry is truncated")
+        values.frombytes(data[offset:end])
+        if sys.byteorder != "little":
+            values.byteswap()
+        arrays[name] = values
+        offset = end
+    if offset != len(data):
+        raise ValueError("The cache entry has the trailing bytes")
+
+    packed = {}
+    for name in _ENTRY_VALUES:
+        packed[name] = int(header["values"][name])
+    for name in _ENTRY_ARRAYS:
+        packed[name] = arrays.pop(name, None)
+    for name, size in _ENTRY_ARRAY_GROUPS:
+        group = tuple(arrays.pop("%s.%d" % (name, i), None) for i in range(size))
+        packed[name] = None if all(values is None for values in group) else group
+        if None in group and packed[name] is not None:
+            raise ValueError("The cache entry lacks the arrays of %s" % name)
+
+    # skin
+    packed["skin"] = None
+    if header["skin"] is not None:
+        skin = XModelSkin()
+        for name in _ENTRY_SKIN_VALUES:
+            setattr(skin, name, int(header["skin"][name]))
+        for name in _ENTRY_SKIN_ARRAYS:
+            setattr(skin, name, arrays.pop("skin." + name))
+        packed["skin"] = skin
+
+    if arrays:
+        raise ValueError("The cache entry has the unknown arrays")
+    return packed
+
+
+# create the cache directory which is accessible only by the user,
+# returns None if it's usable, or the reason why the cache is disabled
+def _prepare_directory(directory):
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        status = os.lstat(directory)
+    except OSError as error:
+        return "%s can't be created, %s" % (directory, error.strerror)
+    if not stat.S_ISDIR(status.st_mode):
+        return "%s isn't a directory" % directory
+    if hasattr(os, "getuid"):
+        # the entries mustn't be planted by the other users
+        if status.st_uid != os.getuid():
+            return "%s is owned by the other user" % directory
+        if status.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            return "%s is writable by the other users" % directory
+    if not os.access(directory, os.R_OK | os.W_OK | os.X_OK):
+        return "%s isn't readable and writable" % directory
+    return None
+
+
+# cache of the converted mesh data with size-bounded LRU eviction
+class XModelMeshCache:
+    # initialize
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, max_size=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+        # int : number of the entries found in cache
+        self.hits = 0
+        # int : number of the entries not found in cache
+        self.misses = 0
+        # int : bytes of the converted mesh data reused from cache
+        self.bytes_saved = 0
+        # int : number of the entries evicted from cache
+        self.evictions = 0
+
+        # string : reason why the cache is disabled, or None if it's enabled
+        self.disabled_reason = _prepare_directory(self.directory)
+
+    # create the cache key from the mesh snapshot and the options of conversion
+    def key(self, snapshot, global_matrix, invert_face, compact, use_mesh_modifiers):
+        digest = hashlib.sha256()
+        digest.update(repr((CACHE_VERSION,
+                            bool(invert_face),
+                            bool(compact),
+                            bool(use_mesh_modifiers),
+                            tuple(tuple(float(value) for value in row)
+                                  for row in global_matrix))).encode("utf-8"))
+        for name in snapshot.__slots__:
+            value = getattr(snapshot, name)
+            digest.update(name.encode("utf-8"))
+            if value is None:
+                digest.update(b"\0")
+            elif isinstance(value, list):
+                digest.update(repr(value).encode("utf-8"))
+            else:
+                digest.update(repr((value.dtype.str, value.shape)).encode("utf-8"))
+                digest.update(value.tobytes())
+        return digest.hexdigest()
+
+    # get the path of the cache entry
+    def __path(self, key):
+        return os.path.join(self.directory, key + _ENTRY_EXTENSION)
+
+    # get the mesh data from cache, or None if it isn't found,
+    # if compact is true, arrays are restored in the compact representations
+    def get(self, key, compact=False):
+        if self.disabled_reason is not None:
+            return None
+
+        path = self.__path(key)
+        try:
+            with open(path, "rb") as file:
+                if hasattr(os, "getuid") and os.fstat(file.fileno()).st_uid != os.getuid():
+                    raise ValueError("%s is owned by the other user" % path)
+                data = file.read()
+            mesh = unpack_mesh_data(_load_entry(data), compact)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # broken entry, such as written by the other version
+            self.misses += 1
+            self.__remove(path)
+            return None
+
+        # mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        self.bytes_saved += len(data)
+        return mesh
+
+    # put the mesh data to cache
+    def put(self, key, mesh):
+        if self.disabled_reason is not None:
+            return
+
+        data = _dump_entry(pack_mesh_data(mesh))
+        if self.max_size < len(data):
+            return
+
+        # write to the temporary file and replace for the other processes
+        path = self.__path(key)
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            self.__remove(temp_path)
+            return
+
+        self.__evict()
+
+    # remove the least recently used entries until the total size fits in the limit
+    def __evict(self):
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(_ENTRY_EXTENSION):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total_size += stat.st_size
+
+        entries.sort()
+        for mtime, size, name in entries:
+            if total_size <= self.max_size:
+                break
+            if self.__remove(os.path.join(self.directory, name)):
+                self.evictions += 1
+            total_size -= size
+
+    # remove the file, returns true if it's removed
+    def __remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    # get the text of statistics
+    def report(self):
+        if self.disabled_reason is not None:
+            return "Mesh cache: disabled, %s" % self.disabled_reason
+        return ("Mesh cache: %d hits, %d misses, %d bytes saved, %d evicted" %
+                (self.hits, self.misses, self.bytes_saved, self.evictions))
@@ -28,10 +28,54 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 
+import array
+import bisect
+import collections.abc
+import concurrent.futures
+import functools
+import io
+import itertools
+import mmap
 import struct
+import sys
+import warnings
+import weakref
+import zlib
 import io_scene_xm
 from io_scene_xm.types import (XModelStructure,
-                               XModelNode)
+                               XModelUserData,
+                               XModelAxisRotate,
+                               XModelQuaternion,
+                               XModelScale,
+                               XModelTranslate,
+                               XModelMatrix,
+                               XModelContainer,
+                               XModelTexture,
+                               XModelMaterial,
+                               XModelMesh,
+                               XModelSkin,
+                               XModelVertex,
+                               XModelVertexTable,
+                               XModelElement,
+                               XModelNode,
+                               XModelKinematic,
+                               XModelAnimation,
+                               XModelAnimationKey,
+                               XModelAnimationSet)
+from io_scene_xm.quantize import (ENCODING_FLOAT32,
+                                  XModelQuantization,
+                                  XModelQuantizationStats,
+                                  parameter_count,
+                                  encoded_size,
+                                  quantize_attribute,
+                                  dequantize_attribute)
+from io_scene_xm.optimize import triangulate_mesh_faces
+from io_scene_xm.interleave import (INTERLEAVE_NONE,
+                                    MAX_ATTRIBUTE,
+                                    XModelInterleaveStats,
+                                    is_interleaved,
+                                    make_layout,
+                                    interleave_vertices)
 
 # code name
 CODE_NAME = "Elise"
@@ -49,90 +93,414 @@ END_OF_DATA = (((0xff & ord('e')) << 0) |
                ((0xff & ord('d')) << 24))
 
 # version
-VERSION = 36
+VERSION = 43
 
 # compatibility version
 COMPATIBILITY_VERSION = 36
 
+# version which introduces the sections
+SECTION_VERSION = 37
+
+# version which introduces the quantized vertex attributes
+QUANTIZE_VERSION = 38
+
+# version which introduces the index of the container for random access
+INDEX_VERSION = 39
+
+# version which introduces the triangulated faces of the mesh
+TRIANGULATE_VERSION = 40
+
+# version which introduces the interleaved vertices of the mesh
+INTERLEAVE_VERSION = 41
+
+# version which introduces the control points of the bezier keys of the animation
+BEZIER_VERSION = 42
+
+# version which introduces the sampled frames of the animation
+SAMPLE_VERSION = 43
+
 # version name
-VERSION_NAME = "0.9.92"
+VERSION_NAME = "0.9.99"
 
 # compatibility version name
 COMPATIBILITY_VERSION_NAME = "0.9.92"
 
+# maximum number of array elements packed at once
+BULK_CHUNK_SIZE = 0x10000
+
+# compression methods of the section
+SECTION_STORED = 0
+SECTION_DEFLATE = 1
+
+# minimum size of the section to try compressing
+SECTION_MIN_COMPRESS_SIZE = 64
+
+
+# precompiled layouts of the scalar values
+_INT8 = struct.Struct("<b")
+_UINT8 = struct.Struct("<B")
+_INT16 = struct.Struct("<h")
+_UINT16 = struct.Struct("<H")
+_INT32 = struct.Struct("<i")
+_UINT32 = struct.Struct("<I")
+_FLOAT32 = struct.Struct("<f")
+_FLOAT64 = struct.Struct("<d")
+
+# precompiled layouts of the records written by the encoder
+_STRUCTURE_HEADER = struct.Struct("<II")
+_SECTION_HEADER = struct.Struct("<BII")
+_INDEX_HEADER = struct.Struct("<Id")
+_INDEX_ENTRY = struct.Struct("<IHIIII")
+_AXIS_ROTATE = struct.Struct("<%df" % XModelStructure.SIZE_AXIS_ROTATE)
+_QUATERNION = struct.Struct("<%df" % XModelStructure.SIZE_QUATERNION)
+_SCALE = struct.Struct("<%df" % XModelStructure.SIZE_SCALE)
+_TRANSLATE = struct.Struct("<%df" % XModelStructure.SIZE_TRANSLATE)
+_MATRIX = struct.Struct("<%df" % XModelStructure.SIZE_MATRIX)
+_MATERIAL_PARAMETERS = struct.Struct("<18f")
+_NODE_PARAMETERS = struct.Struct("<7B9f")
+_KINEMATIC_PARAMETERS = struct.Struct("<HHf")
+
+# layouts of the animation key record, key is value size
+_ANIMATION_KEY_LAYOUTS = {}
+
+# layouts of the element record written by the encoder, key is number of vertices
+_ELEMENT_RECORD_LAYOUTS = {}
+
+# layouts of the weighted index record of skin, key is number of pairs
+_WEIGHTED_INDEX_LAYOUTS = {}
+
+
+# get the precompiled layout from the dictionary, or create it by the format
+def _get_layout(layouts, key, format):
+    layout = layouts.get(key)
+    if layout is None:
+        layout = struct.Struct(format)
+        layouts[key] = layout
+    return layout
+
+
+# get the array as the contiguous little endian buffer, or None if can't
+def _get_buffer(array, formats, item_size):
+    if sys.byteorder != "little":
+        return None
+    try:
+        view = memoryview(array)
+    except TypeError:
+        return None
+    if (view.ndim != 1 or
+            not view.c_contiguous or
+            view.itemsize != item_size or
+            view.format.lstrip("<=@") not in formats):
+        return None
+    return view
+
+
+# get the structure types of the arrays in the container in order of writing for the version,
+# the nodes are ahead of the meshs since the index, so the meshs only refer to the nodes
+def container_array_types(version):
+    if INDEX_VERSION <= version:
+        return (XModelStructure.TYPE_TEXTURE,
+                XModelStructure.TYPE_MATERIAL,
+                XModelStructure.TYPE_NODE,
+                XModelStructure.TYPE_MESH,
+                XModelStructure.TYPE_ANIMATION_SET)
+    return (XModelStructure.TYPE_TEXTURE,
+            XModelStructure.TYPE_MATERIAL,
+            XModelStructure.TYPE_MESH,
+            XModelStructure.TYPE_NODE,
+            XModelStructure.TYPE_ANIMATION_SET)
+
+
+# attribute names of the arrays in the container, key is structure type,
+# value is tuple of the names of the length and the array
+_CONTAINER_ARRAY_NAMES = {
+    XModelStructure.TYPE_TEXTURE: ("num_textures", "textures"),
+    XModelStructure.TYPE_MATERIAL: ("num_materials", "materials"),
+    XModelStructure.TYPE_MESH: ("num_meshs", "meshs"),
+    XModelStructure.TYPE_NODE: ("num_nodes", "nodes"),
+    XModelStructure.TYPE_ANIMATION_SET: ("num_animation_sets", "animation_sets")}
+
+
+# entry of the index, it's a structure in the array of the container
+class XModelIndexEntry:
+    # attributes of instance
+    __slots__ = ("structure_type",
+                 "index",
+                 "offset",
+                 "size",
+                 "first_inst_id",
+                 "num_insts")
+
+    # initialize
+    def __init__(self, structure_type, index, offset, size, first_inst_id, num_insts):
+        # int32_t : structure type of the array
+        self.structure_type = structure_type
+        # int16_t : index in the array
+        self.index = index
+        # int32_t : offset of the structure in the binary
+        self.offset = offset
+        # int32_t : size of the structure in the binary
+        self.size = size
+        # int32_t : first identifier of the instances written in the structure
+        self.first_inst_id = first_inst_id
+        # int32_t : number of the instances written in the structure,
+        # it's zero if the structure is already written in the other entry
+        self.num_insts = num_insts
+
+
+# index of the container for random access
+class XModelIndex:
+    # attributes of instance
+    __slots__ = ("time_rate",
+                 "entries",
+                 "__entry_map",
+                 "__first_inst_ids")
+
+    # initialize
+    def __init__(self, time_rate=1.0, entries=()):
+        # float64_t : time rate of the container
+        self.time_rate = time_rate
+        # XModelIndexEntry[] : entries in order of writing
+        self.entries = list(entries)
+        # entry map, key is tuple of structure type and index
+        self.__entry_map = {(entry.structure_type, entry.index): entry for entry in self.entries}
+        # first identifiers of the instances of the entries which have instances
+        self.__first_inst_ids = [(entry.first_inst_id, i)
+                                 for i, entry in enumerate(self.entries)
+                                 if 0 < entry.num_insts]
+
+    # get the number of the entries of the structure type
+    def count(self, structure_type):
+        return sum(1 for entry in self.entries if entry.structure_type == structure_type)
+
+    # find the entry of the structure in the array of the container
+    def find(self, structure_type, index):
+        return self.__entry_map.get((structure_type, index))
+
+    # find the entry in which the instance is written
+    def findInst(self, inst_id):
+        i = bisect.bisect_right(self.__first_inst_ids, (inst_id, len(self.entries))) - 1
+        if 0 <= i:
+            entry = self.entries[self.__first_inst_ids[i][1]]
+            if inst_id < entry.first_inst_id + entry.num_insts:
+                return entry
+        return None
+
 
 # binary encoder for xModel
 # @author Syuuhei Kuno
 class XModelBinaryEncoder:
-    # initialize
-    def __init__(self):
+    # initialize, if compress_level is not None, the big blocks are written to the sections
+    # and they are compressed in the level of zlib, 0 is for the sections without compression,
+    # if quantization is not None, the vertex attributes of meshs are quantized in the settings,
+    # if indexed is true, the index of the container is written for random access,
+    # if triangulated is true, the triangulated faces of meshs are written for the runtime,
+    # if interleave is not None, the vertices of meshs selected by the mode are interleaved for the runtime,
+    # if bezier is true, the control points of the bezier keys of animations are written,
+    # if sample_encoding is not None, the sampled frames of animations are written in the encoding
+    def __init__(self, compress_level=None, quantization=None, indexed=False, triangulated=False,
+                 interleave=None, bezier=False, sample_encoding=None):
+        # compression level of the sections, or None if the sections aren't used
+        self.compress_level = compress_level
+        # settings of the quantization, or None if the vertex attributes aren't quantized
+        self.quantization = quantization
+        # whether to write the index of the container
+        self.indexed = indexed
+        # whether to write the triangulated faces of meshs
+        self.triangulated = triangulated
+        # mode to select the meshs whose vertices are interleaved, or None if they aren't interleaved
+        self.interleave = interleave
+        # whether to write the control points of the bezier keys of animations
+        self.bezier = bezier
+        # encoding of the sampled frames of animations, or None if they aren't written
+        self.sample_encoding = sample_encoding
+        # statistics of the quantization errors of the written meshs
+        self.quantization_stats = []
+        # statistics of the interleaved vertices of the written meshs
+        self.interleave_stats = []
+        # entries of the index of the container
+        self.__index_entries = []
+        # time rate of the container for the index
+        self.__time_rate = 1.0
+        # version to be written
+        self.__version = COMPATIBILITY_VERSION
         # writer
         self.__writer = None
         # instance map, key is structure, value is identifier
         self.__inst_map = {}
         # weak reference instance map, key is structure, value is identifier
-        self.__weak_inst_map = {}
+        self.__weak_inst_map = weakref.WeakKeyDictionary()
+        # whether any structure is released to the weak reference instance map
+        self.__has_weak_inst = False
         # instance identifier counter
         self.__inst_id_cnt = 1
         # write size in binary
         self.__write_size = 0
+        # declared length of structure array in streaming, or None if it's patched
+        self.__array_length = None
+        # number of structures written in the structure array in streaming
+        self.__array_count = 0
+        # number of the structure arrays begun in streaming
+        self.__array_number = 0
+        # structure type of the structure array in streaming
+        self.__array_type = XModelStructure.TYPE_TEXTURE
+        # offset of the length of structure array in streaming
+        self.__array_offset = 0
+
+        # write procedures, key is structure type
+        self.__put_procedures = {
+            XModelStructure.TYPE_AXIS_ROTATE: self._putAxisRotate,
+            XModelStructure.TYPE_QUATERNION: self._putQuaternion,
+            XModelStructure.TYPE_SCALE: self._putScale,
+            XModelStructure.TYPE_TRANSLATE: self._putTranslate,
+            XModelStructure.TYPE_MATRIX: self._putMatrix,
+            XModelStructure.TYPE_CONTAINER: self._putContainer,
+            XModelStructure.TYPE_TEXTURE: self._putTexture,
+            XModelStructure.TYPE_MATERIAL: self._putMaterial,
+            XModelStructure.TYPE_MESH: self._putMesh,
+            XModelStructure.TYPE_NODE: self._putNode,
+            XModelStructure.TYPE_KINEMATIC: self._putKinematic,
+            XModelStructure.TYPE_ANIMATION: self._putAnimation,
+            XModelStructure.TYPE_ANIMATION_KEY: self._putAnimationKey,
+            XModelStructure.TYPE_ANIMATION_SET: self._putAnimationSet}
 
     # recycle for this instance
     def __recycle(self):
         self.__writer = None
+        self.__index_entries = []
         self.__inst_map.clear()
         self.__weak_inst_map.clear()
+        self.__has_weak_inst = False
         self.__inst_id_cnt = 1
 
+    # write the packed bytes
+    def __putBytes(self, data):
+        self.__writer.write(data)
+        self.__write_size += len(data)
+
+    # get the version to be written, it's the oldest version supporting the options
+    def _getVersion(self):
+        if self.sample_encoding is not None:
+            return SAMPLE_VERSION
+        if self.bezier:
+            return BEZIER_VERSION
+        if self.interleave is not None and self.interleave != INTERLEAVE_NONE:
+            return INTERLEAVE_VERSION
+        if self.triangulated:
+            return TRIANGULATE_VERSION
+        if self.indexed:
+            return INDEX_VERSION
+        if self.quantization is not None and self.quantization.isEnabled():
+            return QUANTIZE_VERSION
+        if self.compress_level is not None:
+            return SECTION_VERSION
+        return COMPATIBILITY_VERSION
+
+    # write the block by the procedure as the section,
+    # it's compressed only if the compressed one is smaller than the raw one
+    def __putSection(self, procedure, *args):
+        if self.__version < SECTION_VERSION:
+            procedure(*args)
+            return
+
+        # write the block to the temporary buffer
+        writer = self.__writer
+        write_size = self.__write_size
+        self.__writer = io.BytesIO()
+        try:
+            procedure(*args)
+            data = self.__writer.getvalue()
+        finally:
+            self.__writer = writer
+            self.__write_size = write_size
+
+        # compress the block
+        method = SECTION_STORED
+        stored_data = data
+        if self.compress_level and SECTION_MIN_COMPRESS_SIZE <= len(data):
+            compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            compressed_data = compressor.compress(data) + compressor.flush()
+            if len(compressed_data) < len(data):
+                method = SECTION_DEFLATE
+                stored_data = compressed_data
+
+        # compression method, raw size, stored size and stored data
+        self.__putBytes(_SECTION_HEADER.pack(method, len(data), len(stored_data)))
+        self.__putBytes(stored_data)
+
     # write 8bits size integer
     def _putInt8(self, value):
-        self.__writer.write(struct.pack("<B", 0xff & value))
+        self.__writer.write(_UINT8.pack(0xff & value))
         self.__write_size += 1
 
     # write 16bits size integer
     def _putInt16(self, value):
-        self.__writer.write(struct.pack("<H", 0xffff & value))
+        self.__writer.write(_UINT16.pack(0xffff & value))
         self.__write_size += 2
 
     # write 32bits size integer
     def _putInt32(self, value):
-        self.__writer.write(struct.pack("<I", 0xffffffff & value))
+        self.__writer.write(_UINT32.pack(0xffffffff & value))
         self.__write_size += 4
 
     # put 32bits size float number
     def _putFloat32(self, value):
-        self.__writer.write(struct.pack("<f", value))
+        self.__writer.write(_FLOAT32.pack(value))
         self.__write_size += 4
 
     # write 64bits size float number
     def _putFloat64(self, value):
-        self.__writer.write(struct.pack("<d", value))
+        self.__writer.write(_FLOAT64.pack(value))
         self.__write_size += 8
 
+    # write array elements in the bulk
+    def __putArray(self, signed_format, unsigned_format, mask, array, offset, length):
+        if length <= 0:
+            return
+
+        item_size = struct.calcsize("<" + signed_format)
+
+        # fast path for the contiguous buffer in the same layout
+        buffer = _get_buffer(array, (signed_format, unsigned_format), item_size)
+        if buffer is not None:
+            self.__writer.write(buffer[offset:offset + length])
+            self.__write_size += item_size * length
+            return
+
+        # pack the elements chunk by chunk
+        end = offset + length
+        for start in range(offset, end, BULK_CHUNK_SIZE):
+            values = array[start:min(start + BULK_CHUNK_SIZE, end)]
+            count = len(values)
+            try:
+                data = struct.pack("<%d%s" % (count, signed_format), *values)
+            except struct.error:
+                if mask is None:
+                    raise
+                data = struct.pack("<%d%s" % (count, unsigned_format),
+                                   *[mask & value for value in values])
+            self.__writer.write(data)
+        self.__write_size += item_size * length
+
     # write 8bits size integer array
     def _putInt8Array(self, array, offset, length):
-        for i in range(offset, offset + length):
-            self._putInt8(array[i])
+        self.__putArray("b", "B", 0xff, array, offset, length)
 
     # write 16bits size integer array
     def _putInt16Array(self, array, offset, length):
-        for i in range(offset, offset + length):
-            self._putInt16(array[i])
+        self.__putArray("h", "H", 0xffff, array, offset, length)
 
     # write 32bits size integer array
     def _putInt32Array(self, array, offset, length):
-        for i in range(offset, offset + length):
-            self._putInt32(array[i])
+        self.__putArray("i", "I", 0xffffffff, array, offset, length)
 
     # write 32bits size float number array
     def _putFloat32Array(self, array, offset, length):
-        for i in range(offset, offset + length):
-            self._putFloat32(array[i])
+        self.__putArray("f", "f", None, array, offset, length)
 
     # write 64bits size float number array
     def _putFloat64Arrat(self, array, offset, length):
-        for i in range(offset, offset + length):
-            self._putFloat64(array[i])
+        self.__putArray("d", "d", None, array, offset, length)
 
     # write string
     def _putString(self, value):
@@ -142,6 +510,7 @@ class XModelBinaryEncoder:
             buffer = value.encode("utf-8")
             self._putInt16(len(buffer))
             self.__writer.write(buffer)
+            self.__write_size += len(buffer)
 
     # write string array
     def _putStringArray(self, array, offset, length):
@@ -165,13 +534,16 @@ class XModelBinaryEncoder:
         if value is None:
             self._putInt32(0)
         elif value in self.__inst_map:
-            self._putInt32(self.__inst_map[value])
-            self._putInt32(value.structure_type)
+            self.__putBytes(_STRUCTURE_HEADER.pack(self.__inst_map[value],
+                                                   value.structure_type))
+        elif self.__has_weak_inst and value in self.__weak_inst_map:
+            self.__putBytes(_STRUCTURE_HEADER.pack(self.__weak_inst_map[value],
+                                                   value.structure_type))
         else:
             self.__inst_map[value] = self.__inst_id_cnt
-            self._putInt32(self.__inst_id_cnt)
+            self.__putBytes(_STRUCTURE_HEADER.pack(self.__inst_id_cnt,
+                                                   value.structure_type))
             self.__inst_id_cnt += 1
-            self._putInt32(value.structure_type)
             self._putStructureProcedure(value)
 
     # write structure array
@@ -179,22 +551,75 @@ class XModelBinaryEncoder:
         for i in range(offset, offset + length):
             self._putXModelStructure(array[i])
 
+    # write structure in the array of the container, and add it to the index
+    def __putContainerEntry(self, structure_type, index, value):
+        if self.__version < INDEX_VERSION:
+            self._putXModelStructure(value)
+            return
+
+        offset = self.__write_size
+        first_inst_id = self.__inst_id_cnt
+        self._putXModelStructure(value)
+        self.__index_entries.append(XModelIndexEntry(structure_type,
+                                                     index,
+                                                     offset,
+                                                     self.__write_size - offset,
+                                                     first_inst_id,
+                                                     self.__inst_id_cnt - first_inst_id))
+
+    # write structure array of the container
+    def __putContainerArray(self, obj, structure_type):
+        length_name, array_name = _CONTAINER_ARRAY_NAMES[structure_type]
+        length = getattr(obj, length_name)
+        array = getattr(obj, array_name)
+        self._putInt16(length)
+        for i in range(length):
+            self.__putContainerEntry(structure_type, i, array[i])
+
+    # write the index of the container and its offset, they are followed by the terminator
+    def __putIndex(self):
+        offset = self.__write_size
+        entries = self.__index_entries if self.indexed else []
+
+        # number of entries and time rate
+        self.__putBytes(_INDEX_HEADER.pack(len(entries), self.__time_rate))
+
+        # entries
+        self.__putBytes(b"".join(_INDEX_ENTRY.pack(entry.structure_type,
+                                                   entry.index,
+                                                   entry.offset,
+                                                   entry.size,
+                                                   entry.first_inst_id,
+                                                   entry.num_insts)
+                                 for entry in entries))
+
+        # offset of the index
+        self._putInt32(offset)
+
     # encode to binary
     def encode(self, structure, writer):
         self.__recycle()
         self.__writer = writer
         self.__write_size = 0
+        self.__version = self._getVersion()
+        self.quantization_stats = []
+        self.interleave_stats = []
 
         # magic number
         self._putInt32(MAGIC_NUMBER)
 
         # version
-        self._putInt32(VERSION)
+        self._putInt32(self.__version)
 
         # writing structure
         self._putInt32(structure.structure_type)
         self._putStructureProcedure(structure)
 
+        # index
+        if INDEX_VERSION <= self.__version and \
+                structure.structure_type == XModelStructure.TYPE_CONTAINER:
+            self.__putIndex()
+
         # terminator
         self._putInt32(END_OF_DATA)
 
@@ -202,63 +627,89 @@ class XModelBinaryEncoder:
         self.__recycle()
         return self.__write_size
 
-    # write procedure for structure
-    def _putStructureProcedure(self, obj):
-        # axis rotate
-        if obj.structure_type == XModelStructure.TYPE_AXIS_ROTATE:
-            self._putAxisRotate(obj)
-
-        # quaternion
-        elif obj.structure_type == XModelStructure.TYPE_QUATERNION:
-            self._putQuaternion(obj)
-
-        # scale
-        elif obj.structure_type == XModelStructure.TYPE_SCALE:
-            self._putScale(obj)
+    # begin encoding the container in streaming,
+    # the sections of the container have to be written by the following methods
+    # in order of the structure arrays given by container_array_types for the version,
+    # time rate, animation sets and user data
+    def beginContainer(self, writer, name=None):
+        self.__recycle()
+        self.__writer = writer
+        self.__write_size = 0
+        self.__version = self._getVersion()
+        self.quantization_stats = []
+        self.interleave_stats = []
 
-        # translate
-        elif obj.structure_type == XModelStructure.TYPE_TRANSLATE:
-            self._putTranslate(obj)
+        # magic number
+        self._putInt32(MAGIC_NUMBER)
 
-        # matrix
-        elif obj.structure_type == XModelStructure.TYPE_MATRIX:
-            self._putMatrix(obj)
+        # version
+        self._putInt32(self.__version)
 
         # container
-        elif obj.structure_type == XModelStructure.TYPE_CONTAINER:
-            self._putContainer(obj)
-
-        # texture
-        elif obj.structure_type == XModelStructure.TYPE_TEXTURE:
-            self._putTexture(obj)
-
-        # material
-        elif obj.structure_type == XModelStructure.TYPE_MATERIAL:
-            self._putMaterial(obj)
-
-        # mesh
-        elif obj.structure_type == XModelStructure.TYPE_MESH:
-            self._putMesh(obj)
-
-        # node
-        elif obj.structure_type == XModelStructure.TYPE_NODE:
-            self._putNode(obj)
+        self._putInt32(XModelStructure.TYPE_CONTAINER)
+        self._putString(name)
+        self.__array_number = 0
+
+    # begin the structure array of the container in streaming,
+    # if length is None, it's patched by seeking back the writer at the end of array
+    def beginStructureArray(self, length=None):
+        self.__array_type = container_array_types(self.__version)[self.__array_number]
+        self.__array_number += 1
+        self.__array_length = length
+        self.__array_count = 0
+        if length is None:
+            self.__array_offset = self.__writer.tell()
+            self._putInt16(0)
+        else:
+            self._putInt16(length)
+
+    # write the structure to the structure array in streaming,
+    # if release is true, the encoder keeps only a weak reference to the structure
+    # and it can be freed by the caller after writing
+    def putStructure(self, obj, release=False):
+        self.__putContainerEntry(self.__array_type, self.__array_count, obj)
+        self.__array_count += 1
+        if release and obj in self.__inst_map:
+            self.__weak_inst_map[obj] = self.__inst_map.pop(obj)
+            self.__has_weak_inst = True
+
+    # end the structure array of the container in streaming
+    def endStructureArray(self):
+        if self.__array_length is None:
+            end = self.__writer.tell()
+            self.__writer.seek(self.__array_offset)
+            self.__writer.write(struct.pack("<H", 0xffff & self.__array_count))
+            self.__writer.seek(end)
+        elif self.__array_count != self.__array_length:
+            raise ValueError("%d structures are written to the array of length %d" %
+                             (self.__array_count, self.__array_length))
+
+    # write the time rate of the container in streaming
+    def putTimeRate(self, time_rate):
+        self.__time_rate = time_rate
+        self._putFloat64(time_rate)
+
+    # end encoding the container in streaming
+    def endContainer(self, user_data=None):
+        # user data
+        self._putUserData(user_data)
 
-        # kinematic
-        elif obj.structure_type == XModelStructure.TYPE_KINEMATIC:
-            self._putKinematic(obj)
+        # index
+        if INDEX_VERSION <= self.__version:
+            self.__putIndex()
 
-        # animation
-        elif obj.structure_type == XModelStructure.TYPE_ANIMATION:
-            self._putAnimation(obj)
+        # terminator
+        self._putInt32(END_OF_DATA)
 
-        # animation key
-        elif obj.structure_type == XModelStructure.TYPE_ANIMATION_KEY:
-            self._putAnimationKey(obj)
+        self.__writer.flush()
+        self.__recycle()
+        return self.__write_size
 
-        # animation set
-        elif obj.structure_type == XModelStructure.TYPE_ANIMATION_SET:
-            self._putAnimationSet(obj)
+    # write procedure for structure
+    def _putStructureProcedure(self, obj):
+        procedure = self.__put_procedures.get(obj.structure_type)
+        if procedure is not None:
+            procedure(obj)
 
     # write user data
     def _putUserData(self, obj):
@@ -273,60 +724,44 @@ class XModelBinaryEncoder:
     # write axis rotate
     def _putAxisRotate(self, obj):
         # value
-        self._putFloat32Array(obj.values, 0, XModelStructure.SIZE_AXIS_ROTATE)
+        self.__putBytes(_AXIS_ROTATE.pack(*obj.values[0:XModelStructure.SIZE_AXIS_ROTATE]))
 
     # write quaternion
     def _putQuaternion(self, obj):
         # value
-        self._putFloat32Array(obj.values, 0, XModelStructure.SIZE_QUATERNION)
+        self.__putBytes(_QUATERNION.pack(*obj.values[0:XModelStructure.SIZE_QUATERNION]))
 
     # write scale
     def _putScale(self, obj):
         # value
-        self._putFloat32Array(obj.values, 0, XModelStructure.SIZE_SCALE)
+        self.__putBytes(_SCALE.pack(*obj.values[0:XModelStructure.SIZE_SCALE]))
 
     # write translate
     def _putTranslate(self, obj):
         # value
-        self._putFloat32Array(obj.values, 0, XModelStructure.SIZE_TRANSLATE)
+        self.__putBytes(_TRANSLATE.pack(*obj.values[0:XModelStructure.SIZE_TRANSLATE]))
 
     # write matrix
     def _putMatrix(self, obj):
         # value
-        self._putFloat32Array(obj.values, 0, XModelStructure.SIZE_MATRIX)
+        self.__putBytes(_MATRIX.pack(*obj.values[0:XModelStructure.SIZE_MATRIX]))
 
     # write container
     def _putContainer(self, obj):
         # name
         self._putString(obj.name)
 
-        # texture
-        self._putInt16(obj.num_textures)
-        if 0 < obj.num_textures:
-            self._putStructureArray(obj.textures, 0, obj.num_textures)
-
-        # material
-        self._putInt16(obj.num_materials)
-        if 0 < obj.num_materials:
-            self._putStructureArray(obj.materials, 0, obj.num_materials)
-
-        # mesh
-        self._putInt16(obj.num_meshs)
-        if 0 < obj.num_meshs:
-            self._putStructureArray(obj.meshs, 0, obj.num_meshs)
-
-        # node
-        self._putInt16(obj.num_nodes)
-        if 0 < obj.num_nodes:
-            self._putStructureArray(obj.nodes, 0, obj.num_nodes)
+        # textures, materials, meshs and nodes
+        structure_types = container_array_types(self.__version)
+        for structure_type in structure_types[:-1]:
+            self.__putContainerArray(obj, structure_type)
 
         # time rate
+        self.__time_rate = obj.time_rate
         self._putFloat64(obj.time_rate)
 
         # animation set
-        self._putInt16(obj.num_animation_sets)
-        if 0 < obj.num_animation_sets:
-            self._putStructureArray(obj.animation_sets, 0, obj.num_animation_sets)
+        self.__putContainerArray(obj, structure_types[-1])
 
         # user data
         self._putUserData(obj.user_data)
@@ -342,7 +777,7 @@ class XModelBinaryEncoder:
         # binary data
         self._putInt32(obj.data_size)
         if 0 < obj.data_size:
-            self._putInt8Array(obj.data, 0, obj.data_size)
+            self.__putSection(self._putInt8Array, obj.data, 0, obj.data_size)
 
         # user data
         self._putUserData(obj.user_data)
@@ -353,12 +788,12 @@ class XModelBinaryEncoder:
         self._putString(obj.name)
 
         # parameters
-        self._putFloat32Array(obj.emissive, 0, 4)
-        self._putFloat32Array(obj.ambient, 0, 4)
-        self._putFloat32Array(obj.diffuse, 0, 4)
-        self._putFloat32Array(obj.specular, 0, 4)
-        self._putFloat32(obj.shininess)
-        self._putFloat32(obj.bump)
+        self.__putBytes(_MATERIAL_PARAMETERS.pack(*obj.emissive[0:4],
+                                                  *obj.ambient[0:4],
+                                                  *obj.diffuse[0:4],
+                                                  *obj.specular[0:4],
+                                                  obj.shininess,
+                                                  obj.bump))
 
         # texture maps
         self._putXModelStructure(obj.emissive_map)
@@ -379,29 +814,55 @@ class XModelBinaryEncoder:
         # name
         self._putString(obj.name)
 
+        # settings and statistics of the quantization
+        quantization = self.quantization or XModelQuantization()
+        stats = XModelQuantizationStats(obj.name)
+        if QUANTIZE_VERSION <= self.__version:
+            self.quantization_stats.append(stats)
+
+        # whether to interleave the vertices, it needs the attributes as the runtime decodes them
+        interleaved = INTERLEAVE_VERSION <= self.__version and is_interleaved(obj, self.interleave)
+        positions = normals = colors = tex_coords = None
+
         # positions
         self._putInt32(obj.num_positions)
         if 0 < obj.num_positions:
             self._putInt8(obj.position_size)
-            self._putFloat32Array(obj.positions, 0, obj.position_size * obj.num_positions)
+            stats.position_error, positions = self._putAttribute(obj.positions,
+                                                                 obj.position_size,
+                                                                 obj.num_positions,
+                                                                 quantization.position_encoding,
+                                                                 interleaved)
 
         # normals
         self._putInt32(obj.num_normals)
         if 0 < obj.num_normals:
             self._putInt8(obj.normal_size)
-            self._putFloat32Array(obj.normals, 0, obj.normal_size * obj.num_normals)
+            stats.normal_error, normals = self._putAttribute(obj.normals,
+                                                             obj.normal_size,
+                                                             obj.num_normals,
+                                                             quantization.normal_encoding,
+                                                             interleaved)
 
         # colors
         self._putInt32(obj.num_colors)
         if 0 < obj.num_colors:
             self._putInt8(obj.color_size)
-            self._putFloat32Array(obj.colors, 0, obj.color_size * obj.num_colors)
+            stats.color_error, colors = self._putAttribute(obj.colors,
+                                                           obj.color_size,
+                                                           obj.num_colors,
+                                                           quantization.color_encoding,
+                                                           interleaved)
 
         # texture coordinates
         self._putInt32(obj.num_tex_coords)
         if 0 < obj.num_tex_coords:
             self._putInt8(obj.tex_coord_size)
-            self._putFloat32Array(obj.tex_coords, 0, obj.tex_coord_size * obj.num_tex_coords)
+            stats.tex_coord_error, tex_coords = self._putAttribute(obj.tex_coords,
+                                                                   obj.tex_coord_size,
+                                                                   obj.num_tex_coords,
+                                                                   quantization.tex_coord_encoding,
+                                                                   interleaved)
 
         # skin weights (inline)
         has_skin_weight = None
@@ -415,13 +876,18 @@ class XModelBinaryEncoder:
 
         # vertices (inline)
         self._putInt32(obj.num_vertices)
-        for i in range(obj.num_vertices):
-            self._putVertex(obj.vertices[i],
-                            obj.num_positions,
-                            obj.num_normals,
-                            obj.num_colors,
-                            obj.num_tex_coords,
-                            has_skin_weight)
+        if 0 < obj.num_vertices:
+            vertices = obj.vertices
+            if not isinstance(vertices, XModelVertexTable):
+                vertices = XModelVertexTable.fromVertices(vertices[0:obj.num_vertices])
+            self.__putSection(self._putVertexTable,
+                              vertices,
+                              obj.num_vertices,
+                              obj.num_positions,
+                              obj.num_normals,
+                              obj.num_colors,
+                              obj.num_tex_coords,
+                              has_skin_weight)
 
         # materials
         self._putInt16(obj.num_materials)
@@ -430,12 +896,108 @@ class XModelBinaryEncoder:
 
         # elements (inline)
         self._putInt32(obj.num_elements)
-        for i in range(obj.num_elements):
-            self._putElement(obj.elements[i])
+        if 0 < obj.num_elements:
+            self.__putSection(self._putElements, obj.elements, obj.num_elements)
+
+        # triangulated faces, they are empty unless they are enabled as the newer versions may be
+        # written for the other options
+        if TRIANGULATE_VERSION <= self.__version:
+            if self.triangulated:
+                self._putFaces(obj)
+            else:
+                self._putInt32(0)
+
+        # interleaved vertices
+        if INTERLEAVE_VERSION <= self.__version:
+            if interleaved:
+                self._putInterleaved(obj, positions, normals, colors, tex_coords)
+            else:
+                self._putInt16(0)
 
         # user data
         self._putUserData(obj.user_data)
 
+    # write the triangulated faces of mesh, they are made from the elements
+    # in the layout of the runtime, so the runtime can use them as the index buffer directly
+    def _putFaces(self, obj):
+        offsets, sizes, indices = triangulate_mesh_faces(obj, True)
+
+        # number of vertex indices
+        self._putInt32(len(indices))
+        if len(indices) <= 0:
+            return
+
+        # size of vertex index and whether the faces are reversed
+        index_size = 2 if indices.typecode == "H" else 4
+        self._putInt8(index_size)
+        self._putBool(True)
+
+        # offsets and numbers of vertex indices of each material
+        self._putInt32Array(offsets, 0, len(offsets))
+        self._putInt32Array(sizes, 0, len(sizes))
+
+        # vertex indices
+        if index_size == 2:
+            self.__putSection(self._putInt16Array, indices, 0, len(indices))
+        else:
+            self.__putSection(self._putInt32Array, indices, 0, len(indices))
+
+    # write the interleaved vertices of mesh in the layout of the runtime,
+    # so the runtime can use them as the vertex buffer directly
+    def _putInterleaved(self, obj, positions, normals, colors, tex_coords):
+        layout = make_layout(obj)
+        data = interleave_vertices(obj, layout, positions, normals, colors, tex_coords)
+
+        # layout of vertex
+        self._putInt16(layout.stride)
+        if layout.stride <= 0:
+            return
+        self._putInt8Array(layout.types, 0, len(layout.types))
+        self._putInt8Array(layout.sizes, 0, len(layout.sizes))
+        self._putInt16Array(layout.offsets, 0, len(layout.offsets))
+
+        # vertices
+        self.__putSection(self.__putBytes, data)
+
+        # statistics
+        stats = XModelInterleaveStats(obj.name)
+        stats.num_vertices = obj.num_vertices
+        stats.stride = layout.stride
+        stats.interleaved_size = len(data)
+        stats.indexed_size = (4 * (obj.position_size * obj.num_positions +
+                                   obj.normal_size * obj.num_normals +
+                                   obj.color_size * obj.num_colors +
+                                   obj.tex_coord_size * obj.num_tex_coords +
+                                   4 * obj.num_vertices))
+        self.interleave_stats.append(stats)
+
+    # write attribute array of mesh, it's quantized in the encoding of the settings
+    # if the version supports it, and return the maximum error of the quantization,
+    # and the values as the runtime decodes them if decode is true, otherwise None
+    def _putAttribute(self, values, size, num, encoding, decode=False):
+        if self.__version < QUANTIZE_VERSION:
+            self.__putSection(self._putFloat32Array, values, 0, size * num)
+            return 0.0, array.array("f", values[0:size * num]) if decode else None
+
+        encoding, params, data, error = quantize_attribute(values, size, num, encoding)
+
+        # encoding
+        self._putInt8(encoding)
+
+        # parameters to dequantize
+        self._putFloat32Array(params, 0, len(params))
+
+        # values
+        if data is None:
+            self.__putSection(self._putFloat32Array, values, 0, size * num)
+        else:
+            self.__putSection(self.__putBytes, data)
+        if not decode:
+            return error, None
+        if data is None:
+            return error, array.array("f", values[0:size * num])
+        return error, dequantize_attribute(data, encoding, array.array("f", params), size, num)
+
     # write skin
     def _putSkin(self, obj):
         # number of weighted indices
@@ -444,21 +1006,8 @@ class XModelBinaryEncoder:
         # weighted index stride
         self._putInt8(obj.weighted_index_stride)
 
-        for i in range(obj.num_weighted_indices):
-            index = obj.weighted_index_stride * i
-
-            # element size
-            num_elem = obj.weighted_index_sizes[i]
-            self._putInt8(num_elem)
-
-            for j in range(num_elem):
-                ind = index + j
-
-                # index
-                self._putInt16(obj.indices[ind])
-
-                # weight
-                self._putFloat32(obj.weights[ind])
+        # weighted indices
+        self.__putSection(self._putWeightedIndices, obj)
 
         # number of nodes
         self._putInt16(obj.num_nodes)
@@ -468,9 +1017,33 @@ class XModelBinaryEncoder:
             self._putStructureArray(obj.nodes, 0, obj.num_nodes)
 
             # offset matrices
-            self._putFloat32Array(obj.offset_matrices,
-                                  0,
-                                  XModelStructure.SIZE_MATRIX * obj.num_nodes)
+            self.__putSection(self._putFloat32Array,
+                              obj.offset_matrices,
+                              0,
+                              XModelStructure.SIZE_MATRIX * obj.num_nodes)
+
+    # write weighted indices of skin,
+    # pairs of index and weight are packed into a record for each weighted index
+    def _putWeightedIndices(self, obj):
+        records = []
+        indices = obj.indices
+        weights = obj.weights
+        for i in range(obj.num_weighted_indices):
+            index = obj.weighted_index_stride * i
+
+            # element size
+            num_elem = obj.weighted_index_sizes[i]
+            layout = _get_layout(_WEIGHTED_INDEX_LAYOUTS, num_elem, "<B" + "Hf" * num_elem)
+
+            values = [0xff & num_elem] * (1 + 2 * num_elem)
+            values[1::2] = [0xffff & value for value in indices[index:index + num_elem]]
+            values[2::2] = weights[index:index + num_elem]
+            records.append(layout.pack(*values))
+
+            if BULK_CHUNK_SIZE <= len(records):
+                self.__putBytes(b"".join(records))
+                records.clear()
+        self.__putBytes(b"".join(records))
 
     # write vertex
     def _putVertex(self,
@@ -500,6 +1073,56 @@ class XModelBinaryEncoder:
         if 0 < has_skin_weight:
             self._putInt32(obj.skin_weight)
 
+    # write vertex table
+    def _putVertexTable(self,
+                        obj,
+                        num_vertices,
+                        has_position,
+                        has_normal,
+                        has_color,
+                        has_tex_coord,
+                        has_skin_weight):
+        columns = [column for column, has in ((obj.position, has_position),
+                                              (obj.normal, has_normal),
+                                              (obj.color, has_color),
+                                              (obj.tex_coord, has_tex_coord),
+                                              (obj.skin_weight, has_skin_weight))
+                   if 0 < has]
+        if num_vertices <= 0 or len(columns) == 0:
+            return
+
+        # interleave the columns to the vertex records
+        stride = len(columns)
+        values = array.array("i", [0]) * (stride * num_vertices)
+        for i, column in enumerate(columns):
+            values[i::stride] = array.array("i", column[:num_vertices])
+        self._putInt32Array(values, 0, len(values))
+
+    # write elements, packing each of them into a record
+    def _putElements(self, elements, num_elements):
+        records = []
+        for i in range(num_elements):
+            obj = elements[i]
+            num_vertices = obj.num_vertices
+            layout = _get_layout(_ELEMENT_RECORD_LAYOUTS, num_vertices, "<HB%di" % num_vertices)
+            try:
+                if 0 < num_vertices:
+                    records.append(layout.pack(0xffff & obj.material,
+                                               0xff & num_vertices,
+                                               *obj.vertices[0:num_vertices]))
+                else:
+                    records.append(layout.pack(0xffff & obj.material, 0))
+            except struct.error:
+                # the vertex indices are out of range of signed integer
+                self.__putBytes(b"".join(records))
+                records.clear()
+                self._putElement(obj)
+
+            if BULK_CHUNK_SIZE <= len(records):
+                self.__putBytes(b"".join(records))
+                records.clear()
+        self.__putBytes(b"".join(records))
+
     # write element
     def _putElement(self, obj):
         # material
@@ -515,17 +1138,14 @@ class XModelBinaryEncoder:
         # name
         self._putString(obj.name)
 
-        # connected
-        self._putBool(obj.connected)
-
-        # inverse kinematics
-        self._putBoolArray(obj.ik_lock_axis, 0, XModelStructure.SIZE_VECTOR_3)
-        self._putBoolArray(obj.ik_limit_angle, 0, XModelStructure.SIZE_VECTOR_3)
-        self._putFloat32Array(obj.ik_min_angle, 0, XModelStructure.SIZE_VECTOR_3)
-        self._putFloat32Array(obj.ik_max_angle, 0, XModelStructure.SIZE_VECTOR_3)
-
-        # bone tail
-        self._putFloat32Array(obj.bone_tail, 0, XModelStructure.SIZE_VECTOR_3)
+        # connected, inverse kinematics and bone tail
+        size = XModelStructure.SIZE_VECTOR_3
+        self.__putBytes(_NODE_PARAMETERS.pack(1 if obj.connected else 0,
+                                              *[1 if value else 0 for value in obj.ik_lock_axis[0:size]],
+                                              *[1 if value else 0 for value in obj.ik_limit_angle[0:size]],
+                                              *obj.ik_min_angle[0:size],
+                                              *obj.ik_max_angle[0:size],
+                                              *obj.bone_tail[0:size]))
 
         # transforms
         self._putStructureArray(obj.transforms, 0, XModelNode.NUM_TRANSFORMS)
@@ -537,7 +1157,7 @@ class XModelBinaryEncoder:
 
         # meshs
         self._putInt16(obj.num_meshs)
-        if 0 < obj.num_children:
+        if 0 < obj.num_meshs:
             self._putStructureArray(obj.meshs, 0, obj.num_meshs)
 
         # nodes
@@ -553,14 +1173,10 @@ class XModelBinaryEncoder:
         # target
         self._putXModelStructure(obj.target)
 
-        # maxinum number of iterations
-        self._putInt16(obj.max_iterations)
-
-        # chain length
-        self._putInt16(obj.chain_length)
-
-        # influence
-        self._putFloat32(obj.influence)
+        # maxinum number of iterations, chain length and influence
+        self.__putBytes(_KINEMATIC_PARAMETERS.pack(0xffff & obj.max_iterations,
+                                                   0xffff & obj.chain_length,
+                                                   obj.influence))
 
     # write animation
     def _putAnimation(self, obj):
@@ -576,7 +1192,15 @@ class XModelBinaryEncoder:
         # keys
         self._putInt16(obj.num_keys)
         if 0 < obj.num_keys:
-            self._putStructureArray(obj.keys, 0, obj.num_keys)
+            self.__putSection(self._putStructureArray, obj.keys, 0, obj.num_keys)
+
+        # sampled frames
+        if SAMPLE_VERSION <= self.__version:
+            self._putInt32(obj.num_frames)
+            if 0 < obj.num_frames:
+                self._putInt32(obj.frame_start)
+                self._putInt8(obj.frame_size)
+                self._putAttribute(obj.frames, obj.frame_size, obj.num_frames, self.sample_encoding)
 
         # animations
         self._putInt16(obj.num_children)
@@ -588,16 +1212,24 @@ class XModelBinaryEncoder:
 
     # write animation key
     def _putAnimationKey(self, obj):
-        # interpolate
-        self._putInt8(obj.interpolate)
-
-        # time
-        self._putFloat64(obj.time)
+        # interpolate, time and value
+        value_size = obj.value_size
+        layout = _get_layout(_ANIMATION_KEY_LAYOUTS, value_size, "<BdH%df" % value_size)
+        if 0 < value_size:
+            self.__putBytes(layout.pack(0xff & obj.interpolate,
+                                        obj.time,
+                                        0xffff & value_size,
+                                        *obj.value[0:value_size]))
+        else:
+            self.__putBytes(layout.pack(0xff & obj.interpolate, obj.time, 0))
 
-        # value
-        self._putInt16(obj.value_size)
-        if 0 < obj.value_size:
-            self._putFloat32Array(obj.value, 0, obj.value_size)
+        # control points of the bezier key
+        if BEZIER_VERSION <= self.__version and obj.interpolate == XModelAnimationKey.INTERPOLATE_BEZIER:
+            self._putFloat64(obj.before_time)
+            self._putFloat64(obj.after_time)
+            if 0 < value_size:
+                self._putFloat32Array(obj.before_value, 0, value_size)
+                self._putFloat32Array(obj.after_value, 0, value_size)
 
     # write animation set
     def _putAnimationSet(self, obj):
@@ -611,3 +1243,1052 @@ class XModelBinaryEncoder:
 
         # user data
         self._putUserData(obj.user_data)
+
+
+# precompiled layouts of the fixed size records
+_ANIMATION_KEY_HEADER = struct.Struct("<bdH")
+
+# layouts of the element record, key is number of vertices
+_ELEMENT_LAYOUTS = {}
+
+
+# get the layout of the element record for number of vertices
+def _get_element_layout(num_vertices):
+    layout = _ELEMENT_LAYOUTS.get(num_vertices)
+    if layout is None:
+        layout = struct.Struct("<hB%di" % num_vertices)
+        _ELEMENT_LAYOUTS[num_vertices] = layout
+    return layout
+
+
+# unpack the vertices from the buffer
+def _unpack_vertices(buffer, offset, num_vertices, flags):
+    stride = sum(1 for has in flags if 0 < has)
+
+    # read all indices at once and split them into the columns
+    values = struct.unpack_from("<%di" % (stride * num_vertices), buffer, offset)
+    columns = []
+    index = 0
+    for has in flags:
+        if 0 < has:
+            columns.append(values[index::stride])
+            index += 1
+        else:
+            columns.append(itertools.repeat(-1, num_vertices))
+
+    vertices = []
+    append = vertices.append
+    for position, normal, color, tex_coord, skin_weight in zip(*columns):
+        vertex = XModelVertex()
+        vertex.position = position
+        vertex.normal = normal
+        vertex.color = color
+        vertex.tex_coord = tex_coord
+        vertex.skin_weight = skin_weight
+        append(vertex)
+    return vertices
+
+
+# unpack the elements from the buffer, and return it with the end offset
+def _unpack_elements(buffer, offset, num_elements):
+    elements = []
+    append = elements.append
+    for i in range(num_elements):
+        # number of vertices, it's next to the material index
+        num_vertices = buffer[offset + 2]
+        layout = _get_element_layout(num_vertices)
+        values = layout.unpack_from(buffer, offset)
+        offset += layout.size
+
+        element = XModelElement()
+        # material
+        element.material = values[0]
+        # vertices
+        element.num_vertices = num_vertices
+        if 0 < num_vertices:
+            element.vertices = list(values[2:])
+        append(element)
+    return elements, offset
+
+
+# skip the elements in the buffer, and return the end offset
+def _skip_elements(buffer, offset, num_elements):
+    for i in range(num_elements):
+        offset += 3 + 4 * buffer[offset + 2]
+    return offset
+
+
+# unpack the weighted indices of the skin from the buffer, and return them with the end offset
+def _unpack_weighted_indices(buffer, offset, num_weighted_indices, weighted_index_stride):
+    array_size = weighted_index_stride * num_weighted_indices
+    weighted_index_sizes = [0] * num_weighted_indices
+    indices = [-1] * array_size
+    weights = [0.0] * array_size
+
+    for i in range(num_weighted_indices):
+        index = weighted_index_stride * i
+
+        # element size
+        num_elem = buffer[offset]
+        weighted_index_sizes[i] = num_elem
+        offset += 1
+
+        # pairs of index and weight
+        values = struct.unpack_from("<" + "hf" * num_elem, buffer, offset)
+        offset += 6 * num_elem
+        indices[index:index + num_elem] = values[0::2]
+        weights[index:index + num_elem] = values[1::2]
+
+    return (weighted_index_sizes, indices, weights), offset
+
+
+# skip the weighted indices of the skin in the buffer, and return the end offset
+def _skip_weighted_indices(buffer, offset, num_weighted_indices):
+    for i in range(num_weighted_indices):
+        offset += 1 + 6 * buffer[offset]
+    return offset
+
+
+# call the unpack function, and return the values without the end offset
+def _unpack_first(unpack, *args):
+    return unpack(*args)[0]
+
+
+# inflate the stored data of the section to the raw block
+def _inflate_section(method, raw_size, data):
+    if method == SECTION_STORED:
+        return data
+    if method == SECTION_DEFLATE:
+        raw_data = zlib.decompress(data, -zlib.MAX_WBITS, raw_size)
+        if len(raw_data) != raw_size:
+            raise ValueError("section is inflated to %d bytes, but %d bytes are expected" %
+                             (len(raw_data), raw_size))
+        return memoryview(raw_data)
+    raise ValueError("unknown compression method of section: %d" % method)
+
+
+# set the values to the attributes of the structure,
+# names is a name of attribute or a tuple of names for a tuple of values
+def _set_attributes(obj, names, values):
+    if isinstance(names, str):
+        setattr(obj, names, values)
+    else:
+        for name, value in zip(names, values):
+            setattr(obj, name, value)
+
+
+# array which unpacks the values from the binary data on first access
+class XModelLazyArray(collections.abc.Sequence):
+    # initialize
+    def __init__(self, length, loader):
+        # int : number of elements
+        self.__length = length
+        # callable : function to unpack the values
+        self.__loader = loader
+        # list : unpacked values
+        self.__values = None
+
+    # whether the values are already unpacked
+    @property
+    def loaded(self):
+        return self.__values is not None
+
+    # unpack the values if not yet
+    def materialize(self):
+        if self.__values is None:
+            self.__values = self.__loader()
+            self.__loader = None
+        return self.__values
+
+    def __len__(self):
+        return self.__length
+
+    def __getitem__(self, index):
+        return self.materialize()[index]
+
+    def __setitem__(self, index, value):
+        self.materialize()[index] = value
+
+    def __iter__(self):
+        return iter(self.materialize())
+
+
+# create the lazy arrays which share the one loader returning a tuple of arrays
+def _create_lazy_arrays(lengths, loader):
+    cache = []
+
+    def load(index):
+        if not cache:
+            cache.append(loader())
+        return cache[0][index]
+
+    return [XModelLazyArray(length, functools.partial(load, i))
+            for i, length in enumerate(lengths)]
+
+
+# binary decoder for xModel
+# @author Syuuhei Kuno
+class XModelBinaryDecoder:
+    # initialize, if lazy is true, big arrays are unpacked on first access,
+    # if num_workers is positive, the compressed sections are inflated by the worker threads
+    def __init__(self, lazy=False, num_workers=0):
+        # whether to decode the big arrays lazily
+        self.lazy = lazy
+        # number of the worker threads to inflate the sections
+        self.num_workers = num_workers
+        # buffer of binary data
+        self.__buffer = None
+        # read offset in buffer
+        self.__offset = 0
+        # version of binary data
+        self.__version = 0
+        # instance map, key is identifier, value is structure
+        self.__inst_map = {}
+        # identifier of the instance to be read next
+        self.__next_inst_id = 1
+        # whole binary data, the buffer is swapped to the sections while reading them
+        self.__source = None
+        # index of the container opened for random access
+        self.__index = None
+        # thread pool to inflate the sections
+        self.__pool = None
+        # sections being inflated by the thread pool,
+        # tuples of future, structure, attribute names, read procedure and arguments
+        self.__pending_sections = []
+
+        # structure factories, key is structure type
+        self.__create_procedures = {
+            XModelStructure.TYPE_AXIS_ROTATE: XModelAxisRotate,
+            XModelStructure.TYPE_QUATERNION: XModelQuaternion,
+            XModelStructure.TYPE_SCALE: XModelScale,
+            XModelStructure.TYPE_TRANSLATE: XModelTranslate,
+            XModelStructure.TYPE_MATRIX: XModelMatrix,
+            XModelStructure.TYPE_CONTAINER: XModelContainer,
+            XModelStructure.TYPE_TEXTURE: XModelTexture,
+            XModelStructure.TYPE_MATERIAL: XModelMaterial,
+            XModelStructure.TYPE_MESH: XModelMesh,
+            XModelStructure.TYPE_NODE: XModelNode,
+            XModelStructure.TYPE_KINEMATIC: XModelKinematic,
+            XModelStructure.TYPE_ANIMATION: XModelAnimation,
+            XModelStructure.TYPE_ANIMATION_KEY: XModelAnimationKey,
+            XModelStructure.TYPE_ANIMATION_SET: XModelAnimationSet}
+
+        # read procedures, key is structure type
+        self.__get_procedures = {
+            XModelStructure.TYPE_AXIS_ROTATE: self._getAxisRotate,
+            XModelStructure.TYPE_QUATERNION: self._getQuaternion,
+            XModelStructure.TYPE_SCALE: self._getScale,
+            XModelStructure.TYPE_TRANSLATE: self._getTranslate,
+            XModelStructure.TYPE_MATRIX: self._getMatrix,
+            XModelStructure.TYPE_CONTAINER: self._getContainer,
+            XModelStructure.TYPE_TEXTURE: self._getTexture,
+            XModelStructure.TYPE_MATERIAL: self._getMaterial,
+            XModelStructure.TYPE_MESH: self._getMesh,
+            XModelStructure.TYPE_NODE: self._getNode,
+            XModelStructure.TYPE_KINEMATIC: self._getKinematic,
+            XModelStructure.TYPE_ANIMATION: self._getAnimation,
+            XModelStructure.TYPE_ANIMATION_KEY: self._getAnimationKey,
+            XModelStructure.TYPE_ANIMATION_SET: self._getAnimationSet}
+
+    # recycle for this instance
+    def __recycle(self):
+        self.__buffer = None
+        self.__offset = 0
+        self.__version = 0
+        self.__inst_map.clear()
+        self.__next_inst_id = 1
+        self.__source = None
+        self.__index = None
+        self.__pending_sections.clear()
+
+    # read 8bits size integer
+    def _getInt8(self):
+        value = _INT8.unpack_from(self.__buffer, self.__offset)[0]
+        self.__offset += 1
+        return value
+
+    # read 8bits size unsigned integer
+    def _getUint8(self):
+        value = _UINT8.unpack_from(self.__buffer, self.__offset)[0]
+        self.__offset += 1
+        return value
+
+    # read 16bits size integer
+    def _getInt16(self):
+        value = _INT16.unpack_from(self.__buffer, self.__offset)[0]
+        self.__offset += 2
+        return value
+
+    # read 16bits size unsigned integer
+    def _getUint16(self):
+        value = _UINT16.unpack_from(self.__buffer, self.__offset)[0]
+        self.__offset += 2
+        return value
+
+    # read 32bits size integer
+    def _getInt32(self):
+        value = _INT32.unpack_from(self.__buffer, self.__offset)[0]
+        self.__offset += 4
+        return value
+
+    # read 32bits size unsigned integer
+    def _getUint32(self):
+        value = _UINT32.unpack_from(self.__buffer, self.__offset)[0]
+        self.__offset += 4
+        return value
+
+    # read 32bits size float number
+    def _getFloat32(self):
+        value = _FLOAT32.unpack_from(self.__buffer, self.__offset)[0]
+        self.__offset += 4
+        return value
+
+    # read 64bits size float number
+    def _getFloat64(self):
+        value = _FLOAT64.unpack_from(self.__buffer, self.__offset)[0]
+        self.__offset += 8
+        return value
+
+    # read the array elements in the bulk
+    def __getArray(self, value_format, item_size, length):
+        values = struct.unpack_from("<%d%s" % (length, value_format),
+                                    self.__buffer,
+                                    self.__offset)
+        self.__offset += item_size * length
+        return values
+
+    # read 32bits size float number array as new array,
+    # it's a view of the binary data in lazy mode
+    def __getFloat32Block(self, length):
+        if self.lazy and sys.byteorder == "little":
+            end = self.__offset + 4 * length
+            values = self.__buffer[self.__offset:end].cast("f")
+            self.__offset = end
+            return values
+        return list(self.__getArray("f", 4, length))
+
+    # read 8bits size integer array
+    def _getInt8Array(self, array, offset, length):
+        array[offset:offset + length] = self.__getArray("b", 1, length)
+
+    # read 16bits size integer array
+    def _getInt16Array(self, array, offset, length):
+        array[offset:offset + length] = self.__getArray("h", 2, length)
+
+    # read 32bits size integer array
+    def _getInt32Array(self, array, offset, length):
+        array[offset:offset + length] = self.__getArray("i", 4, length)
+
+    # read 32bits size float number array
+    def _getFloat32Array(self, array, offset, length):
+        array[offset:offset + length] = self.__getArray("f", 4, length)
+
+    # read 64bits size float number array
+    def _getFloat64Array(self, array, offset, length):
+        array[offset:offset + length] = self.__getArray("d", 8, length)
+
+    # read binary data, it's a view of the binary data in lazy mode
+    def _getBytes(self, length):
+        value = self.__buffer[self.__offset:self.__offset + length]
+        if not self.lazy:
+            value = bytes(value)
+        self.__offset += length
+        return value
+
+    # read the header and the stored data of the section,
+    # and return the compression method, the raw size and the stored data
+    def __getSectionData(self):
+        method, raw_size, stored_size = _SECTION_HEADER.unpack_from(self.__buffer, self.__offset)
+        self.__offset += _SECTION_HEADER.size
+        data = self.__buffer[self.__offset:self.__offset + stored_size]
+        self.__offset += stored_size
+        return method, raw_size, data
+
+    # read the block by the procedure from the raw data of the section
+    def __parseSection(self, data, procedure, *args):
+        buffer = self.__buffer
+        offset = self.__offset
+        self.__buffer = data
+        self.__offset = 0
+        try:
+            return procedure(*args)
+        finally:
+            self.__buffer = buffer
+            self.__offset = offset
+
+    # read the block by the procedure from the section
+    def __getSection(self, procedure, *args):
+        if self.__version < SECTION_VERSION:
+            return procedure(*args)
+        method, raw_size, data = self.__getSectionData()
+        return self.__parseSection(_inflate_section(method, raw_size, data), procedure, *args)
+
+    # read the block which doesn't contain any structure by the procedure from the section,
+    # and set the values to the attributes of the structure,
+    # the compressed section is inflated in parallel and read at the end of decoding
+    # if the decoder has the thread pool
+    def __getDataSection(self, obj, names, procedure, *args):
+        if self.__pool is not None and SECTION_VERSION <= self.__version:
+            method, raw_size, data = self.__getSectionData()
+            if method != SECTION_STORED:
+                future = self.__pool.submit(_inflate_section, method, raw_size, data)
+                self.__pending_sections.append((future, obj, names, procedure, args))
+                return
+            values = self.__parseSection(data, procedure, *args)
+        else:
+            values = self.__getSection(procedure, *args)
+        _set_attributes(obj, names, values)
+
+    # read the sections inflated by the thread pool
+    def __resolveSections(self):
+        for future, obj, names, procedure, args in self.__pending_sections:
+            _set_attributes(obj, names, self.__parseSection(future.result(), procedure, *args))
+        self.__pending_sections.clear()
+
+    # read string
+    def _getString(self):
+        length = self._getUint16()
+        if 0 < length:
+            value = str(self.__buffer[self.__offset:self.__offset + length], "utf-8")
+            self.__offset += length
+            return value
+        return None
+
+    # read boolean
+    def _getBool(self):
+        return self._getInt8() != 0
+
+    # read boolean array
+    def _getBoolArray(self, array, offset, length):
+        array[offset:offset + length] = [value != 0 for value in self.__getArray("b", 1, length)]
+
+    # read structure
+    def _getXModelStructure(self):
+        # identifier
+        inst_id = self._getUint32()
+        if inst_id == 0:
+            return None
+
+        # type
+        structure_type = self._getInt32()
+
+        # search the already decoded instance
+        value = self.__inst_map.get(inst_id)
+        if value is not None:
+            return value
+
+        # read the entry in which the instance is written in random access
+        if inst_id != self.__next_inst_id and self.__index is not None:
+            entry = self.__index.findInst(inst_id)
+            if entry is None:
+                raise ValueError("instance %d isn't found in the index" % inst_id)
+            self.__getEntry(entry)
+            return self.__inst_map[inst_id]
+
+        # create and read the instance
+        value = self._createStructureProcedure(structure_type)
+        self.__inst_map[inst_id] = value
+        self.__next_inst_id = inst_id + 1
+        self._getStructureProcedure(value)
+        return value
+
+    # read structure array
+    def _getStructureArray(self, length):
+        return [self._getXModelStructure() for i in range(length)]
+
+    # read the source and its header, and return whether it's the supported binary
+    def __open(self, reader):
+        if hasattr(reader, "read"):
+            if self.lazy and hasattr(reader, "fileno"):
+                reader = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_COPY)
+            else:
+                reader = reader.read()
+        self.__source = memoryview(reader)
+        self.__buffer = self.__source
+        self.__offset = 0
+
+        # magic number
+        if self._getUint32() != MAGIC_NUMBER:
+            return False
+
+        # version
+        self.__version = self._getInt32()
+        if self.__version < COMPATIBILITY_VERSION or VERSION < self.__version:
+            return False
+
+        # thread pool to inflate the sections
+        if 0 < self.num_workers and SECTION_VERSION <= self.__version:
+            self.__pool = concurrent.futures.ThreadPoolExecutor(self.num_workers)
+        return True
+
+    # shutdown the thread pool and recycle
+    def __close(self):
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+        self.__recycle()
+
+    # skip the index of the container
+    def __skipIndex(self):
+        num_entries = _INDEX_HEADER.unpack_from(self.__buffer, self.__offset)[0]
+        self.__offset += _INDEX_HEADER.size + _INDEX_ENTRY.size * num_entries
+
+        # offset of the index
+        self.__offset += 4
+
+    # read the structure of the entry from the whole binary data
+    def __getEntry(self, entry):
+        buffer = self.__buffer
+        offset = self.__offset
+        next_inst_id = self.__next_inst_id
+        self.__buffer = self.__source
+        self.__offset = entry.offset
+        self.__next_inst_id = entry.first_inst_id
+        try:
+            return self._getXModelStructure()
+        finally:
+            self.__buffer = buffer
+            self.__offset = offset
+            self.__next_inst_id = next_inst_id
+
+    # decode from binary, the source is a readable object or a bytes like object,
+    # a file is mapped to memory in lazy mode,
+    # it returns None if the binary isn't xModel, and raises ValueError if the binary is truncated
+    def decode(self, reader):
+        self.__recycle()
+        try:
+            if not self.__open(reader):
+                return None
+
+            # reading structure
+            structure = self._createStructureProcedure(self._getInt32())
+            self._getStructureProcedure(structure)
+            self.__resolveSections()
+
+            # index
+            if INDEX_VERSION <= self.__version and \
+                    structure.structure_type == XModelStructure.TYPE_CONTAINER:
+                self.__skipIndex()
+
+            # terminator
+            if self._getUint32() != END_OF_DATA:
+                warnings.warn("This data doesn't has a terminator in the binary!", RuntimeWarning, stacklevel=2)
+
+            return structure
+        except (struct.error, zlib.error) as error:
+            raise ValueError("the binary is truncated at %d bytes" % len(self.__source)) from error
+        finally:
+            self.__close()
+
+    # open the binary for random access, and return the index of the container,
+    # it returns None if the binary doesn't have the index,
+    # the structures in the arrays of the container are decoded by decodeEntry until close
+    def open(self, reader):
+        self.__close()
+        if not self.__open(reader) or self.__version < INDEX_VERSION:
+            self.__close()
+            return None
+
+        # offset of the index, it's ahead of the terminator
+        self.__offset = _UINT32.unpack_from(self.__source, len(self.__source) - 8)[0]
+
+        # number of entries and time rate
+        num_entries, time_rate = _INDEX_HEADER.unpack_from(self.__source, self.__offset)
+        self.__offset += _INDEX_HEADER.size
+        if num_entries <= 0:
+            self.__close()
+            return None
+
+        # entries
+        entries = [XModelIndexEntry(*_INDEX_ENTRY.unpack_from(self.__source,
+                                                              self.__offset + _INDEX_ENTRY.size * i))
+                   for i in range(num_entries)]
+        self.__index = XModelIndex(time_rate, entries)
+        return self.__index
+
+    # decode the structure in the array of the container opened for random access,
+    # the structures which it refers to are decoded together and shared between the calls
+    def decodeEntry(self, structure_type, index):
+        if self.__index is None:
+            raise ValueError("the binary isn't opened for random access")
+        entry = self.__index.find(structure_type, index)
+        if entry is None:
+            return None
+        value = self.__getEntry(entry)
+        self.__resolveSections()
+        return value
+
+    # close the binary opened for random access
+    def close(self):
+        self.__close()
+
+    # create structure for structure type
+    def _createStructureProcedure(self, structure_type):
+        procedure = self.__create_procedures.get(structure_type)
+        if procedure is None:
+            raise ValueError("unknown structure type: %d" % structure_type)
+        return procedure()
+
+    # read procedure for structure
+    def _getStructureProcedure(self, obj):
+        self.__get_procedures[obj.structure_type](obj)
+
+    # read user data
+    def _getUserData(self):
+        # data size
+        data_size = self._getInt32()
+        if data_size <= 0:
+            return None
+
+        obj = XModelUserData()
+        obj.data_size = data_size
+        # data
+        obj.data = self._getBytes(data_size)
+        return obj
+
+    # read axis rotate
+    def _getAxisRotate(self, obj):
+        # value
+        self._getFloat32Array(obj.values, 0, XModelStructure.SIZE_AXIS_ROTATE)
+
+    # read quaternion
+    def _getQuaternion(self, obj):
+        # value
+        self._getFloat32Array(obj.values, 0, XModelStructure.SIZE_QUATERNION)
+
+    # read scale
+    def _getScale(self, obj):
+        # value
+        self._getFloat32Array(obj.values, 0, XModelStructure.SIZE_SCALE)
+
+    # read translate
+    def _getTranslate(self, obj):
+        # value
+        self._getFloat32Array(obj.values, 0, XModelStructure.SIZE_TRANSLATE)
+
+    # read matrix
+    def _getMatrix(self, obj):
+        # value
+        self._getFloat32Array(obj.values, 0, XModelStructure.SIZE_MATRIX)
+
+    # read structure array of the container
+    def __getContainerArray(self, obj, structure_type):
+        length_name, array_name = _CONTAINER_ARRAY_NAMES[structure_type]
+        length = self._getUint16()
+        setattr(obj, length_name, length)
+        if 0 < length:
+            setattr(obj, array_name, self._getStructureArray(length))
+
+    # read container
+    def _getContainer(self, obj):
+        # name
+        obj.name = self._getString()
+
+        # textures, materials, meshs and nodes
+        structure_types = container_array_types(self.__version)
+        for structure_type in structure_types[:-1]:
+            self.__getContainerArray(obj, structure_type)
+
+        # time rate
+        obj.time_rate = self._getFloat64()
+
+        # animation set
+        self.__getContainerArray(obj, structure_types[-1])
+
+        # user data
+        obj.user_data = self._getUserData()
+
+    # read texture
+    def _getTexture(self, obj):
+        # name
+        obj.name = self._getString()
+
+        # reference identifier
+        obj.ref = self._getString()
+
+        # binary data
+        obj.data_size = self._getInt32()
+        if 0 < obj.data_size:
+            self.__getDataSection(obj, "data", self._getBytes, obj.data_size)
+
+        # user data
+        obj.user_data = self._getUserData()
+
+    # read material
+    def _getMaterial(self, obj):
+        # name
+        obj.name = self._getString()
+
+        # parameters
+        self._getFloat32Array(obj.emissive, 0, 4)
+        self._getFloat32Array(obj.ambient, 0, 4)
+        self._getFloat32Array(obj.diffuse, 0, 4)
+        self._getFloat32Array(obj.specular, 0, 4)
+        obj.shininess = self._getFloat32()
+        obj.bump = self._getFloat32()
+
+        # texture maps
+        obj.emissive_map = self._getXModelStructure()
+        obj.ambient_map = self._getXModelStructure()
+        obj.diffuse_map = self._getXModelStructure()
+        obj.specular_map = self._getXModelStructure()
+        obj.shininess_map = self._getXModelStructure()
+        obj.bump_map = self._getXModelStructure()
+
+        # draw mode
+        obj.draw_mode = self._getInt32()
+
+        # user data
+        obj.user_data = self._getUserData()
+
+    # read mesh
+    def _getMesh(self, obj):
+        # name
+        obj.name = self._getString()
+
+        # positions
+        obj.num_positions = self._getInt32()
+        if 0 < obj.num_positions:
+            obj.position_size = self._getInt8()
+            self.__getAttribute(obj, "positions", obj.position_size, obj.num_positions)
+
+        # normals
+        obj.num_normals = self._getInt32()
+        if 0 < obj.num_normals:
+            obj.normal_size = self._getInt8()
+            self.__getAttribute(obj, "normals", obj.normal_size, obj.num_normals)
+
+        # colors
+        obj.num_colors = self._getInt32()
+        if 0 < obj.num_colors:
+            obj.color_size = self._getInt8()
+            self.__getAttribute(obj, "colors", obj.color_size, obj.num_colors)
+
+        # texture coordinates
+        obj.num_tex_coords = self._getInt32()
+        if 0 < obj.num_tex_coords:
+            obj.tex_coord_size = self._getInt8()
+            self.__getAttribute(obj, "tex_coords", obj.tex_coord_size, obj.num_tex_coords)
+
+        # skin weights (inline)
+        has_skin_weight = self._getInt8()
+        if 0 < has_skin_weight:
+            obj.skin = XModelSkin()
+            self._getSkin(obj.skin)
+
+        # vertices (inline)
+        obj.num_vertices = self._getInt32()
+        if 0 < obj.num_vertices:
+            self.__getDataSection(obj,
+                                  "vertices",
+                                  self._getVertices,
+                                  obj.num_vertices,
+                                  obj.num_positions,
+                                  obj.num_normals,
+                                  obj.num_colors,
+                                  obj.num_tex_coords,
+                                  has_skin_weight)
+
+        # materials
+        obj.num_materials = self._getUint16()
+        if 0 < obj.num_materials:
+            obj.materials = self._getStructureArray(obj.num_materials)
+
+        # elements (inline)
+        obj.num_elements = self._getInt32()
+        if 0 < obj.num_elements:
+            self.__getDataSection(obj, "elements", self._getElements, obj.num_elements)
+
+        # triangulated faces
+        if TRIANGULATE_VERSION <= self.__version:
+            self._getFaces(obj)
+
+        # interleaved vertices
+        if INTERLEAVE_VERSION <= self.__version:
+            self._getInterleaved(obj)
+
+        # user data
+        obj.user_data = self._getUserData()
+
+    # read the triangulated faces of mesh
+    def _getFaces(self, obj):
+        # number of vertex indices
+        obj.num_face_indices = self._getInt32()
+        if obj.num_face_indices <= 0:
+            return
+
+        # size of vertex index and whether the faces are reversed
+        obj.face_index_size = self._getUint8()
+        obj.face_reversed = self._getBool()
+
+        # offsets and numbers of vertex indices of each material
+        obj.face_offsets = list(self.__getArray("i", 4, obj.num_materials + 1))
+        obj.face_sizes = list(self.__getArray("i", 4, obj.num_materials + 1))
+
+        # vertex indices
+        self.__getDataSection(obj,
+                              "face_indices",
+                              self.__getIndexBlock,
+                              obj.face_index_size,
+                              obj.num_face_indices)
+
+    # read the interleaved vertices of mesh
+    def _getInterleaved(self, obj):
+        # layout of vertex
+        obj.interleaved_stride = self._getInt16()
+        if obj.interleaved_stride <= 0:
+            return
+        obj.interleaved_types = list(self.__getArray("b", 1, MAX_ATTRIBUTE))
+        obj.interleaved_sizes = list(self.__getArray("b", 1, MAX_ATTRIBUTE))
+        obj.interleaved_offsets = list(self.__getArray("h", 2, MAX_ATTRIBUTE))
+
+        # vertices
+        self.__getDataSection(obj,
+                              "interleaved_vertices",
+                              self._getBytes,
+                              obj.interleaved_stride * obj.num_vertices)
+
+    # read 16bits or 32bits size unsigned integer array as new array,
+    # it's a view of the binary data in lazy mode
+    def __getIndexBlock(self, size, length):
+        value_format = "H" if size == 2 else "I"
+        end = self.__offset + size * length
+        if self.lazy and sys.byteorder == "little":
+            values = self.__buffer[self.__offset:end].cast(value_format)
+        else:
+            values = array.array(value_format)
+            values.frombytes(bytes(self.__buffer[self.__offset:end]))
+            if sys.byteorder != "little":
+                values.byteswap()
+        self.__offset = end
+        return values
+
+    # read attribute array of mesh, and set it to the attribute of mesh,
+    # the quantized values are dequantized to float numbers
+    def __getAttribute(self, obj, name, size, num):
+        # encoding
+        encoding = ENCODING_FLOAT32
+        if QUANTIZE_VERSION <= self.__version:
+            encoding = self._getUint8()
+
+        if encoding == ENCODING_FLOAT32:
+            self.__getDataSection(obj, name, self.__getFloat32Block, size * num)
+        else:
+            # parameters to dequantize
+            params = self.__getArray("f", 4, parameter_count(encoding, size))
+
+            # values
+            self.__getDataSection(obj, name, self.__getQuantizedBlock, encoding, params, size, num)
+
+    # read quantized attribute array as new array of float numbers
+    def __getQuantizedBlock(self, encoding, params, size, num):
+        end = self.__offset + encoded_size(encoding, size, num)
+        values = dequantize_attribute(self.__buffer[self.__offset:end], encoding, params, size, num)
+        self.__offset = end
+        return values
+
+    # read skin
+    def _getSkin(self, obj):
+        # number of weighted indices
+        obj.num_weighted_indices = self._getInt32()
+
+        # weighted index stride
+        obj.weighted_index_stride = self._getUint8()
+
+        # weighted indices
+        self.__getDataSection(obj,
+                              ("weighted_index_sizes", "indices", "weights"),
+                              self._getWeightedIndices,
+                              obj.num_weighted_indices,
+                              obj.weighted_index_stride)
+
+        # number of nodes
+        obj.num_nodes = self._getUint16()
+
+        if 0 < obj.num_nodes:
+            # nodes
+            obj.nodes = self._getStructureArray(obj.num_nodes)
+
+            # offset matrices
+            self.__getDataSection(obj,
+                                  "offset_matrices",
+                                  self.__getFloat32Block,
+                                  XModelStructure.SIZE_MATRIX * obj.num_nodes)
+
+    # read weighted indices of skin,
+    # and return a tuple of the sizes, the indices and the weights
+    def _getWeightedIndices(self, num_weighted_indices, weighted_index_stride):
+        if self.lazy:
+            array_size = weighted_index_stride * num_weighted_indices
+            values = _create_lazy_arrays((num_weighted_indices, array_size, array_size),
+                                         functools.partial(_unpack_first,
+                                                           _unpack_weighted_indices,
+                                                           self.__buffer,
+                                                           self.__offset,
+                                                           num_weighted_indices,
+                                                           weighted_index_stride))
+            self.__offset = _skip_weighted_indices(self.__buffer,
+                                                   self.__offset,
+                                                   num_weighted_indices)
+            return tuple(values)
+        values, self.__offset = _unpack_weighted_indices(self.__buffer,
+                                                         self.__offset,
+                                                         num_weighted_indices,
+                                                         weighted_index_stride)
+        return values
+
+    # read vertices
+    def _getVertices(self,
+                     num_vertices,
+                     has_position,
+                     has_normal,
+                     has_color,
+                     has_tex_coord,
+                     has_skin_weight):
+        flags = (has_position, has_normal, has_color, has_tex_coord, has_skin_weight)
+        offset = self.__offset
+        self.__offset += 4 * sum(1 for has in flags if 0 < has) * num_vertices
+        if self.lazy:
+            return XModelLazyArray(num_vertices,
+                                   functools.partial(_unpack_vertices,
+                                                     self.__buffer,
+                                                     offset,
+                                                     num_vertices,
+                                                     flags))
+        return _unpack_vertices(self.__buffer, offset, num_vertices, flags)
+
+    # read elements
+    def _getElements(self, num_elements):
+        offset = self.__offset
+        if self.lazy:
+            self.__offset = _skip_elements(self.__buffer, offset, num_elements)
+            return XModelLazyArray(num_elements,
+                                   functools.partial(_unpack_first,
+                                                     _unpack_elements,
+                                                     self.__buffer,
+                                                     offset,
+                                                     num_elements))
+        elements, self.__offset = _unpack_elements(self.__buffer, offset, num_elements)
+        return elements
+
+    # read node
+    def _getNode(self, obj):
+        # name
+        obj.name = self._getString()
+
+        # connected
+        obj.connected = self._getBool()
+
+        # inverse kinematics
+        self._getBoolArray(obj.ik_lock_axis, 0, XModelStructure.SIZE_VECTOR_3)
+        self._getBoolArray(obj.ik_limit_angle, 0, XModelStructure.SIZE_VECTOR_3)
+        self._getFloat32Array(obj.ik_min_angle, 0, XModelStructure.SIZE_VECTOR_3)
+        self._getFloat32Array(obj.ik_max_angle, 0, XModelStructure.SIZE_VECTOR_3)
+
+        # bone tail
+        self._getFloat32Array(obj.bone_tail, 0, XModelStructure.SIZE_VECTOR_3)
+
+        # transforms
+        obj.transforms = self._getStructureArray(XModelNode.NUM_TRANSFORMS)
+
+        # inverse kinematics
+        obj.num_inverse_kinematics = self._getUint16()
+        if 0 < obj.num_inverse_kinematics:
+            obj.inverse_kinematics = self._getStructureArray(obj.num_inverse_kinematics)
+
+        # meshs
+        obj.num_meshs = self._getUint16()
+        if 0 < obj.num_meshs:
+            obj.meshs = self._getStructureArray(obj.num_meshs)
+            for mesh in obj.meshs:
+                if mesh is not None:
+                    mesh.parent = weakref.proxy(obj)
+
+        # nodes
+        obj.num_children = self._getUint16()
+        if 0 < obj.num_children:
+            obj.children = self._getStructureArray(obj.num_children)
+            for child in obj.children:
+                if child is not None:
+                    child.parent = weakref.proxy(obj)
+
+        # user data
+        obj.user_data = self._getUserData()
+
+    # read kinematic
+    def _getKinematic(self, obj):
+        # target
+        obj.target = self._getXModelStructure()
+
+        # maxinum number of iterations
+        obj.max_iterations = self._getInt16()
+
+        # chain length
+        obj.chain_length = self._getInt16()
+
+        # influence
+        obj.influence = self._getFloat32()
+
+    # read animation
+    def _getAnimation(self, obj):
+        # name
+        obj.name = self._getString()
+
+        # target
+        obj.target = self._getXModelStructure()
+
+        # index
+        obj.index = self._getInt16()
+
+        # keys
+        obj.num_keys = self._getUint16()
+        if 0 < obj.num_keys:
+            obj.keys = self.__getSection(self._getStructureArray, obj.num_keys)
+
+        # sampled frames
+        if SAMPLE_VERSION <= self.__version:
+            obj.num_frames = self._getInt32()
+            if 0 < obj.num_frames:
+                obj.frame_start = self._getInt32()
+                obj.frame_size = self._getUint8()
+                self.__getAttribute(obj, "frames", obj.frame_size, obj.num_frames)
+
+        # animations
+        obj.num_children = self._getUint16()
+        if 0 < obj.num_children:
+            obj.children = self._getStructureArray(obj.num_children)
+
+        # user data
+        obj.user_data = self._getUserData()
+
+    # read animation key
+    def _getAnimationKey(self, obj):
+        # interpolate, time and value size
+        obj.interpolate, obj.time, obj.value_size = \
+            _ANIMATION_KEY_HEADER.unpack_from(self.__buffer, self.__offset)
+        self.__offset += _ANIMATION_KEY_HEADER.size
+
+        # value
+        if 0 < obj.value_size:
+            obj.value = list(self.__getArray("f", 4, obj.value_size))
+
+        # control points of the bezier key
+        if BEZIER_VERSION <= self.__version and obj.interpolate == XModelAnimationKey.INTERPOLATE_BEZIER:
+            obj.before_time = self._getFloat64()
+            obj.after_time = self._getFloat64()
+            if 0 < obj.value_size:
+                obj.before_value = list(self.__getArray("f", 4, obj.value_size))
+                obj.after_value = list(self.__getArray("f", 4, obj.value_size))
+
+    # read animation set
+    def _getAnimationSet(self, obj):
+        # name
+        obj.name = self._getString()
+
+        # animations
+        obj.num_animations = self._getUint16()
+        if 0 < obj.num_animations:
+            obj.animations = self._getStructureArray(obj.num_animations)
+
+        # user data
+        obj.user_data = self._getUserData()
@@ -29,8 +29,11 @@
 #
 
 import bpy
+import collections
 import weakref
 import math
+import multiprocessing
+import os
 
 from mathutils import Matrix, Vector
 from bpy.types import PoseBone
@@ -53,7 +56,49 @@ from io_scene_xm.types import (XModelStructure,
                                XModelAnimation,
                                XModelAnimationKey,
                                XModelAnimationSet)
-from io_scene_xm.code import XModelBinaryEncoder
+from io_scene_xm.code import XModelBinaryEncoder, container_array_types
+from io_scene_xm.quantize import XModelQuantization, ENCODINGS
+from io_scene_xm.texture import XModelTextureEmbedder
+from io_scene_xm.optimize import optimize_mesh_vertex_cache
+from io_scene_xm.palette import partition_mesh_skin
+from io_scene_xm.keyframe import (TRANSLATE_TOLERANCE,
+                                  ROTATE_TOLERANCE,
+                                  SCALE_TOLERANCE,
+                                  tolerance_of,
+                                  merge_channel_keys,
+                                  reduce_animation_keys,
+                                  sample_animation_frames)
+
+try:
+    from io_scene_xm.cache import (XModelMeshCache,
+                                   DEFAULT_CACHE_DIRECTORY,
+                                   DEFAULT_CACHE_SIZE)
+    from io_scene_xm.mesh import (snapshot_mesh,
+                                  build_mesh_data,
+                                  merge_mesh_data,
+                                  matrix_to_array,
+                                  create_mesh_pool)
+except ImportError:
+    # numpy isn't available, convert the mesh by python loops
+    XModelMeshCache = None
+    DEFAULT_CACHE_DIRECTORY = None
+    DEFAULT_CACHE_SIZE = None
+    snapshot_mesh = None
+    build_mesh_data = None
+    merge_mesh_data = None
+    matrix_to_array = None
+    create_mesh_pool = None
+
+# component indices of xModel axis rotate of the array indices of blender axis angle
+_AXIS_ROTATE_INDICES = (3, 0, 1, 2)
+
+# values of the components of the transforms which aren't animated
+_DEFAULT_TRANSFORM_VALUES = {
+    XModelStructure.TYPE_TRANSLATE: (0.0, 0.0, 0.0),
+    XModelStructure.TYPE_SCALE: (1.0, 1.0, 1.0),
+    XModelStructure.TYPE_QUATERNION: (1.0, 0.0, 0.0, 0.0),
+    XModelStructure.TYPE_AXIS_ROTATE: (0.0, 1.0, 0.0, 0.0)
+}
 
 
 # class that convert to xModel format from context.
@@ -67,7 +112,36 @@ class XModelExporter:
                  invert_face=True,
                  global_matrix=Matrix(),
                  export_bones=False,
-                 export_actions=False):
+                 export_actions=False,
+                 compact_mesh=False,
+                 num_workers=0,
+                 use_mesh_cache=False,
+                 mesh_cache_directory=DEFAULT_CACHE_DIRECTORY,
+                 mesh_cache_size=DEFAULT_CACHE_SIZE,
+                 stream_encode=False,
+                 compress_level=None,
+                 position_encoding="FLOAT32",
+                 normal_encoding="FLOAT32",
+                 color_encoding="FLOAT32",
+                 tex_coord_encoding="FLOAT32",
+                 indexed_layout=False,
+                 embed_textures=False,
+                 texture_max_size=0,
+                 texture_format="ORIGINAL",
+                 optimize_vertex_cache=False,
+                 triangulate_faces=False,
+                 interleave_vertices="NONE",
+                 skin_palette_size=0,
+                 skin_max_influences=4,
+                 skin_weight_threshold=0.0,
+                 reduce_keyframes=False,
+                 fit_bezier=False,
+                 translate_tolerance=TRANSLATE_TOLERANCE,
+                 rotate_tolerance=ROTATE_TOLERANCE,
+                 scale_tolerance=SCALE_TOLERANCE,
+                 group_channels=False,
+                 sample_frames="NONE",
+                 bake_pose=False):
         self.context = context
         self.filepath = filepath
         self.output_visible_mesh = output_visible_mesh
@@ -76,33 +150,123 @@ class XModelExporter:
         self.global_matrix = global_matrix
         self.export_bones = export_bones
         self.export_actions = export_actions
+        self.compact_mesh = compact_mesh
+        self.num_workers = num_workers
+        self.stream_encode = stream_encode
+        self.compress_level = compress_level
+        self.quantization = XModelQuantization.fromNames(position_encoding,
+                                                         normal_encoding,
+                                                         color_encoding,
+                                                         tex_coord_encoding)
+        self.indexed_layout = indexed_layout
+        self.triangulate_faces = triangulate_faces
+        self.interleave_vertices = interleave_vertices
+        self.texture_embedder = None
+        if embed_textures:
+            self.texture_embedder = XModelTextureEmbedder(num_workers,
+                                                          texture_max_size,
+                                                          texture_format)
+        self.quantization_stats = []
+        self.optimize_vertex_cache = optimize_vertex_cache
+        self.vertex_cache_stats = []
+        self.interleave_stats = []
+        self.skin_palette_size = skin_palette_size
+        self.skin_max_influences = skin_max_influences
+        self.skin_weight_threshold = skin_weight_threshold
+        self.palette_stats = []
+        self.reduce_keyframes = reduce_keyframes
+        self.fit_bezier = reduce_keyframes and fit_bezier
+        self.translate_tolerance = translate_tolerance
+        self.rotate_tolerance = rotate_tolerance
+        self.scale_tolerance = scale_tolerance
+        self.keyframe_stats = []
+        self.group_channels = group_channels
+        self.sample_encoding = ENCODINGS.get(sample_frames)
+        self.bake_pose = bake_pose
+        self.mesh_pool = None
+        self.pending_meshs = collections.OrderedDict()
+        self.warnings = []
+        self.mesh_cache = None
+        if use_mesh_cache and XModelMeshCache is not None:
+            self.mesh_cache = XModelMeshCache(mesh_cache_directory, mesh_cache_size)
         self.textures = {}
         self.materials = {}
         self.meshs = {}
         self.nodes = {}
         self.animation_sets = {}
+        self.driven_poses = {}
+        self.baked_poses = None
 
     # exporting to xModel format
     def encode(self):
-        self.__convertXModelContainer()
+        if self.stream_encode:
+            self.__encodeXModelContainerInStream()
+        else:
+            self.__convertXModelContainer()
         return {"FINISHED"}
 
+    # get the pairs of the level and the message of the warnings and the statistics of the export
+    def reports(self):
+        reports = [("WARNING", message) for message in self.warnings]
+        if self.mesh_cache is not None:
+            reports.append(("INFO", self.mesh_cache.report()))
+        if self.texture_embedder is not None:
+            reports.append(("INFO", self.texture_embedder.report()))
+        for stats in (self.quantization_stats +
+                      self.vertex_cache_stats +
+                      self.interleave_stats +
+                      self.palette_stats +
+                      self.keyframe_stats):
+            reports.append(("INFO", stats.report()))
+        return reports
+
+    # create the process pool for converting the meshes in parallel,
+    # the meshes are converted serially with a warning if the workers can't be spawned
+    def __createXModelMeshPool(self):
+        if 0 < self.num_workers and create_mesh_pool is not None:
+            self.mesh_pool = create_mesh_pool(self.num_workers,
+                                              getattr(bpy.app, "binary_path_python", None))
+            if self.mesh_pool is None:
+                self.warnings.append("Meshes are converted serially, the worker processes can't be spawned "
+                                     "because the start method of multiprocessing is already %s" %
+                                     multiprocessing.get_start_method())
+
     # convert the context to xModel container
     def __convertXModelContainer(self):
+        # create the process pool for converting the meshes in parallel
+        self.__createXModelMeshPool()
+
         # scan the scene objects
         objects = []
         root_meshs = []
         root_nodes = []
-        for obj in self.context.scene.objects:
-            if obj.type == "MESH":
-                if obj.is_visible(self.context.scene) and self.output_visible_mesh:
+        try:
+            for obj in self.context.scene.objects:
+                if obj.type == "MESH":
+                    if obj.is_visible(self.context.scene) and self.output_visible_mesh:
+                        objects.append(obj)
+                        mesh = self.__convertXModelMeshWithMesh(obj)
+                        root_meshs.append(mesh)
+                elif obj.type == "ARMATURE":
                     objects.append(obj)
-                    mesh = self.__convertXModelMeshWithMesh(obj)
-                    root_meshs.append(mesh)
-            elif obj.type == "ARMATURE":
-                objects.append(obj)
-                nodes = self.__convertXModelNodeWithArmature(obj)
-                root_nodes.append(nodes)
+                    nodes = self.__convertXModelNodeWithArmature(obj)
+                    root_nodes.append(nodes)
+
+            # gather the meshes converted by the process pool in order of the scene
+            for dest_mesh, (future, key) in self.pending_meshs.items():
+                self.__mergeXModelMeshData(future.result(), dest_mesh, key)
+        finally:
+            if self.mesh_pool is not None:
+                self.mesh_pool.shutdown()
+                self.mesh_pool = None
+            self.pending_meshs.clear()
+
+        # reorder the triangles and vertices of the meshes
+        for value in root_meshs:
+            self.__optimizeXModelMesh(value)
+
+        # embed the images of the textures
+        self.__embedXModelTextures()
 
         # create the container
         container = XModelContainer()
@@ -129,8 +293,11 @@ class XModelExporter:
         for key, value in self.meshs.items():
             if value.skin is not None:
                 self.__convertXModelSkinWithMesh(key, value.skin)
-        container.num_meshs = len(root_meshs)
-        container.meshs = root_meshs
+        meshs = []
+        for value in root_meshs:
+            meshs.extend(self.__partitionXModelMesh(value))
+        container.num_meshs = len(meshs)
+        container.meshs = meshs
 
         # build node
         container.num_nodes = len(root_nodes)
@@ -147,8 +314,16 @@ class XModelExporter:
 
         # encode to binary
         with open(self.filepath, "wb") as file:
-            encoder = XModelBinaryEncoder()
+            encoder = XModelBinaryEncoder(self.compress_level,
+                                          self.quantization,
+                                          self.indexed_layout,
+                                          self.triangulate_faces,
+                                          self.interleave_vertices,
+                                          self.fit_bezier,
+                                          self.sample_encoding)
             encoder.encode(container, file)
+            self.quantization_stats = encoder.quantization_stats
+            self.interleave_stats = encoder.interleave_stats
 
         # clean temporary dictionaries
         self.textures.clear()
@@ -159,6 +334,170 @@ class XModelExporter:
 
         return container
 
+    # convert the context to xModel container and encode it in streaming,
+    # each mesh and animation set is released after writing,
+    # so the peak memory is about the largest one of them instead of the sum of them.
+    def __encodeXModelContainerInStream(self):
+        # scan the scene objects, the materials and nodes are converted before the meshes
+        # because they are written ahead of the meshes and referred from the meshes
+        objects = []
+        mesh_objects = []
+        root_nodes = []
+        for obj in self.context.scene.objects:
+            if obj.type == "MESH":
+                if obj.is_visible(self.context.scene) and self.output_visible_mesh:
+                    objects.append(obj)
+                    mesh_objects.append(obj)
+                    for material in obj.data.materials:
+                        self.__convertXModelMaterial(material)
+            elif obj.type == "ARMATURE":
+                objects.append(obj)
+                nodes = self.__convertXModelNodeWithArmature(obj)
+                root_nodes.append(nodes)
+
+        # embed the images of the textures
+        self.__embedXModelTextures()
+
+        # create the process pool for converting the meshes in parallel
+        self.__createXModelMeshPool()
+
+        try:
+            with open(self.filepath, "wb") as file:
+                encoder = XModelBinaryEncoder(self.compress_level,
+                                              self.quantization,
+                                              self.indexed_layout,
+                                              self.triangulate_faces,
+                                              self.interleave_vertices,
+                                              self.fit_bezier,
+                                              self.sample_encoding)
+                encoder.beginContainer(file)
+
+                # textures
+                encoder.beginStructureArray(len(self.textures))
+                for value in self.textures.values():
+                    encoder.putStructure(value)
+                encoder.endStructureArray()
+
+                # materials
+                encoder.beginStructureArray(len(self.materials))
+                for value in self.materials.values():
+                    encoder.putStructure(value)
+                encoder.endStructureArray()
+
+                # meshs and nodes, the nodes are ahead of the meshs in the indexed layout
+                structure_types = container_array_types(encoder._getVersion())
+                if structure_types.index(XModelStructure.TYPE_NODE) < \
+                        structure_types.index(XModelStructure.TYPE_MESH):
+                    self.__encodeXModelNodesInStream(encoder, root_nodes)
+                    self.__encodeXModelMeshsInStream(encoder, mesh_objects)
+                else:
+                    self.__encodeXModelMeshsInStream(encoder, mesh_objects)
+                    self.__encodeXModelNodesInStream(encoder, root_nodes)
+
+                # time rate
+                encoder.putTimeRate(self.context.scene.render.fps /
+                                    self.context.scene.render.fps_base)
+
+                # animation sets
+                if self.export_actions:
+                    encoder.beginStructureArray(len(bpy.data.actions))
+                    for value in bpy.data.actions:
+                        animation_set = self.__convertXModelAnimationSetWithAction(value, objects)
+                        encoder.putStructure(animation_set, True)
+                        del self.animation_sets[value]
+                    encoder.endStructureArray()
+                else:
+                    encoder.beginStructureArray(0)
+                    encoder.endStructureArray()
+
+                encoder.endContainer()
+                self.quantization_stats = encoder.quantization_stats
+                self.interleave_stats = encoder.interleave_stats
+        finally:
+            if self.mesh_pool is not None:
+                self.mesh_pool.shutdown()
+                self.mesh_pool = None
+            self.pending_meshs.clear()
+
+            # clean temporary dictionaries
+            self.textures.clear()
+            self.materials.clear()
+            self.meshs.clear()
+            self.nodes.clear()
+            self.animation_sets.clear()
+
+    # write the meshs in streaming, they are converted ahead as many as the workers
+    # for keeping them busy
+    def __encodeXModelMeshsInStream(self, encoder, mesh_objects):
+        # the number of meshs is patched after writing if they are partitioned
+        if 0 < self.skin_palette_size:
+            encoder.beginStructureArray()
+        else:
+            encoder.beginStructureArray(len(mesh_objects))
+        converting = collections.deque()
+        for obj in mesh_objects:
+            converting.append((obj, self.__convertXModelMeshWithMesh(obj)))
+            if self.num_workers < len(converting):
+                self.__encodeXModelMeshInStream(encoder, *converting.popleft())
+        while 0 < len(converting):
+            self.__encodeXModelMeshInStream(encoder, *converting.popleft())
+        encoder.endStructureArray()
+
+    # write the root nodes in streaming
+    def __encodeXModelNodesInStream(self, encoder, root_nodes):
+        encoder.beginStructureArray(len(root_nodes))
+        for value in root_nodes:
+            encoder.putStructure(value)
+        encoder.endStructureArray()
+
+    # complete the mesh and write it in streaming, and release it
+    def __encodeXModelMeshInStream(self, encoder, obj, dest_mesh):
+        # merge the mesh converted by the process pool
+        if dest_mesh in self.pending_meshs:
+            future, key = self.pending_meshs.pop(dest_mesh)
+            self.__mergeXModelMeshData(future.result(), dest_mesh, key)
+
+        # reorder the triangles and vertices
+        self.__optimizeXModelMesh(dest_mesh)
+
+        # build the skin
+        if dest_mesh.skin is not None:
+            self.__convertXModelSkinWithMesh(obj, dest_mesh.skin)
+
+        for value in self.__partitionXModelMesh(dest_mesh):
+            encoder.putStructure(value, True)
+        del self.meshs[obj]
+
+    # reorder the triangles and vertices of the mesh for the vertex cache if it's enabled
+    def __optimizeXModelMesh(self, dest_mesh):
+        if self.optimize_vertex_cache:
+            self.vertex_cache_stats.append(optimize_mesh_vertex_cache(dest_mesh))
+
+    # split the skinned mesh into the submeshs by the matrix palettes if it's enabled,
+    # returns the meshs to be written
+    def __partitionXModelMesh(self, dest_mesh):
+        if self.skin_palette_size <= 0 or dest_mesh.skin is None:
+            return [dest_mesh]
+        submeshs, stats = partition_mesh_skin(dest_mesh,
+                                              self.skin_palette_size,
+                                              self.skin_max_influences,
+                                              self.skin_weight_threshold)
+        self.palette_stats.append(stats)
+        return submeshs
+
+    # sample the animation into the frames by the function to evaluate it if it's enabled,
+    # or reduce the keys of the animation within the tolerance of the target if it's enabled
+    def __reduceXModelAnimation(self, dest_animation, name, evaluate):
+        if self.sample_encoding is not None:
+            self.keyframe_stats.append(sample_animation_frames(dest_animation, evaluate, name))
+        elif self.reduce_keyframes and dest_animation.target is not None:
+            tolerance = tolerance_of(dest_animation.target,
+                                     self.translate_tolerance,
+                                     self.rotate_tolerance,
+                                     self.scale_tolerance)
+            self.keyframe_stats.append(
+                reduce_animation_keys(dest_animation, tolerance, self.fit_bezier, name))
+
     # convert the texture slot to xModel texture
     def __convertXModelTexture(self, texture):
         if texture in self.textures:
@@ -173,8 +512,45 @@ class XModelExporter:
         if texture.image is not None:
             dest_texture.ref = texture.image.filepath
 
+            # load the image for embedding
+            if self.texture_embedder is not None:
+                image = texture.image
+                if image.packed_file is not None:
+                    self.texture_embedder.add(dest_texture, image.packed_file.data, image)
+                elif image.filepath:
+                    path = bpy.path.abspath(image.filepath, library=image.library)
+                    self.texture_embedder.add(dest_texture,
+                                              path,
+                                              os.path.normcase(os.path.abspath(path)))
+
         return dest_texture
 
+    # embed the images of the textures, and merge the textures of the same image
+    def __embedXModelTextures(self):
+        if self.texture_embedder is None:
+            return
+
+        replaced = self.texture_embedder.finish()
+        if len(replaced) == 0:
+            return
+
+        # refer to the merged textures from the materials
+        for material in self.materials.values():
+            for name in ("emissive_map",
+                         "ambient_map",
+                         "diffuse_map",
+                         "specular_map",
+                         "shininess_map",
+                         "bump_map"):
+                texture = getattr(material, name)
+                if texture in replaced:
+                    setattr(material, name, replaced[texture])
+
+        # remove the merged textures
+        for key, value in list(self.textures.items()):
+            if value in replaced:
+                del self.textures[key]
+
     # convert the material to xModel material
     def __convertXModelMaterial(self, material):
         if material in self.materials:
@@ -275,6 +651,53 @@ class XModelExporter:
                                  self.use_mesh_modifiers,
                                  "PREVIEW")
 
+        if snapshot_mesh is not None:
+            snapshot = snapshot_mesh(work_mesh)
+
+            # reuse the mesh data converted by the previous exporting
+            key = None
+            if self.mesh_cache is not None:
+                key = self.mesh_cache.key(snapshot,
+                                          self.global_matrix,
+                                          self.invert_face,
+                                          self.compact_mesh,
+                                          self.use_mesh_modifiers)
+                cached = self.mesh_cache.get(key, self.compact_mesh)
+                if cached is not None:
+                    return merge_mesh_data(cached, dest_mesh)
+
+            if self.mesh_pool is not None:
+                # build in the worker process, the result is merged after scanning
+                future = self.mesh_pool.submit(build_mesh_data,
+                                               snapshot,
+                                               matrix_to_array(self.global_matrix),
+                                               self.invert_face,
+                                               self.compact_mesh)
+                self.pending_meshs[dest_mesh] = (future, key)
+                return dest_mesh
+            return self.__mergeXModelMeshData(build_mesh_data(snapshot,
+                                                              self.global_matrix,
+                                                              self.invert_face,
+                                                              self.compact_mesh),
+                                              dest_mesh,
+                                              key)
+        else:
+            self.__convertXModelMeshWithLoops(work_mesh, dest_mesh)
+
+        # convert to the compact arrays for reduce the working set
+        if self.compact_mesh:
+            dest_mesh.compact()
+
+        return dest_mesh
+
+    # merge the converted mesh data to xModel mesh, and store it to cache
+    def __mergeXModelMeshData(self, mesh_data, dest_mesh, key):
+        if key is not None:
+            self.mesh_cache.put(key, mesh_data)
+        return merge_mesh_data(mesh_data, dest_mesh)
+
+    # convert the work mesh to xModel mesh data by python loops
+    def __convertXModelMeshWithLoops(self, work_mesh, dest_mesh):
         # scan the vertices
         num_positions = 0
         positions = {}
@@ -460,8 +883,6 @@ class XModelExporter:
 
             dest_mesh.skin = dest_skin
 
-        return dest_mesh
-
     # convert the armature modifiers to xModel skin
     def __convertXModelSkinWithMesh(self, src_mesh, dest_skin):
         # build node and offset matrices and offset quaternions in xModel skin
@@ -533,22 +954,22 @@ class XModelExporter:
 
         node_matrix = self.global_matrix * armature.matrix_world
         dest_matrix = XModelMatrix()
-        dest_matrix.initial = [node_matrix[0][0],
-                               node_matrix[1][0],
-                               node_matrix[2][0],
-                               node_matrix[3][0],
-                               node_matrix[0][1],
-                               node_matrix[1][1],
-                               node_matrix[2][1],
-                               node_matrix[3][1],
-                               node_matrix[0][2],
-                               node_matrix[1][2],
-                               node_matrix[2][2],
-                               node_matrix[3][2],
-                               node_matrix[0][3],
-                               node_matrix[1][3],
-                               node_matrix[2][3],
-                               node_matrix[3][3]]
+        dest_matrix.values[0:16] = [node_matrix[0][0],
+                                     node_matrix[1][0],
+                                     node_matrix[2][0],
+                                     node_matrix[3][0],
+                                     node_matrix[0][1],
+                                     node_matrix[1][1],
+                                     node_matrix[2][1],
+                                     node_matrix[3][1],
+                                     node_matrix[0][2],
+                                     node_matrix[1][2],
+                                     node_matrix[2][2],
+                                     node_matrix[3][2],
+                                     node_matrix[0][3],
+                                     node_matrix[1][3],
+                                     node_matrix[2][3],
+                                     node_matrix[3][3]]
         dest_node.transforms[XModelNode.TRANSFORM_MATRIX] = dest_matrix
 
         # scan the root bones
@@ -587,22 +1008,22 @@ class XModelExporter:
         # node transform
         bone_matrix = invert_matrix * bone.matrix_local
         dest_matrix = XModelMatrix()
-        dest_matrix.initial = [bone_matrix[0][0],
-                               bone_matrix[1][0],
-                               bone_matrix[2][0],
-                               bone_matrix[3][0],
-                               bone_matrix[0][1],
-                               bone_matrix[1][1],
-                               bone_matrix[2][1],
-                               bone_matrix[3][1],
-                               bone_matrix[0][2],
-                               bone_matrix[1][2],
-                               bone_matrix[2][2],
-                               bone_matrix[3][2],
-                               bone_matrix[0][3],
-                               bone_matrix[1][3],
-                               bone_matrix[2][3],
-                               bone_matrix[3][3]]
+        dest_matrix.values[0:16] = [bone_matrix[0][0],
+                                     bone_matrix[1][0],
+                                     bone_matrix[2][0],
+                                     bone_matrix[3][0],
+                                     bone_matrix[0][1],
+                                     bone_matrix[1][1],
+                                     bone_matrix[2][1],
+                                     bone_matrix[3][1],
+                                     bone_matrix[0][2],
+                                     bone_matrix[1][2],
+                                     bone_matrix[2][2],
+                                     bone_matrix[3][2],
+                                     bone_matrix[0][3],
+                                     bone_matrix[1][3],
+                                     bone_matrix[2][3],
+                                     bone_matrix[3][3]]
         dest_node.transforms[XModelNode.TRANSFORM_MATRIX] = dest_matrix
         dest_node.transforms[XModelNode.TRANSFORM_TRANSLATE] = XModelTranslate()
         dest_node.transforms[XModelNode.TRANSFORM_SCALE] = XModelScale()
@@ -647,11 +1068,12 @@ class XModelExporter:
         dest_node.ik_max_angle[1] = pose.ik_max_y
         dest_node.ik_max_angle[2] = pose.ik_max_z
 
-        # scan the constraint
+        # scan the constraint, the inverse kinematics are dropped if they are baked into all of the animations
+        baked = pose in self.__getXModelPoseBonesBakedByActions()
         inverse_kinematics = []
         for constraint in pose.constraints:
             if constraint.type == "IK":
-                if constraint.target.type == "ARMATURE":
+                if not baked and constraint.target.type == "ARMATURE":
                     target_bone = constraint.target.data.bones[constraint.subtarget]
                     if target_bone in self.nodes:
                         dest_kinematic = XModelKinematic()
@@ -692,7 +1114,7 @@ class XModelExporter:
                 animations.extend(anims)
 
             elif obj.type == "ARMATURE":
-                anims = self.__convertXModelAnimationsWithArmature(obj, action)
+                anims = self.__convertXModelAnimationsWithArmature(obj, action, objects)
                 animations.extend(anims)
 
         dest_animation_set.num_animations = len(animations)
@@ -711,9 +1133,44 @@ class XModelExporter:
 
         return animations
 
+    # get the target and the component index of the pose bone property animated by the fcurve,
+    # returns None if the property isn't a transform
+    def __getXModelAnimationTarget(self, fcurve, pose_bone):
+        node = self.nodes[pose_bone.bone]
+
+        # case of the translate transform
+        if fcurve.data_path == pose_bone.path_from_id("location"):
+            return node.transforms[XModelNode.TRANSFORM_TRANSLATE], fcurve.array_index
+
+        # case of the scale transform
+        elif fcurve.data_path == pose_bone.path_from_id("scale"):
+            return node.transforms[XModelNode.TRANSFORM_SCALE], fcurve.array_index
+
+        # case of the quaternion transform
+        elif fcurve.data_path == pose_bone.path_from_id("rotation_quaternion"):
+            if not isinstance(node.transforms[XModelNode.TRANSFORM_ROTATE], XModelQuaternion):
+                node.transforms[XModelNode.TRANSFORM_ROTATE] = XModelQuaternion()
+            return node.transforms[XModelNode.TRANSFORM_ROTATE], fcurve.array_index
+
+        # case of the axis rotate transform, the angle is first in blender and last in xModel
+        elif fcurve.data_path == pose_bone.path_from_id("rotation_axis_angle"):
+            if not isinstance(node.transforms[XModelNode.TRANSFORM_ROTATE], XModelAxisRotate):
+                node.transforms[XModelNode.TRANSFORM_ROTATE] = XModelAxisRotate()
+            return node.transforms[XModelNode.TRANSFORM_ROTATE], _AXIS_ROTATE_INDICES[fcurve.array_index]
+
+        return None
+
     # convert the action with armature to xModel animations
-    def __convertXModelAnimationsWithArmature(self, armature, action):
+    def __convertXModelAnimationsWithArmature(self, armature, action, objects):
+        if self.bake_pose:
+            driven = self.__getXModelPoseBonesDrivenByAction(armature, action, objects)
+            poses = [pose for pose in armature.pose.bones if pose in driven and pose.bone in self.nodes]
+            if len(poses) == 0:
+                return []
+            return self.__bakeXModelAnimationsWithArmature(armature, action, poses)
+
         animations = []
+        channels = collections.OrderedDict()
         for fcurve in action.fcurves:
             try:
                 value = armature.path_resolve(fcurve.data_path, False)
@@ -723,45 +1180,226 @@ class XModelExporter:
             if value is not None:
                 if isinstance(value.data, PoseBone):
                     if value.data.bone in self.nodes:
-                        node = self.nodes[value.data.bone]
-                        dest_animation = XModelAnimation()
-
-                        # case of the translate transform
-                        if fcurve.data_path == value.data.path_from_id("location"):
-                            dest_animation.target = node.transforms[XModelNode.TRANSFORM_TRANSLATE]
-                            dest_animation.index = fcurve.array_index
-
-                        # case of the scale transform
-                        elif fcurve.data_path == value.data.path_from_id("scale"):
-                            dest_animation.target = node.transforms[XModelNode.TRANSFORM_SCALE]
-                            dest_animation.index = fcurve.array_index
-
-                        # case of the quaternion transform
-                        elif fcurve.data_path == value.data.path_from_id("rotation_quaternion"):
-                            if not isinstance(node.transforms[XModelNode.TRANSFORM_ROTATE], XModelQuaternion):
-                                node.transforms[XModelNode.TRANSFORM_ROTATE] = XModelQuaternion()
-                            dest_animation.target = node.transforms[XModelNode.TRANSFORM_ROTATE]
-                            dest_animation.index = fcurve.array_index
-
-                        # case of the axis rotate transform
-                        elif fcurve.data_path == value.data.path_from_id("rotation_axis_angle"):
-                            if not isinstance(node.transforms[XModelNode.TRANSFORM_ROTATE], XModelAxisRotate):
-                                node.transforms[XModelNode.TRANSFORM_ROTATE] = XModelAxisRotate()
-                            dest_animation.target = node.transforms[XModelNode.TRANSFORM_ROTATE]
-                            dest_animation.index = fcurve.array_index
-
-                        # scan the keys
-                        keys = []
-                        for keyframe in fcurve.keyframe_points:
-                            key = XModelAnimationKey()
-                            key.interpolate = XModelAnimationKey.INTERPOLATE_LINER
-                            key.time = keyframe.co[0]
-                            key.value_size = 1
-                            key.value = [keyframe.co[1]]
-                            keys.append(key)
-
-                        dest_animation.num_keys = len(keys)
-                        dest_animation.keys = keys
-                        animations.append(dest_animation)
+                        target = self.__getXModelAnimationTarget(fcurve, value.data)
+                        name = "%s %s" % (value.data.name, fcurve.data_path.rsplit(".", 1)[-1])
+
+                        # gather the fcurves of the components of the transform
+                        if self.group_channels and target is not None:
+                            if target[0] not in channels:
+                                channels[target[0]] = (name, [None] * target[0].size)
+                            times = [keyframe.co[0] for keyframe in fcurve.keyframe_points]
+                            values = [keyframe.co[1] for keyframe in fcurve.keyframe_points]
+                            channels[target[0]][1][target[1]] = (times, values, fcurve.evaluate)
+                            continue
+
+                        times = [keyframe.co[0] for keyframe in fcurve.keyframe_points]
+                        values = [keyframe.co[1] for keyframe in fcurve.keyframe_points]
+                        animations.append(self.__convertXModelAnimationWithChannel(
+                            target, "%s[%d]" % (name, fcurve.array_index), (times, values, fcurve.evaluate)))
+
+        animations.extend(self.__convertXModelAnimationsWithChannels(channels))
+        return animations
+
+    # convert the channel of a component to xModel animation,
+    # the channel is the tuple of the times and the values of the keys and the function to evaluate it
+    def __convertXModelAnimationWithChannel(self, target, name, channel):
+        dest_animation = XModelAnimation()
+        if target is not None:
+            dest_animation.target, dest_animation.index = target
+
+        # scan the keys
+        keys = []
+        for time, value in zip(channel[0], channel[1]):
+            key = XModelAnimationKey()
+            key.interpolate = XModelAnimationKey.INTERPOLATE_LINER
+            key.time = time
+            key.value_size = 1
+            key.value = [value]
+            keys.append(key)
+
+        dest_animation.num_keys = len(keys)
+        dest_animation.keys = keys
+        self.__reduceXModelAnimation(dest_animation, name, lambda time: [channel[2](time)])
+        return dest_animation
+
+    # convert the channels of the components of the transforms to xModel animations of the whole transforms,
+    # the keys of the components are merged and the components without keys are the defaults of blender
+    def __convertXModelAnimationsWithChannels(self, channels):
+        animations = []
+        for target, (name, components) in channels.items():
+            dest_animation = XModelAnimation()
+            dest_animation.target = target
+            dest_animation.index = -1
+            defaults = _DEFAULT_TRANSFORM_VALUES[target.structure_type]
+            keys = merge_channel_keys(components, defaults)
+            dest_animation.num_keys = len(keys)
+            dest_animation.keys = keys
+            self.__reduceXModelAnimation(dest_animation,
+                                         name,
+                                         lambda time, components=components, defaults=defaults:
+                                         [defaults[i] if component is None else component[2](time)
+                                          for i, component in enumerate(components)])
+            animations.append(dest_animation)
+
+        return animations
 
+    # get the pose bones of the armature which the fcurves of the action resolve to
+    def __getXModelPoseBonesKeyedByAction(self, armature, action):
+        keyed = set()
+        for fcurve in action.fcurves:
+            try:
+                value = armature.path_resolve(fcurve.data_path, False)
+            except ValueError:
+                value = None
+
+            if value is not None and isinstance(value.data, PoseBone):
+                keyed.add(value.data)
+
+        return keyed
+
+    # get the set of the pose bones of the armature whose local transforms are moved by the action,
+    # that are the keyed bones and the bones with the constraints which depend on the action,
+    # the constraints depend on the targets keyed in the exported objects or on the own bone and its parents,
+    # and the inverse kinematics move the parents of the bone up to the length of the chain
+    def __getXModelPoseBonesDrivenByAction(self, armature, action, objects):
+        key = (armature, action)
+        if key in self.driven_poses:
+            return self.driven_poses[key]
+
+        keyed = self.__getXModelPoseBonesKeyedByAction(armature, action)
+
+        # check whether the pose bone or the parents of it are keyed
+        def is_keyed(pose):
+            while pose is not None:
+                if pose in keyed:
+                    return True
+                pose = pose.parent
+            return False
+
+        # check whether the target of the constraint is moved by the action
+        def is_driven(target, subtarget):
+            if target is None:
+                return False
+            elif target == armature:
+                return is_keyed(armature.pose.bones[subtarget]) if subtarget else 0 < len(keyed)
+            elif target in objects:
+                return target.type != "ARMATURE" or 0 < len(self.__getXModelPoseBonesKeyedByAction(target, action))
+            return False
+
+        driven = set(keyed)
+        for pose in armature.pose.bones:
+            if len(pose.constraints) == 0:
+                continue
+
+            # the constraints are evaluated again if the bone, its parents or any of the targets move
+            moved = is_keyed(pose)
+            for constraint in pose.constraints:
+                moved = moved or is_driven(getattr(constraint, "target", None),
+                                           getattr(constraint, "subtarget", ""))
+                if constraint.type == "IK":
+                    moved = moved or is_driven(constraint.pole_target, constraint.pole_subtarget)
+
+            if moved:
+                driven.add(pose)
+                for constraint in pose.constraints:
+                    if constraint.type == "IK":
+                        parent = pose.parent
+                        length = 1
+                        while parent is not None and (constraint.chain_count == 0 or
+                                                      length < constraint.chain_count):
+                            driven.add(parent)
+                            parent = parent.parent
+                            length += 1
+
+        self.driven_poses[key] = driven
+        return driven
+
+    # get the set of the pose bones whose inverse kinematics are baked into every exported action,
+    # the inverse kinematics of the other bones are kept for the actions which leave them unbaked
+    # and for the chains posed by the static targets
+    def __getXModelPoseBonesBakedByActions(self):
+        if self.baked_poses is not None:
+            return self.baked_poses
+
+        self.baked_poses = set()
+        if self.bake_pose and self.export_actions and 0 < len(bpy.data.actions):
+            scene = self.context.scene
+            objects = [obj for obj in scene.objects
+                       if obj.type == "ARMATURE" or
+                       (obj.type == "MESH" and obj.is_visible(scene) and self.output_visible_mesh)]
+            baked = None
+            for action in bpy.data.actions:
+                driven = set()
+                for obj in objects:
+                    if obj.type == "ARMATURE":
+                        driven.update(self.__getXModelPoseBonesDrivenByAction(obj, action, objects))
+                baked = driven if baked is None else baked & driven
+            self.baked_poses = baked
+
+        return self.baked_poses
+
+    # bake the poses of the armature at each frame of the action into the animations of the transforms,
+    # the poses are evaluated with the constraints and the inverse kinematics by the scene,
+    # and the local transforms of the driven pose bones are captured at once for each frame
+    def __bakeXModelAnimationsWithArmature(self, armature, action, poses):
+        scene = self.context.scene
+        frame_start = int(math.floor(action.frame_range[0]))
+        frame_end = int(math.ceil(action.frame_range[1]))
+
+        # evaluate the poses with the action, the action and the frame are restored after baking
+        if armature.animation_data is None:
+            armature.animation_data_create()
+        current_action = armature.animation_data.action
+        current_frame = scene.frame_current
+        samples = [([], [], []) for pose in poses]
+        try:
+            armature.animation_data.action = action
+            for frame in range(frame_start, frame_end + 1):
+                scene.frame_set(frame)
+                for pose, (locations, rotations, scales) in zip(poses, samples):
+                    matrix = armature.convert_space(pose_bone=pose,
+                                                    matrix=pose.matrix,
+                                                    from_space="POSE",
+                                                    to_space="LOCAL")
+                    location, rotation, scale = matrix.decompose()
+
+                    # keep the quaternions in the same hemisphere as the previous one for interpolation
+                    if 0 < len(rotations) and rotation.dot(rotations[-1]) < 0.0:
+                        rotation.negate()
+                    locations.append(location)
+                    rotations.append(rotation)
+                    scales.append(scale)
+        finally:
+            armature.animation_data.action = current_action
+            scene.frame_set(current_frame)
+
+        # channels of the components of the transforms
+        times = [float(frame) for frame in range(frame_start, frame_end + 1)]
+        channels = collections.OrderedDict()
+        for pose, sample in zip(poses, samples):
+            node = self.nodes[pose.bone]
+            if not isinstance(node.transforms[XModelNode.TRANSFORM_ROTATE], XModelQuaternion):
+                node.transforms[XModelNode.TRANSFORM_ROTATE] = XModelQuaternion()
+            for transform, values, property_name in ((XModelNode.TRANSFORM_TRANSLATE, sample[0], "location"),
+                                                     (XModelNode.TRANSFORM_ROTATE, sample[1], "rotation"),
+                                                     (XModelNode.TRANSFORM_SCALE, sample[2], "scale")):
+                target = node.transforms[transform]
+                components = []
+                for i in range(target.size):
+                    component_values = [value[i] for value in values]
+                    components.append((times,
+                                       component_values,
+                                       lambda time, component_values=component_values:
+                                       component_values[min(max(int(round(time)) - frame_start, 0),
+                                                            len(component_values) - 1)]))
+                channels[target] = ("%s %s" % (pose.name, property_name), components)
+
+        if self.group_channels:
+            return self.__convertXModelAnimationsWithChannels(channels)
+        animations = []
+        for target, (name, components) in channels.items():
+            for i, component in enumerate(components):
+                animations.append(self.__convertXModelAnimationWithChannel((target, i),
+                                                                           "%s[%d]" % (name, i),
+                                                                           component))
         return animations
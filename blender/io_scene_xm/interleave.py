@@ -0,0 +1,236 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# Interleaved vertex buffer of mesh in the layout which the runtime uploads to the GPU directly.
+# This module doesn't depend on bpy and numpy.
+
+import struct
+
+from io_scene_xm.types import XModelVertexTable
+
+# modes to select the meshs whose vertices are interleaved
+# no mesh
+INTERLEAVE_NONE = "NONE"
+# meshs without skin, the runtime doesn't divide them by the bone palettes, so it uploads them directly
+INTERLEAVE_STATIC = "STATIC"
+# all meshs
+INTERLEAVE_ALL = "ALL"
+
+# modes of the interleaving
+INTERLEAVE_MODES = (INTERLEAVE_NONE, INTERLEAVE_STATIC, INTERLEAVE_ALL)
+
+# data types of the attributes, they are same as the types of xpl.XModelMeshUtils
+TYPE_VOID = 0
+TYPE_UNSIGNED_BYTE = 1
+TYPE_UNSIGNED_SHORT = 2
+TYPE_UNSIGNED_INT = 3
+TYPE_FLOAT = 4
+
+# attributes of the interleaved vertex,
+# they are in order of the attributes of xpl.XModelMeshUtils without the structure size
+ATTRIBUTE_POSITION = 0
+ATTRIBUTE_NORMAL = 1
+ATTRIBUTE_COLOR = 2
+ATTRIBUTE_TEXCOORD = 3
+ATTRIBUTE_BONELENGTH = 4
+ATTRIBUTE_BONEINDICES = 5
+ATTRIBUTE_BONEWEIGHTS = 6
+MAX_ATTRIBUTE = 7
+
+# alignment of the offsets of the attributes and the stride in bytes
+ALIGNMENT_SIZE = 4
+
+# pack formats and sizes of the data types, key is data type
+_TYPE_FORMATS = {TYPE_UNSIGNED_BYTE: ("B", 1),
+                 TYPE_UNSIGNED_SHORT: ("H", 2),
+                 TYPE_UNSIGNED_INT: ("I", 4),
+                 TYPE_FLOAT: ("f", 4)}
+
+
+# layout of the interleaved vertex
+class XModelInterleavedLayout:
+    # attributes of instance
+    __slots__ = ("stride",
+                 "types",
+                 "sizes",
+                 "offsets")
+
+    # initialize
+    def __init__(self):
+        # int16_t : size of a vertex in bytes
+        self.stride = 0
+        # int8_t[] : data type of each attribute
+        self.types = [TYPE_VOID] * MAX_ATTRIBUTE
+        # int8_t[] : number of the components of each attribute
+        self.sizes = [0] * MAX_ATTRIBUTE
+        # int16_t[] : offset of each attribute in the vertex, -1 if the vertex doesn't have it
+        self.offsets = [-1] * MAX_ATTRIBUTE
+
+    # add the attribute at the end of the vertex
+    def add(self, attribute, data_type, size):
+        self.types[attribute] = data_type
+        self.sizes[attribute] = size
+        self.offsets[attribute] = self.stride
+        self.stride += _TYPE_FORMATS[data_type][1] * size
+        self.stride = ALIGNMENT_SIZE * ((self.stride + ALIGNMENT_SIZE - 1) // ALIGNMENT_SIZE)
+
+    # get the pack format of a vertex, the attributes are added in order of the offsets
+    def format(self):
+        format = "<"
+        for attribute in range(MAX_ATTRIBUTE):
+            if 0 <= self.offsets[attribute]:
+                value_format, value_size = _TYPE_FORMATS[self.types[attribute]]
+                format += "%d%s" % (self.sizes[attribute], value_format)
+                padding = -value_size * self.sizes[attribute] % ALIGNMENT_SIZE
+                if 0 < padding:
+                    format += "%dx" % padding
+        return format
+
+
+# statistics of the interleaved vertices of a mesh
+class XModelInterleaveStats:
+    # attributes of instance
+    __slots__ = ("name",
+                 "num_vertices",
+                 "stride",
+                 "interleaved_size",
+                 "indexed_size")
+
+    # initialize
+    def __init__(self, name):
+        # string : mesh name
+        self.name = name
+        # int : number of vertices
+        self.num_vertices = 0
+        # int : size of a interleaved vertex in bytes
+        self.stride = 0
+        # int : size of the interleaved vertices in bytes
+        self.interleaved_size = 0
+        # int : size of the indexed attribute arrays and vertices in bytes, they are written anyway
+        self.indexed_size = 0
+
+    # get the statistics as a line of text
+    def report(self):
+        ratio = 100.0 * self.interleaved_size / self.indexed_size if 0 < self.indexed_size else 0.0
+        return ("%s: %d vertices, stride %d, %d bytes interleaved, %.1f%% of %d bytes indexed" %
+                (self.name, self.num_vertices, self.stride, self.interleaved_size, ratio, self.indexed_size))
+
+
+# whether the vertices of the mesh are interleaved in the mode
+def is_interleaved(mesh, mode):
+    if mode == INTERLEAVE_ALL:
+        return 0 < mesh.num_vertices
+    if mode == INTERLEAVE_STATIC:
+        return 0 < mesh.num_vertices and mesh.skin is None
+    return False
+
+
+# make the layout of the interleaved vertex of the mesh, it's same as the structured vertex
+# of the runtime, the colors are 8bits unsigned integers and the bone indices are 16bits ones
+def make_layout(mesh):
+    layout = XModelInterleavedLayout()
+    if 0 < mesh.num_positions and 0 < mesh.position_size:
+        layout.add(ATTRIBUTE_POSITION, TYPE_FLOAT, mesh.position_size)
+    if 0 < mesh.num_normals and 0 < mesh.normal_size:
+        layout.add(ATTRIBUTE_NORMAL, TYPE_FLOAT, mesh.normal_size)
+    if 0 < mesh.num_colors and 0 < mesh.color_size:
+        layout.add(ATTRIBUTE_COLOR, TYPE_UNSIGNED_BYTE, mesh.color_size)
+    if 0 < mesh.num_tex_coords and 0 < mesh.tex_coord_size:
+        layout.add(ATTRIBUTE_TEXCOORD, TYPE_FLOAT, mesh.tex_coord_size)
+    if mesh.skin is not None and 0 < mesh.skin.weighted_index_stride:
+        layout.add(ATTRIBUTE_BONEINDICES, TYPE_UNSIGNED_SHORT, mesh.skin.weighted_index_stride)
+        layout.add(ATTRIBUTE_BONEWEIGHTS, TYPE_FLOAT, mesh.skin.weighted_index_stride)
+    return layout
+
+
+# convert the component of color to 8bits unsigned integer as the typed array of the runtime does
+def _to_uint8(value):
+    if value != value or value in (float("inf"), float("-inf")):
+        return 0
+    return int(value * 255.0) & 0xff
+
+
+# get the components of the indexed attribute for each vertex, the components of the missing one are 0
+def _attribute_getter(values, size):
+    zeros = (0,) * size
+
+    def get(index):
+        if index < 0:
+            return zeros
+        return values[size * index:size * index + size]
+    return get
+
+
+# interleave the vertices of the mesh in the layout made by make_layout,
+# the attribute arrays are given as the values which are decoded by the runtime,
+# and returns the interleaved vertices as bytes
+def interleave_vertices(mesh, layout, positions, normals, colors, tex_coords):
+    vertex = struct.Struct(layout.format())
+    data = bytearray(layout.stride * mesh.num_vertices)
+
+    # pairs of the index in the key of vertex and the getter of the components
+    getters = []
+    if 0 <= layout.offsets[ATTRIBUTE_POSITION]:
+        getters.append((0, _attribute_getter(positions, mesh.position_size)))
+    if 0 <= layout.offsets[ATTRIBUTE_NORMAL]:
+        getters.append((1, _attribute_getter(normals, mesh.normal_size)))
+    if 0 <= layout.offsets[ATTRIBUTE_COLOR]:
+        getters.append((2, _attribute_getter([_to_uint8(value) for value in colors], mesh.color_size)))
+    if 0 <= layout.offsets[ATTRIBUTE_TEXCOORD]:
+        getters.append((3, _attribute_getter(tex_coords, mesh.tex_coord_size)))
+
+    # bone indices and weights, they are filled with 0 after the weighted indices
+    skin = mesh.skin if 0 <= layout.offsets[ATTRIBUTE_BONEINDICES] else None
+    if skin is not None:
+        skin_stride = skin.weighted_index_stride
+        skin_zeros = (0,) * skin_stride
+
+    vertices = mesh.vertices
+    if isinstance(vertices, XModelVertexTable):
+        keys = vertices.keys()
+    else:
+        keys = (vertex_value.key() for vertex_value in vertices)
+    for i, key in zip(range(mesh.num_vertices), keys):
+        values = []
+        for position, get in getters:
+            values.extend(get(key[position]))
+        if skin is not None:
+            if 0 <= key[4]:
+                length = skin.weighted_index_sizes[key[4]]
+                offset = skin_stride * key[4]
+                values.extend(0xffff & index for index in skin.indices[offset:offset + length])
+                values.extend(skin_zeros[length:])
+                values.extend(skin.weights[offset:offset + length])
+                values.extend(skin_zeros[length:])
+            else:
+                values.extend(skin_zeros)
+                values.extend(skin_zeros)
+        vertex.pack_into(data, layout.stride * i, *values)
+    return bytes(data)
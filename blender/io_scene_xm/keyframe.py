@@ -0,0 +1,483 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# Reduction of the animation keys, the redundant linear keys are removed within the tolerance
+# and the remaining segments are optionally fitted by the cubic bezier curves,
+# and sampling of the animations into the frames at the time rate.
+# This module doesn't depend on bpy, the errors are measured against the source keys
+# interpolated linearly as the runtime does.
+
+import bisect
+import math
+
+from io_scene_xm.types import (XModelStructure,
+                               XModelAnimationKey)
+
+# default tolerances of each type of the target transform, in the units of the values
+TRANSLATE_TOLERANCE = 0.001
+ROTATE_TOLERANCE = 0.0005
+SCALE_TOLERANCE = 0.001
+
+# types of the target transform of each tolerance
+TRANSLATE_TYPES = (XModelStructure.TYPE_TRANSLATE,)
+ROTATE_TYPES = (XModelStructure.TYPE_QUATERNION, XModelStructure.TYPE_AXIS_ROTATE)
+SCALE_TYPES = (XModelStructure.TYPE_SCALE,)
+
+# number of the iterations to solve the parameter of the bezier curve at the time
+_BEZIER_ITERATIONS = 16
+
+
+# statistics of the reduction of an animation channel
+class XModelKeyframeStats:
+    # attributes of instance
+    __slots__ = ("name",
+                 "tolerance",
+                 "num_source_keys",
+                 "num_keys",
+                 "num_bezier_keys",
+                 "num_frames",
+                 "max_error")
+
+    # initialize
+    def __init__(self, name, tolerance):
+        # string : channel name
+        self.name = name
+        # float : tolerance of the error
+        self.tolerance = tolerance
+        # int : number of keys before reduction
+        self.num_source_keys = 0
+        # int : number of keys after reduction
+        self.num_keys = 0
+        # int : number of the bezier keys after reduction
+        self.num_bezier_keys = 0
+        # int : number of the sampled frames which replace the keys
+        self.num_frames = 0
+        # float : maximum error of the reduced keys at the times of the source keys
+        self.max_error = 0.0
+
+    # get the statistics as a line of text
+    def report(self):
+        if 0 < self.num_frames:
+            return "%s: %d keys -> %d frames" % (self.name, self.num_source_keys, self.num_frames)
+        text = ("%s: %d -> %d keys, max error %.6g (tolerance %.6g)" %
+                (self.name, self.num_source_keys, self.num_keys, self.max_error, self.tolerance))
+        if 0 < self.num_bezier_keys:
+            text += ", %d bezier keys" % self.num_bezier_keys
+        return text
+
+
+# get the tolerance for the target structure of animation from the tolerances of each type
+def tolerance_of(target,
+                 translate=TRANSLATE_TOLERANCE,
+                 rotate=ROTATE_TOLERANCE,
+                 scale=SCALE_TOLERANCE):
+    structure_type = target.structure_type if target is not None else None
+    if structure_type in TRANSLATE_TYPES:
+        return translate
+    if structure_type in ROTATE_TYPES:
+        return rotate
+    if structure_type in SCALE_TYPES:
+        return scale
+    return min(translate, rotate, scale)
+
+
+# get the value of the source keys interpolated linearly at the time, the times are ascending
+def _linear_value(times, values, first, last, time):
+    if time <= times[first]:
+        return values[first]
+    for i in range(first + 1, last + 1):
+        if time <= times[i]:
+            span = times[i] - times[i - 1]
+            rate = (time - times[i - 1]) / span if 0.0 < span else 1.0
+            return values[i - 1] * (1.0 - rate) + values[i] * rate
+    return values[last]
+
+
+# interpolate the vectors spherically as the runtime does,
+# the directions are interpolated spherically and the lengths are interpolated linearly
+def _slerp(v1, v2, rate):
+    len1 = math.sqrt(sum(v * v for v in v1))
+    len2 = math.sqrt(sum(v * v for v in v2))
+    n1 = [v / len1 for v in v1] if 0.0 < len1 else list(v1)
+    n2 = [v / len2 for v in v2] if 0.0 < len2 else list(v2)
+    cs = sum(a * b for a, b in zip(n1, n2))
+    if 1.0 <= cs:
+        length = len1 * (1.0 - rate) + len2 * rate
+        return [v * length for v in n1]
+    if cs <= -1.0:
+        length = len1 * (1.0 - rate) - len2 * rate
+        return [v * length for v in n1]
+    length = len1 * (1.0 - rate) + len2 * rate
+    rad = math.acos(cs)
+    sn = math.sin(rad)
+    sn1 = math.sin(rad * (1.0 - rate)) / sn
+    sn2 = math.sin(rad * rate) / sn
+    return [(a * sn1 + b * sn2) * length for a, b in zip(n1, n2)]
+
+
+# interpolate the values of the keys of the whole target as the runtime does,
+# the quaternions are interpolated spherically, and the axes of the axis rotations are too
+def interpolate_values(structure_type, start, end, rate):
+    if structure_type == XModelStructure.TYPE_QUATERNION:
+        return _slerp(start, end, rate)
+    if structure_type == XModelStructure.TYPE_AXIS_ROTATE:
+        return _slerp(start[0:3], end[0:3], rate) + [start[3] * (1.0 - rate) + end[3] * rate]
+    return [a * (1.0 - rate) + b * rate for a, b in zip(start, end)]
+
+
+# merge the keys of the channels of each component into the keys of the vector on the common timeline,
+# each channel is the tuple of the times, the values and the function to evaluate it at the time,
+# or None if the component isn't animated and it's the default value
+def merge_channel_keys(channels, defaults):
+    times = sorted(set(time for channel in channels if channel is not None for time in channel[0]))
+    samples = []
+    for channel in channels:
+        if channel is not None:
+            samples.append(dict(zip(channel[0], channel[1])))
+        else:
+            samples.append(None)
+
+    keys = []
+    for time in times:
+        key = XModelAnimationKey()
+        key.interpolate = XModelAnimationKey.INTERPOLATE_LINER
+        key.time = time
+        key.value_size = len(channels)
+        key.value = [defaults[i] if channel is None else
+                     samples[i][time] if time in samples[i] else
+                     channel[2](time)
+                     for i, channel in enumerate(channels)]
+        keys.append(key)
+    return keys
+
+
+# select the keys by Ramer-Douglas-Peucker algorithm, the error of the removed key is
+# the distance in value from the line between the selected keys,
+# the source keys are linear, so the maximum error is at the source keys,
+# if interpolate is not None, the values are vectors interpolated by it,
+# and the error is the maximum of the components,
+# returns the indices of the selected keys in ascending order
+def reduce_linear_keys(times, values, tolerance, interpolate=None):
+    num = len(times)
+    if num <= 2:
+        return list(range(num))
+    selected = [False] * num
+    selected[0] = selected[num - 1] = True
+    stack = [(0, num - 1)]
+    while 0 < len(stack):
+        first, last = stack.pop()
+        span = times[last] - times[first]
+        max_error = -1.0
+        split = -1
+        for i in range(first + 1, last):
+            rate = (times[i] - times[first]) / span if 0.0 < span else 0.0
+            error = _linear_error(values, first, last, i, rate, interpolate)
+            if max_error < error:
+                max_error = error
+                split = i
+        if tolerance < max_error:
+            selected[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return [i for i in range(num) if selected[i]]
+
+
+# get the error of the source key from the line between the selected keys
+def _linear_error(values, first, last, index, rate, interpolate):
+    if interpolate is None:
+        return abs(values[first] * (1.0 - rate) + values[last] * rate - values[index])
+    value = interpolate(values[first], values[last], rate)
+    return max(abs(a - b) for a, b in zip(value, values[index]))
+
+
+# evaluate the cubic bezier curve of 4 control points at the parameter
+def _bezier(p0, p1, p2, p3, s):
+    r = 1.0 - s
+    return r * r * r * p0 + 3.0 * r * r * s * p1 + 3.0 * r * s * s * p2 + s * s * s * p3
+
+
+# get the value of the segment between the keys at the time, the segment is linear
+# unless the start key is bezier and the end key has the control point,
+# the parameter of the curve at the time is solved by Newton's method with bisection,
+# it's same as the runtime
+def bezier_value(start, end, time):
+    t0, t1, t2, t3 = start.time, start.after_time, end.before_time, end.time
+    if t3 <= t0:
+        return start.value[0]
+    if start.interpolate != XModelAnimationKey.INTERPOLATE_BEZIER or \
+            start.after_value is None or end.before_value is None:
+        rate = (time - t0) / (t3 - t0)
+        return start.value[0] * (1.0 - rate) + end.value[0] * rate
+    low, high = 0.0, 1.0
+    s = (time - t0) / (t3 - t0)
+    for _ in range(_BEZIER_ITERATIONS):
+        error = _bezier(t0, t1, t2, t3, s) - time
+        if abs(error) < 1e-9 * (t3 - t0):
+            break
+        if 0.0 < error:
+            high = s
+        else:
+            low = s
+        r = 1.0 - s
+        slope = 3.0 * (r * r * (t1 - t0) + 2.0 * r * s * (t2 - t1) + s * s * (t3 - t2))
+        s = s - error / slope if 0.0 < slope else 0.5 * (low + high)
+        if s <= low or high <= s:
+            s = 0.5 * (low + high)
+    return _bezier(start.value[0], start.after_value[0], end.before_value[0], end.value[0], s)
+
+
+# fit the bezier segment to the source keys between first and last by least squares,
+# the control times are at the thirds of the segment, so the time is linear in the parameter,
+# returns the control values and the maximum error at the source keys and their middle times
+def _fit_segment(times, values, first, last):
+    t0 = times[first]
+    span = times[last] - t0
+    p0 = values[first]
+    p3 = values[last]
+
+    # normal equations of the inner control values
+    a11 = a12 = a22 = b1 = b2 = 0.0
+    for i in range(first + 1, last):
+        s = (times[i] - t0) / span
+        r = 1.0 - s
+        c1 = 3.0 * r * r * s
+        c2 = 3.0 * r * s * s
+        rest = values[i] - r * r * r * p0 - s * s * s * p3
+        a11 += c1 * c1
+        a12 += c1 * c2
+        a22 += c2 * c2
+        b1 += c1 * rest
+        b2 += c2 * rest
+    det = a11 * a22 - a12 * a12
+    if abs(det) < 1e-12:
+        p1 = p0 + (p3 - p0) / 3.0
+        p2 = p3 - (p3 - p0) / 3.0
+    else:
+        p1 = (b1 * a22 - b2 * a12) / det
+        p2 = (a11 * b2 - a12 * b1) / det
+
+    # error at the source keys and the middle of them
+    max_error = 0.0
+    for i in range(first, last):
+        for time in (times[i], 0.5 * (times[i] + times[i + 1])):
+            s = (time - t0) / span
+            value = _linear_value(times, values, i, i + 1, time)
+            max_error = max(max_error, abs(_bezier(p0, p1, p2, p3, s) - value))
+    return p1, p2, max_error
+
+
+# select the bezier segments greedily, each segment is extended as long as it fits in the tolerance,
+# the extension is searched by doubling and bisection,
+# returns the list of the first index, the last index and the control values of each segment
+def fit_bezier_keys(times, values, tolerance):
+    num = len(times)
+    segments = []
+    first = 0
+    while first < num - 1:
+        # the next key always fits, the segment is linear
+        best = (first + 1,) + _fit_segment(times, values, first, first + 1)[0:2]
+        step = 1
+        low = first + 1
+        high = None
+        while high is None:
+            last = min(first + 2 * step, num - 1)
+            if last <= low:
+                break
+            p1, p2, error = _fit_segment(times, values, first, last)
+            if error <= tolerance:
+                best = (last, p1, p2)
+                low = last
+                step *= 2
+            else:
+                high = last
+        while high is not None and low + 1 < high:
+            last = (low + high) // 2
+            p1, p2, error = _fit_segment(times, values, first, last)
+            if error <= tolerance:
+                best = (last, p1, p2)
+                low = last
+            else:
+                high = last
+        segments.append((first,) + best)
+        first = best[0]
+    return segments
+
+
+# make the linear key of the values
+def _linear_key(time, value):
+    key = XModelAnimationKey()
+    key.interpolate = XModelAnimationKey.INTERPOLATE_LINER
+    key.time = time
+    key.value_size = len(value)
+    key.value = list(value)
+    return key
+
+
+# get the size of the keys in bytes, the bezier key has the control points
+def _keys_size(num_linear, num_bezier):
+    return 15 * num_linear + 39 * num_bezier
+
+
+# reduce the keys of the animation within the tolerance,
+# the keys are replaced if they are reduced, and the bezier segments are used
+# if fit_bezier is true and they are smaller than the linear keys,
+# the keys of the whole target are reduced as they are interpolated by the runtime,
+# but they aren't fitted by the bezier curves,
+# returns the statistics of the reduction
+def reduce_animation_keys(animation, tolerance, fit_bezier=False, name=None):
+    stats = XModelKeyframeStats(name if name is not None else animation.name, tolerance)
+    stats.num_source_keys = animation.num_keys
+    stats.num_keys = animation.num_keys
+    keys = animation.keys
+    if animation.num_keys <= 2:
+        return stats
+    value_size = keys[0].value_size
+    if value_size <= 0 or any(key.value_size != value_size for key in keys[0:animation.num_keys]):
+        return stats
+
+    times = [key.time for key in keys[0:animation.num_keys]]
+    interpolate = None
+    if value_size == 1:
+        values = [key.value[0] for key in keys[0:animation.num_keys]]
+    else:
+        values = [list(key.value[0:value_size]) for key in keys[0:animation.num_keys]]
+        structure_type = animation.target.structure_type if animation.target is not None else None
+        interpolate = (lambda start, end, rate:
+                       interpolate_values(structure_type, start, end, rate))
+
+    # linear keys
+    selected = reduce_linear_keys(times, values, tolerance, interpolate)
+    reduced = [_linear_key(times[i], values[i] if interpolate is not None else [values[i]])
+               for i in selected]
+    max_error = 0.0
+    for j in range(len(selected) - 1):
+        first = selected[j]
+        last = selected[j + 1]
+        span = times[last] - times[first]
+        for i in range(first + 1, last):
+            rate = (times[i] - times[first]) / span if 0.0 < span else 0.0
+            max_error = max(max_error, _linear_error(values, first, last, i, rate, interpolate))
+
+    # bezier keys, the control values of the segment are in the start and end keys
+    if fit_bezier and interpolate is None:
+        segments = fit_bezier_keys(times, values, tolerance)
+        curved = [segment[0] + 1 < segment[1] for segment in segments]
+        num_bezier = sum(1 for j in range(len(segments) + 1)
+                         if (0 < j and curved[j - 1]) or (j < len(segments) and curved[j]))
+        if _keys_size(len(segments) + 1 - num_bezier, num_bezier) < _keys_size(len(reduced), 0):
+            fitted = [_linear_key(times[segment[0]], [values[segment[0]]]) for segment in segments]
+            fitted.append(_linear_key(times[-1], [values[-1]]))
+            max_error = 0.0
+            for j, (first, last, p1, p2) in enumerate(segments):
+                start = fitted[j]
+                end = fitted[j + 1]
+                span = times[last] - times[first]
+                if curved[j]:
+                    max_error = max(max_error, _fit_segment(times, values, first, last)[2])
+                else:
+                    # the handles on the line at the thirds keep the segment linear
+                    p1 = values[first] + (values[last] - values[first]) / 3.0
+                    p2 = values[last] - (values[last] - values[first]) / 3.0
+                start.after_time = times[first] + span / 3.0
+                start.after_value = [p1]
+                end.before_time = times[last] - span / 3.0
+                end.before_value = [p2]
+            for j, key in enumerate(fitted):
+                if (0 < j and curved[j - 1]) or (j < len(segments) and curved[j]):
+                    key.interpolate = XModelAnimationKey.INTERPOLATE_BEZIER
+                    if key.before_value is None:
+                        key.before_time = key.time
+                        key.before_value = list(key.value)
+                    if key.after_value is None:
+                        key.after_time = key.time
+                        key.after_value = list(key.value)
+                else:
+                    key.before_time = key.after_time = 0
+                    key.before_value = key.after_value = None
+            reduced = fitted
+            stats.num_bezier_keys = num_bezier
+
+    animation.num_keys = len(reduced)
+    animation.keys = reduced
+    stats.num_keys = len(reduced)
+    stats.max_error = max_error
+    return stats
+
+
+# get the values of the keys of the animation at the time as the runtime interpolates them,
+# times are the times of the keys
+def evaluate_animation_keys(animation, time, times=None):
+    keys = animation.keys
+    if times is None:
+        times = [key.time for key in keys[0:animation.num_keys]]
+    index = bisect.bisect_right(times, time)
+    if index <= 0:
+        return list(keys[0].value)
+    if animation.num_keys <= index:
+        return list(keys[animation.num_keys - 1].value)
+    start = keys[index - 1]
+    end = keys[index]
+    if start.value_size == 1:
+        return [bezier_value(start, end, time)]
+    rate = (time - start.time) / (end.time - start.time)
+    structure_type = animation.target.structure_type if animation.target is not None else None
+    return interpolate_values(structure_type, list(start.value), list(end.value), rate)
+
+
+# sample the animation at the frames from the first key to the last key and replace the keys by them,
+# evaluate is the function to get the values at the frame,
+# or None if the keys are evaluated as the runtime interpolates them,
+# returns the statistics of the sampling
+def sample_animation_frames(animation, evaluate=None, name=None):
+    stats = XModelKeyframeStats(name if name is not None else animation.name, 0.0)
+    stats.num_source_keys = animation.num_keys
+    stats.num_keys = animation.num_keys
+    if animation.num_keys <= 0:
+        return stats
+
+    keys = animation.keys
+    if evaluate is None:
+        times = [key.time for key in keys[0:animation.num_keys]]
+        evaluate = lambda time: evaluate_animation_keys(animation, time, times)
+    frame_start = int(math.floor(keys[0].time))
+    frame_end = int(math.ceil(keys[animation.num_keys - 1].time))
+    frames = []
+    for frame in range(frame_start, frame_end + 1):
+        frames.extend(evaluate(frame))
+
+    animation.frame_start = frame_start
+    animation.num_frames = frame_end - frame_start + 1
+    animation.frame_size = len(frames) // animation.num_frames
+    animation.frames = frames
+    animation.num_keys = 0
+    animation.keys = None
+    stats.num_keys = 0
+    stats.num_frames = animation.num_frames
+    return stats
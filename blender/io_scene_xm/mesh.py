@@ -0,0 +1,504 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# Vectorized conversion of the mesh data to xModel mesh.
+# This module doesn't depend on bpy except for the objects given to snapshot_mesh,
+# so the conversion can be run in a worker process or with a fake mesh.
+
+import array
+import multiprocessing
+import numpy
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from io_scene_xm.types import (XModelMesh,
+                               XModelSkin,
+                               XModelVertex,
+                               XModelVertexTable,
+                               XModelElement)
+
+# names of the index columns of vertex
+_VERTEX_COLUMNS = ("position", "normal", "color", "tex_coord", "skin_weight")
+
+# names of the attributes of xModel mesh which are built by build_mesh
+_MESH_DATA_ATTRIBUTES = ("num_positions", "position_size", "positions",
+                         "num_normals", "normal_size", "normals",
+                         "num_colors", "color_size", "colors",
+                         "num_tex_coords", "tex_coord_size", "tex_coords",
+                         "skin",
+                         "num_vertices", "vertices",
+                         "num_elements", "elements")
+
+
+# raw arrays of a mesh taken from blender
+class XModelMeshSnapshot:
+    # attributes of instance
+    __slots__ = ("positions",
+                 "normals",
+                 "skin_weights",
+                 "loop_starts",
+                 "loop_totals",
+                 "material_indices",
+                 "loop_vertices",
+                 "colors",
+                 "tex_coords")
+
+    # initialize
+    def __init__(self):
+        # float32_t[num_vertices, 3] : vertex positions
+        self.positions = None
+        # float32_t[num_vertices, 3] : vertex normals
+        self.normals = None
+        # tuple[num_vertices] : pairs of group index and weight of each vertex
+        self.skin_weights = None
+
+        # int32_t[num_polygons] : first loop index of each polygon
+        self.loop_starts = None
+        # int32_t[num_polygons] : number of loops of each polygon
+        self.loop_totals = None
+        # int32_t[num_polygons] : material index of each polygon
+        self.material_indices = None
+
+        # int32_t[num_loops] : vertex index of each loop
+        self.loop_vertices = None
+        # float32_t[num_loops, n] : active vertex colors of each loop, or None
+        self.colors = None
+        # float32_t[num_loops, 2] : active texture coordinates of each loop, or None
+        self.tex_coords = None
+
+
+# read the float vector attribute of the collection into array
+def _foreach_get_float(collection, attribute, size):
+    values = numpy.empty(len(collection) * size, dtype=numpy.float32)
+    collection.foreach_get(attribute, values)
+    return values.reshape(-1, size)
+
+
+# read the integer attribute of the collection into array
+def _foreach_get_int(collection, attribute):
+    values = numpy.empty(len(collection), dtype=numpy.int32)
+    collection.foreach_get(attribute, values)
+    return values
+
+
+# take the raw arrays from the blender mesh data
+def snapshot_mesh(mesh):
+    snapshot = XModelMeshSnapshot()
+
+    # vertices
+    snapshot.positions = _foreach_get_float(mesh.vertices, "co", 3)
+    snapshot.normals = _foreach_get_float(mesh.vertices, "normal", 3)
+    snapshot.skin_weights = [tuple((group.group, group.weight)
+                                   for group in vertex.groups
+                                   if 0.0 < group.weight)
+                             for vertex in mesh.vertices]
+
+    # polygons
+    snapshot.loop_starts = _foreach_get_int(mesh.polygons, "loop_start")
+    snapshot.loop_totals = _foreach_get_int(mesh.polygons, "loop_total")
+    snapshot.material_indices = _foreach_get_int(mesh.polygons, "material_index")
+
+    # loops
+    snapshot.loop_vertices = _foreach_get_int(mesh.loops, "vertex_index")
+
+    if mesh.vertex_colors.active is not None:
+        data = mesh.vertex_colors.active.data
+        size = len(data[0].color) if 0 < len(data) else 3
+        snapshot.colors = _foreach_get_float(data, "color", size)
+
+    if mesh.uv_layers.active is not None:
+        snapshot.tex_coords = _foreach_get_float(mesh.uv_layers.active.data, "uv", 2)
+
+    return snapshot
+
+
+# limit of range of the combined keys of the columns
+_KEY_RANGE_LIMIT = 1 << 62
+
+
+# number the values densely, and return the numbers with the number of unique values
+def _dense_ids(values):
+    if numpy.issubdtype(values.dtype, numpy.integer):
+        minimum = int(values.min())
+        return values.astype(numpy.int64) - minimum, int(values.max()) - minimum + 1
+    unique, inverse = numpy.unique(values, return_inverse=True)
+    return inverse.reshape(-1), len(unique)
+
+
+# get the unique rows in order of first appearance,
+# and return indices of first appearance and index of unique row for each row.
+# rows are compared by value as same as the tuple keys of dictionary.
+def unique_rows(values):
+    num_rows = len(values)
+    if num_rows == 0:
+        return (numpy.zeros(0, dtype=numpy.int64),
+                numpy.zeros(0, dtype=numpy.int64))
+    values = values.reshape(num_rows, -1)
+
+    # combine the columns to the one integer key
+    keys = numpy.zeros(num_rows, dtype=numpy.int64)
+    key_range = 1
+    for column in values.T:
+        ids, size = _dense_ids(column)
+        if _KEY_RANGE_LIMIT <= key_range * size:
+            keys, key_range = _dense_ids(numpy.unique(keys, return_inverse=True)[1])
+        keys = keys * size + ids
+        key_range *= size
+
+    # renumber the keys in order of first appearance
+    unused, firsts, inverse = numpy.unique(keys, return_index=True, return_inverse=True)
+    order = numpy.argsort(firsts, kind="stable")
+    rank = numpy.empty_like(order)
+    rank[order] = numpy.arange(len(order))
+    return firsts[order], rank[inverse.reshape(-1)]
+
+
+# transform the vectors by the matrix in the same arithmetic as mathutils,
+# products in single precision and the sum of them in double precision
+def transform_vectors(matrix, vectors, translate):
+    num_rows = 3
+    result = numpy.empty((len(vectors), num_rows), dtype=numpy.float32)
+    for row in range(num_rows):
+        dot = numpy.zeros(len(vectors), dtype=numpy.float64)
+        for col in range(vectors.shape[1]):
+            dot += matrix[row, col] * vectors[:, col]
+        if translate:
+            dot += matrix[row, 3] * numpy.float32(1.0)
+        result[:, row] = dot
+    return result
+
+
+# convert the array to array.array of type code, or None if it's None
+def _to_array(type_code, values):
+    if values is None:
+        return None
+    return array.array(type_code, values.astype(type_code).tobytes())
+
+
+# convert the array to list, or None if it's None
+def _to_list(values):
+    if values is None:
+        return None
+    return values.tolist()
+
+
+# convert the matrix like object to array
+def matrix_to_array(matrix):
+    return numpy.array([[value for value in row] for row in matrix], dtype=numpy.float32)
+
+
+# build the xModel mesh data from snapshot,
+# if compact is true, arrays are built in the compact representations directly
+def build_mesh(snapshot, dest_mesh, global_matrix, invert_face, compact=False):
+    global_matrix = matrix_to_array(global_matrix)
+
+    # positions and normals, in order of first appearance in the vertices
+    position_firsts, position_indices = unique_rows(snapshot.positions)
+    normal_firsts, normal_indices = unique_rows(snapshot.normals)
+
+    # skin weights, in order of first appearance in the vertices
+    skin_weights = {}
+    skin_weight_stride = 0
+    skin_weight_indices = numpy.empty(len(snapshot.skin_weights), dtype=numpy.int64)
+    for i, skin_weight in enumerate(snapshot.skin_weights):
+        index = skin_weights.get(skin_weight)
+        if index is None:
+            index = len(skin_weights)
+            skin_weights[skin_weight] = index
+            skin_weight_stride = max(skin_weight_stride, len(skin_weight))
+        skin_weight_indices[i] = index
+    num_skin_weights = len(skin_weights)
+
+    # loops in order of polygons
+    loop_totals = snapshot.loop_totals.astype(numpy.int64)
+    loop_offsets = numpy.cumsum(loop_totals) - loop_totals
+    num_loops = int(loop_totals.sum())
+    loop_order = (numpy.arange(num_loops, dtype=numpy.int64) +
+                  numpy.repeat(snapshot.loop_starts - loop_offsets, loop_totals))
+    loop_vertices = snapshot.loop_vertices[loop_order]
+
+    # colors and texture coordinates, in order of first appearance in the loops
+    if snapshot.colors is not None:
+        unused, color_indices = unique_rows(snapshot.colors)
+        color_indices = color_indices[loop_order]
+    else:
+        color_indices = numpy.full(num_loops, -1, dtype=numpy.int64)
+
+    num_tex_coords = 0
+    tex_coords = None
+    if snapshot.tex_coords is not None:
+        tex_coord_firsts, tex_coord_indices = unique_rows(snapshot.tex_coords)
+        num_tex_coords = len(tex_coord_firsts)
+        tex_coords = snapshot.tex_coords[tex_coord_firsts]
+        tex_coord_indices = tex_coord_indices[loop_order]
+    else:
+        tex_coord_indices = numpy.full(num_loops, -1, dtype=numpy.int64)
+
+    if 0 < num_skin_weights:
+        loop_skin_weights = skin_weight_indices[loop_vertices]
+    else:
+        loop_skin_weights = numpy.full(num_loops, -1, dtype=numpy.int64)
+
+    # vertices, in order of first appearance in the polygons
+    vertex_keys = numpy.column_stack((position_indices[loop_vertices],
+                                      normal_indices[loop_vertices],
+                                      color_indices,
+                                      tex_coord_indices,
+                                      loop_skin_weights))
+    vertex_firsts, vertex_indices = unique_rows(vertex_keys)
+    vertex_keys = vertex_keys[vertex_firsts]
+
+    # reverse the vertex order in each polygon
+    if invert_face and 0 < num_loops:
+        local = numpy.arange(num_loops, dtype=numpy.int64) - numpy.repeat(loop_offsets, loop_totals)
+        vertex_indices = vertex_indices[numpy.repeat(loop_offsets + loop_totals - 1, loop_totals) - local]
+
+    # build xModel elements
+    vertex_indices = vertex_indices.tolist()
+    elements = []
+    for material, offset, total in zip(snapshot.material_indices.tolist(),
+                                       loop_offsets.tolist(),
+                                       loop_totals.tolist()):
+        element = XModelElement()
+        element.material = material
+        element.num_vertices = total
+        element.vertices = vertex_indices[offset:offset + total]
+        elements.append(element)
+    dest_mesh.num_elements = len(elements)
+    dest_mesh.elements = elements
+
+    # build xModel vertices
+    dest_mesh.num_vertices = len(vertex_keys)
+    if compact:
+        dest_mesh.vertices = XModelVertexTable()
+        for name, column in zip(_VERTEX_COLUMNS, vertex_keys.T):
+            setattr(dest_mesh.vertices, name, _to_array("i", column.astype(numpy.int32)))
+    else:
+        dest_mesh.vertices = []
+        for position, normal, color, tex_coord, skin_weight in zip(*(column.tolist()
+                                                                      for column in vertex_keys.T)):
+            vertex = XModelVertex()
+            vertex.position = position
+            vertex.normal = normal
+            vertex.color = color
+            vertex.tex_coord = tex_coord
+            vertex.skin_weight = skin_weight
+            dest_mesh.vertices.append(vertex)
+
+    # build xModel positions
+    dest_mesh.num_positions = len(position_firsts)
+    if 0 < dest_mesh.num_positions:
+        dest_mesh.position_size = 3
+        dest_mesh.positions = transform_vectors(global_matrix,
+                                                snapshot.positions[position_firsts],
+                                                True).reshape(-1)
+
+    # build xModel normals
+    dest_mesh.num_normals = len(normal_firsts)
+    if 0 < dest_mesh.num_normals:
+        dest_mesh.normal_size = 3
+        dest_mesh.normals = transform_vectors(global_matrix,
+                                              snapshot.normals[normal_firsts],
+                                              False).reshape(-1)
+
+    # build xModel colors
+    dest_mesh.num_colors = 0
+
+    # build xModel texture coordinates
+    dest_mesh.num_tex_coords = num_tex_coords
+    if 0 < dest_mesh.num_tex_coords:
+        dest_mesh.tex_coord_size = 2
+        values = tex_coords.astype(numpy.float64)
+        values[:, 1] = 1.0 - values[:, 1]
+        dest_mesh.tex_coords = values.reshape(-1)
+
+    # build indices and weights in xModel skin
+    if 0 < num_skin_weights:
+        dest_skin = XModelSkin()
+        dest_skin.num_weighted_indices = num_skin_weights
+        dest_skin.weighted_index_stride = skin_weight_stride
+        dest_skin.weighted_index_sizes = [0] * dest_skin.num_weighted_indices
+
+        array_size = dest_skin.weighted_index_stride * dest_skin.num_weighted_indices
+        dest_skin.indices = [-1] * array_size
+        dest_skin.weights = [0.0] * array_size
+
+        for key, value in skin_weights.items():
+            size = len(key)
+            dest_skin.weighted_index_sizes[value] = size
+            for i in range(size):
+                index = dest_skin.weighted_index_stride * value + i
+                dest_skin.indices[index] = key[i][0]
+                dest_skin.weights[index] = key[i][1]
+
+        dest_mesh.skin = dest_skin
+
+    # convert the number arrays
+    if compact:
+        dest_mesh.positions = _to_array("f", dest_mesh.positions)
+        dest_mesh.normals = _to_array("f", dest_mesh.normals)
+        dest_mesh.tex_coords = _to_array("f", dest_mesh.tex_coords)
+        if dest_mesh.skin is not None:
+            dest_mesh.skin.compact()
+    else:
+        dest_mesh.positions = _to_list(dest_mesh.positions)
+        dest_mesh.normals = _to_list(dest_mesh.normals)
+        dest_mesh.tex_coords = _to_list(dest_mesh.tex_coords)
+
+    return dest_mesh
+
+
+# build the xModel mesh data from snapshot in the worker process,
+# the name and materials of result mesh are left empty
+def build_mesh_data(snapshot, global_matrix, invert_face, compact=False):
+    return build_mesh(snapshot, XModelMesh(), global_matrix, invert_face, compact)
+
+
+# copy the mesh data built by the worker process to the destination mesh
+def merge_mesh_data(src_mesh, dest_mesh):
+    for name in _MESH_DATA_ATTRIBUTES:
+        setattr(dest_mesh, name, getattr(src_mesh, name))
+    return dest_mesh
+
+
+# pack the mesh data built by build_mesh into the flat arrays for storing,
+# it's faster to store and restore than the structures of each vertex and element
+def pack_mesh_data(mesh):
+    packed = {}
+    for name in _MESH_DATA_ATTRIBUTES:
+        packed[name] = getattr(mesh, name)
+
+    # number arrays
+    for name in ("positions", "normals", "colors", "tex_coords"):
+        if isinstance(packed[name], list):
+            packed[name] = array.array("f", packed[name])
+
+    # vertices
+    if mesh.vertices is not None:
+        vertices = mesh.vertices
+        if not isinstance(vertices, XModelVertexTable):
+            vertices = XModelVertexTable.fromVertices(vertices)
+        packed["vertices"] = tuple(getattr(vertices, name) for name in _VERTEX_COLUMNS)
+
+    # elements
+    if mesh.elements is not None:
+        packed["elements"] = (array.array("h", [element.material for element in mesh.elements]),
+                              array.array("B", [element.num_vertices for element in mesh.elements]),
+                              array.array("i", [index
+                                                for element in mesh.elements
+                                                for index in element.vertices]))
+
+    # skin
+    if mesh.skin is not None:
+        skin = XModelSkin()
+        skin.num_weighted_indices = mesh.skin.num_weighted_indices
+        skin.weighted_index_stride = mesh.skin.weighted_index_stride
+        skin.weighted_index_sizes = mesh.skin.weighted_index_sizes
+        skin.indices = mesh.skin.indices
+        skin.weights = mesh.skin.weights
+        skin.compact()
+        packed["skin"] = skin
+
+    return packed
+
+
+# restore the mesh data from the packed arrays,
+# if compact is true, arrays are restored in the compact representations
+def unpack_mesh_data(packed, compact=False):
+    mesh = XModelMesh()
+    for name in _MESH_DATA_ATTRIBUTES:
+        setattr(mesh, name, packed[name])
+
+    # vertices
+    if mesh.vertices is not None:
+        if compact:
+            mesh.vertices = XModelVertexTable()
+            for name, column in zip(_VERTEX_COLUMNS, packed["vertices"]):
+                setattr(mesh.vertices, name, column)
+        else:
+            mesh.vertices = []
+            for position, normal, color, tex_coord, skin_weight in zip(*packed["vertices"]):
+                vertex = XModelVertex()
+                vertex.position = position
+                vertex.normal = normal
+                vertex.color = color
+                vertex.tex_coord = tex_coord
+                vertex.skin_weight = skin_weight
+                mesh.vertices.append(vertex)
+
+    # elements
+    if mesh.elements is not None:
+        materials, sizes, indices = packed["elements"]
+        indices = indices.tolist()
+        mesh.elements = []
+        offset = 0
+        for material, size in zip(materials.tolist(), sizes.tolist()):
+            element = XModelElement()
+            element.material = material
+            element.num_vertices = size
+            element.vertices = indices[offset:offset + size]
+            mesh.elements.append(element)
+            offset += size
+
+    # convert the number arrays
+    if not compact:
+        mesh.positions = _to_list(mesh.positions)
+        mesh.normals = _to_list(mesh.normals)
+        mesh.colors = _to_list(mesh.colors)
+        mesh.tex_coords = _to_list(mesh.tex_coords)
+        if mesh.skin is not None:
+            mesh.skin.weighted_index_sizes = mesh.skin.weighted_index_sizes.tolist()
+            mesh.skin.indices = mesh.skin.indices.tolist()
+            mesh.skin.weights = mesh.skin.weights.tolist()
+
+    return mesh
+
+
+# create the process pool for building the mesh data,
+# the workers are spawned with the given python executable if it's specified,
+# returns None if the workers can't be spawned, then the mesh data has to be built serially
+def create_mesh_pool(num_workers, executable=None):
+    if sys.version_info < (3, 7):
+        # mp_context isn't supported before python 3.7, so the start method and the executable
+        # are set for the whole process, the workers mustn't be forked from blender,
+        # so the pool isn't created if the other start method has already been chosen
+        start_method = multiprocessing.get_start_method(allow_none=True)
+        if start_method is None:
+            multiprocessing.set_start_method("spawn")
+        elif start_method != "spawn":
+            return None
+        if executable is not None:
+            multiprocessing.set_executable(executable)
+        return ProcessPoolExecutor(num_workers)
+
+    context = multiprocessing.get_context("spawn")
+    if executable is not None:
+        context.set_executable(executable)
+    return ProcessPoolExecutor(num_workers, mp_context=context)
@@ -0,0 +1,584 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+# Optimization of xModel mesh, it's the counterpart of xpl.XModelOptimizeUtils of the runtime.
+# This module doesn't depend on bpy, the vertex cache optimization can be run on the exported files.
+#
+# usage: python3 -m io_scene_xm.optimize [options] <input file> [-o <output file>]
+
+import argparse
+import array
+import io
+import math
+import operator
+import sys
+
+import numpy
+
+from io_scene_xm.types import (XModelElement,
+                               XModelVertexTable)
+
+# size of the post-transform vertex cache which is assumed by the optimization and analysis
+VERTEX_CACHE_SIZE = 16
+
+# threshold of ACMR of the cluster to split it for reducing overdraw,
+# the lower value keeps the more vertex cache locality
+OVERDRAW_THRESHOLD = 0.75
+
+# get the key of the vertex, it's same as XModelVertex.key but it's made without calling python
+_vertex_key = operator.attrgetter("position", "normal", "color", "tex_coord", "skin_weight")
+
+# names of the index columns of XModelVertexTable
+_VERTEX_COLUMNS = ("position", "normal", "color", "tex_coord", "skin_weight")
+
+
+# get the map from the old vertex index to the new one and the old indices of the kept vertices
+# by hashing the tuples of indices, the new indices are numbered in the order of the first appearance
+def _unique_vertex_keys(keys):
+    unique = {}
+    remap = [unique.setdefault(key, len(unique)) for key in keys]
+
+    # the first one of the same vertices is kept, it's scattered in the reverse order
+    first = [0] * len(unique)
+    for index, new_index in zip(range(len(remap) - 1, -1, -1), reversed(remap)):
+        first[new_index] = index
+    return remap, first
+
+
+# get the map from the old vertex index to the new one and the old indices of the kept vertices
+# by sorting the rows of the index columns, it gives the same result as _unique_vertex_keys
+# without creating the tuples of indices
+def _unique_vertex_rows(columns):
+    # the stable sort keeps the first one of the same rows in front
+    order = numpy.lexsort(columns[::-1])
+    rows = numpy.column_stack(columns)[order]
+    heads = numpy.empty(len(rows), dtype=bool)
+    heads[0:1] = True
+    numpy.any(rows[1:] != rows[:-1], axis=1, out=heads[1:])
+    groups = numpy.empty(len(rows), dtype=numpy.int64)
+    groups[order] = numpy.cumsum(heads) - 1
+
+    # renumber the groups in the order of the first appearance
+    first = order[heads]
+    appearance = numpy.argsort(first)
+    ranks = numpy.empty_like(appearance)
+    ranks[appearance] = numpy.arange(len(appearance))
+    return ranks[groups].tolist(), first[appearance]
+
+
+# merge the vertices of the same indices in the mesh, and renumber the vertex indices of elements,
+# returns the number of the removed vertices
+def optimize_mesh_vertices(mesh):
+    if mesh.num_vertices <= 0 or mesh.vertices is None:
+        return 0
+
+    # map from the old vertex index to the new one, and build the vertices of the kept indices,
+    # the columns of the table are gathered by numpy, the vertex structures are keyed by the tuples
+    if isinstance(mesh.vertices, XModelVertexTable):
+        columns = [numpy.frombuffer(getattr(mesh.vertices, name), dtype=numpy.int32)
+                   for name in _VERTEX_COLUMNS]
+        remap, first = _unique_vertex_rows(columns)
+        if len(first) == mesh.num_vertices:
+            return 0
+        vertices = XModelVertexTable()
+        for name, column in zip(_VERTEX_COLUMNS, columns):
+            setattr(vertices, name, array.array("i", column[first].tobytes()))
+    else:
+        remap, first = _unique_vertex_keys(map(_vertex_key, mesh.vertices))
+        if len(first) == mesh.num_vertices:
+            return 0
+        vertices = list(map(mesh.vertices.__getitem__, first))
+
+    # renumber the vertex indices of elements
+    if mesh.elements is not None:
+        for element in mesh.elements:
+            if element.vertices is not None:
+                element.vertices = [remap[index] for index in element.vertices]
+
+    removed = mesh.num_vertices - len(first)
+    mesh.num_vertices = len(first)
+    mesh.vertices = vertices
+    return removed
+
+
+# remove the elements of the same material and vertex indices in the mesh,
+# returns the number of the removed elements
+def optimize_mesh_elements(mesh):
+    if mesh.num_elements <= 0 or mesh.elements is None:
+        return 0
+
+    found = set()
+    elements = []
+    for element in mesh.elements:
+        if element not in found:
+            found.add(element)
+            elements.append(element)
+
+    removed = mesh.num_elements - len(elements)
+    mesh.num_elements = len(elements)
+    mesh.elements = elements
+    return removed
+
+
+# statistics of the vertex cache optimization of a mesh
+class XModelVertexCacheStats:
+    # attributes of instance
+    __slots__ = ("name",
+                 "cache_size",
+                 "num_triangles",
+                 "num_vertices",
+                 "num_clusters",
+                 "acmr_before",
+                 "atvr_before",
+                 "acmr_after",
+                 "atvr_after")
+
+    # initialize
+    def __init__(self, name, cache_size):
+        # string : mesh name
+        self.name = name
+        # int : size of the simulated vertex cache
+        self.cache_size = cache_size
+        # int : number of triangles
+        self.num_triangles = 0
+        # int : number of the vertices which are referred by the triangles
+        self.num_vertices = 0
+        # int : number of the clusters which are sorted for reducing overdraw
+        self.num_clusters = 0
+        # float : average cache miss ratio per triangle before the optimization
+        self.acmr_before = 0.0
+        # float : average transformed vertices ratio per vertex before the optimization
+        self.atvr_before = 0.0
+        # float : average cache miss ratio per triangle after the optimization
+        self.acmr_after = 0.0
+        # float : average transformed vertices ratio per vertex after the optimization
+        self.atvr_after = 0.0
+
+    # get the statistics as a line of text
+    def report(self):
+        return ("%s: %d triangles, %d vertices, %d clusters, ACMR %.3f -> %.3f, ATVR %.3f -> %.3f" %
+                (self.name,
+                 self.num_triangles,
+                 self.num_vertices,
+                 self.num_clusters,
+                 self.acmr_before,
+                 self.acmr_after,
+                 self.atvr_before,
+                 self.atvr_after))
+
+
+# simulate the FIFO vertex cache on the vertex indices of triangles,
+# returns the ACMR (cache misses per triangle) and the ATVR (cache misses per referred vertex)
+def analyze_vertex_cache(indices, cache_size=VERTEX_CACHE_SIZE):
+    # the vertex is in the cache if it's pushed in the last cache size misses
+    pushed = {}
+    misses = 0
+    for index in indices:
+        if cache_size < misses - pushed.get(index, -cache_size - 1):
+            pushed[index] = misses
+            misses += 1
+    num_triangles = len(indices) // 3
+    return (misses / num_triangles if 0 < num_triangles else 0.0,
+            misses / len(pushed) if 0 < len(pushed) else 0.0)
+
+
+# triangulate the elements in the drawing order of the runtime,
+# the elements are grouped by the materials and the polygons are divided into the fans,
+# returns the list of the pairs of material and vertex indices of the triangles,
+# and the list of the elements which aren't polygons
+def _triangulate(mesh):
+    groups = {}
+    others = []
+    for element in mesh.elements:
+        if element.num_vertices < 3 or element.vertices is None:
+            others.append(element)
+            continue
+        indices = groups.setdefault(element.material, [])
+        vertices = element.vertices
+        first = vertices[0]
+        for i in range(1, element.num_vertices - 1):
+            indices.append(first)
+            indices.append(vertices[i])
+            indices.append(vertices[i + 1])
+
+    # the materials of the mesh are drawn in order, and the default material is the last
+    materials = sorted(groups, key=lambda material: (material < 0, material))
+    return [(material, groups[material]) for material in materials], others
+
+
+# triangulate the elements into the vertex indices of the triangles in the layout of the runtime,
+# the triangles are grouped by the materials and the group of the default material is the last,
+# the faces are reversed if reverse is true as the runtime does for drawing,
+# returns the arrays of the offsets and the numbers of the indices of each group and the indices,
+# the indices are 16bits if all vertices can be referred by them
+def triangulate_mesh_faces(mesh, reverse=False):
+    num_groups = mesh.num_materials + 1
+    groups = [[] for i in range(num_groups)]
+    if mesh.elements is not None:
+        for element in mesh.elements:
+            if element.num_vertices < 3 or element.vertices is None:
+                continue
+            if 0 <= element.material < mesh.num_materials:
+                indices = groups[element.material]
+            elif element.material < 0:
+                indices = groups[mesh.num_materials]
+            else:
+                continue
+            vertices = element.vertices
+            first = vertices[0]
+            for i in range(1, element.num_vertices - 1):
+                indices.append(first)
+                if reverse:
+                    indices.append(vertices[i + 1])
+                    indices.append(vertices[i])
+                else:
+                    indices.append(vertices[i])
+                    indices.append(vertices[i + 1])
+
+    offsets = array.array("i", [0]) * num_groups
+    sizes = array.array("i", [0]) * num_groups
+    indices = array.array("H" if mesh.num_vertices <= 0x10000 else "I")
+    for i, group in enumerate(groups):
+        offsets[i] = len(indices)
+        sizes[i] = len(group)
+        indices.extend(group)
+    return offsets, sizes, indices
+
+
+# reorder the triangles for the vertex cache by the Tipsify algorithm of Sander et al.,
+# returns the reordered vertex indices of the triangles and
+# the start positions of the clusters in triangles, they are divided at the dead-ends
+# where the locality of the vertices is lost, for sorting them to reduce overdraw
+def _tipsify(indices, cache_size, threshold):
+    num_triangles = len(indices) // 3
+
+    # adjacent triangles of each vertex, and the vertices in order of the appearance
+    adjacency = {}
+    vertices = []
+    for triangle in range(num_triangles):
+        for index in indices[3 * triangle:3 * triangle + 3]:
+            triangles = adjacency.get(index)
+            if triangles is None:
+                triangles = adjacency[index] = []
+                vertices.append(index)
+            triangles.append(triangle)
+    live = {index: len(triangles) for index, triangles in adjacency.items()}
+
+    dest = []
+    clusters = [0]
+    cache_time = {}
+    emitted = bytearray(num_triangles)
+    dead_end = []
+    time = cache_size + 1
+    cluster_time = time
+    cursor = 0
+    fanning = vertices[0] if 0 < num_triangles else -1
+    while 0 <= fanning:
+        # emit the triangles around the fanning vertex
+        candidates = []
+        for triangle in adjacency[fanning]:
+            if emitted[triangle]:
+                continue
+            emitted[triangle] = 1
+            for index in indices[3 * triangle:3 * triangle + 3]:
+                dest.append(index)
+                dead_end.append(index)
+                candidates.append(index)
+                live[index] -= 1
+                if cache_size < time - cache_time.get(index, 0):
+                    cache_time[index] = time
+                    time += 1
+
+        # select the vertex which is in the cache after fanning it
+        fanning = -1
+        priority = -1
+        for index in candidates:
+            if 0 < live[index]:
+                value = 0
+                if time - cache_time[index] + 2 * live[index] <= cache_size:
+                    value = time - cache_time[index]
+                if priority < value:
+                    priority = value
+                    fanning = index
+        if 0 <= fanning:
+            continue
+
+        # skip the dead-end to the recent vertex or the next vertex which has the live triangles
+        while 0 < len(dead_end):
+            index = dead_end.pop()
+            if 0 < live[index]:
+                fanning = index
+                break
+        else:
+            while cursor < len(vertices):
+                if 0 < live[vertices[cursor]]:
+                    fanning = vertices[cursor]
+                    break
+                cursor += 1
+
+        # divide the cluster if its ACMR is low enough for keeping the vertex cache locality
+        start = clusters[-1]
+        count = len(dest) // 3 - start
+        if 0 <= fanning and 0 < count and (time - cluster_time) / count <= threshold:
+            clusters.append(start + count)
+            cluster_time = time
+    return dest, clusters
+
+
+# get the position and the normal of each vertex as the functions of vertex index
+def _vertex_vectors(mesh):
+    vertices = mesh.vertices
+    compact = isinstance(vertices, XModelVertexTable)
+
+    def vector(values, size, index):
+        offset = size * index
+        return (values[offset],
+                values[offset + 1] if 1 < size else 0.0,
+                values[offset + 2] if 2 < size else 0.0)
+
+    def position(index):
+        position_index = vertices.position[index] if compact else vertices[index].position
+        return vector(mesh.positions, mesh.position_size, position_index)
+
+    def normal(index):
+        normal_index = vertices.normal[index] if compact else vertices[index].normal
+        if normal_index < 0:
+            return None
+        return vector(mesh.normals, mesh.normal_size, normal_index)
+
+    return (position if mesh.positions is not None and 0 < mesh.position_size else None,
+            normal if mesh.normals is not None and 0 < mesh.normal_size else None)
+
+
+# sort the clusters of triangles in descending order of the occlusion potential,
+# the outer clusters which face outward are drawn ahead and occlude the inner clusters
+def _sort_clusters(indices, clusters, position, normal, center):
+    num_triangles = len(indices) // 3
+    keyed = []
+    for i, start in enumerate(clusters):
+        end = clusters[i + 1] if i + 1 < len(clusters) else num_triangles
+        centroid = [0.0, 0.0, 0.0]
+        direction = [0.0, 0.0, 0.0]
+        for triangle in range(start, end):
+            p0, p1, p2 = (position(index) for index in indices[3 * triangle:3 * triangle + 3])
+            for j in range(3):
+                centroid[j] += p0[j] + p1[j] + p2[j]
+
+            # the vertex normals are preferred because the winding can be inverted by the exporter
+            normals = None
+            if normal is not None:
+                normals = [normal(index) for index in indices[3 * triangle:3 * triangle + 3]]
+            if normals is not None and None not in normals:
+                for j in range(3):
+                    direction[j] += normals[0][j] + normals[1][j] + normals[2][j]
+            else:
+                e1 = (p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2])
+                e2 = (p2[0] - p0[0], p2[1] - p0[1], p2[2] - p0[2])
+                direction[0] += e1[1] * e2[2] - e1[2] * e2[1]
+                direction[1] += e1[2] * e2[0] - e1[0] * e2[2]
+                direction[2] += e1[0] * e2[1] - e1[1] * e2[0]
+        length = math.sqrt(sum(value * value for value in direction))
+        scale = 1.0 / (3 * (end - start))
+        potential = 0.0
+        if 0.0 < length:
+            potential = sum((centroid[j] * scale - center[j]) * direction[j] / length for j in range(3))
+        keyed.append((-potential, start, end))
+
+    # the stable sort keeps the order of the clusters which have the same potential
+    keyed.sort(key=operator.itemgetter(0))
+    dest = []
+    for potential, start, end in keyed:
+        dest.extend(indices[3 * start:3 * end])
+    return dest
+
+
+# get the center of the positions of the mesh
+def _center(mesh):
+    center = [0.0, 0.0, 0.0]
+    size = mesh.position_size
+    count = mesh.num_positions
+    if 0 < count:
+        for j in range(min(size, 3)):
+            center[j] = math.fsum(mesh.positions[j:size * count:size]) / count
+    return center
+
+
+# renumber the vertices in order of the first use by the elements,
+# the vertices which aren't used by any element are moved to the last
+def _renumber_vertices(mesh):
+    remap = array.array("i", [-1]) * mesh.num_vertices
+    order = []
+    for element in mesh.elements:
+        if element.vertices is None:
+            continue
+        for index in element.vertices:
+            if remap[index] < 0:
+                remap[index] = len(order)
+                order.append(index)
+    for index in range(mesh.num_vertices):
+        if remap[index] < 0:
+            remap[index] = len(order)
+            order.append(index)
+
+    for element in mesh.elements:
+        if element.vertices is not None:
+            element.vertices = [remap[index] for index in element.vertices]
+    if isinstance(mesh.vertices, XModelVertexTable):
+        vertices = XModelVertexTable()
+        for name in ("position", "normal", "color", "tex_coord", "skin_weight"):
+            column = getattr(mesh.vertices, name)
+            setattr(vertices, name, array.array("i", [column[index] for index in order]))
+        mesh.vertices = vertices
+    else:
+        mesh.vertices = [mesh.vertices[index] for index in order]
+
+
+# triangulate the elements and reorder the triangles for the post-transform vertex cache,
+# and the clusters of the triangles are sorted for reducing overdraw if it's enabled,
+# then the vertices are renumbered in order of the first use for the locality of fetching,
+# returns the statistics of the vertex cache
+def optimize_mesh_vertex_cache(mesh,
+                               cache_size=VERTEX_CACHE_SIZE,
+                               reduce_overdraw=True,
+                               threshold=OVERDRAW_THRESHOLD):
+    stats = XModelVertexCacheStats(mesh.name, cache_size)
+    if mesh.num_elements <= 0 or mesh.elements is None or mesh.vertices is None:
+        return stats
+
+    groups, others = _triangulate(mesh)
+    indices = [index for material, group in groups for index in group]
+    stats.num_triangles = len(indices) // 3
+    stats.acmr_before, stats.atvr_before = analyze_vertex_cache(indices, cache_size)
+    stats.num_vertices = len(set(indices))
+
+    position, normal = _vertex_vectors(mesh)
+    center = _center(mesh) if position is not None else None
+    elements = []
+    for material, group in groups:
+        group, clusters = _tipsify(group, cache_size, threshold)
+        if reduce_overdraw and position is not None and 1 < len(clusters):
+            group = _sort_clusters(group, clusters, position, normal, center)
+            stats.num_clusters += len(clusters)
+        else:
+            stats.num_clusters += 1
+        for i in range(0, len(group), 3):
+            element = XModelElement()
+            element.material = material
+            element.num_vertices = 3
+            element.vertices = group[i:i + 3]
+            elements.append(element)
+    elements.extend(others)
+    mesh.num_elements = len(elements)
+    mesh.elements = elements
+
+    _renumber_vertices(mesh)
+    stats.acmr_after, stats.atvr_after = analyze_vertex_cache(
+        [index for element in elements if 3 <= element.num_vertices for index in element.vertices],
+        cache_size)
+    return stats
+
+
+# optimize the vertex cache of all meshes in the container, returns the statistics of the meshes
+def optimize_container_vertex_cache(container,
+                                    cache_size=VERTEX_CACHE_SIZE,
+                                    reduce_overdraw=True,
+                                    threshold=OVERDRAW_THRESHOLD):
+    if container.meshs is None:
+        return []
+    return [optimize_mesh_vertex_cache(mesh, cache_size, reduce_overdraw, threshold)
+            for mesh in container.meshs]
+
+
+# entry point of command line, the xModel file is decoded and optimized and encoded again
+def main(args=None):
+    from io_scene_xm.code import (XModelBinaryDecoder,
+                                  XModelBinaryEncoder)
+    from io_scene_xm.quantize import XModelQuantization
+    from io_scene_xm.interleave import INTERLEAVE_NONE, INTERLEAVE_MODES
+
+    parser = argparse.ArgumentParser(
+        prog="python3 -m io_scene_xm.optimize",
+        description="Optimize the meshes of the xModel file for the vertex cache and overdraw.")
+    parser.add_argument("source",
+                        help="xModel file")
+    parser.add_argument("-o", "--output", default=None,
+                        help="path of the optimized file, only the statistics are reported if it's omitted")
+    parser.add_argument("--cache-size", type=int, default=VERTEX_CACHE_SIZE,
+                        help="size of the vertex cache")
+    parser.add_argument("--threshold", type=float, default=OVERDRAW_THRESHOLD,
+                        help="ACMR of the cluster to split it for reducing overdraw")
+    parser.add_argument("--no-reduce-overdraw", dest="reduce_overdraw", action="store_false",
+                        help="don't sort the clusters of triangles for reducing overdraw")
+    parser.add_argument("--compress-level", type=int, choices=range(10), default=None, metavar="0-9",
+                        help="compress the sections in the level, it needs the newer decoder")
+    parser.add_argument("--position-encoding", choices=("FLOAT32", "INT16"), default="FLOAT32")
+    parser.add_argument("--normal-encoding", choices=("FLOAT32", "OCTAHEDRAL16", "OCTAHEDRAL8"),
+                        default="FLOAT32")
+    parser.add_argument("--color-encoding", choices=("FLOAT32", "FLOAT16", "UNORM8"), default="FLOAT32")
+    parser.add_argument("--tex-coord-encoding", choices=("FLOAT32", "FLOAT16"), default="FLOAT32")
+    parser.add_argument("--indexed-layout", action="store_true",
+                        help="write the index of the structures for loading them partially")
+    parser.add_argument("--triangulate-faces", action="store_true",
+                        help="write the triangulated faces for the index buffers of the runtime")
+    parser.add_argument("--interleave-vertices", choices=INTERLEAVE_MODES, default=INTERLEAVE_NONE,
+                        help="write the interleaved vertices of the selected meshs for the vertex buffers "
+                             "of the runtime")
+    args = parser.parse_args(args)
+
+    with open(args.source, "rb") as file:
+        container = XModelBinaryDecoder().decode(file)
+    if container is None:
+        print("%s isn't a xModel file" % args.source, file=sys.stderr)
+        return 2
+
+    for stats in optimize_container_vertex_cache(container,
+                                                 args.cache_size,
+                                                 args.reduce_overdraw,
+                                                 args.threshold):
+        print(stats.report())
+
+    if args.output is not None:
+        writer = io.BytesIO()
+        XModelBinaryEncoder(args.compress_level,
+                            XModelQuantization.fromNames(args.position_encoding,
+                                                         args.normal_encoding,
+                                                         args.color_encoding,
+                                                         args.tex_coord_encoding),
+                            args.indexed_layout,
+                            args.triangulate_faces,
+                            args.interleave_vertices).encode(container, writer)
+        with open(args.output, "wb") as file:
+            file.write(writer.getvalue())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,357 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# Partitioning of the skinned mesh into the submeshs by the matrix palettes of the bones,
+# it's the offline counterpart of xpl.XModelOptimizeUtils.optimizeMeshSkinForMatrixPallet.
+# This module doesn't depend on bpy, the runtime draws each submesh without dividing it again
+# because the number of nodes of the skin is within the palette.
+
+from io_scene_xm.types import (XModelMesh,
+                               XModelSkin,
+                               XModelElement,
+                               XModelVertex,
+                               XModelVertexTable)
+
+# names of the attributes of mesh in order of the indices of vertex
+_ATTRIBUTE_NAMES = ("position", "normal", "color", "tex_coord")
+
+# maximum number of the bone matrices of a palette, it's same as the default of the runtime
+MAX_PALETTE_SIZE = 16
+
+# maximum number of the weighted bones of a vertex, it's same as the default of the runtime
+MAX_INFLUENCES = 4
+
+# weights below the threshold are pruned before renormalizing the weights
+WEIGHT_THRESHOLD = 0.0
+
+
+# statistics of the partitioning of a mesh
+class XModelPaletteStats:
+    # attributes of instance
+    __slots__ = ("name",
+                 "max_palette_size",
+                 "num_bones",
+                 "palette_sizes",
+                 "num_shared_bones",
+                 "num_oversized",
+                 "num_source_vertices",
+                 "num_vertices",
+                 "num_pruned_weights")
+
+    # initialize
+    def __init__(self, name, max_palette_size):
+        # string : mesh name
+        self.name = name
+        # int : maximum number of the bone matrices of a palette
+        self.max_palette_size = max_palette_size
+        # int : number of the bones referred by the vertices
+        self.num_bones = 0
+        # int[] : number of the bones of each subset
+        self.palette_sizes = []
+        # int : number of the bones referred by the multiple subsets
+        self.num_shared_bones = 0
+        # int : number of the subsets exceeding the palette, it's the last one and 1 at most,
+        # its elements refer too many bones for the palette
+        self.num_oversized = 0
+        # int : number of vertices before partitioning
+        self.num_source_vertices = 0
+        # int : number of vertices of all subsets, the vertices on the borders are duplicated
+        self.num_vertices = 0
+        # int : number of the pruned weights
+        self.num_pruned_weights = 0
+
+    # get the average number of the subsets which refer a bone
+    def boneReuse(self):
+        return sum(self.palette_sizes) / self.num_bones if 0 < self.num_bones else 0.0
+
+    # get the statistics as a line of text
+    def report(self):
+        text = ("%s: %d subsets of %d-%d bones (max %d), %d of %d bones shared, %.2f subsets per bone, "
+                "%d -> %d vertices, %d weights pruned" %
+                (self.name, len(self.palette_sizes), min(self.palette_sizes, default=0),
+                 max(self.palette_sizes, default=0), self.max_palette_size, self.num_shared_bones,
+                 self.num_bones, self.boneReuse(), self.num_source_vertices, self.num_vertices,
+                 self.num_pruned_weights))
+        if 0 < self.num_oversized:
+            text += ", a subset exceeds the palette"
+        return text
+
+
+# count the bits of the set of bones
+def _count_bones(mask):
+    return bin(mask).count("1")
+
+
+# get the bones of the set in ascending order
+def _bone_list(mask):
+    bones = []
+    bone = 0
+    while mask:
+        if mask & 1:
+            bones.append(bone)
+        mask >>= 1
+        bone += 1
+    return bones
+
+
+# limit the weighted bones of each weighted index of the skin,
+# the weights below the threshold are pruned and the remaining ones are renormalized,
+# the heaviest one is kept even if it's below the threshold,
+# returns the lists of pairs of bone and weight, and the number of the pruned weights
+def limit_skin_weights(skin, max_influences=MAX_INFLUENCES, threshold=WEIGHT_THRESHOLD):
+    limited = []
+    num_pruned = 0
+    for i in range(skin.num_weighted_indices):
+        offset = skin.weighted_index_stride * i
+        size = skin.weighted_index_sizes[i]
+        pairs = sorted(zip(skin.indices[offset:offset + size], skin.weights[offset:offset + size]),
+                       key=lambda pair: -pair[1])
+        kept = [pair for pair in pairs[0:max_influences] if threshold <= pair[1]] or pairs[0:1]
+        num_pruned += len(pairs) - len(kept)
+
+        total = sum(weight for bone, weight in kept)
+        if 0.0 < total and len(kept) < len(pairs):
+            kept = [(bone, weight / total) for bone, weight in kept]
+        limited.append(kept)
+    return limited, num_pruned
+
+
+# pack the groups of elements into the subsets whose sets of bones fit in the palette,
+# each subset starts with the group of the most bones, and the group adding the fewest new bones
+# is added repeatedly, the groups adding no bones are added all at once,
+# the ties are broken by the more shared bones and then the more elements,
+# the groups exceeding the palette are gathered into the last subset, the runtime divides it again,
+# returns the pairs of the set of bones and the element indices of each subset
+def _pack_groups(groups, max_palette_size):
+    remaining = []
+    oversized_mask = 0
+    oversized_elements = []
+    for mask, elements in groups.items():
+        if max_palette_size < _count_bones(mask):
+            oversized_mask |= mask
+            oversized_elements.extend(elements)
+        else:
+            remaining.append((mask, elements))
+    remaining.sort(key=lambda item: (-_count_bones(item[0]), item[1][0]))
+    subsets = []
+    while 0 < len(remaining):
+        mask, elements = remaining.pop(0)
+        elements = list(elements)
+        num_bones = _count_bones(mask)
+        while True:
+            best = None
+            best_cost = None
+            rest = []
+            for item in remaining:
+                added = _count_bones(item[0] & ~mask)
+                if added == 0:
+                    elements.extend(item[1])
+                    continue
+                rest.append(item)
+                if max_palette_size < num_bones + added:
+                    continue
+                cost = (added, -_count_bones(item[0] & mask), -len(item[1]))
+                if best_cost is None or cost < best_cost:
+                    best = item
+                    best_cost = cost
+            remaining = rest
+            if best is None:
+                break
+            remaining.remove(best)
+            mask |= best[0]
+            num_bones += best_cost[0]
+            elements.extend(best[1])
+        elements.sort()
+        subsets.append((mask, elements))
+    if 0 < len(oversized_elements):
+        oversized_elements.sort()
+        subsets.append((oversized_mask, oversized_elements))
+    return subsets
+
+
+# gather the vectors of the attribute by the indices, the missing index stays -1,
+# returns the gathered values and the map from the old index to the new one
+def _gather(values, size, num, indices):
+    remap = {}
+    gathered = []
+    if values is None or size <= 0:
+        return gathered, remap
+    for index in indices:
+        if 0 <= index < num and index not in remap:
+            remap[index] = len(remap)
+            gathered.extend(values[size * index:size * index + size])
+    return gathered, remap
+
+
+# build the submesh of the elements whose vertices refer the bones of the palette
+def _build_submesh(mesh, name, keys, limited, palette, element_indices):
+    sub = XModelMesh()
+    sub.name = name
+    sub.user_data = mesh.user_data
+    sub.num_materials = mesh.num_materials
+    sub.materials = mesh.materials
+
+    # vertices used by the elements in order of the source
+    used = sorted(set(index
+                      for element_index in element_indices
+                      for index in mesh.elements[element_index].vertices))
+    used_keys = [keys[index] for index in used]
+    vertex_remap = {index: i for i, index in enumerate(used)}
+
+    # attributes used by the vertices
+    remaps = []
+    for column, name in enumerate(_ATTRIBUTE_NAMES):
+        size = getattr(mesh, name + "_size")
+        values, remap = _gather(getattr(mesh, name + "s"),
+                                size,
+                                getattr(mesh, "num_" + name + "s"),
+                                [key[column] for key in used_keys])
+        setattr(sub, name + "s", values)
+        setattr(sub, "num_" + name + "s", len(remap))
+        setattr(sub, name + "_size", size if 0 < len(remap) else 0)
+        remaps.append(remap)
+    position_remap, normal_remap, color_remap, tex_coord_remap = remaps
+
+    # skin of the bones of the palette, the bone indices are local in the palette
+    weight_remap = {}
+    for key in used_keys:
+        if 0 <= key[4] and key[4] not in weight_remap:
+            weight_remap[key[4]] = len(weight_remap)
+    if 0 < len(weight_remap):
+        local = {bone: i for i, bone in enumerate(palette)}
+        skin = XModelSkin()
+        skin.num_weighted_indices = len(weight_remap)
+        skin.weighted_index_stride = max(len(limited[index]) for index in weight_remap)
+        skin.weighted_index_sizes = [0] * skin.num_weighted_indices
+        skin.indices = [-1] * (skin.weighted_index_stride * skin.num_weighted_indices)
+        skin.weights = [0.0] * (skin.weighted_index_stride * skin.num_weighted_indices)
+        for index, new_index in weight_remap.items():
+            pairs = limited[index]
+            offset = skin.weighted_index_stride * new_index
+            skin.weighted_index_sizes[new_index] = len(pairs)
+            for j, (bone, weight) in enumerate(pairs):
+                skin.indices[offset + j] = local[bone]
+                skin.weights[offset + j] = weight
+        skin.num_nodes = len(palette)
+        skin.nodes = [mesh.skin.nodes[bone] for bone in palette]
+        skin.offset_matrices = []
+        for bone in palette:
+            skin.offset_matrices.extend(mesh.skin.offset_matrices[16 * bone:16 * bone + 16])
+        sub.skin = skin
+
+    # vertices
+    sub.num_vertices = len(used)
+    sub.vertices = []
+    for key in used_keys:
+        vertex = XModelVertex()
+        vertex.position = position_remap.get(key[0], -1)
+        vertex.normal = normal_remap.get(key[1], -1)
+        vertex.color = color_remap.get(key[2], -1)
+        vertex.tex_coord = tex_coord_remap.get(key[3], -1)
+        vertex.skin_weight = weight_remap.get(key[4], -1)
+        sub.vertices.append(vertex)
+
+    # elements
+    sub.num_elements = len(element_indices)
+    sub.elements = []
+    for element_index in element_indices:
+        source = mesh.elements[element_index]
+        element = XModelElement()
+        element.material = source.material
+        element.num_vertices = source.num_vertices
+        element.vertices = [vertex_remap[index] for index in source.vertices]
+        sub.elements.append(element)
+
+    # keep the representations of the arrays
+    if isinstance(mesh.vertices, XModelVertexTable):
+        sub.compact()
+    return sub
+
+
+# split the skinned mesh into the submeshs whose skins have the bones within the palette,
+# the weighted bones of each vertex are limited and renormalized before partitioning,
+# the source mesh isn't modified, and it's returned as it is if it doesn't have the skin,
+# returns the submeshs and the statistics of the partitioning
+def partition_mesh_skin(mesh,
+                        max_palette_size=MAX_PALETTE_SIZE,
+                        max_influences=MAX_INFLUENCES,
+                        threshold=WEIGHT_THRESHOLD):
+    stats = XModelPaletteStats(mesh.name, max_palette_size)
+    stats.num_source_vertices = mesh.num_vertices
+    stats.num_vertices = mesh.num_vertices
+    skin = mesh.skin
+    if skin is None or skin.num_weighted_indices <= 0 or mesh.num_elements <= 0:
+        return [mesh], stats
+
+    # limit the weights, and make the set of bones of each weighted index as the bits
+    limited, stats.num_pruned_weights = limit_skin_weights(skin, max_influences, threshold)
+    weight_masks = []
+    for pairs in limited:
+        mask = 0
+        for bone, weight in pairs:
+            mask |= 1 << bone
+        weight_masks.append(mask)
+
+    # group the elements by the set of bones
+    if isinstance(mesh.vertices, XModelVertexTable):
+        keys = list(mesh.vertices.keys())
+    else:
+        keys = [vertex.key() for vertex in mesh.vertices[0:mesh.num_vertices]]
+    groups = {}
+    for i, element in enumerate(mesh.elements[0:mesh.num_elements]):
+        mask = 0
+        for index in element.vertices:
+            weight_index = keys[index][4]
+            if 0 <= weight_index:
+                mask |= weight_masks[weight_index]
+        groups.setdefault(mask, []).append(i)
+
+    # pack the groups into the palettes
+    subsets = _pack_groups(groups, max_palette_size)
+
+    # build the submeshs
+    submeshs = []
+    bone_counts = {}
+    stats.num_vertices = 0
+    for i, (mask, element_indices) in enumerate(subsets):
+        palette = _bone_list(mask)
+        name = mesh.name if len(subsets) == 1 else "%s_%d" % (mesh.name, i)
+        sub = _build_submesh(mesh, name, keys, limited, palette, element_indices)
+        submeshs.append(sub)
+
+        stats.palette_sizes.append(len(palette))
+        stats.num_vertices += sub.num_vertices
+        if max_palette_size < len(palette):
+            stats.num_oversized += 1
+        for bone in palette:
+            bone_counts[bone] = bone_counts.get(bone, 0) + 1
+    stats.num_bones = len(bone_counts)
+    stats.num_shared_bones = sum(1 for count in bone_counts.values() if 1 < count)
+    return submeshs, stats
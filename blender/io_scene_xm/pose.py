@@ -0,0 +1,481 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# Batched evaluation of the poses of the animation sets with numpy.
+# The node hierarchy is flattened into the order that the parent precedes the children,
+# every channel is interpolated for all of the times at once as the runtime does,
+# and the local and the world matrices are composed over the frames and the nodes.
+# This module doesn't depend on bpy, the matrices are indexed by the row and the column,
+# so they are the transposed combined matrices of the runtime which are stored in the columns.
+
+import itertools
+
+import numpy
+
+from io_scene_xm.types import (XModelStructure,
+                               XModelNode,
+                               XModelAnimationKey)
+
+# number of the iterations to solve the parameter of the bezier curve at the time
+_BEZIER_ITERATIONS = 16
+
+
+# matrices of the poses at the times
+class XModelPose:
+    # attributes of instance
+    __slots__ = ("times",
+                 "local_matrices",
+                 "world_matrices")
+
+    # initialize
+    def __init__(self, times, local_matrices, world_matrices):
+        # float64_t[num_times] : times of the animation set
+        self.times = times
+        # float64_t[num_times][num_nodes][4][4] : local transforms of the nodes
+        self.local_matrices = local_matrices
+        # float64_t[num_times][num_nodes][4][4] : world transforms of the nodes
+        self.world_matrices = world_matrices
+
+
+# get the key to group the animations which share the timeline and the interpolation
+def _track_key(animation):
+    structure_type = animation.target.structure_type
+    if 0 < animation.num_frames:
+        return (structure_type, animation.index == -1, animation.frame_size,
+                animation.frame_start, animation.num_frames)
+    keys = animation.keys[0:animation.num_keys]
+    return (structure_type, animation.index == -1, keys[0].value_size, tuple([key.time for key in keys]))
+
+
+# channels of the animations which share the timeline and the interpolation,
+# they are interpolated at once for the batch of the times
+class _XModelPoseTrack:
+    # attributes of instance
+    __slots__ = ("targets",
+                 "structure_type",
+                 "whole",
+                 "frame_start",
+                 "frames",
+                 "times",
+                 "values",
+                 "bezier")
+
+    # initialize
+    def __init__(self, animations, targets):
+        # tuple[] : order of the animation, group and column of the target and index of the element
+        self.targets = targets
+        # int : type of the target structure
+        self.structure_type = animations[0].target.structure_type
+        # bool : the whole targets are animated, or else the elements
+        self.whole = animations[0].index == -1
+
+        # float64_t : time of the first sampled frame
+        self.frame_start = 0.0
+        # float64_t[num_channels][num_frames][frame_size] : sampled frames, or None if the keys are used
+        self.frames = None
+        # float64_t[num_keys] : times of the keys
+        self.times = None
+        # float64_t[num_channels][num_keys][value_size] : values of the keys
+        self.values = None
+        # tuple of arrays of the control points of the bezier keys, or None if all of the keys are linear
+        self.bezier = None
+
+        # the values are flattened into the iterator and read at once, it's faster than the nested lists
+        if 0 < animations[0].num_frames:
+            self.frame_start = float(animations[0].frame_start)
+            size = animations[0].num_frames * animations[0].frame_size
+            self.frames = numpy.fromiter(
+                itertools.chain.from_iterable(animation.frames[0:size] for animation in animations),
+                dtype=numpy.float64,
+                count=len(animations) * size).reshape(len(animations),
+                                                      animations[0].num_frames,
+                                                      animations[0].frame_size)
+            return
+
+        keys = [animation.keys[0:animation.num_keys] for animation in animations]
+        value_size = keys[0][0].value_size
+        self.times = numpy.array([key.time for key in keys[0]], dtype=numpy.float64)
+        self.values = numpy.fromiter(
+            itertools.chain.from_iterable(key.value[0:value_size] for channel in keys for key in channel),
+            dtype=numpy.float64,
+            count=len(keys) * len(keys[0]) * value_size).reshape(len(keys), len(keys[0]), value_size)
+        if not self.whole and any(key.interpolate == XModelAnimationKey.INTERPOLATE_BEZIER
+                                  for channel in keys for key in channel):
+            self.bezier = tuple(
+                numpy.array([[get(key) for key in channel] for channel in keys])
+                for get in (lambda key: key.interpolate == XModelAnimationKey.INTERPOLATE_BEZIER and
+                            key.after_value is not None,
+                            lambda key: key.after_time,
+                            lambda key: key.after_value[0] if key.after_value is not None else 0.0,
+                            lambda key: key.before_value is not None,
+                            lambda key: key.before_time,
+                            lambda key: key.before_value[0] if key.before_value is not None else 0.0))
+
+    # get the values interpolated at the times, they are the values of the whole targets
+    # or the elements of each channel for each time
+    def evaluate(self, times):
+        if self.frames is not None:
+            # reference the sampled frames
+            last = self.frames.shape[1] - 1
+            frame = numpy.clip(times - self.frame_start, 0.0, last)
+            start = numpy.floor(frame).astype(numpy.intp)
+            end = numpy.minimum(start + 1, last)
+            rate = frame - start
+            return self.__interpolate(self.frames[:, start], self.frames[:, end], rate)
+
+        # search the keys, the times before the first key or after the last key hold the value
+        last = self.times.shape[0] - 1
+        index = numpy.searchsorted(self.times, times, side="right")
+        start = numpy.clip(index - 1, 0, last)
+        end = numpy.where(index <= 0, 0, numpy.minimum(index, last))
+        t0 = self.times[start]
+        t3 = self.times[end]
+        span = t3 - t0
+        rate = numpy.divide(times - t0, span, out=numpy.zeros_like(span), where=0.0 < span)
+        values = self.__interpolate(self.values[:, start], self.values[:, end], rate)
+        if self.bezier is not None:
+            self.__interpolateBezier(values, start, end, t0, t3, rate)
+        return values
+
+    # interpolate the values of the keys as the runtime does
+    def __interpolate(self, start, end, rate):
+        if not self.whole:
+            return start[..., 0] * (1.0 - rate) + end[..., 0] * rate
+        if self.structure_type == XModelStructure.TYPE_QUATERNION:
+            return slerp(start, end, rate)
+        if self.structure_type == XModelStructure.TYPE_AXIS_ROTATE:
+            values = numpy.empty_like(start)
+            values[..., 0:3] = slerp(start[..., 0:3], end[..., 0:3], rate)
+            values[..., 3] = start[..., 3] * (1.0 - rate) + end[..., 3] * rate
+            return values
+        values = start * (1.0 - rate)[..., None] + end * rate[..., None]
+        if self.structure_type == XModelStructure.TYPE_MATRIX:
+            # the axes are interpolated spherically and the others linearly
+            for i in range(0, 12, 4):
+                values[..., i:i + 3] = slerp(start[..., i:i + 3], end[..., i:i + 3], rate)
+        return values
+
+    # replace the values of the segments of the bezier keys, the parameters of the curves at the times
+    # are solved by Newton's method with bisection, it's same as the runtime
+    def __interpolateBezier(self, values, start, end, t0, t3, rate):
+        is_bezier, after_time, after_value, has_before, before_time, before_value = self.bezier
+        channel, frame = numpy.nonzero(is_bezier[:, start] & has_before[:, end] & (t0 < t3))
+        if len(channel) <= 0:
+            return
+        start = start[frame]
+        end = end[frame]
+        t0 = t0[frame]
+        t1 = after_time[channel, start]
+        t2 = before_time[channel, end]
+        t3 = t3[frame]
+        time = t0 + (t3 - t0) * rate[frame]
+        s = rate[frame]
+        low = numpy.zeros_like(s)
+        high = numpy.ones_like(s)
+        active = numpy.ones(s.shape, dtype=bool)
+        for _ in range(_BEZIER_ITERATIONS):
+            error = _bezier(t0, t1, t2, t3, s) - time
+            active &= 1e-9 * (t3 - t0) <= numpy.abs(error)
+            if not active.any():
+                break
+            high = numpy.where(active & (0.0 < error), s, high)
+            low = numpy.where(active & (error <= 0.0), s, low)
+            r = 1.0 - s
+            slope = 3.0 * (r * r * (t1 - t0) + 2.0 * r * s * (t2 - t1) + s * s * (t3 - t2))
+            step = numpy.where(0.0 < slope, s - error / numpy.where(0.0 < slope, slope, 1.0), 0.5 * (low + high))
+            step = numpy.where((step <= low) | (high <= step), 0.5 * (low + high), step)
+            s = numpy.where(active, step, s)
+        values[channel, frame] = _bezier(self.values[channel, start, 0], after_value[channel, start],
+                                         before_value[channel, end], self.values[channel, end, 0], s)
+
+
+# get the values on the cubic bezier curves at the parameters
+def _bezier(p0, p1, p2, p3, s):
+    r = 1.0 - s
+    return r * r * r * p0 + 3.0 * r * r * s * p1 + 3.0 * r * s * s * p2 + s * s * s * p3
+
+
+# interpolate the vectors in the last axis spherically as the runtime does,
+# the directions are interpolated spherically and the lengths are interpolated linearly
+def slerp(v1, v2, rate):
+    len1 = numpy.sqrt(numpy.einsum("...i,...i->...", v1, v1))
+    len2 = numpy.sqrt(numpy.einsum("...i,...i->...", v2, v2))
+    n1 = v1 / numpy.where(0.0 < len1, len1, 1.0)[..., None]
+    n2 = v2 / numpy.where(0.0 < len2, len2, 1.0)[..., None]
+    cs = numpy.einsum("...i,...i->...", n1, n2)
+    length = len1 * (1.0 - rate) + len2 * rate
+    rad = numpy.arccos(numpy.clip(cs, -1.0, 1.0))
+    sn = numpy.sin(rad)
+    sn = numpy.where(0.0 < sn, sn, 1.0)
+    sn1 = numpy.where((-1.0 < cs) & (cs < 1.0), numpy.sin(rad * (1.0 - rate)) / sn, 1.0)
+    sn2 = numpy.where((-1.0 < cs) & (cs < 1.0), numpy.sin(rad * rate) / sn, 0.0)
+    length = numpy.where(cs <= -1.0, len1 * (1.0 - rate) - len2 * rate, length)
+    return (n1 * sn1[..., None] + n2 * sn2[..., None]) * length[..., None]
+
+
+# get the elements of the rotation matrices of the quaternions or the axis rotations,
+# they are the rows of the columns of the shape of the values without the last axis
+def _rotation_elements(structure_type, values):
+    if structure_type == XModelStructure.TYPE_QUATERNION:
+        r, i, j, k = values[..., 0], values[..., 1], values[..., 2], values[..., 3]
+        rr, ii, jj, kk = r * r, i * i, j * j, k * k
+        ij2, ik2, jk2 = 2.0 * i * j, 2.0 * i * k, 2.0 * j * k
+        ri2, rj2, rk2 = 2.0 * r * i, 2.0 * r * j, 2.0 * r * k
+        return ((ii + rr - kk - jj, ij2 - rk2, ik2 + rj2),
+                (ij2 + rk2, jj + rr - ii - kk, jk2 - ri2),
+                (ik2 - rj2, jk2 + ri2, kk + rr - jj - ii))
+
+    # the axis is normalized
+    length = numpy.sqrt(values[..., 0] * values[..., 0] + values[..., 1] * values[..., 1] +
+                        values[..., 2] * values[..., 2])
+    length = numpy.where(0.0 < length, length, 1.0)
+    x, y, z = values[..., 0] / length, values[..., 1] / length, values[..., 2] / length
+    cs = numpy.cos(values[..., 3])
+    sn = numpy.sin(values[..., 3])
+    cs1 = 1.0 - cs
+    xy, xz, yz = x * y * cs1, x * z * cs1, y * z * cs1
+    return ((cs + x * x * cs1, xy - z * sn, xz + y * sn),
+            (xy + z * sn, cs + y * y * cs1, yz - x * sn),
+            (xz - y * sn, yz + x * sn, cs + z * z * cs1))
+
+
+# get the matrices of the transforms from their values, the shape of the values is (..., size)
+def transform_matrices(structure_type, values):
+    shape = values.shape[:-1]
+    if structure_type == XModelStructure.TYPE_MATRIX:
+        return numpy.ascontiguousarray(values.reshape(shape + (4, 4)).swapaxes(-1, -2))
+
+    matrices = numpy.zeros(shape + (4, 4))
+    matrices[..., 3, 3] = 1.0
+    if structure_type == XModelStructure.TYPE_TRANSLATE:
+        matrices[..., 0, 0] = 1.0
+        matrices[..., 1, 1] = 1.0
+        matrices[..., 2, 2] = 1.0
+        matrices[..., 0:3, 3] = values
+    elif structure_type == XModelStructure.TYPE_SCALE:
+        matrices[..., 0, 0] = values[..., 0]
+        matrices[..., 1, 1] = values[..., 1]
+        matrices[..., 2, 2] = values[..., 2]
+    elif structure_type in (XModelStructure.TYPE_QUATERNION, XModelStructure.TYPE_AXIS_ROTATE):
+        for row, elements in enumerate(_rotation_elements(structure_type, values)):
+            for column, element in enumerate(elements):
+                matrices[..., row, column] = element
+    return matrices
+
+
+# multiply the transforms of the values to the matrices in place as the runtime does,
+# only the columns which are changed by the transform are calculated
+def multiply_transforms(matrices, structure_type, values):
+    if structure_type == XModelStructure.TYPE_MATRIX:
+        matrices[...] = numpy.matmul(matrices, transform_matrices(structure_type, values))
+    elif structure_type == XModelStructure.TYPE_TRANSLATE:
+        matrices[..., :, 3] += (matrices[..., :, 0] * values[..., 0, None] +
+                                matrices[..., :, 1] * values[..., 1, None] +
+                                matrices[..., :, 2] * values[..., 2, None])
+    elif structure_type == XModelStructure.TYPE_SCALE:
+        for column in range(3):
+            matrices[..., :, column] *= values[..., column, None]
+    elif structure_type in (XModelStructure.TYPE_QUATERNION, XModelStructure.TYPE_AXIS_ROTATE):
+        elements = _rotation_elements(structure_type, values)
+        axes = [matrices[..., :, i].copy() for i in range(3)]
+        for column in range(3):
+            matrices[..., :, column] = (axes[0] * elements[0][column][..., None] +
+                                        axes[1] * elements[1][column][..., None] +
+                                        axes[2] * elements[2][column][..., None])
+    return matrices
+
+
+# get the slice of the indices if they are the continuous range, or the indices
+def _compact_indices(indices):
+    if 0 < len(indices) and indices[-1] - indices[0] == len(indices) - 1:
+        return slice(int(indices[0]), int(indices[-1]) + 1)
+    return indices
+
+
+# get the total time of the animation as the runtime does
+def animation_total_time(animation):
+    time = 0.0
+    if 0 < animation.num_keys:
+        time = max(animation.keys[animation.num_keys - 1].time, time)
+    if 0 < animation.num_frames:
+        time = max(animation.frame_start + animation.num_frames - 1, time)
+    if animation.children is not None:
+        for child in animation.children[0:animation.num_children]:
+            time = max(animation_total_time(child), time)
+    return time
+
+
+# get the total time of the animation set as the runtime does
+def animation_set_total_time(animation_set):
+    time = 0.0
+    for animation in animation_set.animations[0:animation_set.num_animations]:
+        time = max(animation_total_time(animation), time)
+    return time
+
+
+# get the animations and the children of them recursively in the order of the runtime
+def _flatten_animations(animations, flattened):
+    for animation in animations:
+        flattened.append(animation)
+        if animation.children is not None:
+            _flatten_animations(animation.children[0:animation.num_children], flattened)
+    return flattened
+
+
+# evaluator of the poses of the node hierarchy for the batch of the times
+class XModelPoseEvaluator:
+    # attributes of instance
+    __slots__ = ("nodes",
+                 "parents",
+                 "levels",
+                 "groups",
+                 "targets",
+                 "tracks")
+
+    # initialize, the nodes are the root nodes of the hierarchy
+    def __init__(self, nodes):
+        # XModelNode[] : nodes in the order of the depth, so the parent precedes the children
+        self.nodes = list(nodes)
+        parents = [-1] * len(self.nodes)
+        # slice[] : range of the nodes of each depth
+        self.levels = []
+        start = 0
+        while start < len(self.nodes):
+            stop = len(self.nodes)
+            self.levels.append(slice(start, stop))
+            for index in range(start, stop):
+                node = self.nodes[index]
+                if node.children is not None:
+                    for child in node.children[0:node.num_children]:
+                        self.nodes.append(child)
+                        parents.append(index)
+            start = stop
+
+        # int[num_nodes] : index of the parent of each node, or -1 for the root nodes
+        self.parents = numpy.array(parents, dtype=numpy.intp)
+
+        # the transforms of the same slot and type are grouped to be composed at once,
+        # each group is the tuple of the slot, the type, the indices of the nodes and the rest values
+        self.groups = []
+        # dict : group and column of each transform by its identity
+        self.targets = {}
+        for transform in range(XModelNode.NUM_TRANSFORMS):
+            members = {}
+            for index, node in enumerate(self.nodes):
+                param = node.transforms[transform]
+                if param is not None:
+                    members.setdefault(param.structure_type, []).append((index, param))
+            for structure_type in sorted(members.keys()):
+                group = len(self.groups)
+                for column, (index, param) in enumerate(members[structure_type]):
+                    self.targets[id(param)] = (group, column)
+                self.groups.append((
+                    transform,
+                    structure_type,
+                    _compact_indices(numpy.array([index for index, param in members[structure_type]],
+                                                 dtype=numpy.intp)),
+                    numpy.array([param.values[0:param.size] for index, param in members[structure_type]],
+                                dtype=numpy.float64)))
+
+        # dict : prepared tracks of each animation set by its identity, with the animation set to keep it alive
+        self.tracks = {}
+
+    # get the prepared tracks of the animation set, the animations of the targets out of the hierarchy
+    # are ignored, the tracks are prepared at the first evaluation of the animation set
+    def __getTracks(self, animation_set):
+        entry = self.tracks.get(id(animation_set))
+        if entry is None:
+            members = {}
+            animations = _flatten_animations(animation_set.animations[0:animation_set.num_animations], [])
+            for order, animation in enumerate(animations):
+                target = self.targets.get(id(animation.target)) if animation.target is not None else None
+                if target is not None and (0 < animation.num_frames or 0 < animation.num_keys):
+                    member = members.setdefault(_track_key(animation), ([], []))
+                    member[0].append(animation)
+                    member[1].append((order, target[0], target[1], animation.index))
+            entry = (animation_set, [_XModelPoseTrack(animations, targets)
+                                     for animations, targets in members.values()])
+            self.tracks[id(animation_set)] = entry
+        return entry[1]
+
+    # evaluate the poses of the animation set at the times,
+    # the times are multiplied by the time rate and wrapped by the total time if loop is enabled
+    # as the container does, the root matrix is multiplied to the world matrices of the root nodes
+    def evaluate(self, animation_set, times, time_rate=1.0, loop=False, root_matrix=None):
+        times = numpy.asarray(times, dtype=numpy.float64).reshape(-1) * time_rate
+        if loop:
+            total = animation_set_total_time(animation_set)
+            if 0.0 < total:
+                times = numpy.mod(times, total)
+        num_times = times.shape[0]
+
+        # interpolate the channels over the rest values
+        values = [numpy.repeat(rest[None], num_times, axis=0)
+                  for transform, structure_type, indices, rest in self.groups]
+        channels = []
+        for track in self.__getTracks(animation_set) if animation_set is not None else []:
+            channels.extend(zip(track.targets, track.evaluate(times)))
+        channels.sort(key=lambda channel: channel[0][0])
+        for (order, group, column, index), channel_values in channels:
+            if index == -1:
+                values[group][:, column, :] = channel_values
+            else:
+                values[group][:, column, index] = channel_values
+
+        # compose the local matrices in the order of the matrix, the translate, the scale and the rotate,
+        # the first transform of the nodes is assigned without the multiplication to the identity
+        local_matrices = numpy.empty((num_times, len(self.nodes), 4, 4))
+        composed = numpy.zeros(len(self.nodes), dtype=bool)
+        for (transform, structure_type, indices, rest), group_values in zip(self.groups, values):
+            first = ~composed[indices]
+            if first.all():
+                local_matrices[:, indices] = transform_matrices(structure_type, group_values)
+                composed[indices] = True
+                continue
+            if first.any():
+                local_matrices[:, numpy.arange(len(self.nodes))[indices][first]] = numpy.identity(4)
+            if isinstance(indices, slice):
+                multiply_transforms(local_matrices[:, indices], structure_type, group_values)
+            else:
+                local_matrices[:, indices] = multiply_transforms(local_matrices[:, indices],
+                                                                 structure_type, group_values)
+            composed[indices] = True
+        local_matrices[:, ~composed] = numpy.identity(4)
+
+        # compose the world matrices for each depth of the hierarchy
+        world_matrices = numpy.empty_like(local_matrices)
+        for depth, indices in enumerate(self.levels):
+            if depth == 0:
+                world_matrices[:, indices] = local_matrices[:, indices] if root_matrix is None else \
+                    numpy.matmul(numpy.asarray(root_matrix, dtype=numpy.float64), local_matrices[:, indices])
+            else:
+                numpy.matmul(world_matrices[:, self.parents[indices]], local_matrices[:, indices],
+                             out=world_matrices[:, indices])
+        return XModelPose(times, local_matrices, world_matrices)
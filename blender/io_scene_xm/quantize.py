@@ -0,0 +1,384 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# Quantized encodings of the vertex attributes of mesh.
+# This module doesn't depend on bpy and numpy.
+
+import math
+import struct
+
+# encodings of the vertex attribute
+# 32bits float number
+ENCODING_FLOAT32 = 0
+# 16bits float number
+ENCODING_FLOAT16 = 1
+# 16bits integer, value is offset + scale * integer for each component
+ENCODING_INT16 = 2
+# octahedral mapped unit vector in two 16bits normalized integers
+ENCODING_OCTAHEDRAL16 = 3
+# octahedral mapped unit vector in two 8bits normalized integers
+ENCODING_OCTAHEDRAL8 = 4
+# 8bits unsigned normalized integer
+ENCODING_UNORM8 = 5
+
+# encodings, key is name
+ENCODINGS = {"FLOAT32": ENCODING_FLOAT32,
+             "FLOAT16": ENCODING_FLOAT16,
+             "INT16": ENCODING_INT16,
+             "OCTAHEDRAL16": ENCODING_OCTAHEDRAL16,
+             "OCTAHEDRAL8": ENCODING_OCTAHEDRAL8,
+             "UNORM8": ENCODING_UNORM8}
+
+# maximum value of 16bits normalized integer
+_INT16_MAX = 0x7fff
+
+# maximum value of 8bits normalized integer
+_INT8_MAX = 0x7f
+
+# maximum value of 8bits unsigned normalized integer
+_UNORM8_MAX = 0xff
+
+# maximum finite value of 16bits float number
+_FLOAT16_MAX = 65504.0
+
+# precompiled layouts of the scalar values
+_FLOAT32 = struct.Struct("<f")
+
+# whether struct supports 16bits float number, it's since python 3.6
+try:
+    struct.calcsize("<e")
+    _HAS_FLOAT16 = True
+except struct.error:
+    _HAS_FLOAT16 = False
+
+
+# settings of the quantization for each vertex attribute
+class XModelQuantization:
+    # attributes of instance
+    __slots__ = ("position_encoding",
+                 "normal_encoding",
+                 "color_encoding",
+                 "tex_coord_encoding")
+
+    # initialize
+    def __init__(self,
+                 position_encoding=ENCODING_FLOAT32,
+                 normal_encoding=ENCODING_FLOAT32,
+                 color_encoding=ENCODING_FLOAT32,
+                 tex_coord_encoding=ENCODING_FLOAT32):
+        # int : encoding of positions
+        self.position_encoding = position_encoding
+        # int : encoding of normals
+        self.normal_encoding = normal_encoding
+        # int : encoding of colors
+        self.color_encoding = color_encoding
+        # int : encoding of texture coordinates
+        self.tex_coord_encoding = tex_coord_encoding
+
+    # create the settings from the names of encodings
+    @staticmethod
+    def fromNames(position="FLOAT32", normal="FLOAT32", color="FLOAT32", tex_coord="FLOAT32"):
+        return XModelQuantization(ENCODINGS[position],
+                                  ENCODINGS[normal],
+                                  ENCODINGS[color],
+                                  ENCODINGS[tex_coord])
+
+    # whether any attribute is quantized
+    def isEnabled(self):
+        return any(encoding != ENCODING_FLOAT32 for encoding in (self.position_encoding,
+                                                                 self.normal_encoding,
+                                                                 self.color_encoding,
+                                                                 self.tex_coord_encoding))
+
+
+# statistics of the quantization errors of a mesh
+class XModelQuantizationStats:
+    # attributes of instance
+    __slots__ = ("name",
+                 "position_error",
+                 "normal_error",
+                 "color_error",
+                 "tex_coord_error")
+
+    # initialize
+    def __init__(self, name):
+        # string : mesh name
+        self.name = name
+        # float : maximum distance between the original and the quantized position
+        self.position_error = 0.0
+        # float : maximum angle in degrees between the original and the quantized normal
+        self.normal_error = 0.0
+        # float : maximum difference of the components of color
+        self.color_error = 0.0
+        # float : maximum difference of the components of texture coordinate
+        self.tex_coord_error = 0.0
+
+    # get the statistics as a line of text
+    def report(self):
+        return ("%s: position %.6g, normal %.4g deg, color %.4g, texture coordinate %.6g" %
+                (self.name, self.position_error, self.normal_error, self.color_error, self.tex_coord_error))
+
+
+# get the values as a list of float numbers
+def _to_floats(values, length):
+    try:
+        view = memoryview(values)
+        if view.format == "f" and view.ndim == 1:
+            return view[0:length].tolist()
+    except TypeError:
+        pass
+    return [float(value) for value in values[0:length]]
+
+
+# round the value to 32bits float number
+def _round_float32(value):
+    return _FLOAT32.unpack(_FLOAT32.pack(value))[0]
+
+
+# convert the float number to bits of 16bits float number, rounded to the nearest even
+def _float_to_half(value):
+    if value != value:
+        return 0x7e00
+    sign = 0x8000 if math.copysign(1.0, value) < 0.0 else 0
+    value = abs(value)
+    if 65520.0 <= value:
+        return sign | 0x7c00
+    if value < 2.0 ** -14:
+        # subnormal number
+        return sign | int(round(value * 2.0 ** 24))
+    mantissa, exponent = math.frexp(value)
+    # the carry of the rounded mantissa is added to the exponent
+    return sign | (((exponent + 14) << 10) + int(round((2.0 * mantissa - 1.0) * 1024.0)))
+
+
+# convert the bits of 16bits float number to the float number
+def _half_to_float(half):
+    sign = -1.0 if half & 0x8000 else 1.0
+    exponent = (half >> 10) & 0x1f
+    mantissa = half & 0x3ff
+    if exponent == 0:
+        return sign * mantissa * 2.0 ** -24
+    if exponent == 31:
+        return sign * float("inf") if mantissa == 0 else float("nan")
+    return sign * (0x400 | mantissa) * 2.0 ** (exponent - 25)
+
+
+# sign of the value for octahedral mapping, zero is positive
+def _sign(value):
+    return -1.0 if value < 0.0 else 1.0
+
+
+# clamp the value in the range
+def _clamp(value, low, high):
+    return low if value < low else high if high < value else value
+
+
+# map the unit vector to the point in the octahedron
+def _octahedral_encode(x, y, z):
+    length = abs(x) + abs(y) + abs(z)
+    u = x / length
+    v = y / length
+    if z < 0.0:
+        u, v = (1.0 - abs(v)) * _sign(u), (1.0 - abs(u)) * _sign(v)
+    return u, v
+
+
+# map the point in the octahedron to the unit vector
+def _octahedral_decode(u, v):
+    w = 1.0 - abs(u) - abs(v)
+    if w < 0.0:
+        u, v = (1.0 - abs(v)) * _sign(u), (1.0 - abs(u)) * _sign(v)
+    length = math.sqrt(u * u + v * v + w * w)
+    return u / length, v / length, w / length
+
+
+# get the number of the parameters to dequantize the attribute
+def parameter_count(encoding, size):
+    if encoding == ENCODING_INT16:
+        return 2 * size
+    return 0
+
+
+# get the size in bytes of the quantized attribute
+def encoded_size(encoding, size, num):
+    if encoding == ENCODING_FLOAT32:
+        return 4 * size * num
+    if encoding in (ENCODING_FLOAT16, ENCODING_INT16):
+        return 2 * size * num
+    if encoding == ENCODING_OCTAHEDRAL16:
+        return 4 * num
+    if encoding == ENCODING_OCTAHEDRAL8:
+        return 2 * num
+    if encoding == ENCODING_UNORM8:
+        return size * num
+    raise ValueError("unknown encoding of attribute: %d" % encoding)
+
+
+# quantize to 16bits float numbers
+def _quantize_float16(values):
+    values = [_clamp(value, -_FLOAT16_MAX, _FLOAT16_MAX) for value in values]
+    if _HAS_FLOAT16:
+        data = struct.pack("<%de" % len(values), *values)
+        quantized = struct.unpack("<%de" % len(values), data)
+    else:
+        halfs = [_float_to_half(value) for value in values]
+        data = struct.pack("<%dH" % len(halfs), *halfs)
+        quantized = [_half_to_float(half) for half in halfs]
+    error = max((abs(a - b) for a, b in zip(values, quantized)), default=0.0)
+    return (), data, error
+
+
+# quantize to 16bits integers in the bounding box
+def _quantize_int16(values, size, num):
+    offsets = []
+    scales = []
+    for i in range(size):
+        components = values[i::size]
+        low = min(components)
+        high = max(components)
+        offsets.append(_round_float32(0.5 * (low + high)))
+        scales.append(_round_float32(0.5 * (high - low) / _INT16_MAX))
+
+    integers = [0] * (size * num)
+    error = 0.0
+    for i in range(num):
+        index = size * i
+        distance = 0.0
+        for j in range(size):
+            value = values[index + j]
+            if scales[j] != 0.0:
+                integer = int(round(_clamp((value - offsets[j]) / scales[j], -_INT16_MAX, _INT16_MAX)))
+            else:
+                integer = 0
+            integers[index + j] = integer
+            difference = offsets[j] + scales[j] * integer - value
+            distance += difference * difference
+        error = max(error, distance)
+    return tuple(offsets) + tuple(scales), struct.pack("<%dh" % len(integers), *integers), math.sqrt(error)
+
+
+# quantize the unit vectors to the normalized integers in octahedral mapping,
+# the nearest one in the neighbors of the mapped point is selected
+def _quantize_octahedral(values, num, max_value, format):
+    integers = [0] * (2 * num)
+    min_cosine = 1.0
+    for i in range(num):
+        x, y, z = values[3 * i:3 * i + 3]
+        length = math.sqrt(x * x + y * y + z * z)
+        if length == 0.0:
+            continue
+        x /= length
+        y /= length
+        z /= length
+
+        u, v = _octahedral_encode(x, y, z)
+        u *= max_value
+        v *= max_value
+        best = None
+        best_cosine = -2.0
+        for candidate_u in (math.floor(u), math.ceil(u)):
+            for candidate_v in (math.floor(v), math.ceil(v)):
+                dx, dy, dz = _octahedral_decode(candidate_u / max_value, candidate_v / max_value)
+                cosine = x * dx + y * dy + z * dz
+                if best_cosine < cosine:
+                    best = (candidate_u, candidate_v)
+                    best_cosine = cosine
+        integers[2 * i] = int(best[0])
+        integers[2 * i + 1] = int(best[1])
+        min_cosine = min(min_cosine, best_cosine)
+    error = math.degrees(math.acos(_clamp(min_cosine, -1.0, 1.0)))
+    return (), struct.pack("<%d%s" % (len(integers), format), *integers), error
+
+
+# quantize to 8bits unsigned normalized integers
+def _quantize_unorm8(values):
+    integers = [int(round(_clamp(value, 0.0, 1.0) * _UNORM8_MAX)) for value in values]
+    error = max((abs(integer / _UNORM8_MAX - value) for integer, value in zip(integers, values)),
+                default=0.0)
+    return (), bytes(integers), error
+
+
+# quantize the attribute array,
+# and return the tuple of encoding, parameters to dequantize, quantized data and maximum error,
+# the encoding falls back to 32bits float number if it can't be applied to the attribute,
+# and data is None for 32bits float number
+def quantize_attribute(values, size, num, encoding):
+    if encoding == ENCODING_FLOAT32 or num <= 0 or \
+            encoding in (ENCODING_OCTAHEDRAL16, ENCODING_OCTAHEDRAL8) and size != 3:
+        return ENCODING_FLOAT32, (), None, 0.0
+
+    values = _to_floats(values, size * num)
+    if encoding == ENCODING_FLOAT16:
+        params, data, error = _quantize_float16(values)
+    elif encoding == ENCODING_INT16:
+        params, data, error = _quantize_int16(values, size, num)
+    elif encoding == ENCODING_OCTAHEDRAL16:
+        params, data, error = _quantize_octahedral(values, num, _INT16_MAX, "h")
+    elif encoding == ENCODING_OCTAHEDRAL8:
+        params, data, error = _quantize_octahedral(values, num, _INT8_MAX, "b")
+    elif encoding == ENCODING_UNORM8:
+        params, data, error = _quantize_unorm8(values)
+    else:
+        raise ValueError("unknown encoding of attribute: %d" % encoding)
+    return encoding, params, data, error
+
+
+# dequantize the attribute array from the quantized data, and return a list of float numbers
+def dequantize_attribute(data, encoding, params, size, num):
+    length = size * num
+    if encoding == ENCODING_FLOAT32:
+        return list(struct.unpack_from("<%df" % length, data))
+    if encoding == ENCODING_FLOAT16:
+        if _HAS_FLOAT16:
+            return list(struct.unpack_from("<%de" % length, data))
+        return [_half_to_float(half) for half in struct.unpack_from("<%dH" % length, data)]
+    if encoding == ENCODING_INT16:
+        integers = struct.unpack_from("<%dh" % length, data)
+        values = [0.0] * length
+        for j in range(size):
+            offset = params[j]
+            scale = params[size + j]
+            values[j::size] = [offset + scale * integer for integer in integers[j::size]]
+        return values
+    if encoding in (ENCODING_OCTAHEDRAL16, ENCODING_OCTAHEDRAL8):
+        if encoding == ENCODING_OCTAHEDRAL16:
+            max_value = _INT16_MAX
+            integers = struct.unpack_from("<%dh" % (2 * num), data)
+        else:
+            max_value = _INT8_MAX
+            integers = struct.unpack_from("<%db" % (2 * num), data)
+        values = [0.0] * length
+        for i in range(num):
+            values[3 * i:3 * i + 3] = _octahedral_decode(_clamp(integers[2 * i] / max_value, -1.0, 1.0),
+                                                         _clamp(integers[2 * i + 1] / max_value, -1.0, 1.0))
+        return values
+    if encoding == ENCODING_UNORM8:
+        return [integer / _UNORM8_MAX for integer in bytes(data[0:length])]
+    raise ValueError("unknown encoding of attribute: %d" % encoding)
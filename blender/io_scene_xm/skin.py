@@ -0,0 +1,206 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# Vectorized skinning of the meshes with numpy.
+# The weighted indices of variable length are expanded into the matrix of the blend weights
+# of the vertices and the palette once, and the vertices are skinned for the batch of the poses
+# by a product of it and the matrix palettes which blends them without gathering the matrices,
+# the frames are processed in chunks to bound the memory.
+# This module doesn't depend on bpy, the vertices are skinned as the runtime does
+# with XModelSkinUtils.updateMatrixPallet and updateVertices.
+
+import numpy
+
+from io_scene_xm.types import XModelVertexTable
+
+# default limit of the bytes of the gathered matrices of a chunk of the frames
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+# expand the weighted indices of the skin into the indices and the weights of fixed width,
+# the elements over the size of each weighted index and the weights which aren't positive
+# are zero as the runtime skips them, the weights are one if the width is one
+def expand_weighted_indices(skin):
+    num = skin.num_weighted_indices
+    stride = skin.weighted_index_stride
+    if num <= 0 or stride <= 0:
+        return numpy.zeros((max(num, 0), 0), dtype=numpy.intp), numpy.zeros((max(num, 0), 0), dtype=numpy.float32)
+
+    sizes = numpy.minimum(numpy.array(skin.weighted_index_sizes[0:num], dtype=numpy.intp), stride)
+    width = max(int(sizes.max()), 1)
+    indices = numpy.array(skin.indices[0:num * stride], dtype=numpy.intp).reshape(num, stride)[:, 0:width]
+    valid = numpy.arange(width)[None, :] < sizes[:, None]
+    valid &= (0 <= indices) & (indices < skin.num_nodes)
+    if width == 1:
+        weights = valid.astype(numpy.float32)
+    else:
+        weights = numpy.array(skin.weights[0:num * stride], dtype=numpy.float32).reshape(num, stride)[:, 0:width]
+        weights = numpy.where(valid & (0.0 < weights), weights, 0.0).astype(numpy.float32)
+    return numpy.where(valid, indices, 0), weights
+
+
+# get the column of the vertex attribute of the vertices
+def _vertex_column(vertices, name, num):
+    if isinstance(vertices, XModelVertexTable):
+        return numpy.array(getattr(vertices, name)[0:num], dtype=numpy.intp)
+    return numpy.fromiter((getattr(vertex, name) for vertex in vertices[0:num]), dtype=numpy.intp, count=num)
+
+
+# get the vectors of the attribute for each vertex, the vectors of the vertices without the attribute are zero
+def _vertex_vectors(values, size, num_values, column):
+    vectors = numpy.zeros((len(column), 3), dtype=numpy.float32)
+    if values is not None and 0 < num_values and 0 < size:
+        source = numpy.array(values[0:num_values * size], dtype=numpy.float32).reshape(num_values, size)
+        exists = (0 <= column) & (column < num_values)
+        vectors[exists, 0:min(size, 3)] = source[column[exists], 0:min(size, 3)]
+    return vectors
+
+
+# deformer of the vertices of a mesh by its skin for the batch of the poses
+class XModelSkinDeformer:
+    # attributes of instance
+    __slots__ = ("num_vertices",
+                 "positions",
+                 "normals",
+                 "indices",
+                 "weights",
+                 "blend_weights",
+                 "palette_nodes",
+                 "offset_matrices")
+
+    # initialize, the nodes are the nodes of the poses, it's same as XModelPoseEvaluator.nodes
+    def __init__(self, mesh, nodes):
+        # int : number of the vertices
+        self.num_vertices = mesh.num_vertices
+        vertices = mesh.vertices if mesh.vertices is not None else []
+        skin = mesh.skin
+
+        # float32_t[num_vertices][4] : positions of the vertices in the homogeneous coordinates
+        self.positions = numpy.ones((self.num_vertices, 4), dtype=numpy.float32)
+        self.positions[:, 0:3] = _vertex_vectors(mesh.positions, mesh.position_size, mesh.num_positions,
+                                                 _vertex_column(vertices, "position", self.num_vertices))
+        # float32_t[num_vertices][3] : normals of the vertices, or None if the mesh doesn't have them
+        self.normals = None
+        if mesh.normals is not None and 0 < mesh.num_normals:
+            self.normals = _vertex_vectors(mesh.normals, mesh.normal_size, mesh.num_normals,
+                                           _vertex_column(vertices, "normal", self.num_vertices))
+
+        # the palette has the identity matrix at the last, the vertices without the weighted index
+        # keep the positions and the normals by it
+        num_nodes = skin.num_nodes if skin is not None else 0
+        if skin is not None:
+            indices, weights = expand_weighted_indices(skin)
+        else:
+            indices = numpy.zeros((0, 0), dtype=numpy.intp)
+            weights = numpy.zeros((0, 0), dtype=numpy.float32)
+        column = _vertex_column(vertices, "skin_weight", self.num_vertices)
+        skinned = (0 <= column) & (column < len(indices))
+        width = max(indices.shape[1], 1)
+        # int[num_vertices][width] : indices of the matrices of the palette for each vertex
+        self.indices = numpy.zeros((self.num_vertices, width), dtype=numpy.intp)
+        self.indices[:, 0] = num_nodes
+        # float32_t[num_vertices][width] : weights of the matrices of the palette for each vertex
+        self.weights = numpy.zeros((self.num_vertices, width), dtype=numpy.float32)
+        self.weights[:, 0] = 1.0
+        if 0 < indices.shape[1]:
+            self.indices[skinned] = indices[column[skinned]]
+            self.weights[skinned] = weights[column[skinned]]
+
+        # float32_t[num_vertices][num_nodes + 1] : weight of each matrix of the palette for each vertex
+        self.blend_weights = numpy.zeros((self.num_vertices, num_nodes + 1), dtype=numpy.float32)
+        numpy.add.at(self.blend_weights,
+                     (numpy.arange(self.num_vertices)[:, None], self.indices),
+                     self.weights)
+
+        # int[num_nodes] : index of the pose of each bone, or -1 if the bone isn't in the nodes
+        positions = {id(node): index for index, node in enumerate(nodes)}
+        skin_nodes = list(skin.nodes[0:num_nodes]) if skin is not None and skin.nodes is not None else []
+        skin_nodes.extend([None] * (num_nodes - len(skin_nodes)))
+        self.palette_nodes = numpy.array(
+            [positions.get(id(node), -1) if node is not None else -1 for node in skin_nodes],
+            dtype=numpy.intp)
+        # float64_t[num_nodes][4][4] : offset matrices of the bones in the rows and the columns
+        self.offset_matrices = numpy.tile(numpy.identity(4), (len(self.palette_nodes), 1, 1))
+        if skin is not None and skin.offset_matrices is not None:
+            offsets = numpy.array(skin.offset_matrices[0:16 * len(self.palette_nodes)], dtype=numpy.float64)
+            self.offset_matrices[0:len(offsets) // 16] = offsets.reshape(-1, 4, 4).swapaxes(-1, -2)
+
+    # get the matrix palettes of the poses from the world matrices of the nodes,
+    # they are the upper three rows of the matrices and the identity matrix is appended at the last,
+    # the bones out of the nodes are the identity matrix as the runtime does
+    def paletteMatrices(self, world_matrices):
+        num_times = world_matrices.shape[0]
+        palettes = numpy.zeros((num_times, len(self.palette_nodes) + 1, 3, 4), dtype=numpy.float32)
+        palettes[..., [0, 1, 2], [0, 1, 2]] = 1.0
+        bones = numpy.flatnonzero(0 <= self.palette_nodes)
+        if 0 < len(bones):
+            palettes[:, bones] = numpy.matmul(world_matrices[:, self.palette_nodes[bones]],
+                                              self.offset_matrices[bones])[..., 0:3, :]
+        return palettes
+
+    # get the number of the frames of a chunk which blends the matrices within the bytes
+    def chunkSize(self, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        frame_bytes = self.num_vertices * 12 * 4
+        return max(chunk_bytes // frame_bytes, 1) if 0 < frame_bytes else 1
+
+    # skin the vertices for the chunks of the poses, yields the tuples of the index of the first frame,
+    # the positions and the normals of the frames of the chunk, the normals are None if the mesh doesn't have them,
+    # the world matrices are the world matrices of the nodes of each pose, it's same as XModelPose.world_matrices
+    def deformChunks(self, world_matrices, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        chunk_size = self.chunkSize(chunk_bytes)
+        num_palettes = self.blend_weights.shape[1]
+        for start in range(0, world_matrices.shape[0], chunk_size):
+            palettes = self.paletteMatrices(world_matrices[start:start + chunk_size])
+            num_times = palettes.shape[0]
+
+            # blend the matrices of each vertex for all of the frames by a product of the weights and the palettes,
+            # the palettes are affine so blending the matrices is same as blending the transformed vertices
+            # as the runtime does
+            matrices = numpy.matmul(self.blend_weights,
+                                    palettes.transpose(1, 0, 2, 3).reshape(num_palettes, num_times * 12))
+            matrices = matrices.reshape(self.num_vertices, num_times, 3, 4)
+            positions = numpy.einsum("vfij,vj->fvi", matrices, self.positions, optimize=True)
+            normals = None
+            if self.normals is not None:
+                normals = numpy.einsum("vfij,vj->fvi", matrices[..., 0:3], self.normals, optimize=True)
+            yield start, positions, normals
+
+    # skin the vertices for the poses, returns the positions and the normals of all of the frames,
+    # the normals are None if the mesh doesn't have them
+    def deform(self, world_matrices, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        num_times = world_matrices.shape[0]
+        positions = numpy.empty((num_times, self.num_vertices, 3), dtype=numpy.float32)
+        normals = numpy.empty((num_times, self.num_vertices, 3), dtype=numpy.float32) \
+            if self.normals is not None else None
+        for start, chunk_positions, chunk_normals in self.deformChunks(world_matrices, chunk_bytes):
+            positions[start:start + len(chunk_positions)] = chunk_positions
+            if normals is not None:
+                normals[start:start + len(chunk_normals)] = chunk_normals
+        return positions, normals
@@ -0,0 +1,242 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+# Embedding of the texture images into the binary.
+# The images are read once by the worker threads and deduplicated by the hash of the contents,
+# they are downscaled or converted by Pillow if it's available.
+
+import concurrent.futures
+import hashlib
+import io
+
+try:
+    from PIL import Image
+except ImportError:
+    # Pillow isn't available, the images are embedded as they are
+    Image = None
+
+# formats of the embedded images, key is option name, value is format name of Pillow
+IMAGE_FORMATS = {"ORIGINAL": None,
+                 "PNG": "PNG",
+                 "JPEG": "JPEG"}
+
+# quality of the JPEG images
+JPEG_QUALITY = 90
+
+
+# image data to be embedded
+class XModelImageData:
+    # attributes of instance
+    __slots__ = ("digest",
+                 "data",
+                 "source_size",
+                 "width",
+                 "height",
+                 "converted")
+
+    # initialize
+    def __init__(self, digest, data, source_size, width=0, height=0, converted=False):
+        # bytes : hash of the source image file
+        self.digest = digest
+        # bytes : image file to be embedded
+        self.data = data
+        # int : size of the source image file
+        self.source_size = source_size
+        # int : width of the embedded image, it's zero if it's unknown
+        self.width = width
+        # int : height of the embedded image, it's zero if it's unknown
+        self.height = height
+        # bool : whether the image is downscaled or converted
+        self.converted = converted
+
+
+# read the image file, the source is a file path or the bytes of packed file
+def read_image_source(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    with open(source, "rb") as file:
+        return file.read()
+
+
+# read the image and downscale it to fit in max size or convert it to the format,
+# max size is zero and image format is None for keeping the image as it is
+def load_image_data(source, max_size=0, image_format=None):
+    source_data = read_image_source(source)
+    digest = hashlib.sha1(source_data).digest()
+    if Image is None or (max_size <= 0 and image_format is None):
+        return XModelImageData(digest, source_data, len(source_data))
+
+    with Image.open(io.BytesIO(source_data)) as image:
+        image.load()
+        width, height = image.size
+        output_format = image_format or image.format
+        if (max(width, height) <= max_size or max_size <= 0) and output_format == image.format:
+            return XModelImageData(digest, source_data, len(source_data), width, height)
+
+        # downscale with keeping the aspect ratio
+        if 0 < max_size < max(width, height):
+            scale = max_size / max(width, height)
+            image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))),
+                                 Image.LANCZOS)
+
+        # JPEG doesn't have the alpha channel
+        options = {}
+        if output_format == "JPEG":
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            options["quality"] = JPEG_QUALITY
+        elif output_format == "PNG":
+            options["optimize"] = True
+
+        writer = io.BytesIO()
+        image.save(writer, output_format, **options)
+        return XModelImageData(digest, writer.getvalue(), len(source_data),
+                               image.size[0], image.size[1], True)
+
+
+# embedder of the textures, the images are loaded in parallel while the other data is converted,
+# and the textures of the same image are merged into one of them by finish
+class XModelTextureEmbedder:
+    # initialize, if num_workers is positive, the images are loaded by the worker threads
+    def __init__(self, num_workers=0, max_size=0, image_format="ORIGINAL"):
+        self.max_size = max_size
+        self.image_format = IMAGE_FORMATS[image_format]
+
+        # int : number of the textures
+        self.num_textures = 0
+        # int : number of the image files read
+        self.num_images = 0
+        # int : number of the embedded images after deduplication
+        self.num_embedded = 0
+        # int : number of the images downscaled or converted
+        self.num_converted = 0
+        # int : number of the images failed to read
+        self.num_failed = 0
+        # int : total size of the source image files
+        self.source_bytes = 0
+        # int : total size of the embedded images
+        self.embedded_bytes = 0
+
+        # thread pool to load the images
+        self.__pool = None
+        if 0 < num_workers:
+            self.__pool = concurrent.futures.ThreadPoolExecutor(num_workers)
+        # loaded images, key is source key, value is future or image data
+        self.__images = {}
+        # tuples of texture and source key in order of adding
+        self.__textures = []
+
+    # add the texture to be embedded with the image source,
+    # the source is a file path or the bytes of packed file, key identifies the same source
+    def add(self, texture, source, key):
+        self.__textures.append((texture, key))
+        if key in self.__images:
+            return
+
+        if self.__pool is not None:
+            self.__images[key] = self.__pool.submit(load_image_data,
+                                                    source,
+                                                    self.max_size,
+                                                    self.image_format)
+        else:
+            try:
+                self.__images[key] = load_image_data(source, self.max_size, self.image_format)
+            except (OSError, ValueError) as error:
+                self.__images[key] = error
+
+    # get the loaded image, or None if it's failed to read
+    def __getImage(self, key):
+        value = self.__images[key]
+        if isinstance(value, concurrent.futures.Future):
+            try:
+                value = value.result()
+            except (OSError, ValueError) as error:
+                value = error
+            self.__images[key] = value
+        if isinstance(value, Exception):
+            return None
+        return value
+
+    # set the images to the textures, and return the map of the duplicated textures,
+    # key is texture, value is the texture which has the same image
+    def finish(self):
+        try:
+            replaced = {}
+            embedded = {}
+            for key in self.__images:
+                image = self.__getImage(key)
+                if image is None:
+                    self.num_failed += 1
+                    continue
+                self.num_images += 1
+                self.source_bytes += image.source_size
+                if image.converted:
+                    self.num_converted += 1
+
+            for texture, key in self.__textures:
+                self.num_textures += 1
+                image = self.__getImage(key)
+                if image is None:
+                    continue
+
+                # merge the texture into the other texture of the same image
+                other = embedded.get(image.digest)
+                if other is not None:
+                    if other is not texture:
+                        replaced[texture] = other
+                    continue
+                embedded[image.digest] = texture
+
+                texture.data = image.data
+                texture.data_size = len(image.data)
+                texture.x_size = image.width
+                texture.y_size = image.height
+                self.num_embedded += 1
+                self.embedded_bytes += texture.data_size
+            return replaced
+        finally:
+            if self.__pool is not None:
+                self.__pool.shutdown()
+                self.__pool = None
+            self.__images.clear()
+            self.__textures.clear()
+
+    # get the text of statistics
+    def report(self):
+        return ("Textures: %d textures, %d images read, %d embedded, %d converted, %d failed, "
+                "%d bytes to %d bytes" %
+                (self.num_textures,
+                 self.num_images,
+                 self.num_embedded,
+                 self.num_converted,
+                 self.num_failed,
+                 self.source_bytes,
+                 self.embedded_bytes))
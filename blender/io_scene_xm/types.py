@@ -28,6 +28,7 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 
+import array
 import math
 
 
@@ -44,6 +45,15 @@ def _identity_matrix():
             0.0, 0.0, 0.0, 1.0]
 
 
+# convert the values to the array of type code, or return it if already converted
+def _compact_array(type_code, values):
+    if values is None:
+        return None
+    if isinstance(values, array.array) and values.typecode == type_code:
+        return values
+    return array.array(type_code, values)
+
+
 # Base structure of xModel
 class XModelStructure:
     # structure of undefined
@@ -103,6 +113,10 @@ class XModelStructure:
     # number of slot for animation blend
     NUM_BLEND_SLOT = 2
 
+    # attributes of instance
+    __slots__ = ("structure_type",
+                 "__weakref__")
+
     # initialize
     def __init__(self, structure_type):
         # const int32_t : type of structure
@@ -111,6 +125,10 @@ class XModelStructure:
 
 # User data structure of xModel
 class XModelUserData:
+    # attributes of instance
+    __slots__ = ("data_size",
+                 "data")
+
     # initialize
     def __init__(self):
         # int32_t : size of data
@@ -122,6 +140,9 @@ class XModelUserData:
 
 # Parameter structure of xModel
 class XModelParameter(XModelStructure):
+    # attributes of instance
+    __slots__ = ()
+
     # initialize
     def __init__(self, structure_type):
         super(XModelParameter, self).__init__(structure_type)
@@ -129,6 +150,10 @@ class XModelParameter(XModelStructure):
 
 # 32bit float number array structure of xModel
 class XModelFloatArray(XModelParameter):
+    # attributes of instance
+    __slots__ = ("size",
+                 "values")
+
     # initialize
     def __init__(self, structure_type, size):
         super(XModelFloatArray, self).__init__(structure_type)
@@ -142,6 +167,9 @@ class XModelFloatArray(XModelParameter):
 
 # Axis rotate transform structure of xModel
 class XModelAxisRotate(XModelFloatArray):
+    # attributes of instance
+    __slots__ = ()
+
     # initialize
     def __init__(self):
         super(XModelAxisRotate, self).__init__(self.TYPE_AXIS_ROTATE, self.SIZE_AXIS_ROTATE)
@@ -149,6 +177,9 @@ class XModelAxisRotate(XModelFloatArray):
 
 # Quaternion transform structure fo xModel
 class XModelQuaternion(XModelFloatArray):
+    # attributes of instance
+    __slots__ = ()
+
     # initialize
     def __init__(self):
         super(XModelQuaternion, self).__init__(self.TYPE_QUATERNION, self.SIZE_QUATERNION)
@@ -156,6 +187,9 @@ class XModelQuaternion(XModelFloatArray):
 
 # Scale transform structure of xModel
 class XModelScale(XModelFloatArray):
+    # attributes of instance
+    __slots__ = ()
+
     # initialize
     def __init__(self):
         super(XModelScale, self).__init__(self.TYPE_SCALE, self.SIZE_SCALE)
@@ -163,6 +197,9 @@ class XModelScale(XModelFloatArray):
 
 # Translate transform structure of xModel
 class XModelTranslate(XModelFloatArray):
+    # attributes of instance
+    __slots__ = ()
+
     # initialize
     def __init__(self):
         super(XModelTranslate, self).__init__(self.TYPE_TRANSLATE, self.SIZE_TRANSLATE)
@@ -170,6 +207,9 @@ class XModelTranslate(XModelFloatArray):
 
 # Matrix transform structure of xModel
 class XModelMatrix(XModelFloatArray):
+    # attributes of instance
+    __slots__ = ()
+
     # initialize
     def __init__(self):
         super(XModelMatrix, self).__init__(self.TYPE_MATRIX, self.SIZE_MATRIX)
@@ -177,6 +217,10 @@ class XModelMatrix(XModelFloatArray):
 
 # Extensible structure of xModel
 class XModelExtensible(XModelStructure):
+    # attributes of instance
+    __slots__ = ("user_data",
+                 "user_object")
+
     # initialize
     def __init__(self, structure_type):
         super(XModelExtensible, self).__init__(structure_type)
@@ -192,6 +236,20 @@ class XModelExtensible(XModelStructure):
 
 # Container structure of xModel
 class XModelContainer(XModelExtensible):
+    # attributes of instance
+    __slots__ = ("name",
+                 "num_textures",
+                 "textures",
+                 "num_materials",
+                 "materials",
+                 "num_meshs",
+                 "meshs",
+                 "num_nodes",
+                 "nodes",
+                 "time_rate",
+                 "num_animation_sets",
+                 "animation_sets")
+
     # initialize
     def __init__(self):
         super(XModelContainer, self).__init__(self.TYPE_CONTAINER)
@@ -230,6 +288,16 @@ class XModelContainer(XModelExtensible):
 
 # Texture structure of xModel
 class XModelTexture(XModelExtensible):
+    # attributes of instance
+    __slots__ = ("name",
+                 "ref",
+                 "data_size",
+                 "data",
+                 "texture",
+                 "x_size",
+                 "y_size",
+                 "z_size")
+
     # initialize
     def __init__(self):
         super(XModelTexture, self).__init__(self.TYPE_TEXTURE)
@@ -267,6 +335,22 @@ class XModelMaterial(XModelExtensible):
     DRAW_MODE_FACE_FRONT_AND_BACK_BITS = (DRAW_MODE_FACE_FRONT_BITS |
                                           DRAW_MODE_FACE_BACK_BITS)
 
+    # attributes of instance
+    __slots__ = ("name",
+                 "emissive",
+                 "ambient",
+                 "diffuse",
+                 "specular",
+                 "shininess",
+                 "bump",
+                 "emissive_map",
+                 "ambient_map",
+                 "diffuse_map",
+                 "specular_map",
+                 "shininess_map",
+                 "bump_map",
+                 "draw_mode")
+
     # initialize
     def __init__(self):
         super(XModelMaterial, self).__init__(self.TYPE_MATERIAL)
@@ -306,6 +390,42 @@ class XModelMaterial(XModelExtensible):
 
 # Mesh structure of xModel
 class XModelMesh(XModelExtensible):
+    # attributes of instance
+    __slots__ = ("name",
+                 "num_positions",
+                 "position_size",
+                 "positions",
+                 "num_normals",
+                 "normal_size",
+                 "normals",
+                 "num_colors",
+                 "color_size",
+                 "colors",
+                 "num_tex_coords",
+                 "tex_coord_size",
+                 "tex_coords",
+                 "skin",
+                 "num_vertices",
+                 "vertices",
+                 "num_materials",
+                 "materials",
+                 "num_elements",
+                 "elements",
+                 "num_face_indices",
+                 "face_index_size",
+                 "face_reversed",
+                 "face_offsets",
+                 "face_sizes",
+                 "face_indices",
+                 "interleaved_stride",
+                 "interleaved_types",
+                 "interleaved_sizes",
+                 "interleaved_offsets",
+                 "interleaved_vertices",
+                 "parent",
+                 "vertex_buffer",
+                 "element_buffer")
+
     # initialize
     def __init__(self):
         super(XModelMesh, self).__init__(self.TYPE_MESH)
@@ -359,6 +479,30 @@ class XModelMesh(XModelExtensible):
         # XModelElement[] : element array
         self.elements = None
 
+        # int32_t : number of vertex indices of the triangulated faces
+        self.num_face_indices = 0
+        # int8_t : size of vertex index of the triangulated faces in bytes, 2 or 4
+        self.face_index_size = 0
+        # bool : true if the triangulated faces are reversed from the elements
+        self.face_reversed = False
+        # int32_t[] : offsets of the triangulated faces of each material, the last is the default material
+        self.face_offsets = None
+        # int32_t[] : numbers of vertex indices of the triangulated faces of each material
+        self.face_sizes = None
+        # uint16_t[] or uint32_t[] : vertex indices of the triangulated faces
+        self.face_indices = None
+
+        # int16_t : size of a interleaved vertex in bytes, 0 if the vertices aren't interleaved
+        self.interleaved_stride = 0
+        # int8_t[] : data type of each attribute of the interleaved vertex
+        self.interleaved_types = None
+        # int8_t[] : number of the components of each attribute of the interleaved vertex
+        self.interleaved_sizes = None
+        # int16_t[] : offset of each attribute in the interleaved vertex, -1 if the vertex doesn't have it
+        self.interleaved_offsets = None
+        # uint8_t[] : interleaved vertices
+        self.interleaved_vertices = None
+
         # work variable
 
         # XModelNone : parent of this mesh
@@ -369,6 +513,18 @@ class XModelMesh(XModelExtensible):
         # any object : element buffer object
         self.element_buffer = None
 
+    # convert the arrays to compact representations,
+    # number arrays to array.array and vertices to XModelVertexTable
+    def compact(self):
+        self.positions = _compact_array("f", self.positions)
+        self.normals = _compact_array("f", self.normals)
+        self.colors = _compact_array("f", self.colors)
+        self.tex_coords = _compact_array("f", self.tex_coords)
+        if self.skin is not None:
+            self.skin.compact()
+        if self.vertices is not None and not isinstance(self.vertices, XModelVertexTable):
+            self.vertices = XModelVertexTable.fromVertices(self.vertices)
+
 
 # Skin data structure of xModel
 class XModelSkin:
@@ -381,6 +537,16 @@ class XModelSkin:
     # 3 dimensions weight
     SIZE_WEIGHTED4 = 4
 
+    # attributes of instance
+    __slots__ = ("num_weighted_indices",
+                 "weighted_index_stride",
+                 "weighted_index_sizes",
+                 "indices",
+                 "weights",
+                 "num_nodes",
+                 "offset_matrices",
+                 "nodes")
+
     # initialize
     def __init__(self):
         # int32_t : number of weighted indices
@@ -404,9 +570,23 @@ class XModelSkin:
         # XModelNodes[] : nodes as the bones
         self.nodes = None  # elements is weak reference
 
+    # convert the number arrays to array.array
+    def compact(self):
+        self.weighted_index_sizes = _compact_array("B", self.weighted_index_sizes)
+        self.indices = _compact_array("h", self.indices)
+        self.weights = _compact_array("f", self.weights)
+        self.offset_matrices = _compact_array("f", self.offset_matrices)
+
 
 # Vertex data structure of xModel
 class XModelVertex:
+    # attributes of instance
+    __slots__ = ("position",
+                 "normal",
+                 "color",
+                 "tex_coord",
+                 "skin_weight")
+
     # initialize
     def __init__(self):
         # int32_t : position index
@@ -420,13 +600,21 @@ class XModelVertex:
         # int32_t : skinning weight index
         self.skin_weight = -1
 
-    def __hash__(self):
-        return (self.position ^
-                self.normal ^
-                self.color ^
-                self.tex_coord ^
+    # get the key of the indices, it's same as the key of the other vertex of the same indices
+    def key(self):
+        return (self.position,
+                self.normal,
+                self.color,
+                self.tex_coord,
                 self.skin_weight)
 
+    def __hash__(self):
+        return hash((self.position,
+                     self.normal,
+                     self.color,
+                     self.tex_coord,
+                     self.skin_weight))
+
     def __eq__(self, other):
         if isinstance(other, XModelVertex):
             return (self.position == other.position and
@@ -437,8 +625,88 @@ class XModelVertex:
         return False
 
 
+# Vertex table structure of xModel, it stores the vertex indices by columns
+class XModelVertexTable:
+    # attributes of instance
+    __slots__ = ("position",
+                 "normal",
+                 "color",
+                 "tex_coord",
+                 "skin_weight")
+
+    # initialize
+    def __init__(self, num_vertices=0):
+        # int32_t[] : position indices
+        self.position = array.array("i", [-1]) * num_vertices
+        # int32_t[] : normal indices
+        self.normal = array.array("i", [-1]) * num_vertices
+        # int32_t[] : color indices
+        self.color = array.array("i", [-1]) * num_vertices
+        # int32_t[] : texture coordinate indices
+        self.tex_coord = array.array("i", [-1]) * num_vertices
+        # int32_t[] : skinning weight indices
+        self.skin_weight = array.array("i", [-1]) * num_vertices
+
+    # create the table from the vertex array
+    @classmethod
+    def fromVertices(cls, vertices):
+        table = cls()
+        table.position = array.array("i", [vertex.position for vertex in vertices])
+        table.normal = array.array("i", [vertex.normal for vertex in vertices])
+        table.color = array.array("i", [vertex.color for vertex in vertices])
+        table.tex_coord = array.array("i", [vertex.tex_coord for vertex in vertices])
+        table.skin_weight = array.array("i", [vertex.skin_weight for vertex in vertices])
+        return table
+
+    # append the vertex
+    def append(self, vertex):
+        self.position.append(vertex.position)
+        self.normal.append(vertex.normal)
+        self.color.append(vertex.color)
+        self.tex_coord.append(vertex.tex_coord)
+        self.skin_weight.append(vertex.skin_weight)
+
+    def __len__(self):
+        return len(self.position)
+
+    # get the vertex at index as a new vertex structure
+    def __getitem__(self, index):
+        vertex = XModelVertex()
+        vertex.position = self.position[index]
+        vertex.normal = self.normal[index]
+        vertex.color = self.color[index]
+        vertex.tex_coord = self.tex_coord[index]
+        vertex.skin_weight = self.skin_weight[index]
+        return vertex
+
+    # set the vertex structure at index
+    def __setitem__(self, index, vertex):
+        self.position[index] = vertex.position
+        self.normal[index] = vertex.normal
+        self.color[index] = vertex.color
+        self.tex_coord[index] = vertex.tex_coord
+        self.skin_weight[index] = vertex.skin_weight
+
+    def __iter__(self):
+        for i in range(len(self.position)):
+            yield self[i]
+
+    # get the keys of the vertices without creating the vertex structures
+    def keys(self):
+        return zip(self.position,
+                   self.normal,
+                   self.color,
+                   self.tex_coord,
+                   self.skin_weight)
+
+
 # Element data structure of xModel
 class XModelElement:
+    # attributes of instance
+    __slots__ = ("material",
+                 "num_vertices",
+                 "vertices")
+
     # initialize
     def __init__(self):
         # int16_t : material index
@@ -448,16 +716,19 @@ class XModelElement:
         # int32_t[] : vertex index array
         self.vertices = None
 
+    # get the key of the material and the vertex indices,
+    # the vertex indices are compared by value even if they are list or array
+    def key(self):
+        return (self.material,
+                self.num_vertices,
+                tuple(self.vertices) if self.vertices is not None else None)
+
     def __hash__(self):
-        return (self.material ^
-                self.num_vertices ^
-                hash(self.vertices) if self.vertices is not None else 0)
+        return hash(self.key())
 
     def __eq__(self, other):
         if isinstance(other, XModelElement):
-            return (self.material == other.material and
-                    self.num_vertices == other.num_vertices and
-                    self.vertices == other.vertices)
+            return self.key() == other.key()
         return False
 
 
@@ -474,6 +745,25 @@ class XModelNode(XModelExtensible):
     # number of transforms
     NUM_TRANSFORMS = 4
 
+    # attributes of instance
+    __slots__ = ("name",
+                 "connected",
+                 "ik_lock_axis",
+                 "ik_limit_angle",
+                 "ik_min_angle",
+                 "ik_max_angle",
+                 "bone_tail",
+                 "transforms",
+                 "num_inverse_kinematics",
+                 "inverse_kinematics",
+                 "num_meshs",
+                 "meshs",
+                 "num_children",
+                 "children",
+                 "parent",
+                 "offset_matrix",
+                 "combined_matrix")
+
     # initialize
     def __init__(self):
         super(XModelNode, self).__init__(self.TYPE_NODE)
@@ -527,6 +817,12 @@ class XModelNode(XModelExtensible):
 
 # Kinematic structure of xModel
 class XModelKinematic(XModelStructure):
+    # attributes of instance
+    __slots__ = ("target",
+                 "max_iterations",
+                 "chain_length",
+                 "influence")
+
     # initialize
     def __init__(self):
         super(XModelKinematic, self).__init__(self.TYPE_KINEMATIC)
@@ -543,6 +839,19 @@ class XModelKinematic(XModelStructure):
 
 # Animation structure of xModel
 class XModelAnimation(XModelExtensible):
+    # attributes of instance
+    __slots__ = ("name",
+                 "target",
+                 "index",
+                 "num_keys",
+                 "keys",
+                 "frame_start",
+                 "num_frames",
+                 "frame_size",
+                 "frames",
+                 "num_children",
+                 "children")
+
     # initialize
     def __init__(self):
         super(XModelAnimation, self).__init__(self.TYPE_ANIMATION)
@@ -560,6 +869,15 @@ class XModelAnimation(XModelExtensible):
         # XModelAnimationKey[] : array of keys
         self.keys = None
 
+        # int32_t : frame of the first sampled values
+        self.frame_start = 0
+        # int32_t : number of the sampled frames, the frames are at the time rate of the container
+        self.num_frames = 0
+        # int8_t : number of the values of a frame
+        self.frame_size = 0
+        # float32_t[frame_size * num_frames] : sampled values of the frames
+        self.frames = None
+
         # int16_t : number of children
         self.num_children = 0
         # XModelAnimation[] : array of children
@@ -575,6 +893,16 @@ class XModelAnimationKey(XModelStructure):
     # interpolate by bezier
     INTERPOLATE_BEZIER = 1
 
+    # attributes of instance
+    __slots__ = ("interpolate",
+                 "time",
+                 "before_time",
+                 "after_time",
+                 "value_size",
+                 "value",
+                 "before_value",
+                 "after_value")
+
     # initialize
     def __init__(self):
         super(XModelAnimationKey, self).__init__(self.TYPE_ANIMATION_KEY)
@@ -601,6 +929,11 @@ class XModelAnimationKey(XModelStructure):
 
 # Animation set structure of xModel
 class XModelAnimationSet(XModelExtensible):
+    # attributes of instance
+    __slots__ = ("name",
+                 "num_animations",
+                 "animations")
+
     # initialize
     def __init__(self):
         super(XModelAnimationSet, self).__init__(self.TYPE_ANIMATION_SET)
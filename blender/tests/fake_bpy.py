@@ -0,0 +1,224 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# Lightweight stand-ins of the blender modules for the tests outside of blender.
+# install() registers the fake bpy, bpy_extras and mathutils modules unless blender's ones are importable,
+# and create_mesh() creates the mesh data which has the collections read by foreach_get.
+
+import importlib.util
+import random
+import sys
+import types
+
+import numpy
+
+
+# round the number to single precision as blender stores it
+def _float32(value):
+    return float(numpy.float32(value))
+
+
+# vector of mathutils, the components are in single precision
+class Vector(tuple):
+
+    def __new__(cls, values=(0.0, 0.0, 0.0)):
+        return tuple.__new__(cls, [_float32(value) for value in values])
+
+
+# quaternion of mathutils in the order of w, x, y and z
+class Quaternion(list):
+
+    def __init__(self, values=(1.0, 0.0, 0.0, 0.0)):
+        super(Quaternion, self).__init__(values)
+
+    def dot(self, other):
+        return sum(a * b for a, b in zip(self, other))
+
+    def negate(self):
+        self[:] = [-value for value in self]
+
+
+# matrix of mathutils, the products are in single precision and the sum of them is in double precision
+class Matrix:
+
+    # initialize by the rows, or the identity matrix
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+        self.rows = [[_float32(value) for value in row] for row in rows]
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # get the upper left 3x3 matrix
+    def to_3x3(self):
+        return Matrix([row[0:3] for row in self.rows[0:3]])
+
+    # get the 4x4 matrix
+    def to_4x4(self):
+        return self
+
+    # dot product of the row and the column in the same arithmetic as blender
+    @staticmethod
+    def __dot(row, column):
+        dot = 0.0
+        for a, b in zip(row, column):
+            dot += float(numpy.float32(a) * numpy.float32(b))
+        return _float32(dot)
+
+    def __mul__(self, other):
+        if isinstance(other, Matrix):
+            columns = list(zip(*other.rows))
+            return Matrix([[self.__dot(row, column) for column in columns] for row in self.rows])
+        values = list(other)
+        size = len(values)
+        if size < len(self.rows[0]):
+            values.append(1.0)
+        return Vector([self.__dot(row, values) for row in self.rows][0:size])
+
+
+# object which has the attributes given by the keywords
+class Namespace:
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+# collection of blender, which reads the attribute of all of the items by foreach_get
+class Collection(list):
+
+    def foreach_get(self, attribute, values):
+        flat = []
+        for item in self:
+            value = getattr(item, attribute)
+            if isinstance(value, (tuple, list)):
+                flat.extend(value)
+            else:
+                flat.append(value)
+        values[:] = numpy.asarray(flat, dtype=values.dtype)
+
+
+# identity function of the properties of operator
+def _property(**options):
+    return options.get("default")
+
+
+# create the fake modules of blender
+def _create_modules():
+    bpy = types.ModuleType("bpy")
+    bpy.types = types.ModuleType("bpy.types")
+    bpy.types.Operator = type("Operator", (), {})
+    bpy.types.PoseBone = type("PoseBone", (), {})
+    bpy.props = types.ModuleType("bpy.props")
+    for name in ("BoolProperty", "IntProperty", "FloatProperty", "StringProperty", "EnumProperty"):
+        setattr(bpy.props, name, _property)
+    bpy.path = types.ModuleType("bpy.path")
+    bpy.path.abspath = lambda path, start=None, library=None: path
+    bpy.utils = types.ModuleType("bpy.utils")
+    bpy.app = Namespace(binary_path="blender")
+    bpy.data = Namespace(actions=[])
+    bpy.context = None
+
+    bpy_extras = types.ModuleType("bpy_extras")
+    bpy_extras.io_utils = types.ModuleType("bpy_extras.io_utils")
+    bpy_extras.io_utils.ImportHelper = type("ImportHelper", (), {})
+    bpy_extras.io_utils.ExportHelper = type("ExportHelper", (), {})
+    bpy_extras.io_utils.axis_conversion = lambda *args, **options: Matrix()
+
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Matrix = Matrix
+    mathutils.Vector = Vector
+    mathutils.Quaternion = Quaternion
+
+    return {"bpy": bpy,
+            "bpy.types": bpy.types,
+            "bpy.props": bpy.props,
+            "bpy.path": bpy.path,
+            "bpy.utils": bpy.utils,
+            "bpy_extras": bpy_extras,
+            "bpy_extras.io_utils": bpy_extras.io_utils,
+            "mathutils": mathutils}
+
+
+# register the fake modules of blender unless the blender's ones are importable
+def install():
+    if "bpy" in sys.modules or importlib.util.find_spec("bpy") is not None:
+        return
+    sys.modules.update(_create_modules())
+
+
+# create the mesh data of the grid of quads like the work mesh of blender,
+# the positions, normals, texture coordinates and colors are chosen from few values to be shared,
+# the vertices are in 0 to 2 of 6 vertex groups, and the half of the quads are triangles if ngons is true
+def create_mesh(width=8, height=6, seed=1, colors=True, uvs=True, groups=True, ngons=False):
+    rnd = random.Random(seed)
+    vertices = Collection()
+    for y in range(height + 1):
+        for x in range(width + 1):
+            co = (_float32(x * 0.1), _float32(y * 0.1), rnd.choice([0.0, -0.0, 0.5]))
+            if rnd.random() < 0.7:
+                normal = (0.0, 0.0, 1.0)
+            else:
+                normal = (_float32(rnd.random()), 0.0, _float32(rnd.random()))
+            vertex_groups = []
+            if groups:
+                for group in rnd.sample(range(6), rnd.randrange(3)):
+                    vertex_groups.append(Namespace(group=group, weight=rnd.choice([0.0, 0.25, 0.5, 1.0])))
+            vertices.append(Namespace(co=co, normal=normal, groups=vertex_groups))
+
+    polygons = Collection()
+    loops = Collection()
+    uv_data = Collection()
+    color_data = Collection()
+    for y in range(height):
+        for x in range(width):
+            first = y * (width + 1) + x
+            indices = [first, first + 1, first + width + 2, first + width + 1]
+            if ngons and rnd.random() < 0.5:
+                indices = indices[0:3]
+            polygons.append(Namespace(loop_start=len(loops),
+                                      loop_total=len(indices),
+                                      material_index=rnd.randrange(3),
+                                      vertices=indices))
+            for index in indices:
+                loops.append(Namespace(vertex_index=index))
+                uv_data.append(Namespace(uv=(rnd.choice([0.0, 0.5, 1.0]), rnd.choice([0.0, 0.25]))))
+                color_data.append(Namespace(color=(rnd.choice([0.0, 1.0]), 0.5, 0.5)))
+
+    mesh = Namespace(vertices=vertices, polygons=polygons, loops=loops)
+    mesh.uv_layers = Namespace(active=Namespace(data=uv_data) if uvs else None)
+    mesh.vertex_colors = Namespace(active=Namespace(data=color_data) if colors else None)
+    return mesh
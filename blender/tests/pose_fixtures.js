@@ -0,0 +1,151 @@
+/**
+ * @license
+ *
+ * Copyright (c) 2016, Syuuhei Kuno
+ * All rights reserved.
+ *
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * 2. Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * 3. Neither the name of xplain_for_js nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+ * FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ * DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ * CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+ * OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+// Write the poses of the runtime to data/poses.json for test_pose.py,
+// the combined matrices are evaluated by XModelContainerUtils.setAnimation and updateCombination.
+//
+// usage: node tests/pose_fixtures.js
+
+"use strict";
+
+var fs = require("fs");
+var path = require("path");
+var vm = require("vm");
+
+// sources of the runtime in the order of the compile
+var SOURCES = [
+    "xplain_core.js",
+    "utils_system.js",
+    "utils_math.js",
+    "utils_array.js",
+    "utils_string.js",
+    "utils_inflate.js",
+    "math_geometry.js",
+    "math_matrix4x4.js",
+    "math_matrix4x4_dim.js",
+    "math_quaternion.js",
+    "math_quaternion_dim.js",
+    "math_vector3.js",
+    "xmodel_type.js",
+    "xmodel_codec.js",
+    "xmodel_decoder.js",
+    "xmodel_utils_material.js",
+    "xmodel_utils_mesh.js",
+    "xmodel_utils_skin.js",
+    "xmodel_utils_parameter.js",
+    "xmodel_utils_kinematics.js",
+    "xmodel_utils_animation.js",
+    "xmodel_utils_node.js",
+    "xmodel_utils_container.js"];
+
+var DATA_DIRECTORY = path.join(__dirname, "data");
+var SOURCE_DIRECTORY = path.join(__dirname, "..", "..", "src");
+
+// models and jobs, the model is relative to the data directory and the times are in seconds
+var MODELS = [
+    {
+        model: "poses.xm",
+        jobs: [
+            {name: "keys", animation: 0, loop: false, times: [0.0, 0.05, 0.2, 0.35, 0.5, 0.61, 0.9, 1.2, 1.33]},
+            {name: "clamp", animation: 0, loop: false, times: [1.5, 3.0]},
+            {name: "loop", animation: 1, loop: true, times: [0.0, 0.1, 0.35, 0.5, 0.95]}
+        ]
+    },
+    {
+        model: path.join("..", "..", "..", "demo", "common_resources", "3d_model", "hackadoll_no2", "model.xm"),
+        nodes: 16,
+        jobs: [
+            {name: "keys", animation: 0, loop: false, times: [0.0, 0.3, 0.75, 1.1]},
+            {name: "static", animation: 1, loop: false, times: [0.1, 0.5, 0.9]},
+            {name: "loop", animation: 2, loop: true, times: [0.2, 0.6, 30.4]}
+        ]
+    }];
+
+// load the runtime into the sandbox
+var loadRuntime = function () {
+    var code = SOURCES.map(function (name) {
+        return fs.readFileSync(path.join(SOURCE_DIRECTORY, name), "utf8");
+    }).join("\n");
+    var sandbox = {module: {exports: {}}, console: console};
+    vm.runInNewContext(code, sandbox);
+    return sandbox.module.exports;
+};
+
+// get the nodes in the depth first order
+var depthFirstNodes = function (nodes, num_nodes, ordered) {
+    for (var i = 0; i < num_nodes; ++i) {
+        ordered.push(nodes[i]);
+        depthFirstNodes(nodes[i].children, nodes[i].num_children, ordered);
+    }
+    return ordered;
+};
+
+var main = function () {
+    var xpl = loadRuntime();
+    var fixtures = [];
+    MODELS.forEach(function (model) {
+        var buf = fs.readFileSync(path.join(DATA_DIRECTORY, model.model));
+        var container = new xpl.XModelDecoder().decode(buf.buffer.slice(buf.byteOffset, buf.byteOffset + buf.byteLength));
+        var nodes = depthFirstNodes(container.nodes, container.num_nodes, []);
+
+        // the nodes are sampled evenly if the model is large
+        var indices = [];
+        var num_nodes = model.nodes != null ? Math.min(model.nodes, nodes.length) : nodes.length;
+        for (var i = 0; i < num_nodes; ++i) {
+            indices.push(Math.floor(i * nodes.length / num_nodes));
+        }
+
+        model.jobs.forEach(function (job) {
+            var matrices = [];
+            job.times.forEach(function (time) {
+                xpl.XModelContainerUtils.resetTransforms(container);
+                xpl.XModelContainerUtils.setAnimation(container, job.animation, time, job.loop);
+                xpl.XModelContainerUtils.updateCombination(container);
+                indices.forEach(function (index) {
+                    Array.prototype.push.apply(matrices, Array.prototype.slice.call(nodes[index].combined_matrix, 0, 16));
+                });
+            });
+            fixtures.push({
+                model: model.model,
+                name: job.name,
+                animation: job.animation,
+                loop: job.loop,
+                times: job.times,
+                nodes: indices,
+                matrices: matrices
+            });
+        });
+    });
+    fs.writeFileSync(path.join(DATA_DIRECTORY, "poses.json"), JSON.stringify(fixtures, null, 1) + "\n");
+};
+
+main();
@@ -0,0 +1,373 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import math
+import unittest
+
+from tests import fake_bpy
+
+fake_bpy.install()
+
+import bpy
+from bpy.types import PoseBone
+from mathutils import Quaternion, Vector
+from io_scene_xm import export_xm
+from io_scene_xm.types import (XModelNode,
+                               XModelQuaternion,
+                               XModelScale,
+                               XModelTranslate)
+
+# lengths of the bones of the chain of the inverse kinematics
+_LENGTHS = (1.0, 0.8)
+
+# keys of the location of the target of the inverse kinematics, all of them are in reach of the chain
+_TARGET_KEYS = ([(1.0, 1.2), (8.0, 0.5), (20.0, 1.5)],
+                [(1.0, 0.3), (12.0, 1.2), (20.0, -0.4)])
+
+
+# local transform of the pose bone, the rotation is around z-axis
+class _Transform:
+
+    def __init__(self, location, angle):
+        self.location = location
+        self.angle = angle
+
+    def decompose(self):
+        return (Vector(self.location),
+                Quaternion((math.cos(self.angle * 0.5), 0.0, 0.0, math.sin(self.angle * 0.5))),
+                Vector((1.0, 1.0, 1.0)))
+
+
+# pose bone of the fake armature
+class _PoseBone(PoseBone):
+
+    def __init__(self, name, parent=None, constraints=()):
+        self.name = name
+        self.bone = fake_bpy.Namespace(name=name)
+        self.parent = parent
+        self.constraints = list(constraints)
+        self.location = [0.0, 0.0, 0.0]
+        self.angle = 0.0
+        self.matrix = _Transform(self.location, self.angle)
+        for axis in "xyz":
+            setattr(self, "lock_ik_" + axis, False)
+            setattr(self, "use_ik_limit_" + axis, False)
+            setattr(self, "ik_min_" + axis, -math.pi)
+            setattr(self, "ik_max_" + axis, math.pi)
+
+    def path_from_id(self, property_name):
+        return 'pose.bones["%s"].%s' % (self.name, property_name)
+
+
+# pose bones which are found by the name
+class _PoseBones(list):
+
+    def __getitem__(self, index):
+        if isinstance(index, str):
+            for pose in self:
+                if pose.name == index:
+                    return pose
+            raise KeyError(index)
+        return super(_PoseBones, self).__getitem__(index)
+
+
+# armature object which evaluates the keys of the action and the planar inverse kinematics of two bones
+class _Armature:
+    type = "ARMATURE"
+
+    def __init__(self, name, poses):
+        self.name = name
+        self.pose = fake_bpy.Namespace(bones=_PoseBones(poses))
+        self.data = fake_bpy.Namespace(bones=dict((pose.name, pose.bone) for pose in poses))
+        self.animation_data = None
+
+    def animation_data_create(self):
+        self.animation_data = fake_bpy.Namespace(action=None)
+
+    def path_resolve(self, path, coerce=True):
+        for pose in self.pose.bones:
+            if path.startswith('pose.bones["%s"].' % pose.name):
+                return fake_bpy.Namespace(data=pose)
+        raise ValueError(path)
+
+    def convert_space(self, pose_bone, matrix, from_space, to_space):
+        return matrix
+
+    def evaluate(self, frame):
+        for pose in self.pose.bones:
+            pose.location[:] = [0.0, 0.0, 0.0]
+            pose.angle = 0.0
+        if self.animation_data is not None and self.animation_data.action is not None:
+            for fcurve in self.animation_data.action.fcurves:
+                try:
+                    pose = self.path_resolve(fcurve.data_path).data
+                except ValueError:
+                    continue
+                pose.location[fcurve.array_index] = fcurve.evaluate(frame)
+
+        for pose in self.pose.bones:
+            for constraint in pose.constraints:
+                if constraint.type == "IK" and constraint.target == self:
+                    target = self.pose.bones[constraint.subtarget].location
+                    pose.parent.angle, pose.angle = _solve(target[0], target[1])
+        for pose in self.pose.bones:
+            pose.matrix = _Transform(list(pose.location), pose.angle)
+
+
+# scene which evaluates the armatures at the frame
+class _Scene:
+
+    def __init__(self, armatures):
+        self.armatures = armatures
+        self.objects = armatures
+        self.frame_current = 0
+
+    def frame_set(self, frame):
+        self.frame_current = frame
+        for armature in self.armatures:
+            armature.evaluate(frame)
+
+
+# fcurve of the linear keys
+class _FCurve:
+
+    def __init__(self, data_path, array_index, keys):
+        self.data_path = data_path
+        self.array_index = array_index
+        self.keyframe_points = [fake_bpy.Namespace(co=key) for key in keys]
+
+    def evaluate(self, time):
+        keys = [point.co for point in self.keyframe_points]
+        if time <= keys[0][0]:
+            return keys[0][1]
+        for (time0, value0), (time1, value1) in zip(keys[0:-1], keys[1:]):
+            if time <= time1:
+                return value0 + (value1 - value0) * (time - time0) / (time1 - time0)
+        return keys[-1][1]
+
+
+# angles of the root and the tip bone which put the end of the chain at the target
+def _solve(x, y):
+    length0, length1 = _LENGTHS
+    cos = (x * x + y * y - length0 * length0 - length1 * length1) / (2.0 * length0 * length1)
+    tip = math.acos(min(max(cos, -1.0), 1.0))
+    root = math.atan2(y, x) - math.atan2(length1 * math.sin(tip), length0 + length1 * math.cos(tip))
+    return root, tip
+
+
+# end of the chain by the angles of the root and the tip bone
+def _forward(root, tip):
+    length0, length1 = _LENGTHS
+    return (length0 * math.cos(root) + length1 * math.cos(root + tip),
+            length0 * math.sin(root) + length1 * math.sin(root + tip))
+
+
+# angle around z-axis of the quaternion in the order of w, x, y and z
+def _angle(quaternion):
+    return 2.0 * math.atan2(quaternion[3], quaternion[0])
+
+
+# create the armature of the chain of the root and the tip bone which follows the target bone,
+# and the tail bone which is neither keyed nor constrained
+def _create_rig(name="rig"):
+    root = _PoseBone("root")
+    tip = _PoseBone("tip", root)
+    rig = _Armature(name, [root, tip, _PoseBone("tail", root), _PoseBone("target")])
+    tip.constraints.append(fake_bpy.Namespace(type="IK",
+                                              target=rig,
+                                              subtarget="target",
+                                              pole_target=None,
+                                              pole_subtarget="",
+                                              chain_count=2,
+                                              iterations=500,
+                                              influence=1.0))
+    return rig
+
+
+# create the action which keys the location of the bone
+def _create_action(bone="target"):
+    fcurves = [_FCurve('pose.bones["%s"].location' % bone, index, keys) for index, keys in enumerate(_TARGET_KEYS)]
+    return fake_bpy.Namespace(fcurves=fcurves, frame_range=(1.0, 20.0))
+
+
+# The poses are baked only for the armatures and the bones which the action moves,
+# and the baked keys reproduce the poses solved by the inverse kinematics.
+class BakePoseTest(unittest.TestCase):
+
+    # create the exporter of the objects and the nodes of the bones of them,
+    # the actions are exported as the actions of blender data
+    def createExporter(self, objects, actions, bake_pose=True):
+        current_actions = bpy.data.actions
+        bpy.data.actions = actions
+        self.addCleanup(setattr, bpy.data, "actions", current_actions)
+
+        scene = _Scene(objects)
+        exporter = export_xm.XModelExporter(fake_bpy.Namespace(scene=scene),
+                                            export_bones=True,
+                                            export_actions=True,
+                                            group_channels=True,
+                                            bake_pose=bake_pose)
+        for obj in objects:
+            for pose in obj.pose.bones:
+                node = XModelNode()
+                node.name = "%s %s" % (obj.name, pose.name)
+                node.transforms[XModelNode.TRANSFORM_TRANSLATE] = XModelTranslate()
+                node.transforms[XModelNode.TRANSFORM_SCALE] = XModelScale()
+                node.transforms[XModelNode.TRANSFORM_ROTATE] = XModelQuaternion()
+                exporter.nodes[pose.bone] = node
+        return exporter, scene
+
+    # convert the pose bones of the objects, returns the inverse kinematics by the name of the node
+    def convertKinematics(self, objects, actions, bake_pose=True):
+        exporter, scene = self.createExporter(objects, actions, bake_pose)
+        kinematics = {}
+        for obj in objects:
+            for pose in obj.pose.bones:
+                node = exporter._XModelExporter__convertXModelNodeWithPoseBone(pose)
+                if 0 < node.num_inverse_kinematics:
+                    kinematics[node.name] = [(kinematic.target.name, kinematic.chain_length)
+                                             for kinematic in node.inverse_kinematics]
+        return kinematics
+
+    # convert the action for the objects, returns the animations by the name of the node and the transform
+    def convert(self, objects, action, bake_pose=True):
+        exporter, scene = self.createExporter(objects, [action], bake_pose)
+        targets = {}
+        animation_set = exporter._XModelExporter__convertXModelAnimationSetWithAction(action, objects)
+        for obj in objects:
+            for pose in obj.pose.bones:
+                node = exporter.nodes[pose.bone]
+                for transform, name in ((XModelNode.TRANSFORM_TRANSLATE, "location"),
+                                        (XModelNode.TRANSFORM_SCALE, "scale"),
+                                        (XModelNode.TRANSFORM_ROTATE, "rotation")):
+                    targets[id(node.transforms[transform])] = "%s %s" % (node.name, name)
+
+        animations = {}
+        for animation in animation_set.animations:
+            animations[targets[id(animation.target)]] = animation
+        return animations, scene
+
+    def test_chain_reaches_target(self):
+        rig = _create_rig()
+        action = _create_action()
+        animations, scene = self.convert([rig], action)
+        root = animations["rig root rotation"]
+        tip = animations["rig tip rotation"]
+        target = animations["rig target location"]
+        self.assertEqual(20, root.num_keys)
+        for frame in range(1, 21):
+            x, y = (fcurve.evaluate(frame) for fcurve in action.fcurves)
+            self.assertAlmostEqual(x, target.keys[frame - 1].value[0], places=6)
+            self.assertAlmostEqual(y, target.keys[frame - 1].value[1], places=6)
+
+            # the end of the chain posed by the baked keys is at the target
+            end = _forward(_angle(root.keys[frame - 1].value), _angle(tip.keys[frame - 1].value))
+            self.assertAlmostEqual(x, end[0], places=5)
+            self.assertAlmostEqual(y, end[1], places=5)
+
+        # the action and the frame are restored
+        self.assertIsNone(rig.animation_data.action)
+        self.assertEqual(0, scene.frame_current)
+
+    def test_chain_without_baking(self):
+        rig = _create_rig()
+        action = _create_action()
+        animations, scene = self.convert([rig], action, bake_pose=False)
+        self.assertEqual(["rig target location"], list(animations))
+
+        # the chain at rest misses the target, so the inverse kinematics are solved at runtime
+        end = _forward(0.0, 0.0)
+        x, y = (fcurve.evaluate(1.0) for fcurve in action.fcurves)
+        self.assertGreater(abs(end[0] - x) + abs(end[1] - y), 0.1)
+
+    def test_kinematics_baked_into_all_actions(self):
+        self.assertEqual({}, self.convertKinematics([_create_rig()], [_create_action(), _create_action()]))
+        self.assertEqual({"rig tip": [("rig target", 2)]},
+                         self.convertKinematics([_create_rig()], [_create_action()], bake_pose=False))
+        self.assertEqual({"rig tip": [("rig target", 2)]}, self.convertKinematics([_create_rig()], []))
+
+    def test_static_target(self):
+        rig = _create_rig()
+        action = _create_action("tail")
+        animations, scene = self.convert([rig], action)
+        self.assertEqual(["rig tail location", "rig tail rotation", "rig tail scale"], list(animations))
+
+        # the chain isn't baked, so the inverse kinematics keep solving the pose at runtime
+        self.assertEqual({"rig tip": [("rig target", 2)]}, self.convertKinematics([_create_rig()], [action]))
+
+    def test_target_static_in_some_actions(self):
+        rig = _create_rig()
+        actions = [_create_action(), _create_action("tail")]
+        self.assertEqual({"rig tip": [("rig target", 2)]}, self.convertKinematics([rig], actions))
+
+        # the chain is baked only for the action which moves the target
+        animations, scene = self.convert([rig], actions[0])
+        self.assertIn("rig root rotation", animations)
+        animations, scene = self.convert([rig], actions[1])
+        self.assertNotIn("rig root rotation", animations)
+
+    def test_keyed_chain_with_static_target(self):
+        rig = _create_rig()
+        animations, scene = self.convert([rig], _create_action("tip"))
+        self.assertIn("rig root rotation", animations)
+        self.assertEqual({}, self.convertKinematics([_create_rig()], [_create_action("tip")]))
+
+    def test_only_driven_bones(self):
+        rig = _create_rig()
+        animations, scene = self.convert([rig], _create_action())
+        self.assertEqual(["rig root location", "rig root rotation", "rig root scale",
+                          "rig tip location", "rig tip rotation", "rig tip scale",
+                          "rig target location", "rig target rotation", "rig target scale"],
+                         list(animations))
+
+    def test_only_driven_armatures(self):
+        rig = _create_rig()
+        other = _Armature("other", [_PoseBone("a"), _PoseBone("b")])
+        animations, scene = self.convert([rig, other], _create_action())
+        self.assertFalse(any(name.startswith("other ") for name in animations))
+
+        # the action of the other armature doesn't drive the rig
+        rig = _create_rig()
+        animations, scene = self.convert([rig, other], _create_action("a"))
+        self.assertEqual(["other a location", "other a rotation", "other a scale"], list(animations))
+        self.assertIsNone(rig.animation_data)
+
+    def test_constraint_to_driven_armature(self):
+        rig = _create_rig()
+        follower = _PoseBone("follower")
+        follower.constraints.append(fake_bpy.Namespace(type="COPY_ROTATION", target=rig, subtarget="target"))
+        other = _Armature("other", [follower, _PoseBone("b")])
+        animations, scene = self.convert([rig, other], _create_action())
+        self.assertIn("other follower rotation", animations)
+        self.assertNotIn("other b rotation", animations)
+
+
+if __name__ == "__main__":
+    unittest.main()
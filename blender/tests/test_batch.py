@@ -0,0 +1,188 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import ast
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from io_scene_xm import batch
+
+
+# runner which stands in for blender, it writes the file named by the options of export_test,
+# the blend files whose names contain "fail" exit with the error and "empty" exit without the file
+class _FakeRunner:
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    # get the options of export_test from the python expression
+    @staticmethod
+    def optionsOf(expression):
+        start = expression.index("export_test(**") + len("export_test(**")
+        return ast.literal_eval(expression[start:expression.rindex(")")])
+
+    def run(self, source, expression, timeout=None):
+        options = self.optionsOf(expression)
+        with self.lock:
+            self.calls.append((source, options, timeout))
+        name = os.path.basename(source)
+        if "fail" in name:
+            return 1, "Traceback (most recent call last):\nRuntimeError: broken scene\n"
+        if "empty" not in name:
+            with open(options["filepath"], "wb") as file:
+                file.write(name.encode("utf-8"))
+        return 0, "finished\n"
+
+
+# The batch exporter exports the blend files collected from the command line by the runner.
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output_directory = os.path.join(self.directory, "out")
+        self.runner = _FakeRunner()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    # create the empty blend files in the directory
+    def createFiles(self, *names):
+        paths = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb"):
+                pass
+            paths.append(path)
+        return paths
+
+    # run the command line with the fake runner, returns the exit status and the output
+    def runMain(self, *args):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            status = batch.main(list(args), self.runner)
+        return status, output.getvalue()
+
+    # read the JSON report
+    def readReport(self, path):
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def test_collect_manifest_globs_and_duplicates(self):
+        a, b, c = self.createFiles("a.blend", "sub/b.blend", "sub/deep/c.blend")
+        manifest = os.path.join(self.directory, "list.txt")
+        with open(manifest, "w", encoding="utf-8") as file:
+            file.write("# comment\n\nsub/b.blend\nsub/**/*.blend\n")
+        sources = batch.collect_sources([a,
+                                         "@" + manifest,
+                                         os.path.join(self.directory, "*.blend"),
+                                         os.path.join(self.directory, "sub", "..", "a.blend")])
+        self.assertEqual([os.path.abspath(path) for path in (a, b, c)],
+                         [os.path.abspath(path) for path in sources])
+
+    def test_export_and_report(self):
+        a, b = self.createFiles("a.blend", "b.blend")
+        report = os.path.join(self.directory, "report.json")
+        status, output = self.runMain(a, b, a, "-o", self.output_directory, "-j", "2", "--report", report)
+        self.assertEqual(0, status)
+        self.assertEqual(2, len(self.runner.calls))
+
+        data = self.readReport(report)
+        self.assertEqual((2, 0), (data["num_files"], data["num_failures"]))
+        self.assertEqual([a, b], [result["source"] for result in data["results"]])
+        for result in data["results"]:
+            self.assertTrue(result["succeeded"])
+            self.assertEqual(os.path.getsize(result["destination"]), result["size"])
+            self.assertEqual(self.output_directory, os.path.dirname(result["destination"]))
+        self.assertIn("2 files, 0 failed", output)
+
+    def test_failure_exit_code(self):
+        ok, failed, empty = self.createFiles("ok.blend", "fail.blend", "empty.blend")
+        report = os.path.join(self.directory, "report.json")
+        status, output = self.runMain(ok, failed, empty, "-o", self.output_directory, "--report", report)
+        self.assertEqual(1, status)
+
+        data = self.readReport(report)
+        self.assertEqual((3, 2), (data["num_files"], data["num_failures"]))
+        results = dict((os.path.basename(result["source"]), result) for result in data["results"])
+        self.assertTrue(results["ok.blend"]["succeeded"])
+        self.assertFalse(results["fail.blend"]["succeeded"])
+        self.assertIn("exit code 1", results["fail.blend"]["message"])
+        self.assertIn("broken scene", results["fail.blend"]["message"])
+        self.assertFalse(results["empty.blend"]["succeeded"])
+        self.assertIn("no output file", results["empty.blend"]["message"])
+        self.assertIn("FAIL", output)
+
+    def test_no_sources(self):
+        status, output = self.runMain(os.path.join(self.directory, "*.blend"))
+        self.assertEqual(2, status)
+        self.assertEqual([], self.runner.calls)
+
+    def test_same_destination(self):
+        a, b = self.createFiles("x/scene.blend", "y/scene.blend")
+        status, output = self.runMain(a, b, "-o", self.output_directory)
+        self.assertEqual(2, status)
+        self.assertIn("same file", output)
+        self.assertEqual([], self.runner.calls)
+
+    def test_exporter_options(self):
+        a, = self.createFiles("a.blend")
+        cache = os.path.join(self.directory, "cache")
+        status, output = self.runMain(a, "--timeout", "30", "--compact-mesh", "--mesh-workers", "3",
+                                      "--mesh-cache", "--mesh-cache-directory", cache, "--mesh-cache-size", "64")
+        self.assertEqual(0, status)
+        source, options, timeout = self.runner.calls[0]
+        self.assertEqual(30.0, timeout)
+        self.assertTrue(options["compact_mesh"])
+        self.assertEqual(3, options["num_workers"])
+        self.assertTrue(options["use_mesh_cache"])
+        self.assertEqual(cache, options["mesh_cache_directory"])
+        self.assertEqual(64, options["mesh_cache_size"])
+        self.assertEqual(os.path.join(self.directory, "a.xm"), options["filepath"])
+
+    def test_default_options(self):
+        a, = self.createFiles("a.blend")
+        self.runMain(a)
+        source, options, timeout = self.runner.calls[0]
+        self.assertEqual(0, options["num_workers"])
+        self.assertFalse(options["use_mesh_cache"])
+        self.assertIsNone(options["mesh_cache_directory"])
+        self.assertTrue(options["invert_face"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import io
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from tests import fake_bpy
+
+from io_scene_xm.types import (XModelContainer,
+                               XModelMesh)
+from io_scene_xm.code import XModelBinaryEncoder
+from io_scene_xm.mesh import (snapshot_mesh,
+                              build_mesh)
+from io_scene_xm.cache import XModelMeshCache
+
+# identity matrix of the global matrix
+_IDENTITY = [[1.0, 0.0, 0.0, 0.0],
+             [0.0, 1.0, 0.0, 0.0],
+             [0.0, 0.0, 1.0, 0.0],
+             [0.0, 0.0, 0.0, 1.0]]
+
+
+# encode the mesh in the container
+def _encode(mesh):
+    mesh.name = "mesh"
+    container = XModelContainer()
+    container.num_meshs = 1
+    container.meshs = [mesh]
+    writer = io.BytesIO()
+    XModelBinaryEncoder().encode(container, writer)
+    return writer.getvalue()
+
+
+# object which creates the file when it's unpickled
+class _Planted:
+
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return (open, (self.path, "w"))
+
+
+# The mesh cache stores the converted mesh data in the directory of the user.
+class MeshCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parent = tempfile.mkdtemp()
+        self.directory = os.path.join(self.parent, "cache")
+        snapshot = snapshot_mesh(fake_bpy.create_mesh())
+        self.key_args = (snapshot, _IDENTITY, True, False, True)
+        self.mesh = build_mesh(snapshot, XModelMesh(), _IDENTITY, True)
+
+    def tearDown(self):
+        shutil.rmtree(self.parent)
+
+    # get the path of the only entry of the cache
+    def entryPath(self):
+        names = os.listdir(self.directory)
+        self.assertEqual(1, len(names))
+        return os.path.join(self.directory, names[0])
+
+    def test_round_trip(self):
+        cache = XModelMeshCache(self.directory)
+        self.assertIsNone(cache.disabled_reason)
+        key = cache.key(*self.key_args)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, self.mesh)
+        for compact in (False, True):
+            mesh = cache.get(key, compact)
+            self.assertIsNotNone(mesh)
+            self.assertEqual(_encode(self.mesh), _encode(mesh))
+        self.assertEqual((2, 1), (cache.hits, cache.misses))
+
+    def test_private_directory(self):
+        XModelMeshCache(self.directory)
+        if hasattr(os, "getuid"):
+            self.assertEqual(0, os.stat(self.directory).st_mode & 0o077)
+
+    def test_entry_is_not_pickled(self):
+        cache = XModelMeshCache(self.directory)
+        key = cache.key(*self.key_args)
+        cache.put(key, self.mesh)
+        with open(self.entryPath(), "rb") as file:
+            data = file.read()
+        self.assertTrue(data.startswith(b"XMC\0"))
+
+    def test_planted_pickle(self):
+        cache = XModelMeshCache(self.directory)
+        key = cache.key(*self.key_args)
+        planted = os.path.join(self.parent, "planted")
+        with open(os.path.join(self.directory, key + ".xmc"), "wb") as file:
+            file.write(pickle.dumps(_Planted(planted)))
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(os.path.exists(planted))
+
+    def test_broken_entry(self):
+        cache = XModelMeshCache(self.directory)
+        key = cache.key(*self.key_args)
+        cache.put(key, self.mesh)
+        path = self.entryPath()
+        with open(path, "r+b") as file:
+            file.truncate(os.path.getsize(path) - 1)
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(os.path.exists(path))
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "permissions of POSIX")
+    def test_disabled_by_shared_directory(self):
+        os.mkdir(self.directory)
+        os.chmod(self.directory, 0o777)
+        cache = XModelMeshCache(self.directory)
+        self.assertIsNotNone(cache.disabled_reason)
+        key = cache.key(*self.key_args)
+        cache.put(key, self.mesh)
+        self.assertEqual([], os.listdir(self.directory))
+        self.assertIsNone(cache.get(key))
+        self.assertIn("disabled", cache.report())
+
+    def test_disabled_by_file(self):
+        with open(self.directory, "wb"):
+            pass
+        cache = XModelMeshCache(self.directory)
+        self.assertIsNotNone(cache.disabled_reason)
+        self.assertIsNone(cache.get(cache.key(*self.key_args)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,510 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import array
+import gc
+import io
+import math
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import warnings
+
+from io_scene_xm.types import (XModelStructure,
+                               XModelUserData,
+                               XModelMesh,
+                               XModelSkin,
+                               XModelVertex,
+                               XModelVertexTable,
+                               XModelElement)
+from io_scene_xm.code import (XModelBinaryEncoder,
+                              XModelBinaryDecoder,
+                              XModelLazyArray,
+                              MAGIC_NUMBER,
+                              VERSION,
+                              COMPATIBILITY_VERSION,
+                              SECTION_VERSION,
+                              QUANTIZE_VERSION,
+                              INDEX_VERSION,
+                              TRIANGULATE_VERSION,
+                              INTERLEAVE_VERSION,
+                              BEZIER_VERSION,
+                              SAMPLE_VERSION)
+from io_scene_xm.quantize import (XModelQuantization,
+                                  ENCODINGS)
+from io_scene_xm.interleave import (INTERLEAVE_STATIC,
+                                    INTERLEAVE_ALL,
+                                    ATTRIBUTE_POSITION,
+                                    ATTRIBUTE_TEXCOORD)
+from io_scene_xm.optimize import triangulate_mesh_faces
+from io_scene_xm.keyframe import sample_animation_frames
+
+# demo model of the runtime, it's encoded in the compatibility version
+DEMO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "..", "..", "demo", "common_resources", "3d_model", "hackadoll_no2", "model.xm")
+
+# attributes which aren't decoded, the parent is the weak reference to the decoded structure
+_IGNORED_ATTRIBUTES = frozenset(["parent", "user_object", "vertex_buffer", "element_buffer"])
+
+# classes whose attributes are compared one by one, XModelVertex is compared by itself
+_STRUCTURE_CLASSES = (XModelStructure, XModelUserData, XModelSkin, XModelVertexTable, XModelElement)
+
+
+# read the demo model
+def read_demo():
+    with open(DEMO_PATH, "rb") as file:
+        return file.read()
+
+
+# encode the structure by the encoder
+def encode(structure, encoder=None):
+    writer = io.BytesIO()
+    (encoder if encoder is not None else XModelBinaryEncoder()).encode(structure, writer)
+    return writer.getvalue()
+
+
+# get the names of the attributes of the structure
+def _attribute_names(obj):
+    names = []
+    for cls in reversed(type(obj).__mro__):
+        for name in cls.__dict__.get("__slots__", ()):
+            if name not in _IGNORED_ATTRIBUTES and not name.startswith("__"):
+                names.append(name)
+    return names
+
+
+# assert that the decoded structures have the same values, the arrays of any type are compared by the elements
+def assert_same_structure(test, expected, actual, path="structure", visited=None):
+    visited = set() if visited is None else visited
+    if isinstance(expected, _STRUCTURE_CLASSES):
+        test.assertIs(type(expected), type(actual), path)
+        if id(expected) in visited:
+            return
+        visited.add(id(expected))
+        for name in _attribute_names(expected):
+            assert_same_structure(test, getattr(expected, name), getattr(actual, name), path + "." + name, visited)
+    elif isinstance(expected, (str, bytes)) or expected is None:
+        test.assertEqual(expected, actual, path)
+    elif isinstance(expected, (list, tuple, memoryview, XModelLazyArray)) or hasattr(expected, "tolist"):
+        test.assertIsNotNone(actual, path)
+        test.assertEqual(len(expected), len(actual), path)
+        if 0 < len(expected) and not isinstance(expected[0], _STRUCTURE_CLASSES + (list, tuple)):
+            # the first different element is reported, the difference of the long arrays is too slow to show
+            for i, (left, right) in enumerate(zip(expected, actual)):
+                if left != right:
+                    test.assertEqual(left, right, "%s[%d]" % (path, i))
+        else:
+            for i, (left, right) in enumerate(zip(expected, actual)):
+                assert_same_structure(test, left, right, "%s[%d]" % (path, i), visited)
+    else:
+        test.assertEqual(expected, actual, path)
+
+
+# The decoded demo model is encoded to the same binary, and the broken binaries are rejected.
+class XModelBinaryDecoderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = read_demo()
+
+    def test_round_trip(self):
+        container = XModelBinaryDecoder().decode(self.data)
+        self.assertEqual(container.structure_type, XModelStructure.TYPE_CONTAINER)
+        self.assertLess(0, container.num_nodes)
+        self.assertLess(0, container.num_meshs)
+        self.assertEqual(self.data, encode(container))
+
+    def test_readable(self):
+        expected = XModelBinaryDecoder().decode(self.data)
+        with open(DEMO_PATH, "rb") as file:
+            assert_same_structure(self, expected, XModelBinaryDecoder().decode(file))
+
+    def test_bad_magic(self):
+        data = bytearray(self.data)
+        data[0] ^= 0xff
+        self.assertIsNone(XModelBinaryDecoder().decode(bytes(data)))
+        self.assertIsNone(XModelBinaryDecoder().decode(b"PK\x03\x04" + self.data[4:]))
+
+    def test_unsupported_version(self):
+        header = struct.pack("<Ii", MAGIC_NUMBER, VERSION + 1)
+        self.assertIsNone(XModelBinaryDecoder().decode(header + self.data[8:]))
+        header = struct.pack("<Ii", MAGIC_NUMBER, 35)
+        self.assertIsNone(XModelBinaryDecoder().decode(header + self.data[8:]))
+
+    def test_truncated(self):
+        deflated = encode(XModelBinaryDecoder().decode(self.data), XModelBinaryEncoder(compress_level=6))
+        for data in (self.data, deflated):
+            for size in (0, 3, 4, 7, 8, 100, len(data) // 3, len(data) // 2, len(data) - 12, len(data) - 4):
+                with self.assertRaises(ValueError, msg="%d of %d bytes" % (size, len(data))):
+                    XModelBinaryDecoder().decode(data[0:size])
+
+    def test_missing_terminator(self):
+        data = self.data[0:-4] + struct.pack("<I", 0)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            container = XModelBinaryDecoder().decode(data)
+        self.assertIsNotNone(container)
+        self.assertEqual(1, len(caught))
+        self.assertIs(caught[0].category, RuntimeWarning)
+
+
+# The lazy decoding has the same values as the eager decoding, and it releases the mapped file.
+class XModelLazyDecoderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = read_demo()
+        cls.expected = XModelBinaryDecoder().decode(cls.data)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    # write the binary to the file in the temporary directory
+    def write(self, data, name="model.xm"):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    # whether the file is mapped to the memory of this process
+    def isMapped(self, path):
+        with open("/proc/self/maps", "r") as maps:
+            return any(line.rstrip("\n").endswith(path) for line in maps)
+
+    def test_same_values(self):
+        deflated = encode(self.expected, XModelBinaryEncoder(compress_level=6))
+        for data in (self.data, deflated):
+            with open(self.write(data), "rb") as file:
+                container = XModelBinaryDecoder(lazy=True).decode(file)
+            assert_same_structure(self, self.expected, container)
+            self.assertEqual(self.data, encode(container))
+
+    def test_lazy_arrays(self):
+        with open(self.write(self.data), "rb") as file:
+            container = XModelBinaryDecoder(lazy=True).decode(file)
+        mesh = container.meshs[0]
+        self.assertIsInstance(mesh.vertices, XModelLazyArray)
+        self.assertFalse(mesh.vertices.loaded)
+        self.assertEqual(mesh.num_vertices, len(mesh.vertices))
+        self.assertFalse(mesh.vertices.loaded)
+        vertex = mesh.vertices[0]
+        self.assertTrue(mesh.vertices.loaded)
+        self.assertEqual(self.expected.meshs[0].vertices[0], vertex)
+        self.assertIsInstance(mesh.elements, XModelLazyArray)
+        self.assertEqual(mesh.num_elements, len(mesh.elements.materialize()))
+
+    @unittest.skipUnless(os.path.exists("/proc/self/maps"), "the mapped files aren't listed")
+    def test_mmap_released(self):
+        path = self.write(self.data, "mapped.xm")
+        decoder = XModelBinaryDecoder(lazy=True)
+        with open(path, "rb") as file:
+            container = decoder.decode(file)
+        self.assertTrue(self.isMapped(path))
+
+        # the arrays refer to the mapped file after the file is closed, and the decoder doesn't refer to it
+        assert_same_structure(self, self.expected.meshs, container.meshs)
+        self.assertTrue(self.isMapped(path))
+        del container
+        gc.collect()
+        self.assertFalse(self.isMapped(path))
+
+        # the decoder can be reused
+        with open(path, "rb") as file:
+            container = decoder.decode(file)
+        self.assertEqual(self.expected.num_meshs, container.num_meshs)
+        del container
+        gc.collect()
+        self.assertFalse(self.isMapped(path))
+
+
+# create the mesh of a quad without skin, the attributes are 32bits float numbers as they are decoded
+def create_static_mesh():
+    mesh = XModelMesh()
+    mesh.name = "quad"
+    mesh.num_positions = 4
+    mesh.position_size = 3
+    mesh.positions = array.array("f", [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 0.0, 0.0, 1.0, 0.0])
+    mesh.num_normals = 1
+    mesh.normal_size = 3
+    mesh.normals = array.array("f", [0.0, 0.0, 1.0])
+    mesh.num_colors = 2
+    mesh.color_size = 4
+    mesh.colors = array.array("f", [0.3, 0.6, 0.9, 1.0, 0.1, 0.2, 0.7, 0.5])
+    mesh.num_tex_coords = 4
+    mesh.tex_coord_size = 2
+    mesh.tex_coords = array.array("f", [0.0, 0.0, 1.0, 0.0, 1.0, 1.0, 0.0, 1.0])
+    mesh.num_vertices = 4
+    mesh.vertices = []
+    for i in range(4):
+        vertex = XModelVertex()
+        vertex.position = i
+        vertex.normal = 0
+        vertex.color = i % 2
+        vertex.tex_coord = i
+        mesh.vertices.append(vertex)
+    element = XModelElement()
+    element.num_vertices = 4
+    element.vertices = [0, 1, 2, 3]
+    mesh.num_elements = 1
+    mesh.elements = [element]
+    return mesh
+
+
+# get the length of the vector
+def _length(values):
+    return math.sqrt(sum(value * value for value in values))
+
+
+# get the angle in degrees between the vectors
+def _angle(v1, v2):
+    cos = sum(a * b for a, b in zip(v1, v2)) / (_length(v1) * _length(v2))
+    return math.degrees(math.acos(max(-1.0, min(1.0, cos))))
+
+
+# The options of the encoder are written in the oldest version supporting them, and decoded to the same values,
+# or to the values within the errors of the quantization.
+class XModelEncoderOptionsTest(unittest.TestCase):
+
+    # attributes which are added or changed by the options
+    OPTION_ATTRIBUTES = {
+        "quantization": ("positions", "normals", "colors", "tex_coords"),
+        "triangulated": ("num_face_indices", "face_index_size", "face_reversed", "face_offsets", "face_sizes",
+                         "face_indices"),
+        "interleave": ("interleaved_stride", "interleaved_types", "interleaved_sizes", "interleaved_offsets",
+                       "interleaved_vertices")}
+
+    # encodings of the quantization which the exporter selects for each attribute,
+    # the colors are only in the static mesh
+    QUANTIZATIONS = {"FLOAT16": dict(color="FLOAT16", tex_coord="FLOAT16"),
+                     "INT16": dict(position="INT16"),
+                     "OCTAHEDRAL16": dict(normal="OCTAHEDRAL16"),
+                     "OCTAHEDRAL8": dict(normal="OCTAHEDRAL8"),
+                     "UNORM8": dict(color="UNORM8")}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = read_demo()
+
+    # decode the demo model with the static mesh
+    def createContainer(self):
+        container = XModelBinaryDecoder().decode(self.data)
+        container.meshs.append(create_static_mesh())
+        container.num_meshs += 1
+        return container
+
+    # encode the container, and check the version of the binary
+    def encode(self, container, version, **options):
+        encoder = XModelBinaryEncoder(**options)
+        data = encode(container, encoder)
+        self.assertEqual(version, encoder._getVersion())
+        self.assertEqual((MAGIC_NUMBER, version), struct.unpack_from("<Ii", data))
+        return encoder, data
+
+    # assert that the decoded container is same as the source except for the attributes of the options
+    def assertSameContainer(self, expected, actual, ignored=()):
+        saved = {}
+        for mesh in expected.meshs + actual.meshs:
+            saved[id(mesh)] = [(name, getattr(mesh, name)) for name in ignored]
+            for name in ignored:
+                setattr(mesh, name, None)
+        try:
+            assert_same_structure(self, expected, actual)
+        finally:
+            for mesh in expected.meshs + actual.meshs:
+                for name, value in saved[id(mesh)]:
+                    setattr(mesh, name, value)
+
+    def test_versions(self):
+        container = self.createContainer()
+        self.encode(container, COMPATIBILITY_VERSION)
+        for version, options in ((SECTION_VERSION, dict(compress_level=0)),
+                                 (QUANTIZE_VERSION, dict(quantization=XModelQuantization.fromNames("INT16"))),
+                                 (INDEX_VERSION, dict(indexed=True)),
+                                 (TRIANGULATE_VERSION, dict(triangulated=True)),
+                                 (INTERLEAVE_VERSION, dict(interleave=INTERLEAVE_STATIC)),
+                                 (BEZIER_VERSION, dict(bezier=True)),
+                                 (SAMPLE_VERSION, dict(sample_encoding=ENCODINGS["FLOAT32"]))):
+            with self.subTest(version=version):
+                encoder, data = self.encode(container, version, **options)
+                self.assertSameContainer(container, XModelBinaryDecoder().decode(data),
+                                         self.OPTION_ATTRIBUTES.get(next(iter(options)), ()))
+
+        # the options which don't change the binary are written in the compatibility version
+        self.encode(container, COMPATIBILITY_VERSION, quantization=XModelQuantization.fromNames())
+        self.encode(container, COMPATIBILITY_VERSION, interleave="NONE")
+
+    def test_deflate(self):
+        container = self.createContainer()
+        stored = self.encode(container, SECTION_VERSION, compress_level=0)[1]
+        deflated = self.encode(container, SECTION_VERSION, compress_level=9)[1]
+        self.assertLess(len(deflated), len(stored))
+        for data in (stored, deflated):
+            for num_workers in (0, 2):
+                self.assertSameContainer(container, XModelBinaryDecoder(num_workers=num_workers).decode(data))
+
+    def test_quantization(self):
+        container = self.createContainer()
+        for name, encodings in sorted(self.QUANTIZATIONS.items()):
+            with self.subTest(encoding=name):
+                encoder, data = self.encode(container, QUANTIZE_VERSION,
+                                            quantization=XModelQuantization.fromNames(**encodings))
+                decoded = XModelBinaryDecoder().decode(data)
+                self.assertSameContainer(container, decoded, self.OPTION_ATTRIBUTES["quantization"])
+                self.assertEqual(len(container.meshs), len(encoder.quantization_stats))
+                errors = []
+                for mesh, actual, stats in zip(container.meshs, decoded.meshs, encoder.quantization_stats):
+                    errors.extend(self.assertQuantized(mesh, actual, stats, encodings))
+                self.assertLess(0.0, max(errors))
+
+    # assert that the quantized attributes are within the reported errors, and return the errors
+    def assertQuantized(self, expected, actual, stats, encodings):
+        component = lambda values: max(abs(value) for value in values)
+        attributes = (("position", "positions", expected.position_size, stats.position_error, _length),
+                      ("normal", "normals", expected.normal_size, stats.normal_error, None),
+                      ("color", "colors", expected.color_size, stats.color_error, component),
+                      ("tex_coord", "tex_coords", expected.tex_coord_size, stats.tex_coord_error, component))
+        errors = []
+        for name, attribute, size, error, measure in attributes:
+            source = getattr(expected, attribute) or ()
+            values = getattr(actual, attribute) or ()
+            self.assertEqual(len(source), len(values))
+            if name not in encodings:
+                self.assertEqual(0.0, error)
+                self.assertEqual(list(source), list(values))
+                continue
+            errors.append(error)
+            if len(source) <= 0:
+                continue
+            max_error = 0.0
+            for i in range(0, len(source), size):
+                if measure is None:
+                    max_error = max(max_error, _angle(source[i:i + size], values[i:i + size]))
+                else:
+                    max_error = max(max_error, measure([a - b for a, b in zip(source[i:i + size],
+                                                                              values[i:i + size])]))
+            self.assertLessEqual(max_error, error * (1.0 + 1e-3) + 1e-6, "%s %s" % (expected.name, name))
+        return errors
+
+    def test_index(self):
+        container = self.createContainer()
+        data = self.encode(container, INDEX_VERSION, indexed=True)[1]
+        self.assertSameContainer(container, XModelBinaryDecoder().decode(data))
+
+        decoder = XModelBinaryDecoder()
+        index = decoder.open(data)
+        self.addCleanup(decoder.close)
+        self.assertIsNotNone(index)
+        self.assertEqual(container.time_rate, index.time_rate)
+        self.assertEqual(container.num_meshs, index.count(XModelStructure.TYPE_MESH))
+        self.assertEqual(container.num_animation_sets, index.count(XModelStructure.TYPE_ANIMATION_SET))
+
+        # the structures are decoded in any order
+        for i in reversed(range(container.num_animation_sets)):
+            assert_same_structure(self, container.animation_sets[i],
+                                  decoder.decodeEntry(XModelStructure.TYPE_ANIMATION_SET, i))
+        for i in reversed(range(container.num_meshs)):
+            assert_same_structure(self, container.meshs[i], decoder.decodeEntry(XModelStructure.TYPE_MESH, i))
+        self.assertIsNone(decoder.decodeEntry(XModelStructure.TYPE_MESH, container.num_meshs))
+
+        # the binary without the index can't be opened
+        self.assertIsNone(XModelBinaryDecoder().open(self.data))
+
+    def test_triangulate(self):
+        container = self.createContainer()
+        decoded = XModelBinaryDecoder().decode(self.encode(container, TRIANGULATE_VERSION, triangulated=True)[1])
+        self.assertSameContainer(container, decoded, self.OPTION_ATTRIBUTES["triangulated"])
+        for mesh, actual in zip(container.meshs, decoded.meshs):
+            offsets, sizes, indices = triangulate_mesh_faces(mesh, True)
+            self.assertEqual(len(indices), actual.num_face_indices)
+            self.assertEqual(2 if indices.typecode == "H" else 4, actual.face_index_size)
+            self.assertTrue(actual.face_reversed)
+            self.assertEqual(list(offsets), actual.face_offsets)
+            self.assertEqual(list(sizes), actual.face_sizes)
+            self.assertEqual(list(indices), list(actual.face_indices))
+        self.assertEqual([0, 2, 1, 0, 3, 2], list(decoded.meshs[-1].face_indices))
+
+    def test_interleave(self):
+        container = self.createContainer()
+        for mode, interleaved in ((INTERLEAVE_ALL, [True, True]), (INTERLEAVE_STATIC, [False, True])):
+            with self.subTest(mode=mode):
+                decoded = XModelBinaryDecoder().decode(self.encode(container, INTERLEAVE_VERSION,
+                                                                   interleave=mode)[1])
+                self.assertSameContainer(container, decoded, self.OPTION_ATTRIBUTES["interleave"])
+                for mesh, actual, expected in zip(container.meshs, decoded.meshs, interleaved):
+                    self.assertEqual(expected, 0 < actual.interleaved_stride, mesh.name)
+                    if expected:
+                        self.assertInterleaved(mesh, actual)
+
+    # assert that the interleaved vertices have the positions and the texture coordinates of the vertices
+    def assertInterleaved(self, expected, actual):
+        stride = actual.interleaved_stride
+        self.assertEqual(stride * expected.num_vertices, len(actual.interleaved_vertices))
+        for attribute, name, size in ((ATTRIBUTE_POSITION, "position", expected.position_size),
+                                      (ATTRIBUTE_TEXCOORD, "tex_coord", expected.tex_coord_size)):
+            self.assertEqual(size, actual.interleaved_sizes[attribute])
+            layout = struct.Struct("<%df" % size)
+            values = getattr(expected, name + "s")
+            for i, vertex in enumerate(expected.vertices[0:expected.num_vertices]):
+                index = getattr(vertex, name)
+                self.assertEqual(tuple(values[size * index:size * (index + 1)]),
+                                 layout.unpack_from(actual.interleaved_vertices,
+                                                    stride * i + actual.interleaved_offsets[attribute]))
+
+    def test_sampled_frames(self):
+        container = self.createContainer()
+        for animation_set in container.animation_sets:
+            for animation in animation_set.animations[0:animation_set.num_animations]:
+                sample_animation_frames(animation)
+                if animation.frames is not None:
+                    animation.frames = array.array("f", animation.frames)
+        num_frames = sum(animation.num_frames
+                         for animation_set in container.animation_sets
+                         for animation in animation_set.animations[0:animation_set.num_animations])
+        self.assertLess(0, num_frames)
+        for name in ("FLOAT32", "FLOAT16"):
+            with self.subTest(encoding=name):
+                decoded = XModelBinaryDecoder().decode(self.encode(container, SAMPLE_VERSION,
+                                                                   sample_encoding=ENCODINGS[name])[1])
+                if name == "FLOAT32":
+                    self.assertSameContainer(container, decoded)
+                    continue
+                for expected, actual in zip(container.animation_sets, decoded.animation_sets):
+                    for source, animation in zip(expected.animations, actual.animations):
+                        self.assertEqual(source.num_frames, animation.num_frames)
+                        self.assertEqual(source.frame_start, animation.frame_start)
+                        for a, b in zip(source.frames, animation.frames):
+                            self.assertAlmostEqual(a, b, delta=1e-3 * max(1.0, abs(a)))
+
+
+if __name__ == "__main__":
+    unittest.main()
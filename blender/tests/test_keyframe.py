@@ -0,0 +1,213 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import math
+import unittest
+
+from io_scene_xm.types import (XModelTranslate,
+                               XModelQuaternion,
+                               XModelAnimation,
+                               XModelAnimationKey)
+from io_scene_xm.keyframe import (merge_channel_keys,
+                                  reduce_linear_keys,
+                                  fit_bezier_keys,
+                                  reduce_animation_keys,
+                                  evaluate_animation_keys)
+
+
+# create the animation of the linear keys of the values at the times
+def _create_animation(target, times, values, index=-1):
+    animation = XModelAnimation()
+    animation.name = "animation"
+    animation.target = target
+    animation.index = index
+    animation.num_keys = len(times)
+    animation.keys = []
+    for time, value in zip(times, values):
+        key = XModelAnimationKey()
+        key.interpolate = XModelAnimationKey.INTERPOLATE_LINER
+        key.time = time
+        key.value_size = len(value)
+        key.value = list(value)
+        animation.keys.append(key)
+    return animation
+
+
+# get the values of the curve of an element, it has the smooth parts, the linear part and the steps
+def _curve(time):
+    if time < 30.0:
+        return math.sin(0.05 * time) + 0.3 * math.cos(0.03 * time)
+    if time < 50.0:
+        return 1.3 - 0.05 * (time - 30.0)
+    if time < 60.0:
+        return 0.3
+    return 0.5 * math.sin(0.08 * time) * math.exp(-0.02 * (time - 60.0))
+
+
+# create the quaternion of the rotation around the axis
+def _quaternion(x, y, z, angle):
+    length = math.sqrt(x * x + y * y + z * z)
+    sn = math.sin(0.5 * angle) / length
+    return [math.cos(0.5 * angle), x * sn, y * sn, z * sn]
+
+
+# The reduced and fitted keys are evaluated within the tolerance of the source keys.
+class ReduceKeysTest(unittest.TestCase):
+
+    # times of the source keys, the frames and the subframes
+    TIMES = [float(frame) for frame in range(0, 100)] + [100.5, 101.0, 103.0]
+
+    # assert that the reduced animation is within the tolerance at the source keys
+    def assertWithinTolerance(self, animation, times, values, tolerance):
+        for time, value in zip(times, values):
+            actual = evaluate_animation_keys(animation, time)
+            for a, b in zip(value, actual):
+                self.assertLessEqual(abs(a - b), tolerance * (1.0 + 1e-9), "at %g" % time)
+
+    def test_reduce_linear_keys(self):
+        values = [_curve(time) for time in self.TIMES]
+        for tolerance in (0.1, 0.01, 0.001):
+            selected = reduce_linear_keys(self.TIMES, values, tolerance)
+            self.assertEqual(0, selected[0])
+            self.assertEqual(len(self.TIMES) - 1, selected[-1])
+            self.assertEqual(sorted(set(selected)), selected)
+            self.assertLess(len(selected), len(self.TIMES))
+            animation = _create_animation(XModelTranslate(),
+                                          [self.TIMES[i] for i in selected],
+                                          [[values[i]] for i in selected],
+                                          0)
+            self.assertWithinTolerance(animation, self.TIMES, [[value] for value in values], tolerance)
+
+        # the linear keys are reduced to the both ends
+        self.assertEqual([0, 9], reduce_linear_keys(list(range(10)), [0.5 * i for i in range(10)], 0.0))
+        self.assertEqual([0, 1], reduce_linear_keys([0.0, 1.0], [0.0, 1.0], 0.1))
+
+    def test_fit_bezier_keys(self):
+        values = [_curve(time) for time in self.TIMES]
+        segments = fit_bezier_keys(self.TIMES, values, 0.001)
+        self.assertEqual(0, segments[0][0])
+        self.assertEqual(len(self.TIMES) - 1, segments[-1][1])
+        for segment, next_segment in zip(segments, segments[1:]):
+            self.assertEqual(segment[1], next_segment[0])
+        self.assertLess(0, sum(1 for segment in segments if segment[0] + 1 < segment[1]))
+
+    def test_reduce_animation_keys(self):
+        values = [[_curve(time)] for time in self.TIMES]
+        for fit_bezier in (False, True):
+            for tolerance in (0.01, 0.003, 0.001):
+                animation = _create_animation(XModelTranslate(), self.TIMES, values, 1)
+                stats = reduce_animation_keys(animation, tolerance, fit_bezier)
+                self.assertEqual(len(self.TIMES), stats.num_source_keys)
+                self.assertEqual(animation.num_keys, stats.num_keys)
+                self.assertLess(stats.num_keys, stats.num_source_keys)
+                self.assertLessEqual(stats.max_error, tolerance)
+                if not fit_bezier:
+                    self.assertEqual(0, stats.num_bezier_keys)
+                self.assertEqual(stats.num_bezier_keys,
+                                 sum(1 for key in animation.keys
+                                     if key.interpolate == XModelAnimationKey.INTERPOLATE_BEZIER))
+                self.assertWithinTolerance(animation, self.TIMES, values, tolerance)
+
+    def test_bezier_smaller_than_linear(self):
+        values = [[_curve(time)] for time in self.TIMES]
+        linear = _create_animation(XModelTranslate(), self.TIMES, values, 0)
+        reduce_animation_keys(linear, 0.001)
+        fitted = _create_animation(XModelTranslate(), self.TIMES, values, 0)
+        stats = reduce_animation_keys(fitted, 0.001, True)
+        self.assertLess(0, stats.num_bezier_keys)
+        self.assertLess(fitted.num_keys, linear.num_keys)
+        self.assertLess(15 * (stats.num_keys - stats.num_bezier_keys) + 39 * stats.num_bezier_keys,
+                        15 * linear.num_keys)
+
+    def test_reduce_quaternion_keys(self):
+        times = [float(frame) for frame in range(0, 60)]
+        values = [_quaternion(1.0, math.sin(0.1 * time), 0.5, 0.05 * time) for time in times]
+        values[30:40] = [_quaternion(0.0, 1.0, 0.0, 0.3 * (time - 30.0) / 9.0) for time in times[30:40]]
+        for tolerance in (0.01, 0.0005):
+            animation = _create_animation(XModelQuaternion(), times, values)
+            stats = reduce_animation_keys(animation, tolerance, True)
+            self.assertLess(stats.num_keys, stats.num_source_keys)
+            self.assertEqual(0, stats.num_bezier_keys)
+            self.assertWithinTolerance(animation, times, values, tolerance)
+
+    def test_short_animation(self):
+        animation = _create_animation(XModelTranslate(), [0.0, 10.0], [[1.0], [2.0]], 0)
+        stats = reduce_animation_keys(animation, 1.0, True)
+        self.assertEqual(2, animation.num_keys)
+        self.assertEqual(2, stats.num_keys)
+
+
+# The channels of the components are merged into the vector keys on the common timeline.
+class MergeChannelKeysTest(unittest.TestCase):
+
+    # make the channel of the linear keys
+    @staticmethod
+    def channel(times, values):
+        animation = _create_animation(XModelTranslate(), times, [[value] for value in values], 0)
+        return times, values, lambda time: evaluate_animation_keys(animation, time)[0]
+
+    def test_merge(self):
+        x = self.channel([0.0, 10.0, 20.0], [0.0, 1.0, 0.0])
+        z = self.channel([5.0, 10.0, 12.5, 30.0], [2.0, 3.0, 4.0, 4.0])
+        keys = merge_channel_keys([x, None, z], [0.1, 0.2, 0.3])
+
+        # every key time of the channels is kept
+        self.assertEqual([0.0, 5.0, 10.0, 12.5, 20.0, 30.0], [key.time for key in keys])
+        for key in keys:
+            self.assertEqual(XModelAnimationKey.INTERPOLATE_LINER, key.interpolate)
+            self.assertEqual(3, key.value_size)
+            self.assertEqual(0.2, key.value[1])
+
+        # the values are the keys of the channels at their times, and interpolated at the other times
+        values = {key.time: key.value for key in keys}
+        for index, channel in ((0, x), (2, z)):
+            for time, value in zip(channel[0], channel[1]):
+                self.assertEqual(value, values[time][index])
+        self.assertAlmostEqual(0.5, values[5.0][0])
+        self.assertAlmostEqual(0.75, values[12.5][0])
+        self.assertEqual(0.0, values[30.0][0])
+        self.assertEqual(2.0, values[0.0][2])
+        self.assertAlmostEqual(4.0, values[20.0][2])
+
+        # the merged keys are evaluated as the channels
+        animation = _create_animation(XModelTranslate(), [key.time for key in keys], [key.value for key in keys])
+        for time in (0.0, 2.5, 7.0, 11.0, 12.5, 16.0, 25.0):
+            value = evaluate_animation_keys(animation, time)
+            self.assertAlmostEqual(x[2](time), value[0])
+            self.assertAlmostEqual(z[2](time), value[2])
+
+    def test_single_channel(self):
+        y = self.channel([1.0, 2.0], [5.0, 6.0])
+        keys = merge_channel_keys([None, y, None], [1.0, 0.0, 1.0])
+        self.assertEqual([[1.0, 5.0, 1.0], [1.0, 6.0, 1.0]], [key.value for key in keys])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import io
+import unittest
+
+from tests import fake_bpy
+
+fake_bpy.install()
+
+from mathutils import Matrix
+from io_scene_xm import export_xm
+from io_scene_xm.types import (XModelContainer,
+                               XModelMesh,
+                               XModelVertexTable)
+from io_scene_xm.code import XModelBinaryEncoder
+from io_scene_xm.mesh import (snapshot_mesh,
+                              build_mesh)
+
+# global matrix which flips x-axis and swaps y-axis and z-axis like the export operator,
+# combined with the matrix of the rotation, scale and translation
+_GLOBAL_MATRIX = Matrix([[-1.0, 0.0, 0.0, 0.0],
+                         [0.0, 0.0, 1.0, 0.0],
+                         [0.0, 1.0, 0.0, 0.0],
+                         [0.0, 0.0, 0.0, 1.0]]) * \
+                 Matrix([[0.3, 0.1, 0.7, 1.5],
+                         [0.2, 0.9, 0.1, -2.0],
+                         [0.4, 0.3, 0.8, 0.25],
+                         [0.0, 0.0, 0.0, 1.0]])
+
+
+# encode the mesh in the container
+def _encode(mesh):
+    mesh.name = "mesh"
+    container = XModelContainer()
+    container.num_meshs = 1
+    container.meshs = [mesh]
+    writer = io.BytesIO()
+    XModelBinaryEncoder().encode(container, writer)
+    return writer.getvalue()
+
+
+# convert the work mesh by the python loops of the exporter
+def _convert_with_loops(work_mesh, invert_face, compact):
+    exporter = export_xm.XModelExporter(None, global_matrix=_GLOBAL_MATRIX, invert_face=invert_face)
+    dest_mesh = XModelMesh()
+    exporter._XModelExporter__convertXModelMeshWithLoops(work_mesh, dest_mesh)
+    if compact:
+        dest_mesh.compact()
+    return dest_mesh
+
+
+# convert the work mesh by the vectorized conversion
+def _convert_with_arrays(work_mesh, invert_face, compact):
+    return build_mesh(snapshot_mesh(work_mesh), XModelMesh(), _GLOBAL_MATRIX, invert_face, compact)
+
+
+# The vectorized conversion of the meshes builds the same xModel meshes as the python loops.
+class BuildMeshTest(unittest.TestCase):
+
+    # compare the meshes converted by both for the options of the fake mesh
+    def assertSameMesh(self, invert_face=True, compact=False, **options):
+        work_mesh = fake_bpy.create_mesh(**options)
+        expected = _convert_with_loops(work_mesh, invert_face, compact)
+        actual = _convert_with_arrays(work_mesh, invert_face, compact)
+        self.assertEqual(expected.num_positions, actual.num_positions)
+        self.assertEqual(expected.num_normals, actual.num_normals)
+        self.assertEqual(expected.num_tex_coords, actual.num_tex_coords)
+        self.assertEqual(expected.num_vertices, actual.num_vertices)
+        self.assertEqual([vertex.key() for vertex in expected.vertices],
+                         [vertex.key() for vertex in actual.vertices])
+        self.assertEqual([(element.material, element.vertices) for element in expected.elements],
+                         [(element.material, list(element.vertices)) for element in actual.elements])
+        self.assertEqual(expected.skin is None, actual.skin is None)
+        self.assertEqual(_encode(expected), _encode(actual))
+        return actual
+
+    def test_all_attributes(self):
+        mesh = self.assertSameMesh()
+        self.assertLess(0, mesh.num_tex_coords)
+        self.assertIsNotNone(mesh.skin)
+
+    def test_without_colors(self):
+        self.assertSameMesh(colors=False)
+
+    def test_without_tex_coords_and_groups(self):
+        mesh = self.assertSameMesh(uvs=False, groups=False)
+        self.assertEqual(0, mesh.num_tex_coords)
+
+    def test_ngons(self):
+        self.assertSameMesh(ngons=True)
+
+    def test_not_inverted(self):
+        self.assertSameMesh(invert_face=False)
+        self.assertSameMesh(invert_face=False, ngons=True)
+
+    def test_compact(self):
+        mesh = self.assertSameMesh(compact=True)
+        self.assertIsInstance(mesh.vertices, XModelVertexTable)
+        self.assertSameMesh(compact=True, invert_face=False, colors=False)
+
+    def test_larger_mesh(self):
+        self.assertSameMesh(width=40, height=30, seed=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,279 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import collections
+import math
+import random
+import unittest
+
+from io_scene_xm.types import (XModelMesh,
+                               XModelVertex,
+                               XModelVertexTable,
+                               XModelElement)
+from io_scene_xm.code import XModelBinaryDecoder
+from io_scene_xm.optimize import (VERTEX_CACHE_SIZE,
+                                  OVERDRAW_THRESHOLD,
+                                  analyze_vertex_cache,
+                                  optimize_mesh_vertices,
+                                  optimize_mesh_vertex_cache,
+                                  _tipsify,
+                                  _sort_clusters,
+                                  _vertex_vectors,
+                                  _center)
+from tests.test_code import read_demo
+
+
+# create the mesh of the random vertices of the few indices, so the many of them are duplicated,
+# the elements are the random triangles of the vertices
+def create_random_mesh(num_vertices=2000, num_elements=1000, seed=1):
+    rnd = random.Random(seed)
+    mesh = XModelMesh()
+    mesh.num_vertices = num_vertices
+    mesh.vertices = []
+    for i in range(num_vertices):
+        vertex = XModelVertex()
+        vertex.position = rnd.randrange(8)
+        vertex.normal = rnd.randrange(4)
+        vertex.color = rnd.choice((-1, 0))
+        vertex.tex_coord = rnd.randrange(4)
+        vertex.skin_weight = rnd.choice((-1, 0, 1))
+        mesh.vertices.append(vertex)
+    mesh.num_elements = num_elements
+    mesh.elements = []
+    for i in range(num_elements):
+        element = XModelElement()
+        element.material = rnd.randrange(2)
+        element.num_vertices = 3
+        element.vertices = [rnd.randrange(num_vertices) for j in range(3)]
+        mesh.elements.append(element)
+    return mesh
+
+
+# get the keys of the vertices of each element
+def _resolve_elements(mesh):
+    return [[mesh.vertices[index].key() for index in element.vertices] for element in mesh.elements]
+
+
+# The same vertices are merged into the first one in the order of the first appearance,
+# the vertex structures and the table of the exporter are merged equally.
+class OptimizeMeshVerticesTest(unittest.TestCase):
+
+    def test_merge(self):
+        mesh = create_random_mesh()
+        keys = [vertex.key() for vertex in mesh.vertices]
+        elements = _resolve_elements(mesh)
+        removed = optimize_mesh_vertices(mesh)
+
+        self.assertEqual(removed, len(keys) - len(set(keys)))
+        self.assertEqual(mesh.num_vertices, len(set(keys)))
+        self.assertEqual([vertex.key() for vertex in mesh.vertices], list(dict.fromkeys(keys)))
+        self.assertEqual(_resolve_elements(mesh), elements)
+
+    def test_table(self):
+        mesh = create_random_mesh()
+        table_mesh = create_random_mesh()
+        table_mesh.vertices = XModelVertexTable.fromVertices(table_mesh.vertices)
+        self.assertEqual(optimize_mesh_vertices(table_mesh), optimize_mesh_vertices(mesh))
+
+        self.assertIsInstance(table_mesh.vertices, XModelVertexTable)
+        self.assertEqual(table_mesh.num_vertices, mesh.num_vertices)
+        self.assertEqual(list(table_mesh.vertices.keys()), [vertex.key() for vertex in mesh.vertices])
+        self.assertEqual([element.vertices for element in table_mesh.elements],
+                         [element.vertices for element in mesh.elements])
+
+    def test_unique(self):
+        mesh = create_random_mesh(num_vertices=4, num_elements=1)
+        for i, vertex in enumerate(mesh.vertices):
+            vertex.position = i
+        vertices = list(mesh.vertices)
+        self.assertEqual(optimize_mesh_vertices(mesh), 0)
+        self.assertEqual(mesh.vertices, vertices)
+
+        mesh.vertices = XModelVertexTable.fromVertices(mesh.vertices)
+        self.assertEqual(optimize_mesh_vertices(mesh), 0)
+        self.assertEqual(mesh.num_vertices, 4)
+
+
+# create the cylinder of the quads in the random order, the vertices have the outward normals,
+# and a line element of the material 1 is appended after the quads
+def create_cylinder(num_columns=24, num_rows=16, seed=1):
+    rnd = random.Random(seed)
+    mesh = XModelMesh()
+    mesh.name = "cylinder"
+    mesh.num_positions = num_columns * (num_rows + 1)
+    mesh.position_size = 3
+    mesh.positions = []
+    mesh.num_normals = num_columns
+    mesh.normal_size = 3
+    mesh.normals = []
+    for column in range(num_columns):
+        angle = 2.0 * math.pi * column / num_columns
+        mesh.normals.extend([math.cos(angle), math.sin(angle), 0.0])
+    for row in range(num_rows + 1):
+        mesh.positions.extend(value if j % 3 < 2 else float(row)
+                              for j, value in enumerate(mesh.normals))
+    mesh.num_vertices = mesh.num_positions
+    mesh.vertices = []
+    for i in range(mesh.num_vertices):
+        vertex = XModelVertex()
+        vertex.position = i
+        vertex.normal = i % num_columns
+        mesh.vertices.append(vertex)
+    mesh.elements = []
+    for row in range(num_rows):
+        for column in range(num_columns):
+            element = XModelElement()
+            element.material = 0
+            element.num_vertices = 4
+            element.vertices = [row * num_columns + column,
+                                row * num_columns + (column + 1) % num_columns,
+                                (row + 1) * num_columns + (column + 1) % num_columns,
+                                (row + 1) * num_columns + column]
+            mesh.elements.append(element)
+    rnd.shuffle(mesh.elements)
+    line = XModelElement()
+    line.material = 1
+    line.num_vertices = 2
+    line.vertices = [0, num_columns]
+    mesh.elements.append(line)
+    mesh.num_elements = len(mesh.elements)
+    return mesh
+
+
+# get the triangle of the vertex keys which starts at the least one, the winding is kept by rotating it
+def _canonical_triangle(keys):
+    start = keys.index(min(keys))
+    return tuple(keys[start:] + keys[0:start])
+
+
+# get the counts of the triangles of each material, the polygons are divided into the fans,
+# and the counts of the other elements
+def _count_triangles(mesh):
+    triangles = collections.Counter()
+    for element in mesh.elements[0:mesh.num_elements]:
+        keys = [mesh.vertices[index].key() for index in element.vertices]
+        if element.num_vertices < 3:
+            triangles[(element.material, tuple(keys))] += 1
+            continue
+        for i in range(1, element.num_vertices - 1):
+            triangles[(element.material, _canonical_triangle([keys[0], keys[i], keys[i + 1]]))] += 1
+    return triangles
+
+
+# get the vertex indices of the triangles of the mesh
+def _triangle_indices(mesh):
+    return [index for element in mesh.elements[0:mesh.num_elements] if 3 <= element.num_vertices
+            for index in element.vertices]
+
+
+# The triangles are only reordered by the optimization of the vertex cache,
+# they keep the materials and the windings, and the vertex cache misses don't increase.
+class OptimizeMeshVertexCacheTest(unittest.TestCase):
+
+    def test_analyze(self):
+        self.assertEqual(analyze_vertex_cache([0, 1, 2, 0, 1, 2], 3), (1.5, 1.0))
+        self.assertEqual(analyze_vertex_cache([0, 1, 2, 0, 1, 2], 2), (3.0, 2.0))
+        self.assertEqual(analyze_vertex_cache([]), (0.0, 0.0))
+
+    def test_triangles(self):
+        for reduce_overdraw in (True, False):
+            for compact in (False, True):
+                with self.subTest(reduce_overdraw=reduce_overdraw, compact=compact):
+                    mesh = create_cylinder()
+                    triangles = _count_triangles(mesh)
+                    if compact:
+                        mesh.vertices = XModelVertexTable.fromVertices(mesh.vertices)
+                    stats = optimize_mesh_vertex_cache(mesh, reduce_overdraw=reduce_overdraw)
+                    if compact:
+                        self.assertIsInstance(mesh.vertices, XModelVertexTable)
+                        mesh.vertices = list(mesh.vertices)
+
+                    self.assertEqual(_count_triangles(mesh), triangles)
+                    self.assertEqual(mesh.num_elements, len(mesh.elements))
+                    self.assertEqual(mesh.elements[-1].num_vertices, 2)
+                    self.assertEqual(stats.num_triangles, 2 * 24 * 16)
+                    self.assertEqual(stats.num_vertices, mesh.num_vertices)
+                    if reduce_overdraw:
+                        self.assertLess(1, stats.num_clusters)
+                    else:
+                        self.assertEqual(1, stats.num_clusters)
+
+    def test_acmr(self):
+        mesh = create_cylinder()
+        stats = optimize_mesh_vertex_cache(mesh)
+        self.assertEqual((stats.acmr_after, stats.atvr_after), analyze_vertex_cache(_triangle_indices(mesh)))
+        self.assertLess(stats.acmr_after, stats.acmr_before)
+        self.assertLess(stats.atvr_after, stats.atvr_before)
+
+        # the vertices are renumbered in order of the first use
+        indices = _triangle_indices(mesh)
+        self.assertEqual(list(dict.fromkeys(indices)), list(range(mesh.num_vertices)))
+
+    def test_clusters(self):
+        mesh = create_cylinder()
+        indices = _triangle_indices(mesh)
+        triangles = collections.Counter(_canonical_triangle(indices[i:i + 3]) for i in range(0, len(indices), 3))
+        dest, clusters = _tipsify(indices, VERTEX_CACHE_SIZE, OVERDRAW_THRESHOLD)
+        self.assertEqual(collections.Counter(_canonical_triangle(dest[i:i + 3]) for i in range(0, len(dest), 3)),
+                         triangles)
+        self.assertEqual(clusters[0], 0)
+        self.assertEqual(clusters, sorted(set(clusters)))
+        self.assertLess(clusters[-1], len(dest) // 3)
+
+        # the clusters are moved as a whole
+        position, normal = _vertex_vectors(mesh)
+        sorted_indices = _sort_clusters(dest, clusters, position, normal, _center(mesh))
+        bounds = clusters + [len(dest) // 3]
+        blocks = [tuple(dest[3 * bounds[i]:3 * bounds[i + 1]]) for i in range(len(clusters))]
+        offset = 0
+        while 0 < len(blocks):
+            block = next((block for block in blocks if
+                          tuple(sorted_indices[offset:offset + len(block)]) == block), None)
+            self.assertIsNotNone(block, "no cluster starts at the triangle %d" % (offset // 3))
+            blocks.remove(block)
+            offset += len(block)
+        self.assertEqual(offset, len(sorted_indices))
+
+    def test_demo(self):
+        container = XModelBinaryDecoder().decode(read_demo())
+        for mesh in container.meshs:
+            with self.subTest(mesh=mesh.name):
+                triangles = _count_triangles(mesh)
+                acmr, atvr = analyze_vertex_cache(_triangle_indices(mesh))
+                stats = optimize_mesh_vertex_cache(mesh)
+
+                self.assertEqual(_count_triangles(mesh), triangles)
+                self.assertAlmostEqual(stats.acmr_before, acmr)
+                self.assertLess(stats.acmr_after, stats.acmr_before)
+                self.assertLess(stats.acmr_after, 0.8)
+
+
+if __name__ == "__main__":
+    unittest.main()
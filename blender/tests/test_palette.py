@@ -0,0 +1,223 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import unittest
+
+from io_scene_xm.types import (XModelMesh,
+                               XModelSkin,
+                               XModelNode,
+                               XModelVertex,
+                               XModelElement)
+from io_scene_xm.palette import (limit_skin_weights,
+                                 partition_mesh_skin)
+
+
+# create the skin of the weighted indices, they are the lists of pairs of bone and weight
+def _create_skin(weighted_indices, num_nodes):
+    skin = XModelSkin()
+    skin.num_weighted_indices = len(weighted_indices)
+    skin.weighted_index_stride = max(len(pairs) for pairs in weighted_indices)
+    skin.weighted_index_sizes = [len(pairs) for pairs in weighted_indices]
+    skin.indices = [-1] * (skin.weighted_index_stride * skin.num_weighted_indices)
+    skin.weights = [0.0] * (skin.weighted_index_stride * skin.num_weighted_indices)
+    for i, pairs in enumerate(weighted_indices):
+        for j, (bone, weight) in enumerate(pairs):
+            skin.indices[skin.weighted_index_stride * i + j] = bone
+            skin.weights[skin.weighted_index_stride * i + j] = weight
+    skin.num_nodes = num_nodes
+    skin.nodes = []
+    skin.offset_matrices = []
+    for i in range(num_nodes):
+        node = XModelNode()
+        node.name = "bone%d" % i
+        skin.nodes.append(node)
+        skin.offset_matrices.extend([1.0, 0.0, 0.0, 0.0,
+                                     0.0, 1.0, 0.0, 0.0,
+                                     0.0, 0.0, 1.0, 0.0,
+                                     float(i), 0.0, 0.0, 1.0])
+    return skin
+
+
+# create the strip of the quads along the bones, the vertices of each column are weighted by
+# the 5 bones from the bone of the column, and the normals are shared by the rows
+def create_strip(num_columns=12, num_influences=5):
+    mesh = XModelMesh()
+    mesh.name = "strip"
+    mesh.num_positions = 2 * num_columns
+    mesh.position_size = 3
+    mesh.positions = []
+    for column in range(num_columns):
+        mesh.positions.extend([float(column), 0.0, 0.0, float(column), 1.0, 0.0])
+    mesh.num_normals = 2
+    mesh.normal_size = 3
+    mesh.normals = [0.0, 0.0, 1.0, 0.0, 0.6, 0.8]
+
+    # the weights of the column decrease with the distance of the bone
+    weighted_indices = []
+    for column in range(num_columns):
+        weights = [1.0 / (1 + j) for j in range(num_influences)]
+        total = sum(weights)
+        weighted_indices.append([(column + j, weight / total) for j, weight in enumerate(weights)])
+    mesh.skin = _create_skin(weighted_indices, num_columns + num_influences - 1)
+
+    mesh.num_vertices = 2 * num_columns
+    mesh.vertices = []
+    for i in range(mesh.num_vertices):
+        vertex = XModelVertex()
+        vertex.position = i
+        vertex.normal = i % 2
+        vertex.skin_weight = i // 2
+        mesh.vertices.append(vertex)
+
+    mesh.num_elements = num_columns - 1
+    mesh.elements = []
+    for column in range(num_columns - 1):
+        element = XModelElement()
+        element.material = -1
+        element.num_vertices = 4
+        element.vertices = [2 * column, 2 * column + 2, 2 * column + 3, 2 * column + 1]
+        mesh.elements.append(element)
+    return mesh
+
+
+# get the positions of the vertices of each element, and the weights of each bone of the vertices of them
+def _resolve_elements(mesh):
+    skin = mesh.skin
+    elements = []
+    for element in mesh.elements[0:mesh.num_elements]:
+        vertices = []
+        for index in element.vertices:
+            vertex = mesh.vertices[index]
+            position = tuple(mesh.positions[3 * vertex.position:3 * vertex.position + 3])
+            normal = tuple(mesh.normals[3 * vertex.normal:3 * vertex.normal + 3])
+            offset = skin.weighted_index_stride * vertex.skin_weight
+            size = skin.weighted_index_sizes[vertex.skin_weight]
+            weights = {skin.nodes[bone].name: weight
+                       for bone, weight in zip(skin.indices[offset:offset + size], skin.weights[offset:offset + size])}
+            vertices.append((position, normal, weights))
+        elements.append(vertices)
+    return elements
+
+
+# The skinned mesh is partitioned into the submeshs of the palettes, and their vertices have the same bones.
+class PartitionMeshSkinTest(unittest.TestCase):
+
+    def test_palette_size(self):
+        mesh = create_strip()
+        for palette_size in (6, 8, 16):
+            submeshs, stats = partition_mesh_skin(mesh, palette_size)
+            self.assertEqual(palette_size < 16, 1 < len(submeshs))
+            self.assertEqual(0, stats.num_oversized)
+            # the last bone is only the 5th bone of the last column
+            self.assertEqual(mesh.skin.num_nodes - 1, stats.num_bones)
+            for sub in submeshs:
+                self.assertLessEqual(sub.skin.num_nodes, palette_size)
+                self.assertEqual(sub.skin.num_nodes, len(sub.skin.nodes))
+                self.assertEqual(16 * sub.skin.num_nodes, len(sub.skin.offset_matrices))
+                for index in sub.skin.indices:
+                    self.assertLess(index, sub.skin.num_nodes)
+            self.assertEqual([sub.skin.num_nodes for sub in submeshs], stats.palette_sizes)
+            self.assertEqual(sum(sub.num_vertices for sub in submeshs), stats.num_vertices)
+            self.assertEqual(mesh.num_elements, sum(sub.num_elements for sub in submeshs))
+
+    def test_same_bones(self):
+        mesh = create_strip()
+        expected = sorted(_resolve_elements(mesh))
+        submeshs, stats = partition_mesh_skin(mesh, 6)
+        actual = []
+        for sub in submeshs:
+            actual.extend(_resolve_elements(sub))
+
+            # the offset matrices are moved with the nodes
+            for i, node in enumerate(sub.skin.nodes):
+                bone = mesh.skin.nodes.index(node)
+                self.assertEqual(mesh.skin.offset_matrices[16 * bone:16 * bone + 16],
+                                 sub.skin.offset_matrices[16 * i:16 * i + 16])
+
+        # the weights are limited to the 4 heaviest bones, the elements are compared as the sets of the bones
+        self.assertEqual(len(expected), len(actual))
+        for source, element in zip(expected, sorted(actual)):
+            for (position, normal, weights), (sub_position, sub_normal, sub_weights) in zip(source, element):
+                self.assertEqual(position, sub_position)
+                self.assertEqual(normal, sub_normal)
+                heaviest = sorted(weights, key=lambda name: -weights[name])[0:4]
+                self.assertEqual(sorted(heaviest), sorted(sub_weights))
+                self.assertAlmostEqual(1.0, sum(sub_weights.values()))
+        self.assertEqual(mesh.num_vertices // 2, stats.num_pruned_weights)
+
+    def test_oversized(self):
+        mesh = create_strip(num_columns=4)
+        submeshs, stats = partition_mesh_skin(mesh, 4, max_influences=5)
+        self.assertEqual(1, stats.num_oversized)
+        self.assertEqual(1, len(submeshs))
+        self.assertEqual(mesh.skin.num_nodes, submeshs[0].skin.num_nodes)
+        self.assertEqual(0, stats.num_pruned_weights)
+
+    def test_without_skin(self):
+        mesh = create_strip()
+        mesh.skin = None
+        submeshs, stats = partition_mesh_skin(mesh)
+        self.assertEqual([mesh], submeshs)
+        self.assertEqual([], stats.palette_sizes)
+
+
+# The weights of the weighted indices are limited and renormalized.
+class LimitSkinWeightsTest(unittest.TestCase):
+
+    def test_limit(self):
+        skin = _create_skin([[(0, 0.1), (1, 0.4), (2, 0.2), (3, 0.05), (4, 0.25)],
+                             [(5, 0.5), (6, 0.5)],
+                             [(7, 0.3)]], 8)
+        limited, num_pruned = limit_skin_weights(skin, 3)
+        self.assertEqual(2, num_pruned)
+        self.assertEqual([1, 4, 2], [bone for bone, weight in limited[0]])
+        for (bone, weight), expected in zip(limited[0], (0.4, 0.25, 0.2)):
+            self.assertAlmostEqual(expected / 0.85, weight)
+        self.assertAlmostEqual(1.0, sum(weight for bone, weight in limited[0]))
+
+        # the weights within the limit are kept as they are
+        self.assertEqual([(5, 0.5), (6, 0.5)], limited[1])
+        self.assertEqual([(7, 0.3)], limited[2])
+
+    def test_threshold(self):
+        skin = _create_skin([[(0, 0.5), (1, 0.3), (2, 0.15), (3, 0.05)],
+                             [(4, 0.04), (5, 0.02)]], 6)
+        limited, num_pruned = limit_skin_weights(skin, 4, 0.1)
+        self.assertEqual(2, num_pruned)
+        self.assertEqual([0, 1, 2], [bone for bone, weight in limited[0]])
+        self.assertAlmostEqual(1.0, sum(weight for bone, weight in limited[0]))
+
+        # the heaviest one is kept even if it's below the threshold
+        self.assertEqual([4], [bone for bone, weight in limited[1]])
+        self.assertAlmostEqual(1.0, limited[1][0][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,281 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import io
+import json
+import math
+import os
+import unittest
+
+import numpy
+
+from io_scene_xm.types import (XModelContainer,
+                               XModelNode,
+                               XModelMatrix,
+                               XModelTranslate,
+                               XModelScale,
+                               XModelQuaternion,
+                               XModelAxisRotate,
+                               XModelAnimation,
+                               XModelAnimationKey,
+                               XModelAnimationSet)
+from io_scene_xm.code import (XModelBinaryEncoder,
+                              XModelBinaryDecoder)
+from io_scene_xm.quantize import ENCODING_FLOAT32
+from io_scene_xm.pose import XModelPoseEvaluator
+
+# directory of the fixtures
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# poses of the runtime, they are written by "node tests/pose_fixtures.js" with
+# XModelContainerUtils.setAnimation and updateCombination
+POSES_PATH = os.path.join(DATA_DIRECTORY, "poses.json")
+
+# model of the synthetic animations, it's the encoded create_container()
+MODEL_PATH = os.path.join(DATA_DIRECTORY, "poses.xm")
+
+
+# create the transform of the values
+def _transform(transform_class, values):
+    transform = transform_class()
+    transform.values[0:len(values)] = values
+    return transform
+
+
+# create the matrix transform of the translation in the columns
+def _matrix(x, y, z):
+    return _transform(XModelMatrix, [1.0, 0.0, 0.0, 0.0,
+                                     0.0, 1.0, 0.0, 0.0,
+                                     0.0, 0.0, 1.0, 0.0,
+                                     x, y, z, 1.0])
+
+
+# create the node of the transforms
+def _node(name, transforms, children=()):
+    node = XModelNode()
+    node.name = name
+    node.transforms = transforms
+    node.num_children = len(children)
+    node.children = list(children)
+    return node
+
+
+# create the key, the bezier key has the control points of before and after it
+def _key(time, value, before=None, after=None):
+    key = XModelAnimationKey()
+    key.interpolate = XModelAnimationKey.INTERPOLATE_LINER
+    key.time = time
+    key.value_size = len(value)
+    key.value = list(value)
+    if before is not None or after is not None:
+        key.interpolate = XModelAnimationKey.INTERPOLATE_BEZIER
+        key.before_time, key.before_value = before if before is not None else (time, value)
+        key.after_time, key.after_value = after if after is not None else (time, value)
+    return key
+
+
+# create the animation of the keys for the target, the index is -1 for the whole target
+def _animation(target, keys, index=-1):
+    animation = XModelAnimation()
+    animation.target = target
+    animation.index = index
+    animation.num_keys = len(keys)
+    animation.keys = keys
+    return animation
+
+
+# create the quaternion of the rotation around the axis
+def _quaternion(x, y, z, angle):
+    length = math.sqrt(x * x + y * y + z * z)
+    sn = math.sin(0.5 * angle) / length
+    return [math.cos(0.5 * angle), x * sn, y * sn, z * sn]
+
+
+# create the container of the hierarchy of the nodes which have all of the types of the transforms,
+# the first animation set has the linear and the bezier keys of the elements, the keys of the whole
+# quaternion, axis rotate, scale and matrix, and the sampled frames,
+# the second one is the short animation of a scale for the loop
+def create_container():
+    hand = _node("hand", [_matrix(0.0, 1.0, 0.0), None, None, None])
+    arm = _node("arm", [_matrix(0.0, 2.0, 0.0),
+                        _transform(XModelTranslate, [0.1, 0.0, 0.0]),
+                        _transform(XModelScale, [1.0, 1.0, 1.0]),
+                        _transform(XModelAxisRotate, [0.0, 0.0, 1.0, 0.3])], [hand])
+    leg = _node("leg", [_matrix(0.0, -1.0, 0.0),
+                        _transform(XModelTranslate, [0.0, 0.0, 0.0]),
+                        _transform(XModelScale, [1.0, 2.0, 1.0]),
+                        _transform(XModelQuaternion, _quaternion(1.0, 0.0, 0.0, 0.4))])
+    root = _node("root", [_matrix(0.5, 1.0, 0.0),
+                          _transform(XModelTranslate, [0.0, 0.0, 0.0]),
+                          _transform(XModelScale, [1.0, 1.0, 1.0]),
+                          _transform(XModelQuaternion, [1.0, 0.0, 0.0, 0.0])], [arm, leg])
+    root_translate, root_scale, root_rotate = root.transforms[1:4]
+    arm_translate, arm_rotate = arm.transforms[1], arm.transforms[3]
+    leg_translate, leg_scale, leg_rotate = leg.transforms[1:4]
+
+    # linear and bezier keys of the elements
+    animations = [
+        _animation(root_translate, [_key(0.0, [0.0]), _key(10.0, [1.0]), _key(30.0, [-0.5]), _key(40.0, [0.2])], 0),
+        _animation(root_translate, [_key(0.0, [0.0], after=(5.0, [1.0])),
+                                    _key(20.0, [2.0], before=(12.0, [2.5]), after=(26.0, [1.0])),
+                                    _key(40.0, [0.5], before=(39.0, [0.0]))], 1),
+        _animation(arm_translate, [_key(0.0, [0.0], after=(15.0, [1.0])),
+                                   _key(20.0, [1.0], before=(18.0, [1.5])),
+                                   _key(40.0, [0.0])], 2),
+        _animation(leg_rotate, [_key(4.0, [0.2]), _key(36.0, [-0.3])], 3)]
+
+    # keys of the whole transforms
+    animations.extend([
+        _animation(root_rotate, [_key(0.0, _quaternion(0.0, 1.0, 0.0, 0.0)),
+                                 _key(20.0, _quaternion(0.0, 1.0, 0.2, 1.5)),
+                                 _key(40.0, _quaternion(1.0, 0.0, 0.5, -2.5))]),
+        _animation(root_scale, [_key(0.0, [1.0, 1.0, 1.0]), _key(40.0, [1.5, 0.5, 1.0])]),
+        _animation(arm_rotate, [_key(0.0, [0.0, 0.0, 1.0, 0.0]),
+                                _key(20.0, [1.0, 0.0, 1.0, 1.2]),
+                                _key(40.0, [0.0, 1.0, 0.0, -0.5])]),
+        _animation(hand.transforms[0], [_key(0.0, [1.0, 0.0, 0.0, 0.0,
+                                                   0.0, 1.0, 0.0, 0.0,
+                                                   0.0, 0.0, 1.0, 0.0,
+                                                   0.0, 1.0, 0.0, 1.0]),
+                                        _key(40.0, [0.0, 1.0, 0.0, 0.0,
+                                                    -2.0, 0.0, 0.0, 0.0,
+                                                    0.0, 0.0, 1.0, 0.0,
+                                                    1.0, 0.5, -1.0, 1.0])])])
+
+    # sampled frames
+    sampled = _animation(leg_translate, [])
+    sampled.frame_start = 5
+    sampled.num_frames = 21
+    sampled.frame_size = 3
+    sampled.frames = []
+    for frame in range(sampled.num_frames):
+        sampled.frames.extend([0.05 * frame, math.sin(0.3 * frame), 0.0])
+    animations.append(sampled)
+
+    first = XModelAnimationSet()
+    first.name = "mixed"
+    first.num_animations = len(animations)
+    first.animations = animations
+    second = XModelAnimationSet()
+    second.name = "scale"
+    second.num_animations = 1
+    second.animations = [_animation(leg_scale, [_key(0.0, [1.0, 1.0, 1.0]), _key(10.0, [2.0, 0.5, 1.5])])]
+
+    container = XModelContainer()
+    container.num_nodes = 1
+    container.nodes = [root]
+    container.time_rate = 30.0
+    container.num_animation_sets = 2
+    container.animation_sets = [first, second]
+    return container
+
+
+# encode the container of create_container() with the bezier keys and the sampled frames
+def encode_container():
+    writer = io.BytesIO()
+    XModelBinaryEncoder(bezier=True, sample_encoding=ENCODING_FLOAT32).encode(create_container(), writer)
+    return writer.getvalue()
+
+
+# write the model of the synthetic animations for pose_fixtures.js
+def write_model(path=MODEL_PATH):
+    with open(path, "wb") as file:
+        file.write(encode_container())
+
+
+# get the nodes in the depth first order as pose_fixtures.js does
+def _depth_first_nodes(nodes, ordered=None):
+    ordered = [] if ordered is None else ordered
+    for node in nodes:
+        ordered.append(node)
+        if node.children is not None:
+            _depth_first_nodes(node.children[0:node.num_children], ordered)
+    return ordered
+
+
+# The batched poses are same as the poses of the runtime for each time.
+class PoseEvaluatorTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(POSES_PATH, "r") as file:
+            cls.fixtures = json.load(file)
+        cls.containers = {}
+
+    # get the decoded container of the model of the fixture
+    def getContainer(self, model):
+        if model not in self.containers:
+            with open(os.path.join(DATA_DIRECTORY, model), "rb") as file:
+                self.containers[model] = XModelBinaryDecoder().decode(file.read())
+        return self.containers[model]
+
+    # compare the poses of the fixtures of the model, the combined matrices of the runtime are in the columns
+    def assertSamePoses(self, model, tolerance):
+        jobs = [job for job in self.fixtures if job["model"] == model]
+        self.assertLess(0, len(jobs))
+        container = self.getContainer(model)
+        nodes = _depth_first_nodes(container.nodes[0:container.num_nodes])
+        evaluator = XModelPoseEvaluator(container.nodes[0:container.num_nodes])
+        columns = [evaluator.nodes.index(nodes[index]) for index in jobs[0]["nodes"]]
+        for job in jobs:
+            pose = evaluator.evaluate(container.animation_sets[job["animation"]],
+                                      job["times"],
+                                      time_rate=container.time_rate,
+                                      loop=job["loop"])
+            expected = numpy.array(job["matrices"]).reshape(len(job["times"]), len(job["nodes"]), 4, 4)
+            numpy.testing.assert_allclose(pose.world_matrices[:, columns],
+                                          expected.swapaxes(-1, -2),
+                                          rtol=0.0,
+                                          atol=tolerance,
+                                          err_msg="%s %s" % (model, job["name"]))
+
+    def test_model(self):
+        with open(MODEL_PATH, "rb") as file:
+            self.assertEqual(file.read(), encode_container())
+
+    def test_synthetic_poses(self):
+        self.assertSamePoses("poses.xm", 2e-6)
+
+    def test_demo_poses(self):
+        self.assertSamePoses(os.path.join("..", "..", "..", "demo", "common_resources", "3d_model",
+                                          "hackadoll_no2", "model.xm"), 2e-5)
+
+    def test_batch_of_a_frame(self):
+        container = self.getContainer("poses.xm")
+        evaluator = XModelPoseEvaluator(container.nodes)
+        times = [0.0, 0.3, 0.71, 1.6]
+        batch = evaluator.evaluate(container.animation_sets[0], times, container.time_rate, True)
+        for i, time in enumerate(times):
+            pose = evaluator.evaluate(container.animation_sets[0], [time], container.time_rate, True)
+            numpy.testing.assert_array_equal(batch.world_matrices[i], pose.world_matrices[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+#
+# Copyright (c) 2015, Syuuhei Kuno
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+#  1. Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#  2. Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and / or other materials provided with the distribution.
+#
+#  3. Neither the name of the copyright holder nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+# ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import random
+import unittest
+
+import numpy
+
+from io_scene_xm.types import (XModelMesh,
+                               XModelNode,
+                               XModelSkin,
+                               XModelVertex)
+from io_scene_xm.skin import XModelSkinDeformer
+
+
+# multiply the matrices in the columns as xpl.Matrix4x4.mulv
+def _multiply(a, b):
+    return [sum(a[k * 4 + row] * b[column * 4 + k] for k in range(4)) for column in range(4) for row in range(4)]
+
+
+# transform the vector by the matrix in the columns as xpl.Vector3.mulMatrix4x4v and mulMatrix4x4Axisv
+def _transform(m, vector, axis):
+    return [sum(m[column * 4 + row] * vector[column] for column in range(3)) + (0.0 if axis else m[12 + row])
+            for row in range(3)]
+
+
+# skin the vertices of the mesh for a pose as XModelSkinUtils.updateMatrixPallet and updateVertices do,
+# the combined matrices are in the columns and None for the null nodes,
+# returns the positions and the normals of the vertices
+def _skin_vertices(mesh, combined_matrices):
+    skin = mesh.skin
+    pallet = []
+    for i in range(skin.num_nodes):
+        if combined_matrices[i] is None:
+            pallet.append(numpy.identity(4).reshape(-1).tolist())
+        else:
+            pallet.append(_multiply(combined_matrices[i], skin.offset_matrices[16 * i:16 * i + 16]))
+
+    stride = skin.weighted_index_stride
+    results = []
+    for values, size, axis in ((mesh.positions, mesh.position_size, False),
+                               (mesh.normals, mesh.normal_size, True)):
+        vectors = []
+        for vertex in mesh.vertices:
+            source = values[size * vertex.position if not axis else size * vertex.normal:][0:3]
+            first = stride * vertex.skin_weight
+            if stride == 1:
+                vectors.append(_transform(pallet[skin.indices[first]], source, axis))
+                continue
+            dest = [0.0, 0.0, 0.0]
+            for j in range(stride):
+                weight = skin.weights[first + j]
+                if 0 < weight:
+                    vector = _transform(pallet[skin.indices[first + j]], source, axis)
+                    dest = [d + v * weight for d, v in zip(dest, vector)]
+            vectors.append(dest)
+        results.append(vectors)
+    return results
+
+
+# create the random affine matrix in the rows
+def _random_matrix(rnd):
+    matrix = numpy.identity(4)
+    matrix[0:3, 0:4] = [[rnd.uniform(-1.0, 1.0) for column in range(4)] for row in range(3)]
+    return matrix
+
+
+# create the mesh skinned by the nodes, each vertex has the weighted indices of the stride,
+# the weights are zero at random and the indices of the vertices are shuffled
+def _create_mesh(num_vertices, num_nodes, stride, rnd):
+    mesh = XModelMesh()
+    mesh.num_positions = num_vertices
+    mesh.position_size = 3
+    mesh.positions = [rnd.uniform(-2.0, 2.0) for i in range(3 * num_vertices)]
+    mesh.num_normals = num_vertices
+    mesh.normal_size = 3
+    mesh.normals = [rnd.uniform(-1.0, 1.0) for i in range(3 * num_vertices)]
+
+    skin = XModelSkin()
+    skin.num_weighted_indices = num_vertices
+    skin.weighted_index_stride = stride
+    skin.weighted_index_sizes = [stride] * num_vertices
+    skin.indices = [rnd.randrange(num_nodes) for i in range(stride * num_vertices)]
+    skin.weights = [rnd.choice([0.0, rnd.random()]) for i in range(stride * num_vertices)]
+    skin.num_nodes = num_nodes
+    skin.nodes = [XModelNode() for i in range(num_nodes)]
+    skin.offset_matrices = []
+    for i in range(num_nodes):
+        skin.offset_matrices.extend(_random_matrix(rnd).T.reshape(-1).tolist())
+    mesh.skin = skin
+
+    mesh.num_vertices = num_vertices
+    mesh.vertices = []
+    for i in range(num_vertices):
+        vertex = XModelVertex()
+        vertex.position = rnd.randrange(num_vertices)
+        vertex.normal = rnd.randrange(num_vertices)
+        vertex.skin_weight = rnd.randrange(num_vertices)
+        mesh.vertices.append(vertex)
+    return mesh
+
+
+# The skinned vertices for the batch of the poses are same as the vertices skinned by the runtime for each pose.
+class SkinDeformerTest(unittest.TestCase):
+
+    # compare the skinned vertices of the random poses, the nodes of the poses are shuffled from the skin
+    def assertSameVertices(self, stride, num_frames=5, chunk_bytes=None, seed=1):
+        rnd = random.Random(seed)
+        mesh = _create_mesh(60, 7, stride, rnd)
+        nodes = list(mesh.skin.nodes)
+        rnd.shuffle(nodes)
+        world_matrices = numpy.array([[_random_matrix(rnd) for node in nodes] for frame in range(num_frames)])
+        deformer = XModelSkinDeformer(mesh, nodes)
+        if chunk_bytes is None:
+            positions, normals = deformer.deform(world_matrices)
+        else:
+            positions, normals = deformer.deform(world_matrices, chunk_bytes)
+
+        for frame in range(num_frames):
+            combined = [world_matrices[frame, nodes.index(node)].T.reshape(-1).tolist() for node in mesh.skin.nodes]
+            expected_positions, expected_normals = _skin_vertices(mesh, combined)
+            numpy.testing.assert_allclose(positions[frame], expected_positions, rtol=0.0, atol=2e-5)
+            numpy.testing.assert_allclose(normals[frame], expected_normals, rtol=0.0, atol=2e-5)
+
+    def test_weighted_indices(self):
+        self.assertSameVertices(4)
+
+    def test_single_index(self):
+        self.assertSameVertices(1)
+
+    def test_chunks(self):
+        self.assertSameVertices(4, num_frames=7, chunk_bytes=3 * 60 * 12 * 4)
+        self.assertSameVertices(3, num_frames=3, chunk_bytes=0, seed=2)
+
+    def test_null_node(self):
+        rnd = random.Random(3)
+        mesh = _create_mesh(20, 3, 2, rnd)
+        mesh.skin.nodes[2] = None
+        world_matrices = numpy.array([[_random_matrix(rnd) for i in range(2)]])
+        positions, normals = XModelSkinDeformer(mesh, mesh.skin.nodes[0:2]).deform(world_matrices)
+
+        # the null node is the identity matrix without the offset matrix as the runtime does
+        combined = [matrix.T.reshape(-1).tolist() for matrix in world_matrices[0]] + [None]
+        expected_positions, expected_normals = _skin_vertices(mesh, combined)
+        numpy.testing.assert_allclose(positions[0], expected_positions, rtol=0.0, atol=2e-5)
+        numpy.testing.assert_allclose(normals[0], expected_normals, rtol=0.0, atol=2e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,369 @@
+/**
+ * @license
+ *
+ * Copyright (c) 2016, Syuuhei Kuno
+ * All rights reserved.
+ *
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * 1. Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * 2. Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * 3. Neither the name of xplain_for_js nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+ * DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+ * FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ * DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+ * SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ * CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+ * OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+(function (xpl) {
+
+    "use strict";
+
+    /**
+     * 長さ符号の基本値
+     *
+     * @private
+     * @const {Uint16Array}
+     */
+    const LENGTH_BASES = new Uint16Array([
+        3, 4, 5, 6, 7, 8, 9, 10, 11, 13, 15, 17, 19, 23, 27, 31,
+        35, 43, 51, 59, 67, 83, 99, 115, 131, 163, 195, 227, 258]);
+
+    /**
+     * 長さ符号の拡張ビット数
+     *
+     * @private
+     * @const {Uint8Array}
+     */
+    const LENGTH_EXTRAS = new Uint8Array([
+        0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2,
+        3, 3, 3, 3, 4, 4, 4, 4, 5, 5, 5, 5, 0]);
+
+    /**
+     * 距離符号の基本値
+     *
+     * @private
+     * @const {Uint16Array}
+     */
+    const DISTANCE_BASES = new Uint16Array([
+        1, 2, 3, 4, 5, 7, 9, 13, 17, 25, 33, 49, 65, 97, 129, 193,
+        257, 385, 513, 769, 1025, 1537, 2049, 3073, 4097, 6145, 8193, 12289, 16385, 24577]);
+
+    /**
+     * 距離符号の拡張ビット数
+     *
+     * @private
+     * @const {Uint8Array}
+     */
+    const DISTANCE_EXTRAS = new Uint8Array([
+        0, 0, 0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6,
+        7, 7, 8, 8, 9, 9, 10, 10, 11, 11, 12, 12, 13, 13]);
+
+    /**
+     * 符号長の符号の並び順
+     *
+     * @private
+     * @const {Uint8Array}
+     */
+    const CODE_LENGTH_ORDER = new Uint8Array([
+        16, 17, 18, 0, 8, 7, 9, 6, 10, 5, 11, 4, 12, 3, 13, 2, 14, 1, 15]);
+
+    /**
+     * ハフマン符号の最大ビット数
+     *
+     * @private
+     * @const {number}
+     */
+    const MAX_BITS = 15;
+
+    /**
+     * Deflate形式の圧縮データを展開するためのユーティリティクラスです。
+     *
+     * @constructor
+     */
+    xpl.InflateUtils = function () {
+        throw new Error("Unsupported operation!");
+    };
+
+    /**
+     * 展開の状態を保持するクラスです。
+     *
+     * @private
+     * @constructor
+     * @param {Uint8Array} src - 入力元の配列
+     * @param {number} src_off - 入力元の配列オフセット
+     * @param {number} src_len - 入力元の要素数
+     * @param {Uint8Array} dest - 出力先の配列
+     */
+    function Inflater(src, src_off, src_len, dest) {
+        this.src = src;
+        this.src_pos = src_off;
+        this.src_end = src_off + src_len;
+        this.dest = dest;
+        this.dest_pos = 0;
+        this.bit_buf = 0;
+        this.bit_cnt = 0;
+    }
+
+    /**
+     * 入力元から指定のビット数の値を取得します。
+     *
+     * @param {number} num - ビット数
+     * @returns {number} 取得した値
+     */
+    Inflater.prototype.getBits = function (num) {
+        let buf = this.bit_buf;
+        while (this.bit_cnt < num) {
+            if (this.src_end <= this.src_pos) {
+                throw new Error("Unexpected end of the compressed data!");
+            }
+            buf |= this.src[this.src_pos++] << this.bit_cnt;
+            this.bit_cnt += 8;
+        }
+        this.bit_buf = buf >>> num;
+        this.bit_cnt -= num;
+        return buf & ((1 << num) - 1);
+    };
+
+    /**
+     * ハフマン符号の表を構築します。
+     *
+     * @param {Uint8Array} lengths - 符号長の配列
+     * @param {number} off - 符号長の配列オフセット
+     * @param {number} num - 符号の数
+     * @returns {Object} 符号長ごとの符号の数と、符号順の記号の配列
+     */
+    function createHuffman(lengths, off, num) {
+        let counts = new Uint16Array(MAX_BITS + 1);
+        let symbols = new Uint16Array(num);
+        for (let i = 0; i < num; ++i) {
+            counts[lengths[off + i]]++;
+        }
+        counts[0] = 0;
+
+        let offsets = new Uint16Array(MAX_BITS + 1);
+        for (let i = 1; i < MAX_BITS; ++i) {
+            offsets[i + 1] = offsets[i] + counts[i];
+        }
+        for (let i = 0; i < num; ++i) {
+            let len = lengths[off + i];
+            if (len != 0) {
+                symbols[offsets[len]++] = i;
+            }
+        }
+        return {counts: counts, symbols: symbols};
+    }
+
+    /**
+     * ハフマン符号から記号を取得します。
+     *
+     * @param {Object} huffman - ハフマン符号の表
+     * @returns {number} 記号
+     */
+    Inflater.prototype.getSymbol = function (huffman) {
+        let counts = huffman.counts;
+        let code = 0;
+        let first = 0;
+        let index = 0;
+        for (let len = 1; len <= MAX_BITS; ++len) {
+            code |= this.getBits(1);
+            let count = counts[len];
+            if (code - first < count) {
+                return huffman.symbols[index + code - first];
+            }
+            index += count;
+            first = (first + count) << 1;
+            code <<= 1;
+        }
+        throw new Error("Invalid huffman code in the compressed data!");
+    };
+
+    /**
+     * 非圧縮のブロックを展開します。
+     */
+    Inflater.prototype.inflateStored = function () {
+        // バイト境界に揃える
+        this.bit_buf = 0;
+        this.bit_cnt = 0;
+
+        if (this.src_end < this.src_pos + 4) {
+            throw new Error("Unexpected end of the compressed data!");
+        }
+        let src = this.src;
+        let len = src[this.src_pos] | (src[this.src_pos + 1] << 8);
+        let nlen = src[this.src_pos + 2] | (src[this.src_pos + 3] << 8);
+        this.src_pos += 4;
+        if (len != (~nlen & 0xffff)) {
+            throw new Error("Invalid stored block in the compressed data!");
+        }
+        if (this.src_end < this.src_pos + len || this.dest.length < this.dest_pos + len) {
+            throw new Error("Unexpected end of the compressed data!");
+        }
+        this.dest.set(src.subarray(this.src_pos, this.src_pos + len), this.dest_pos);
+        this.src_pos += len;
+        this.dest_pos += len;
+    };
+
+    /**
+     * ハフマン符号で圧縮されたブロックを展開します。
+     *
+     * @param {Object} lengths - 長さ、もしくはリテラルのハフマン符号の表
+     * @param {Object} distances - 距離のハフマン符号の表
+     */
+    Inflater.prototype.inflateCodes = function (lengths, distances) {
+        let dest = this.dest;
+        for (; ;) {
+            let symbol = this.getSymbol(lengths);
+            if (symbol < 256) {
+                // リテラル
+                if (dest.length <= this.dest_pos) {
+                    throw new Error("The inflated data overflows the buffer!");
+                }
+                dest[this.dest_pos++] = symbol;
+            } else if (symbol == 256) {
+                // ブロックの終端
+                return;
+            } else {
+                // 長さと距離
+                symbol -= 257;
+                if (LENGTH_BASES.length <= symbol) {
+                    throw new Error("Invalid length code in the compressed data!");
+                }
+                let len = LENGTH_BASES[symbol] + this.getBits(LENGTH_EXTRAS[symbol]);
+                symbol = this.getSymbol(distances);
+                if (DISTANCE_BASES.length <= symbol) {
+                    throw new Error("Invalid distance code in the compressed data!");
+                }
+                let dist = DISTANCE_BASES[symbol] + this.getBits(DISTANCE_EXTRAS[symbol]);
+                if (this.dest_pos < dist || dest.length < this.dest_pos + len) {
+                    throw new Error("Invalid distance in the compressed data!");
+                }
+                for (let i = 0; i < len; ++i, ++this.dest_pos) {
+                    dest[this.dest_pos] = dest[this.dest_pos - dist];
+                }
+            }
+        }
+    };
+
+    /**
+     * 固定ハフマン符号の表
+     *
+     * @private
+     * @type {Object[]}
+     */
+    let fixed_huffmans = null;
+
+    /**
+     * 固定ハフマン符号で圧縮されたブロックを展開します。
+     */
+    Inflater.prototype.inflateFixed = function () {
+        if (fixed_huffmans == null) {
+            let lengths = new Uint8Array(288 + 30);
+            xpl.ArrayUtils.fill(lengths, 0, 144, 8);
+            xpl.ArrayUtils.fill(lengths, 144, 256, 9);
+            xpl.ArrayUtils.fill(lengths, 256, 280, 7);
+            xpl.ArrayUtils.fill(lengths, 280, 288, 8);
+            xpl.ArrayUtils.fill(lengths, 288, 288 + 30, 5);
+            fixed_huffmans = [createHuffman(lengths, 0, 288), createHuffman(lengths, 288, 30)];
+        }
+        this.inflateCodes(fixed_huffmans[0], fixed_huffmans[1]);
+    };
+
+    /**
+     * 動的ハフマン符号で圧縮されたブロックを展開します。
+     */
+    Inflater.prototype.inflateDynamic = function () {
+        let num_lengths = this.getBits(5) + 257;
+        let num_distances = this.getBits(5) + 1;
+        let num_codes = this.getBits(4) + 4;
+        if (286 < num_lengths || 30 < num_distances) {
+            throw new Error("Invalid number of codes in the compressed data!");
+        }
+
+        // 符号長の符号
+        let lengths = new Uint8Array(num_lengths + num_distances);
+        let code_lengths = new Uint8Array(CODE_LENGTH_ORDER.length);
+        for (let i = 0; i < num_codes; ++i) {
+            code_lengths[CODE_LENGTH_ORDER[i]] = this.getBits(3);
+        }
+        let code_huffman = createHuffman(code_lengths, 0, code_lengths.length);
+
+        // 長さ、もしくはリテラルと距離の符号長
+        for (let i = 0; i < lengths.length;) {
+            let symbol = this.getSymbol(code_huffman);
+            if (symbol < 16) {
+                lengths[i++] = symbol;
+            } else {
+                let len = 0;
+                let repeat;
+                if (symbol == 16) {
+                    if (i == 0) {
+                        throw new Error("Invalid repeat of code lengths in the compressed data!");
+                    }
+                    len = lengths[i - 1];
+                    repeat = 3 + this.getBits(2);
+                } else if (symbol == 17) {
+                    repeat = 3 + this.getBits(3);
+                } else {
+                    repeat = 11 + this.getBits(7);
+                }
+                if (lengths.length < i + repeat) {
+                    throw new Error("Invalid repeat of code lengths in the compressed data!");
+                }
+                xpl.ArrayUtils.fill(lengths, i, i + repeat, len);
+                i += repeat;
+            }
+        }
+
+        this.inflateCodes(createHuffman(lengths, 0, num_lengths),
+                          createHuffman(lengths, num_lengths, num_distances));
+    };
+
+    /**
+     * ヘッダを持たないDeflate形式の圧縮データを展開します。
+     *
+     * @param {Uint8Array} src - 入力元の配列
+     * @param {number} src_off - 入力元の配列オフセット
+     * @param {number} src_len - 入力元の要素数
+     * @param {Uint8Array} dest - 出力先の配列、展開後のデータの大きさを持っている必要があります。
+     * @returns {number} 展開されたデータの大きさ
+     */
+    xpl.InflateUtils.inflateRaw = function (src, src_off, src_len, dest) {
+        let inflater = new Inflater(src, src_off, src_len, dest);
+        let last;
+        do {
+            last = inflater.getBits(1);
+            let type = inflater.getBits(2);
+            switch (type) {
+                case 0:
+                    inflater.inflateStored();
+                    break;
+                case 1:
+                    inflater.inflateFixed();
+                    break;
+                case 2:
+                    inflater.inflateDynamic();
+                    break;
+                default:
+                    throw new Error("Invalid block type in the compressed data!");
+            }
+        } while (!last);
+        return inflater.dest_pos;
+    };
+
+})(xpl);
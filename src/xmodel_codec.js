@@ -84,7 +84,7 @@
          * @memberof xpl.XModelCodec
          * @const {xpl.uint32_t} VERSION
          */
-        VERSION: {value: 36},
+        VERSION: {value: 43},
 
         /**
          * 互換のあるバージョン数
@@ -94,13 +94,159 @@
          */
         COMPATIBILITY_VERSION: {value: 36},
 
+        /**
+         * セクションが導入されたバージョン数
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint32_t} SECTION_VERSION
+         */
+        SECTION_VERSION: {value: 37},
+
+        /**
+         * 非圧縮のセクションの圧縮方式
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint8_t} SECTION_STORED
+         */
+        SECTION_STORED: {value: 0},
+
+        /**
+         * Deflate形式で圧縮されたセクションの圧縮方式
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint8_t} SECTION_DEFLATE
+         */
+        SECTION_DEFLATE: {value: 1},
+
+        /**
+         * 量子化された頂点属性が導入されたバージョン数
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint32_t} QUANTIZE_VERSION
+         */
+        QUANTIZE_VERSION: {value: 38},
+
+        /**
+         * 32bitの浮動小数点数の頂点属性の符号化方式
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint8_t} ENCODING_FLOAT32
+         */
+        ENCODING_FLOAT32: {value: 0},
+
+        /**
+         * 16bitの浮動小数点数の頂点属性の符号化方式
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint8_t} ENCODING_FLOAT16
+         */
+        ENCODING_FLOAT16: {value: 1},
+
+        /**
+         * 16bitの整数の頂点属性の符号化方式、値は成分ごとにオフセット + スケール * 整数です。
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint8_t} ENCODING_INT16
+         */
+        ENCODING_INT16: {value: 2},
+
+        /**
+         * 2つの16bitの正規化整数で八面体写像された単位ベクトルの符号化方式
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint8_t} ENCODING_OCTAHEDRAL16
+         */
+        ENCODING_OCTAHEDRAL16: {value: 3},
+
+        /**
+         * 2つの8bitの正規化整数で八面体写像された単位ベクトルの符号化方式
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint8_t} ENCODING_OCTAHEDRAL8
+         */
+        ENCODING_OCTAHEDRAL8: {value: 4},
+
+        /**
+         * 8bitの符号なし正規化整数の頂点属性の符号化方式
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint8_t} ENCODING_UNORM8
+         */
+        ENCODING_UNORM8: {value: 5},
+
+        /**
+         * コンテナの索引が導入されたバージョン数、
+         * このバージョンからノード配列はメッシュ配列より前に格納されます
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint32_t} INDEX_VERSION
+         */
+        INDEX_VERSION: {value: 39},
+
+        /**
+         * 索引の見出しのバイト数
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.size_t} INDEX_HEADER_SIZE
+         */
+        INDEX_HEADER_SIZE: {value: 12},
+
+        /**
+         * 索引の項目のバイト数
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.size_t} INDEX_ENTRY_SIZE
+         */
+        INDEX_ENTRY_SIZE: {value: 22},
+
+        /**
+         * 三角形分割された面が導入されたバージョン数
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint32_t} TRIANGULATE_VERSION
+         */
+        TRIANGULATE_VERSION: {value: 40},
+
+        /**
+         * インターリーブされた頂点が導入されたバージョン数
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint32_t} INTERLEAVE_VERSION
+         */
+        INTERLEAVE_VERSION: {value: 41},
+
+        /**
+         * ベジェ曲線のアニメーションキーの制御点が導入されたバージョン数
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint32_t} BEZIER_VERSION
+         */
+        BEZIER_VERSION: {value: 42},
+
+        /**
+         * サンプリングされたアニメーションのフレームが導入されたバージョン数
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.uint32_t} SAMPLE_VERSION
+         */
+        SAMPLE_VERSION: {value: 43},
+
+        /**
+         * インターリーブされた頂点の属性の数、
+         * 属性の順序はxpl.XModelMeshUtilsの構造体のバイト数を除いた属性と同じです
+         *
+         * @memberof xpl.XModelCodec
+         * @const {xpl.size_t} NUM_INTERLEAVED_ATTRIBUTES
+         */
+        NUM_INTERLEAVED_ATTRIBUTES: {value: 7},
+
         /**
          * バージョン文字列
          *
          * @memberof xpl.XModelCodec
          * @const {string} VERSION_NAME
          */
-        VERSION_NAME: {value: "0.9.92"},
+        VERSION_NAME: {value: "0.9.99"},
 
         /**
          * 互換のあるバージョン文字列
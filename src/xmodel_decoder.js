@@ -61,6 +61,16 @@
          */
         this.__data_offset = 0;
 
+        /**
+         * バイナリデータのバージョン
+         *
+         * @private
+         * @instance
+         * @memberof xpl.XModelDecoder
+         * @member {xpl.uint32_t} __version
+         */
+        this.__version = 0;
+
         /**
          * インスタンスマップ
          *
@@ -80,6 +90,36 @@
          * @member {Object.<uint32_t, XModelStructure>}
          */
         this.__weak_inst_map = null;
+
+        /**
+         * 次に取得されるインスタンスの識別子
+         *
+         * @private
+         * @instance
+         * @memberof xpl.XModelDecoder
+         * @member {xpl.uint32_t} __next_inst_id
+         */
+        this.__next_inst_id = 1;
+
+        /**
+         * バイナリデータ全体へのビュー、セクションの取得中もデータ全体を指します
+         *
+         * @private
+         * @instance
+         * @memberof xpl.XModelDecoder
+         * @member {DataView} __source_view
+         */
+        this.__source_view = null;
+
+        /**
+         * ランダムアクセスのために開かれているコンテナの索引
+         *
+         * @private
+         * @instance
+         * @memberof xpl.XModelDecoder
+         * @member {Object} __index
+         */
+        this.__index = null;
     };
 
     Object.setPrototypeOf(xpl.XModelDecoder.prototype, xpl.XModelCodec.prototype);
@@ -92,21 +132,7 @@
      * @returns {xpl.XModelStructure} デコードされたインスタンス
      */
     xpl.XModelDecoder.prototype.decode = function (buf) {
-        this.__data_view = new DataView(buf);
-        this.__data_offset = 0;
-        this.__inst_map = {};
-        this.__weak_inst_map = {};
-
-        // マジックナンバー
-        let magicNumber = this._getInt32();
-        if (magicNumber != xpl.XModelCodec.MAGIC_NUMBER) {
-            this._recycle();
-            return null;
-        }
-
-        // バージョン
-        let version = this._getInt32();
-        if (version < xpl.XModelCodec.COMPATIBILITY_VERSION) {
+        if (!this._open(buf)) {
             this._recycle();
             return null;
         }
@@ -116,6 +142,14 @@
         let inst = this._createStructureProcedure(type);
         this._getStructureProcedure(inst);
 
+        // 索引と索引のオフセット
+        if (xpl.XModelCodec.INDEX_VERSION <= this.__version &&
+            type == xpl.XModelStructure.TYPE_CONTAINER) {
+            let num_entries = this.__data_view.getUint32(this.__data_offset, true);
+            this.__data_offset += xpl.XModelCodec.INDEX_HEADER_SIZE +
+                                  xpl.XModelCodec.INDEX_ENTRY_SIZE * num_entries + 4;
+        }
+
         // 終端子
         let end = this._getInt32();
         if (end != xpl.XModelCodec.END_OF_DATA) {
@@ -135,8 +169,171 @@
     xpl.XModelDecoder.prototype._recycle = function () {
         this.__data_view = null;
         this.__data_offset = 0;
+        this.__version = 0;
         this.__inst_map = null;
         this.__weak_inst_map = null;
+        this.__next_inst_id = 1;
+        this.__source_view = null;
+        this.__index = null;
+    };
+
+    /**
+     * バイナリデータを読み込み、その見出しを取得します。
+     *
+     * @protected
+     * @instance
+     * @param {ArrayBuffer} buf - デコード対象のデータバッファ
+     * @returns {boolean} 対応しているバイナリデータかどうか
+     */
+    xpl.XModelDecoder.prototype._open = function (buf) {
+        this.__source_view = new DataView(buf);
+        this.__data_view = this.__source_view;
+        this.__data_offset = 0;
+        this.__inst_map = {};
+        this.__weak_inst_map = {};
+        this.__next_inst_id = 1;
+
+        // マジックナンバー
+        let magicNumber = this._getInt32();
+        if (magicNumber != xpl.XModelCodec.MAGIC_NUMBER) {
+            return false;
+        }
+
+        // バージョン
+        this.__version = this._getInt32();
+        return xpl.XModelCodec.COMPATIBILITY_VERSION <= this.__version &&
+               this.__version <= xpl.XModelCodec.VERSION;
+    };
+
+    /**
+     * ランダムアクセスのためにバイナリデータを開き、コンテナの索引を取得します。
+     * 索引の無いバイナリデータの場合はnullを返します。
+     * コンテナの配列の構造はcloseを呼ぶまでdecodeEntryで取得できます。
+     *
+     * @instance
+     * @param {ArrayBuffer} buf - デコード対象のデータバッファ
+     * @returns {Object} コンテナの索引、タイムレートと項目の配列
+     */
+    xpl.XModelDecoder.prototype.open = function (buf) {
+        this._recycle();
+        if (!this._open(buf) || this.__version < xpl.XModelCodec.INDEX_VERSION) {
+            this._recycle();
+            return null;
+        }
+
+        // 索引のオフセット、終端子の前に格納されています
+        this.__data_offset = this.__source_view.getUint32(this.__source_view.byteLength - 8, true);
+
+        // 項目数とタイムレート
+        let num_entries = this._getInt32();
+        let time_rate = this._getFloat64();
+        if (num_entries <= 0) {
+            this._recycle();
+            return null;
+        }
+
+        // 項目
+        let entries = new Array(num_entries);
+        for (let i = 0; i < num_entries; ++i) {
+            entries[i] = {
+                structure_type: this._getInt32(),
+                index: this._getUint16(),
+                offset: this._getInt32(),
+                size: this._getInt32(),
+                first_inst_id: this._getInt32(),
+                num_insts: this._getInt32()
+            };
+        }
+        this.__index = {time_rate: time_rate, entries: entries};
+        return this.__index;
+    };
+
+    /**
+     * ランダムアクセスのために開かれているコンテナの配列の構造をデコードします。
+     * 参照されている構造も合わせてデコードされ、呼び出しの間で共有されます。
+     *
+     * @instance
+     * @param {xpl.int32_t} struct_type - 配列の構造の種別
+     * @param {xpl.size_t} index - 配列の中の位置
+     * @returns {xpl.XModelStructure} デコードされたインスタンス
+     */
+    xpl.XModelDecoder.prototype.decodeEntry = function (struct_type, index) {
+        if (this.__index == null) {
+            throw new Error("The binary isn't opened for random access!");
+        }
+        let entries = this.__index.entries;
+        for (let i = 0; i < entries.length; ++i) {
+            let entry = entries[i];
+            if (entry.structure_type == struct_type && entry.index == index) {
+                return this._getEntry(entry);
+            }
+        }
+        return null;
+    };
+
+    /**
+     * ランダムアクセスのために開かれているバイナリデータを閉じます。
+     *
+     * @instance
+     */
+    xpl.XModelDecoder.prototype.close = function () {
+        this._recycle();
+    };
+
+    /**
+     * インスタンスが格納されている索引の項目を検索します。
+     *
+     * @protected
+     * @instance
+     * @param {xpl.uint32_t} inst_id - インスタンスの識別子
+     * @returns {Object} 索引の項目
+     */
+    xpl.XModelDecoder.prototype._findEntry = function (inst_id) {
+        // 先頭の識別子がinst_id以下の最後の項目を二分探索
+        let entries = this.__index.entries;
+        let low = 0;
+        let high = entries.length;
+        while (low < high) {
+            let mid = (low + high) >>> 1;
+            if (entries[mid].first_inst_id <= inst_id) {
+                low = mid + 1;
+            } else {
+                high = mid;
+            }
+        }
+
+        // インスタンスを持たない項目を除外
+        for (let i = low - 1; 0 <= i; --i) {
+            let entry = entries[i];
+            if (0 < entry.num_insts) {
+                return inst_id < entry.first_inst_id + entry.num_insts ? entry : null;
+            }
+        }
+        return null;
+    };
+
+    /**
+     * 索引の項目の構造をバイナリデータ全体から取得します。
+     *
+     * @protected
+     * @instance
+     * @param {Object} entry - 索引の項目
+     * @returns {xpl.XModelStructure} 構造
+     */
+    xpl.XModelDecoder.prototype._getEntry = function (entry) {
+        let data_view = this.__data_view;
+        let data_offset = this.__data_offset;
+        let next_inst_id = this.__next_inst_id;
+        this.__data_view = this.__source_view;
+        this.__data_offset = entry.offset;
+        this.__next_inst_id = entry.first_inst_id;
+        try {
+            return this._getStructure();
+        } finally {
+            this.__data_view = data_view;
+            this.__data_offset = data_offset;
+            this.__next_inst_id = next_inst_id;
+        }
     };
 
     /**
@@ -178,6 +375,19 @@
         return value;
     };
 
+    /**
+     * 16bitの符号なし整数を取得します。
+     *
+     * @protected
+     * @instance
+     * @returns {xpl.uint16_t} 16bitの符号なし整数
+     */
+    xpl.XModelDecoder.prototype._getUint16 = function () {
+        let value = this.__data_view.getUint16(this.__data_offset, true);
+        this.__data_offset += 2;
+        return value;
+    };
+
     /**
      * 32bitの符号あり整数を取得します。
      *
@@ -191,6 +401,19 @@
         return value;
     };
 
+    /**
+     * 32bitの符号なし整数を取得します。
+     *
+     * @protected
+     * @instance
+     * @returns {xpl.uint32_t} 32bitの符号なし整数
+     */
+    xpl.XModelDecoder.prototype._getUint32 = function () {
+        let value = this.__data_view.getUint32(this.__data_offset, true);
+        this.__data_offset += 4;
+        return value;
+    };
+
     /**
      * 32bitの浮動小数点数を取得します。
      *
@@ -365,6 +588,54 @@
         }
     };
 
+    /**
+     * セクションからデータを取得します。
+     * セクションが圧縮されている場合は展開したデータから取得します。
+     *
+     * @protected
+     * @instance
+     * @param {Function} proc - データを取得する関数
+     * @param {...*} args - データを取得する関数の引数
+     */
+    xpl.XModelDecoder.prototype._getSection = function (proc, ...args) {
+        if (this.__version < xpl.XModelCodec.SECTION_VERSION) {
+            proc.apply(this, args);
+            return;
+        }
+
+        // 圧縮方式、展開後の大きさと格納されている大きさ
+        let method = this._getUint8();
+        let raw_size = this._getInt32();
+        let stored_size = this._getInt32();
+        let end = this.__data_offset + stored_size;
+
+        if (method == xpl.XModelCodec.SECTION_STORED) {
+            proc.apply(this, args);
+        } else if (method == xpl.XModelCodec.SECTION_DEFLATE) {
+            // 展開
+            let raw = new Uint8Array(raw_size);
+            let src = new Uint8Array(this.__data_view.buffer,
+                                     this.__data_view.byteOffset + this.__data_offset,
+                                     stored_size);
+            if (xpl.InflateUtils.inflateRaw(src, 0, stored_size, raw) != raw_size) {
+                throw new Error("The section is broken!");
+            }
+
+            // 展開したデータから取得
+            let data_view = this.__data_view;
+            this.__data_view = new DataView(raw.buffer);
+            this.__data_offset = 0;
+            try {
+                proc.apply(this, args);
+            } finally {
+                this.__data_view = data_view;
+            }
+        } else {
+            throw new Error("Unknown compression method of the section: " + method);
+        }
+        this.__data_offset = end;
+    };
+
     /**
      * 構造を取得します。
      *
@@ -388,6 +659,16 @@
             return value;
         }
 
+        // ランダムアクセスではインスタンスが格納されている項目を取得
+        if (this.__index != null && inst_id != this.__next_inst_id) {
+            let entry = this._findEntry(inst_id);
+            if (entry == null) {
+                throw new Error("The instance " + inst_id + " isn't found in the index!");
+            }
+            this._getEntry(entry);
+            return this.__inst_map[inst_id];
+        }
+
         // 生成
         value = this.__weak_inst_map[inst_id];
         if (value != null) {
@@ -398,6 +679,7 @@
 
         // 追加
         this.__inst_map[inst_id] = value;
+        this.__next_inst_id = inst_id + 1;
 
         // 取得
         this._getStructureProcedure(value);
@@ -692,18 +974,13 @@
             this._getStructureArray(inst.materials, 0, inst.num_materials);
         }
 
-        // メッシュ配列
-        inst.num_meshes = this._getInt16();
-        if (0 < inst.num_meshes) {
-            inst.meshes = new Array(inst.num_meshes);
-            this._getStructureArray(inst.meshes, 0, inst.num_meshes);
-        }
-
-        // ノード配列
-        inst.num_nodes = this._getInt16();
-        if (0 < inst.num_nodes) {
-            inst.nodes = new Array(inst.num_nodes);
-            this._getStructureArray(inst.nodes, 0, inst.num_nodes);
+        // メッシュ配列とノード配列、索引のあるバージョンではノード配列が先に格納されています
+        if (xpl.XModelCodec.INDEX_VERSION <= this.__version) {
+            this._getContainerNodes(inst);
+            this._getContainerMeshes(inst);
+        } else {
+            this._getContainerMeshes(inst);
+            this._getContainerNodes(inst);
         }
 
         // タイムレート
@@ -720,6 +997,36 @@
         inst.userData = this._getUserData();
     };
 
+    /**
+     * コンテナのメッシュ配列を取得します。
+     *
+     * @protected
+     * @instance
+     * @param {xpl.XModelContainer} inst - コンテナ構造
+     */
+    xpl.XModelDecoder.prototype._getContainerMeshes = function (inst) {
+        inst.num_meshes = this._getInt16();
+        if (0 < inst.num_meshes) {
+            inst.meshes = new Array(inst.num_meshes);
+            this._getStructureArray(inst.meshes, 0, inst.num_meshes);
+        }
+    };
+
+    /**
+     * コンテナのノード配列を取得します。
+     *
+     * @protected
+     * @instance
+     * @param {xpl.XModelContainer} inst - コンテナ構造
+     */
+    xpl.XModelDecoder.prototype._getContainerNodes = function (inst) {
+        inst.num_nodes = this._getInt16();
+        if (0 < inst.num_nodes) {
+            inst.nodes = new Array(inst.num_nodes);
+            this._getStructureArray(inst.nodes, 0, inst.num_nodes);
+        }
+    };
+
     /**
      * テクスチャの構造を取得します。
      *
@@ -738,7 +1045,7 @@
         inst.data_size = this._getInt32();
         if (0 < inst.data_size) {
             inst.data = new Int8Array(inst.data_size);
-            this._getInt8Array(inst.data, 0, inst.data_size);
+            this._getSection(this._getInt8Array, inst.data, 0, inst.data_size);
         }
 
         // ユーザーデータ (インライン展開)
@@ -794,36 +1101,28 @@
         inst.num_positions = this._getInt32();
         if (0 < inst.num_positions) {
             inst.position_size = this._getInt8();
-            let size = inst.position_size * inst.num_positions;
-            inst.positions = new Float32Array(size);
-            this._getFloat32Array(inst.positions, 0, size);
+            inst.positions = this._getAttribute(inst.position_size, inst.num_positions);
         }
 
         // 法線配列
         inst.num_normals = this._getInt32();
         if (0 < inst.num_normals) {
             inst.normal_size = this._getInt8();
-            let size = inst.normal_size * inst.num_normals;
-            inst.normals = new Float32Array(size);
-            this._getFloat32Array(inst.normals, 0, size);
+            inst.normals = this._getAttribute(inst.normal_size, inst.num_normals);
         }
 
         // 色配列
         inst.num_colors = this._getInt32();
         if (0 < inst.num_colors) {
             inst.color_size = this._getInt8();
-            let size = inst.color_size * inst.num_colors;
-            inst.colors = new Float32Array(size);
-            this._getFloat32Array(inst.colors, 0, size);
+            inst.colors = this._getAttribute(inst.color_size, inst.num_colors);
         }
 
         // テクスチャ座標配列
         inst.num_tex_coords = this._getInt32();
         if (0 < inst.num_tex_coords) {
             inst.tex_coord_size = this._getInt8();
-            let size = inst.tex_coord_size * inst.num_tex_coords;
-            inst.tex_coords = new Float32Array(size);
-            this._getFloat32Array(inst.tex_coords, 0, size);
+            inst.tex_coords = this._getAttribute(inst.tex_coord_size, inst.num_tex_coords);
         }
 
         // スキン (インライン展開)
@@ -837,17 +1136,7 @@
         inst.num_vertices = this._getInt32();
         if (0 < inst.num_vertices) {
             inst.vertices = new Array(inst.num_vertices);
-            for (let i = 0; i < inst.num_vertices; ++i) {
-                let vertex = new xpl.XModelVertex();
-                this._getVertex(
-                    vertex,
-                    inst.num_positions,
-                    inst.num_normals,
-                    inst.num_colors,
-                    inst.num_tex_coords,
-                    has_skinning);
-                inst.vertices[i] = vertex;
-            }
+            this._getSection(this._getVertexArray, inst, has_skinning);
         }
 
         // 材質配列
@@ -861,17 +1150,300 @@
         inst.num_elements = this._getInt32();
         if (0 < inst.num_elements) {
             inst.elements = new Array(inst.num_elements);
-            for (let i = 0; i < inst.num_elements; ++i) {
-                let element = new xpl.XModelElement();
-                this._getElement(element);
-                inst.elements[i] = element
-            }
+            this._getSection(this._getElementArray, inst);
+        }
+
+        // 三角形分割された面
+        if (xpl.XModelCodec.TRIANGULATE_VERSION <= this.__version) {
+            this._getFaces(inst);
+        }
+
+        // インターリーブされた頂点
+        if (xpl.XModelCodec.INTERLEAVE_VERSION <= this.__version) {
+            this._getInterleaved(inst);
         }
 
         // ユーザーデータ (インライン展開)
         inst.user_data = this._getUserData();
     };
 
+    /**
+     * メッシュの頂点の配列を取得します。
+     *
+     * @protected
+     * @instance
+     * @param {xpl.XModelMesh} inst - メッシュの構造
+     * @param {boolean} has_skinning - スキンパラメータを持っているかどうか
+     */
+    xpl.XModelDecoder.prototype._getVertexArray = function (inst, has_skinning) {
+        for (let i = 0; i < inst.num_vertices; ++i) {
+            let vertex = new xpl.XModelVertex();
+            this._getVertex(
+                vertex,
+                inst.num_positions,
+                inst.num_normals,
+                inst.num_colors,
+                inst.num_tex_coords,
+                has_skinning);
+            inst.vertices[i] = vertex;
+        }
+    };
+
+    /**
+     * メッシュの要素の配列を取得します。
+     *
+     * @protected
+     * @instance
+     * @param {xpl.XModelMesh} inst - メッシュの構造
+     */
+    xpl.XModelDecoder.prototype._getElementArray = function (inst) {
+        for (let i = 0; i < inst.num_elements; ++i) {
+            let element = new xpl.XModelElement();
+            this._getElement(element);
+            inst.elements[i] = element
+        }
+    };
+
+    /**
+     * メッシュの三角形分割された面を取得します。
+     *
+     * @protected
+     * @instance
+     * @param {xpl.XModelMesh} inst - メッシュの構造
+     */
+    xpl.XModelDecoder.prototype._getFaces = function (inst) {
+        // 頂点インデックスの数
+        inst.num_face_indices = this._getInt32();
+        if (inst.num_face_indices <= 0) {
+            return;
+        }
+
+        // 頂点インデックスのバイト数と反転されているかどうか
+        inst.face_index_size = this._getUint8();
+        inst.face_reversed = this._getBool();
+
+        // 材質毎の開始位置と頂点インデックスの数
+        inst.face_offsets = new Int32Array(inst.num_materials + 1);
+        this._getInt32Array(inst.face_offsets, 0, inst.num_materials + 1);
+        inst.face_sizes = new Uint32Array(inst.num_materials + 1);
+        this._getInt32Array(inst.face_sizes, 0, inst.num_materials + 1);
+
+        // 頂点インデックス
+        if (inst.face_index_size == 2) {
+            inst.face_indices = new Uint16Array(inst.num_face_indices);
+        } else {
+            inst.face_indices = new Uint32Array(inst.num_face_indices);
+        }
+        this._getSection(this._getIndexArray, inst.face_indices);
+    };
+
+    /**
+     * メッシュのインターリーブされた頂点を取得します。
+     *
+     * @protected
+     * @instance
+     * @param {xpl.XModelMesh} inst - メッシュの構造
+     */
+    xpl.XModelDecoder.prototype._getInterleaved = function (inst) {
+        // 頂点のバイト数
+        inst.interleaved_stride = this._getInt16();
+        if (inst.interleaved_stride <= 0) {
+            return;
+        }
+
+        // 属性毎のデータ型、要素数と開始位置
+        let num_attributes = xpl.XModelCodec.NUM_INTERLEAVED_ATTRIBUTES;
+        inst.interleaved_types = new Int8Array(num_attributes);
+        this._getInt8Array(inst.interleaved_types, 0, num_attributes);
+        inst.interleaved_sizes = new Int8Array(num_attributes);
+        this._getInt8Array(inst.interleaved_sizes, 0, num_attributes);
+        inst.interleaved_offsets = new Int16Array(num_attributes);
+        this._getInt16Array(inst.interleaved_offsets, 0, num_attributes);
+
+        // 頂点
+        inst.interleaved_vertices = new Uint8Array(inst.interleaved_stride * inst.num_vertices);
+        this._getSection(this._getByteArray, inst.interleaved_vertices);
+    };
+
+    /**
+     * 符号なし整数の頂点インデックスの配列を取得します。
+     * 実行環境がリトルエンディアンの場合はバイト列をまとめて複製します。
+     *
+     * @protected
+     * @instance
+     * @param {Uint16Array|Uint32Array} buf - 出力先の配列
+     */
+    xpl.XModelDecoder.prototype._getIndexArray = function (buf) {
+        let size = buf.BYTES_PER_ELEMENT;
+        if (IS_LITTLE_ENDIAN) {
+            this._getByteArray(buf);
+        } else if (size == 2) {
+            for (let i = 0; i < buf.length; ++i) {
+                buf[i] = this._getUint16();
+            }
+        } else {
+            for (let i = 0; i < buf.length; ++i) {
+                buf[i] = this._getUint32();
+            }
+        }
+    };
+
+    /**
+     * 型付き配列のバイト列をまとめて複製して取得します。
+     *
+     * @protected
+     * @instance
+     * @param {ArrayBufferView} buf - 出力先の配列
+     */
+    xpl.XModelDecoder.prototype._getByteArray = function (buf) {
+        new Uint8Array(buf.buffer, buf.byteOffset, buf.byteLength).set(
+            new Uint8Array(this.__data_view.buffer,
+                           this.__data_view.byteOffset + this.__data_offset,
+                           buf.byteLength));
+        this.__data_offset += buf.byteLength;
+    };
+
+    /**
+     * メッシュの頂点属性の配列を取得します。
+     * 量子化された値は浮動小数点数に復元されます。
+     *
+     * @protected
+     * @instance
+     * @param {xpl.size_t} size - 頂点属性のベクトルの大きさ
+     * @param {xpl.size_t} num - 頂点属性の数
+     * @returns {Float32Array} 頂点属性の配列
+     */
+    xpl.XModelDecoder.prototype._getAttribute = function (size, num) {
+        let values = new Float32Array(size * num);
+
+        // 符号化方式
+        let encoding = xpl.XModelCodec.ENCODING_FLOAT32;
+        if (xpl.XModelCodec.QUANTIZE_VERSION <= this.__version) {
+            encoding = this._getUint8();
+        }
+
+        if (encoding == xpl.XModelCodec.ENCODING_FLOAT32) {
+            this._getSection(this._getFloat32Array, values, 0, size * num);
+        } else {
+            // 復元用のパラメータ
+            let params = null;
+            if (encoding == xpl.XModelCodec.ENCODING_INT16) {
+                params = new Float32Array(2 * size);
+                this._getFloat32Array(params, 0, params.length);
+            }
+
+            // 値
+            this._getSection(this._getQuantizedArray, values, encoding, params, size, num);
+        }
+        return values;
+    };
+
+    /**
+     * 量子化された頂点属性の配列を取得し、浮動小数点数に復元します。
+     *
+     * @protected
+     * @instance
+     * @param {Float32Array} values - 出力先の配列
+     * @param {xpl.uint8_t} encoding - 符号化方式
+     * @param {?Float32Array} params - 復元用のパラメータ
+     * @param {xpl.size_t} size - 頂点属性のベクトルの大きさ
+     * @param {xpl.size_t} num - 頂点属性の数
+     */
+    xpl.XModelDecoder.prototype._getQuantizedArray = function (values, encoding, params, size, num) {
+        let len = size * num;
+        switch (encoding) {
+            case xpl.XModelCodec.ENCODING_FLOAT16:
+                for (let i = 0; i < len; ++i) {
+                    values[i] = halfToFloat(this._getUint16());
+                }
+                break;
+
+            case xpl.XModelCodec.ENCODING_INT16:
+                for (let i = 0; i < len; ++i) {
+                    let j = i % size;
+                    values[i] = params[j] + params[size + j] * this._getInt16();
+                }
+                break;
+
+            case xpl.XModelCodec.ENCODING_OCTAHEDRAL16:
+                for (let i = 0; i < num; ++i) {
+                    let u = this._getInt16() / 0x7fff;
+                    let v = this._getInt16() / 0x7fff;
+                    octahedralToVector(u, v, values, 3 * i);
+                }
+                break;
+
+            case xpl.XModelCodec.ENCODING_OCTAHEDRAL8:
+                for (let i = 0; i < num; ++i) {
+                    let u = this._getInt8() / 0x7f;
+                    let v = this._getInt8() / 0x7f;
+                    octahedralToVector(u, v, values, 3 * i);
+                }
+                break;
+
+            case xpl.XModelCodec.ENCODING_UNORM8:
+                for (let i = 0; i < len; ++i) {
+                    values[i] = this._getUint8() / 0xff;
+                }
+                break;
+
+            default:
+                throw new Error("Unknown encoding of the attribute: " + encoding);
+        }
+    };
+
+    /**
+     * 実行環境がリトルエンディアンかどうか
+     *
+     * @private
+     * @const {boolean}
+     */
+    const IS_LITTLE_ENDIAN = new Uint8Array(new Uint16Array([1]).buffer)[0] == 1;
+
+    /**
+     * 16bitの浮動小数点数のビット列を数値に変換します。
+     *
+     * @private
+     * @param {xpl.uint16_t} half - 16bitの浮動小数点数のビット列
+     * @returns {number} 数値
+     */
+    function halfToFloat(half) {
+        let sign = (half & 0x8000) != 0 ? -1.0 : 1.0;
+        let exponent = (half >> 10) & 0x1f;
+        let mantissa = half & 0x3ff;
+        if (exponent == 0) {
+            return sign * mantissa * Math.pow(2, -24);
+        }
+        if (exponent == 31) {
+            return mantissa == 0 ? sign * Infinity : NaN;
+        }
+        return sign * (0x400 | mantissa) * Math.pow(2, exponent - 25);
+    }
+
+    /**
+     * 八面体写像された点を単位ベクトルに変換します。
+     *
+     * @private
+     * @param {number} u - 八面体写像された点のU座標
+     * @param {number} v - 八面体写像された点のV座標
+     * @param {Float32Array} dest - 出力先の配列
+     * @param {xpl.size_t} dest_off - 出力先の配列オフセット
+     */
+    function octahedralToVector(u, v, dest, dest_off) {
+        u = Math.max(-1.0, Math.min(u, 1.0));
+        v = Math.max(-1.0, Math.min(v, 1.0));
+        let w = 1.0 - Math.abs(u) - Math.abs(v);
+        if (w < 0.0) {
+            let t = u;
+            u = (1.0 - Math.abs(v)) * (t < 0.0 ? -1.0 : 1.0);
+            v = (1.0 - Math.abs(t)) * (v < 0.0 ? -1.0 : 1.0);
+        }
+        let len = Math.sqrt(u * u + v * v + w * w);
+        dest[dest_off] = u / len;
+        dest[dest_off + 1] = v / len;
+        dest[dest_off + 2] = w / len;
+    }
+
     /**
      * スキンの構造を取得します。
      *
@@ -897,23 +1469,8 @@
             }
             xpl.ArrayUtils.fill(inst.indices, 0, num, -1);
             xpl.ArrayUtils.fill(inst.weights, 0, num, 0);
-
-            for (let i = 0, index = 0; i < inst.num_weighted_indices; ++i, index += inst.weighted_index_stride) {
-                // 要素数
-                let size = this._getInt8();
-                inst.weighted_index_sizes[i] = size;
-
-                for (let j = 0; j < size; ++j) {
-                    let ind = index + j;
-
-                    // インデックス
-                    inst.indices[ind] = this._getInt16();
-
-                    // 重み
-                    inst.weights[ind] = this._getFloat32();
-                }
-            }
         }
+        this._getSection(this._getWeightedIndices, inst);
 
         // ボーン
         inst.num_nodes = this._getInt16();
@@ -925,7 +1482,32 @@
             // オフセット行列
             let matrices_size = xpl.XModelStructure.SIZE_MATRIX * inst.num_nodes;
             inst.offset_matrices = new Float32Array(matrices_size);
-            this._getFloat32Array(inst.offset_matrices, 0, matrices_size);
+            this._getSection(this._getFloat32Array, inst.offset_matrices, 0, matrices_size);
+        }
+    };
+
+    /**
+     * スキンの重み付きインデックスの配列を取得します。
+     *
+     * @protected
+     * @instance
+     * @param {xpl.XModelSkin} inst - スキン構造
+     */
+    xpl.XModelDecoder.prototype._getWeightedIndices = function (inst) {
+        for (let i = 0, index = 0; i < inst.num_weighted_indices; ++i, index += inst.weighted_index_stride) {
+            // 要素数
+            let size = this._getInt8();
+            inst.weighted_index_sizes[i] = size;
+
+            for (let j = 0; j < size; ++j) {
+                let ind = index + j;
+
+                // インデックス
+                inst.indices[ind] = this._getInt16();
+
+                // 重み
+                inst.weights[ind] = this._getFloat32();
+            }
         }
     };
 
@@ -1099,7 +1681,17 @@
         inst.num_keys = this._getInt16();
         if (0 < inst.num_keys) {
             inst.keys = new Array(inst.num_keys);
-            this._getStructureArray(inst.keys, 0, inst.num_keys);
+            this._getSection(this._getStructureArray, inst.keys, 0, inst.num_keys);
+        }
+
+        // サンプリングされたフレーム
+        if (xpl.XModelCodec.SAMPLE_VERSION <= this.__version) {
+            inst.num_frames = this._getInt32();
+            if (0 < inst.num_frames) {
+                inst.frame_start = this._getInt32();
+                inst.frame_size = this._getUint8();
+                inst.frames = this._getAttribute(inst.frame_size, inst.num_frames);
+            }
         }
 
         // アニメーション配列
@@ -1133,6 +1725,19 @@
             inst.value = new Float32Array(inst.value_size);
             this._getFloat32Array(inst.value, 0, inst.value_size);
         }
+
+        // ベジェ曲線の制御点
+        if (xpl.XModelCodec.BEZIER_VERSION <= this.__version &&
+            inst.interpolate == xpl.XModelAnimationKey.INTERPOLATE_BEZIER) {
+            inst.before_time = this._getFloat64();
+            inst.after_time = this._getFloat64();
+            if (0 < inst.value_size) {
+                inst.before_value = new Float32Array(inst.value_size);
+                this._getFloat32Array(inst.before_value, 0, inst.value_size);
+                inst.after_value = new Float32Array(inst.value_size);
+                this._getFloat32Array(inst.after_value, 0, inst.value_size);
+            }
+        }
     };
 
     /**
@@ -444,7 +444,7 @@
 
     Object.setPrototypeOf(xpl.XModelAxisRotate.prototype, xpl.XModelFloat32Array.prototype);
 
-    Object.defineProperties(xpl.XModelStructure, {
+    Object.defineProperties(xpl.XModelAxisRotate, {
 
         /**
          * 軸ベクトルのX要素
@@ -1285,6 +1285,105 @@
          */
         this.elements = null;
 
+        /**
+         * uint32_t : 三角形分割された面の頂点インデックスの数
+         *
+         * @instance
+         * @memberof xpl.XModelMesh
+         * @member {xpl.uint32_t} num_face_indices
+         */
+        this.num_face_indices = 0;
+
+        /**
+         * uint8_t : 三角形分割された面の頂点インデックスのバイト数 (2または4)
+         *
+         * @instance
+         * @memberof xpl.XModelMesh
+         * @member {xpl.uint8_t} face_index_size
+         */
+        this.face_index_size = 0;
+
+        /**
+         * bool : 三角形分割された面が要素から反転されているかどうか
+         *
+         * @instance
+         * @memberof xpl.XModelMesh
+         * @member {boolean} face_reversed
+         */
+        this.face_reversed = false;
+
+        /**
+         * int32_t[num_materials + 1] : 材質毎の三角形分割された面の開始位置、最後は既定の材質
+         *
+         * @instance
+         * @memberof xpl.XModelMesh
+         * @member {Int32Array} face_offsets
+         */
+        this.face_offsets = null;
+
+        /**
+         * uint32_t[num_materials + 1] : 材質毎の三角形分割された面の頂点インデックスの数
+         *
+         * @instance
+         * @memberof xpl.XModelMesh
+         * @member {Uint32Array} face_sizes
+         */
+        this.face_sizes = null;
+
+        /**
+         * uint16_t[num_face_indices] or uint32_t[num_face_indices] : 三角形分割された面の頂点インデックス
+         *
+         * @instance
+         * @memberof xpl.XModelMesh
+         * @member {Uint16Array|Uint32Array} face_indices
+         */
+        this.face_indices = null;
+
+        /**
+         * int16_t : インターリーブされた頂点のバイト数、インターリーブされていない場合は0
+         *
+         * @instance
+         * @memberof xpl.XModelMesh
+         * @member {xpl.int16_t} interleaved_stride
+         */
+        this.interleaved_stride = 0;
+
+        /**
+         * int8_t[7] : インターリーブされた頂点の属性毎のデータ型
+         *
+         * @instance
+         * @memberof xpl.XModelMesh
+         * @member {Int8Array} interleaved_types
+         */
+        this.interleaved_types = null;
+
+        /**
+         * int8_t[7] : インターリーブされた頂点の属性毎の要素数
+         *
+         * @instance
+         * @memberof xpl.XModelMesh
+         * @member {Int8Array} interleaved_sizes
+         */
+        this.interleaved_sizes = null;
+
+        /**
+         * int16_t[7] : インターリーブされた頂点の属性毎の開始位置、属性を持たない場合は-1
+         *
+         * @instance
+         * @memberof xpl.XModelMesh
+         * @member {Int16Array} interleaved_offsets
+         */
+        this.interleaved_offsets = null;
+
+        /**
+         * uint8_t[interleaved_stride * num_vertices] : インターリーブされた頂点
+         *
+         * @instance
+         * @memberof xpl.XModelMesh
+         * @member {Uint8Array} interleaved_vertices
+         */
+        this.interleaved_vertices = null;
+
         /**
          * int16_t : サブセットの数
          *
@@ -2014,6 +2113,42 @@
          */
         this.keys = null;
 
+        /**
+         * int32_t : 最初のサンプリングされたフレーム
+         *
+         * @instance
+         * @memberof xpl.XModelAnimation
+         * @member {xpl.int32_t} frame_start
+         */
+        this.frame_start = 0;
+
+        /**
+         * int32_t : サンプリングされたフレームの数、フレームはコンテナの時間レートの間隔です
+         *
+         * @instance
+         * @memberof xpl.XModelAnimation
+         * @member {xpl.int32_t} num_frames
+         */
+        this.num_frames = 0;
+
+        /**
+         * int8_t : 1フレームの値の数
+         *
+         * @instance
+         * @memberof xpl.XModelAnimation
+         * @member {xpl.int8_t} frame_size
+         */
+        this.frame_size = 0;
+
+        /**
+         * float32_t[frame_size * num_frames] : サンプリングされたフレームの値の配列
+         *
+         * @instance
+         * @memberof xpl.XModelAnimation
+         * @member {Float32Array} frames
+         */
+        this.frames = null;
+
         /**
          * uint16_t : 子のアニメーションの数
          *
@@ -60,6 +60,52 @@
         return -(from + 1);
     };
 
+    // サンプリングされたフレームを参照するためのキー
+    var sampled_start = {interpolate: 0, value: null};
+    var sampled_end = {interpolate: 0, value: null};
+
+    // サンプリングされたフレームの値をキーに設定
+    var getSampledKey = function (key, anim, index) {
+        key.value = anim.frames.subarray(anim.frame_size * index, anim.frame_size * (index + 1));
+        return key;
+    };
+
+    // 3次ベジェ曲線の値
+    var bezier = function (p0, p1, p2, p3, s) {
+        var r = 1.0 - s;
+        return r * r * r * p0 + 3.0 * r * r * s * p1 + 3.0 * r * s * s * p2 + s * s * s * p3;
+    };
+
+    // 局所的なキーの値の補間、開始のキーがベジェ曲線の場合は時間に対する曲線の媒介変数を
+    // ニュートン法と2分法で求めます
+    var interpolateValue = function (start, end, rate) {
+        if (start.interpolate != xpl.XModelAnimationKey.INTERPOLATE_BEZIER ||
+            start.after_value == null || end.before_value == null || end.time <= start.time) {
+            return start.value[0] * (1.0 - rate) + end.value[0] * rate;
+        }
+        var t0 = start.time, t1 = start.after_time, t2 = end.before_time, t3 = end.time;
+        var time = t0 + (t3 - t0) * rate;
+        var low = 0.0, high = 1.0, s = rate;
+        for (var i = 0; i < 16; ++i) {
+            var error = bezier(t0, t1, t2, t3, s) - time;
+            if (Math.abs(error) < 1e-9 * (t3 - t0)) {
+                break;
+            }
+            if (0.0 < error) {
+                high = s;
+            } else {
+                low = s;
+            }
+            var r = 1.0 - s;
+            var slope = 3.0 * (r * r * (t1 - t0) + 2.0 * r * s * (t2 - t1) + s * s * (t3 - t2));
+            s = 0.0 < slope ? s - error / slope : 0.5 * (low + high);
+            if (s <= low || high <= s) {
+                s = 0.5 * (low + high);
+            }
+        }
+        return bezier(start.value[0], start.after_value[0], end.before_value[0], end.value[0], s);
+    };
+
     /**
      * 軸回転構造に対する補間を行います。
      *
@@ -81,7 +127,7 @@
                     end.value[xpl.XModelAxisRotate.ANGLE] * rate;
             } else {
                 // 局所的な補間
-                target.values[index + anim.index] = start.value[0] * (1.0 - rate) + end.value[0] * rate;
+                target.values[index + anim.index] = interpolateValue(start, end, rate);
             }
         }
     };
@@ -104,7 +150,7 @@
                 xpl.Quaternion.slerpv(target.values, index, start.value, 0, end.value, 0, rate);
             } else {
                 // 局所的な補間
-                target.values[index + anim.index] = start.value[0] * (1.0 - rate) + end.value[0] * rate;
+                target.values[index + anim.index] = interpolateValue(start, end, rate);
             }
         }
     };
@@ -124,10 +170,10 @@
             let index = target.size * slot;
             if (anim.index == -1) {
                 // 全体的な補間
-                xpl.Vector3.lerpv(target.values, index, key0.value, 0, key1.value, 0, weight);
+                xpl.Vector3.lerpv(target.values, index, start.value, 0, end.value, 0, rate);
             } else {
                 // 局所的な補間
-                target.values[index + anim.index] = start.value[0] * (1.0 - rate) + end.value[0] * rate;
+                target.values[index + anim.index] = interpolateValue(start, end, rate);
             }
         }
     };
@@ -147,10 +193,10 @@
             let index = target.size * slot;
             if (anim.index == -1) {
                 // 全体的な補間
-                xpl.Vector3.lerpv(target.values, index, start.value, 0, end.value, 0, weight);
+                xpl.Vector3.lerpv(target.values, index, start.value, 0, end.value, 0, rate);
             } else {
                 // 局所的な補間
-                target.values[index + anim.index] = start.value[0] * (1.0 - rate) + end.value[0] * rate;
+                target.values[index + anim.index] = interpolateValue(start, end, rate);
             }
         }
     };
@@ -174,10 +220,10 @@
                     target.values, index,
                     start.value, 0,
                     end.value, 0,
-                    weight);
+                    rate);
             } else {
                 // 局所的な補間
-                target.values[index + anim.index] = start.value[0] * (1.0 - rate) + end.value[0] * rate;
+                target.values[index + anim.index] = interpolateValue(start, end, rate);
             }
         }
     };
@@ -191,12 +237,20 @@
      */
     xpl.XModelAnimationUtils.setAnimation = function (anim, time, slot) {
         if (anim != null) {
-            if (0 < anim.num_keys) {
-                // キーフレームの検索
-                let start = anim.keys[0];
-                let end = anim.keys[0];
+            if (0 < anim.num_frames || 0 < anim.num_keys) {
+                let start, end;
                 let rate = 0.0;
-                if (1 < anim.num_keys) {
+                if (0 < anim.num_frames) {
+                    // サンプリングされたフレームの参照
+                    let frame = Math.min(Math.max(time - anim.frame_start, 0.0), anim.num_frames - 1);
+                    let frame_index = Math.floor(frame);
+                    start = getSampledKey(sampled_start, anim, frame_index);
+                    end = getSampledKey(sampled_end, anim, Math.min(frame_index + 1, anim.num_frames - 1));
+                    rate = frame - frame_index;
+                } else if (1 < anim.num_keys) {
+                    // キーフレームの検索
+                    start = anim.keys[0];
+                    end = anim.keys[0];
                     var index = binarySearch(anim.keys, 0, anim.num_keys, time);
                     if (0 <= index) {
                         start = anim.keys[index];
@@ -214,6 +268,9 @@
                             rate = 0.0;
                         }
                     }
+                } else {
+                    start = anim.keys[0];
+                    end = anim.keys[0];
                 }
 
                 // キーフーレム間の補間
@@ -276,6 +333,9 @@
             for (var i = 0; i < anim.num_keys; ++i) {
                 time = Math.max(anim.keys[anim.num_keys - 1].time, time);
             }
+            if (0 < anim.num_frames) {
+                time = Math.max(anim.frame_start + anim.num_frames - 1, time);
+            }
             for (var i = 0; i < anim.num_children; ++i) {
                 time = Math.max(xpl.XModelAnimationUtils.getAnimationTotalTime(anim.children[i]), time);
             }
@@ -1029,6 +1029,62 @@
         }
     };
 
+    /**
+     * Get the interleaved vertices stored in the file if they are compatible with the specified types.
+     * The interleaved vertices have the attributes which the mesh has,
+     * so they are not compatible if the type of any stored attribute is different.
+     *
+     * @memberof xpl.XModelMesh
+     * @function getInterleavedVertices
+     * @param {xpl.XModelMesh} mesh - メッシュ構造のインスタンス
+     * @param {xpl.size_t} position_type - The type of the position.
+     * @param {xpl.size_t} normal_type - The type of normal.
+     * @param {xpl.size_t} color_type - The type of color.
+     * @param {xpl.size_t} tex_coord_type - The type of texture coordinate.
+     * @param {xpl.size_t} bone_length_type - The type of length of bones.
+     * @param {xpl.size_t} bone_indices_type - The type of bone indices.
+     * @param {xpl.size_t} bone_weights_type - The type of bone weights.
+     * @param {Int32Array} attrs - The destination attribute indices.
+     * @param {xpl.size_t} attrs_off - Starting position in the destination attribute indices.
+     * @returns {Uint8Array} The interleaved vertices, or null if they are not compatible.
+     */
+    xpl.XModelMeshUtils.getInterleavedVertices = function (mesh,
+                                                          position_type,
+                                                          normal_type,
+                                                          color_type,
+                                                          tex_coord_type,
+                                                          bone_length_type,
+                                                          bone_indices_type,
+                                                          bone_weights_type,
+                                                          attrs, attrs_off) {
+        if (mesh == null || mesh.interleaved_stride <= 0 || mesh.interleaved_vertices == null) {
+            return null;
+        }
+        let types = [
+            position_type,
+            normal_type,
+            color_type,
+            tex_coord_type,
+            bone_length_type,
+            bone_indices_type,
+            bone_weights_type
+        ];
+
+        // check the types of the stored attributes.
+        for (let i = 0; i < types.length; ++i) {
+            if (0 <= mesh.interleaved_offsets[i] && mesh.interleaved_types[i] != types[i]) {
+                return null;
+            }
+        }
+
+        // write the attribute indices.
+        attrs[attrs_off + xpl.XModelMeshUtils.ATTRIBUTE_STRUCTURE_SIZE] = mesh.interleaved_stride;
+        for (let i = 0; i < types.length; ++i) {
+            attrs[attrs_off + xpl.XModelMeshUtils.ATTRIBUTE_POSITION + i] = mesh.interleaved_offsets[i];
+        }
+        return mesh.interleaved_vertices;
+    };
+
     /**
      * Get the number of triangle indices of specified material within the mesh.
      *
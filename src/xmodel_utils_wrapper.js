@@ -664,30 +664,45 @@
                             var makeGPUBuffer = function (subset) {
                                 var base = subset == -1 ? mesh : mesh.subsets[subset];
 
-                                // get the vertices information.
+                                // get the vertices information,
+                                // the interleaved vertices in the file are used if they are compatible.
                                 var vertices_offsets =
                                     new Int32Array(ns.XModelMeshUtils.MAX_ATTRIBUTE);
-                                var vertices_size =
-                                    ns.XModelMeshUtils.getVerticesSize(
+                                var vertices = null;
+                                if (subset == -1 && is_structure) {
+                                    vertices = ns.XModelMeshUtils.getInterleavedVertices(
                                         mesh,
-                                        is_structure,
-                                        config[cls.CONFIG_MEMORY_ALIGNMENT_SIZE],
-                                        4, 4, 1, 4,
-                                        0, index_size, weight_size,
+                                        ns.XModelMeshUtils.TYPE_FLOAT,
+                                        ns.XModelMeshUtils.TYPE_FLOAT,
+                                        ns.XModelMeshUtils.TYPE_UNSIGNED_BYTE,
+                                        ns.XModelMeshUtils.TYPE_FLOAT,
+                                        ns.XModelMeshUtils.TYPE_VOID,
+                                        index_type, weight_type,
+                                        vertices_offsets, 0);
+                                }
+                                if (vertices == null) {
+                                    var vertices_size =
+                                        ns.XModelMeshUtils.getVerticesSize(
+                                            mesh,
+                                            is_structure,
+                                            config[cls.CONFIG_MEMORY_ALIGNMENT_SIZE],
+                                            4, 4, 1, 4,
+                                            0, index_size, weight_size,
+                                            vertices_offsets, 0,
+                                            subset);
+                                    vertices = new ArrayBuffer(vertices_size);
+                                    ns.XModelMeshUtils.getVertices(
+                                        mesh,
+                                        ns.XModelMeshUtils.TYPE_FLOAT,
+                                        ns.XModelMeshUtils.TYPE_FLOAT,
+                                        ns.XModelMeshUtils.TYPE_UNSIGNED_BYTE,
+                                        ns.XModelMeshUtils.TYPE_FLOAT,
+                                        ns.XModelMeshUtils.TYPE_VOID,
+                                        index_type, weight_type,
                                         vertices_offsets, 0,
+                                        vertices, 0,
                                         subset);
-                                var vertices = new ArrayBuffer(vertices_size);
-                                ns.XModelMeshUtils.getVertices(
-                                    mesh,
-                                    ns.XModelMeshUtils.TYPE_FLOAT,
-                                    ns.XModelMeshUtils.TYPE_FLOAT,
-                                    ns.XModelMeshUtils.TYPE_UNSIGNED_BYTE,
-                                    ns.XModelMeshUtils.TYPE_FLOAT,
-                                    ns.XModelMeshUtils.TYPE_VOID,
-                                    index_type, weight_type,
-                                    vertices_offsets, 0,
-                                    vertices, 0,
-                                    subset);
+                                }
 
                                 // make the buffers for CPU skinning.
                                 var src_vertices;
@@ -760,17 +775,25 @@
                                     dest_normals = null;
                                 }
 
-                                // get the faces information.
-                                var elements_offsets =
-                                    new Int32Array(mesh.num_materials + 1);
-                                var elements_sizes =
-                                    new Uint32Array(mesh.num_materials + 1);
-                                var elements_size =
-                                    ns.XModelMeshUtils.getNumAllTriangledFaceIndices(
-                                        mesh, elements_offsets, 0, elements_sizes, 0, subset);
-                                var elements = new Uint32Array(elements_size);
-                                ns.XModelMeshUtils.getAllTriangledFaceIndices(
-                                    mesh, true, elements_offsets, 0, elements, 0, subset);
+                                // get the faces information,
+                                // the triangulated faces in the file are used if they are reversed as drawing.
+                                var elements_offsets;
+                                var elements_sizes;
+                                var elements;
+                                if (subset == -1 && 0 < mesh.num_face_indices && mesh.face_reversed) {
+                                    elements_offsets = mesh.face_offsets;
+                                    elements_sizes = mesh.face_sizes;
+                                    elements = mesh.face_indices;
+                                } else {
+                                    elements_offsets = new Int32Array(mesh.num_materials + 1);
+                                    elements_sizes = new Uint32Array(mesh.num_materials + 1);
+                                    var elements_size =
+                                        ns.XModelMeshUtils.getNumAllTriangledFaceIndices(
+                                            mesh, elements_offsets, 0, elements_sizes, 0, subset);
+                                    elements = new Uint32Array(elements_size);
+                                    ns.XModelMeshUtils.getAllTriangledFaceIndices(
+                                        mesh, true, elements_offsets, 0, elements, 0, subset);
+                                }
 
                                 // generate the GPU buffer.
                                 base.vertex_buffer = ns.GLUtils.createBuffer(
@@ -791,7 +814,10 @@
                                     "dest_positions": dest_positions,
                                     "dest_normals": dest_normals,
                                     "elements_offsets": elements_offsets,
-                                    "elements_sizes": elements_sizes
+                                    "elements_sizes": elements_sizes,
+                                    "elements_type": elements.BYTES_PER_ELEMENT == 2 ?
+                                        gl.UNSIGNED_SHORT : gl.UNSIGNED_INT,
+                                    "elements_type_size": elements.BYTES_PER_ELEMENT
                                 };
                             };
 
@@ -844,10 +870,41 @@
         request.send();
     };
 
+    /**
+     *
+     */
+    var loadTextureWithBlob = function (self, gl, texture, blob, config) {
+        var img = new Image();
+        img.onload = function () {
+            texture.texture = ns.GLUtils.createTexture2DFromImage(
+                gl, gl.RGBA, gl.UNSIGNED_BYTE, img);
+            gl.bindTexture(gl.TEXTURE_2D, texture.texture);
+            if (config[cls.CONFIG_USE_MIPMAP_TEXTURE]) {
+                gl.generateMipmap(gl.TEXTURE_2D);
+            }
+            gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_WRAP_S, gl.MIRRORED_REPEAT);
+            gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_WRAP_T, gl.MIRRORED_REPEAT);
+            gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_MIN_FILTER, gl.LINEAR);
+            gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_MAG_FILTER, gl.LINEAR);
+            URL.revokeObjectURL(img.src);
+        };
+        img.src = URL.createObjectURL(blob);
+    };
+
     /**
      *
      */
     var loadTextureWithUrl = function (self, gl, texture, prefix, config) {
+        // 埋め込まれている画像は取得せずに読み込む
+        if (0 < texture.data_size && texture.data != null) {
+            loadTextureWithBlob(self, gl, texture, new Blob([texture.data]), config);
+            self.__remain_textures--;
+            if (self.__remain_textures <= 0) {
+                self._complete();
+            }
+            return;
+        }
+
         var request = new XMLHttpRequest();
         if (config[cls.CONFIG_PATH_ALIAS] != null && config[cls.CONFIG_PATH_ALIAS][texture.ref] != null) {
             request.open("GET", config[cls.CONFIG_PATH_ALIAS][texture.ref], true);
@@ -858,21 +915,7 @@
         request.onload = (function (event) {
             if (!self.isCanceled) {
                 if (event.target.status == 200) {
-                    var blob = event.target.response;
-                    var img = new Image();
-                    img.onload = function () {
-                        texture.texture = ns.GLUtils.createTexture2DFromImage(
-                            gl, gl.RGBA, gl.UNSIGNED_BYTE, img);
-                        gl.bindTexture(gl.TEXTURE_2D, texture.texture);
-                        if (config[cls.CONFIG_USE_MIPMAP_TEXTURE]) {
-                            gl.generateMipmap(gl.TEXTURE_2D);
-                        }
-                        gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_WRAP_S, gl.MIRRORED_REPEAT);
-                        gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_WRAP_T, gl.MIRRORED_REPEAT);
-                        gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_MIN_FILTER, gl.LINEAR);
-                        gl.texParameteri(gl.TEXTURE_2D, gl.TEXTURE_MAG_FILTER, gl.LINEAR);
-                    };
-                    img.src = URL.createObjectURL(blob);
+                    loadTextureWithBlob(this, gl, texture, event.target.response, config);
                 }
                 this.__remain_textures--;
                 if (this.__remain_textures <= 0) {
@@ -1108,8 +1151,9 @@
                         gl.drawElements(
                             gl.TRIANGLES,
                             elements_size,
-                            gl.UNSIGNED_INT,
-                            base.user_object.elements_offsets[i] * 4);
+                            base.user_object.elements_type,
+                            base.user_object.elements_offsets[i] *
+                            base.user_object.elements_type_size);
                     }
                 }
 